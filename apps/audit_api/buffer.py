@@ -0,0 +1,194 @@
+"""Escritura diferida y por lotes de AuditLog.
+
+AuditLogMiddleware abre un buffer por request; ``queue_audit_log`` (usado por el
+middleware y por los receivers de signals.py) solo construye el AuditLog en
+memoria y lo encola. Al terminar el request el buffer se vacía con un único
+``bulk_create`` después del commit.
+
+AUDIT_LOG_DURABILITY:
+- ``'request'`` (defecto): bulk_create al final del request. Un fallo del
+  proceso a mitad de request pierde las entradas aún no escritas.
+- ``'async'``: el lote se serializa y se entrega a la tarea Celery
+  ``write_audit_log_batch``; si el broker no responde se escribe en línea.
+- ``'sync'``: cada entrada se inserta al momento (comportamiento anterior).
+
+Backpressure: si un request acumula AUDIT_LOG_BUFFER_MAX_SIZE entradas el
+buffer se vacía en el acto. ``get_audit_buffer_metrics()`` expone contadores
+por proceso (encoladas, escritas, fallidas, vaciados anticipados, lote máximo).
+"""
+import contextvars
+import logging
+import threading
+
+from django.conf import settings
+from django.db import transaction
+from django.utils.dateparse import parse_datetime
+
+from .models import AuditLog
+from .utils import build_audit_log, create_audit_log
+
+logger = logging.getLogger(__name__)
+
+DURABILITY_SYNC = 'sync'
+DURABILITY_REQUEST = 'request'
+DURABILITY_ASYNC = 'async'
+
+_buffer = contextvars.ContextVar('audit_log_buffer', default=None)
+
+_SERIALIZED_FIELDS = (
+    'tenant_id', 'user_id', 'action', 'description', 'content_type_id', 'object_id',
+    'ip_address', 'user_agent', 'extra_data', 'source',
+)
+
+
+def get_durability():
+    return getattr(settings, 'AUDIT_LOG_DURABILITY', DURABILITY_REQUEST)
+
+
+def get_buffer_max_size():
+    return getattr(settings, 'AUDIT_LOG_BUFFER_MAX_SIZE', 200)
+
+
+class AuditBufferMetrics:
+    """Contadores por proceso del pipeline de auditoría."""
+
+    FIELDS = ('queued', 'written', 'failed', 'early_flushes', 'async_batches', 'max_batch_size')
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self._values = dict.fromkeys(self.FIELDS, 0)
+
+    def incr(self, name, amount=1):
+        with self._lock:
+            self._values[name] += amount
+
+    def observe_batch(self, size):
+        with self._lock:
+            if size > self._values['max_batch_size']:
+                self._values['max_batch_size'] = size
+
+    def snapshot(self):
+        with self._lock:
+            return dict(self._values)
+
+
+metrics = AuditBufferMetrics()
+
+
+def get_audit_buffer_metrics():
+    return metrics.snapshot()
+
+
+def start_audit_buffer():
+    """Abre un buffer para el contexto actual; devuelve el token para cerrarlo."""
+    if get_durability() == DURABILITY_SYNC:
+        return None
+    return _buffer.set([])
+
+
+def close_audit_buffer(token):
+    """Cierra el buffer abierto con ``start_audit_buffer`` y escribe lo pendiente tras el commit."""
+    if token is None:
+        return
+    entries = _buffer.get() or []
+    _buffer.reset(token)
+    if entries:
+        transaction.on_commit(lambda: flush_audit_logs(entries))
+
+
+def queue_audit_log(**kwargs):
+    """Como ``create_audit_log`` pero encola la entrada si hay un buffer abierto."""
+    entries = _buffer.get()
+    if entries is None:
+        return create_audit_log(**kwargs)
+
+    try:
+        entry = build_audit_log(**kwargs)
+    except Exception as exc:
+        logger.debug("No se pudo construir AuditLog (ignorado): %s", exc)
+        return None
+
+    entries.append(entry)
+    metrics.incr('queued')
+    if len(entries) >= get_buffer_max_size():
+        # Backpressure: no dejar crecer el buffer de un request sin límite
+        metrics.incr('early_flushes')
+        pending = entries[:]
+        entries.clear()
+        flush_audit_logs(pending)
+    return entry
+
+
+def queue_audit_logs(items):
+    """Encola varias entradas (``[kwargs de queue_audit_log]``) como un lote.
+
+    Sin buffer abierto (tareas Celery, comandos) se escriben con un único
+    ``bulk_create`` en lugar de una inserción por entrada.
+    """
+    if _buffer.get() is not None:
+        for kwargs in items:
+            queue_audit_log(**kwargs)
+        return
+
+    entries = []
+    for kwargs in items:
+        try:
+            entries.append(build_audit_log(**kwargs))
+        except Exception as exc:
+            logger.debug("No se pudo construir AuditLog (ignorado): %s", exc)
+    metrics.incr('queued', len(entries))
+    flush_audit_logs(entries)
+
+
+def flush_audit_logs(entries):
+    """Escribe ``entries`` según AUDIT_LOG_DURABILITY."""
+    if not entries:
+        return
+    metrics.observe_batch(len(entries))
+
+    if get_durability() == DURABILITY_ASYNC:
+        try:
+            from .tasks import write_audit_log_batch
+
+            write_audit_log_batch.delay([serialize_audit_log(entry) for entry in entries])
+            metrics.incr('async_batches')
+            return
+        except Exception as exc:
+            logger.warning("Audit async dispatch failed, writing inline: %s", exc)
+
+    write_audit_logs(entries)
+
+
+def write_audit_logs(entries):
+    """bulk_create de ``entries``; si el lote falla se reintenta fila a fila."""
+    try:
+        AuditLog.objects.bulk_create(entries)
+        metrics.incr('written', len(entries))
+        return
+    except Exception as exc:
+        logger.warning("Audit bulk_create failed (%s entries): %s", len(entries), exc)
+
+    for entry in entries:
+        try:
+            entry.pk = None
+            entry.save(force_insert=True)
+            metrics.incr('written')
+        except Exception as exc:
+            metrics.incr('failed')
+            logger.debug("No se pudo crear AuditLog (ignorado): %s", exc)
+
+
+def serialize_audit_log(entry):
+    row = {name: getattr(entry, name) for name in _SERIALIZED_FIELDS}
+    row['timestamp'] = entry.timestamp.isoformat()
+    return row
+
+
+def deserialize_audit_log(row):
+    row = dict(row)
+    row['timestamp'] = parse_datetime(row['timestamp'])
+    return AuditLog(**row)
@@ -1,31 +1,42 @@
-import json
 from django.utils.deprecation import MiddlewareMixin
-from django.contrib.contenttypes.models import ContentType
-from .utils import create_audit_log
+from .buffer import close_audit_buffer, queue_audit_log, start_audit_buffer
 
 class AuditLogMiddleware(MiddlewareMixin):
-    """Middleware to log user actions (non-auth actions only — auth logging is handled by views)"""
+    """Middleware to log user actions (non-auth actions only — auth logging is handled by views).
+
+    Opens a per-request audit buffer: entries queued during the request (this
+    middleware and the model signals) are written with one bulk_create after commit.
+    """
     
     def process_request(self, request):
         # Store original state for update operations
         if request.method in ['PUT', 'PATCH']:
             request._audit_original_state = {}
+        request._audit_buffer_token = start_audit_buffer()
         return None
     
     def process_response(self, request, response):
+        try:
+            self._log_request(request, response)
+        finally:
+            if hasattr(request, '_audit_buffer_token'):
+                close_audit_buffer(request._audit_buffer_token)
+                del request._audit_buffer_token
+        return response
+
+    def _log_request(self, request, response):
         # Skip auth paths — CookieLoginView already creates LoginAudit + AccessLog
         if request.path.startswith('/api/auth/'):
-            return response
+            return
         
         # Log other write actions
         if request.method in ['POST', 'PUT', 'PATCH', 'DELETE'] and response.status_code < 400:
             if not request.path.startswith('/api/'):
-                return response
-            create_audit_log(
+                return
+            queue_audit_log(
                 user=request.user if request.user.is_authenticated else None,
                 action=f'{request.method} {request.path}',
                 description=f'{request.method} {request.path} — {response.status_code}',
                 request=request,
                 source='API'
             )
-        return response
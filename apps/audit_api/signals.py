@@ -1,9 +1,8 @@
 import sys
 from django.db.models.signals import post_save, post_delete
 from django.dispatch import receiver
-from django.contrib.contenttypes.models import ContentType
 from django.db import transaction
-from .utils import create_audit_log
+from .buffer import queue_audit_log, queue_audit_logs
 from django.contrib.auth import get_user_model
 
 User = get_user_model()
@@ -16,6 +15,22 @@ AUDITED_APPS = {
 }
 
 
+def _is_audited(model):
+    # 🚫 Evitar ejecución durante migraciones o comandos especiales
+    if any(cmd in sys.argv for cmd in ['makemigrations', 'migrate', 'collectstatic', 'test', 'flush']):
+        return False
+    # Solo auditar modelos de negocio explícitamente listados
+    return model._meta.app_label in AUDITED_APPS
+
+
+def _audit_user(instance):
+    if hasattr(instance, 'created_by') and instance.created_by:
+        return instance.created_by
+    if hasattr(instance, 'user') and instance.user:
+        return instance.user
+    return None
+
+
 def _safe_instance_label(instance):
     try:
         return str(instance)
@@ -28,12 +43,7 @@ def _safe_instance_label(instance):
 @receiver(post_save)
 def audit_log_on_save(sender, instance, created, **kwargs):
     """Registra automáticamente todas las operaciones de guardado de modelos"""
-    # 🚫 Evitar ejecución durante migraciones o comandos especiales
-    if any(cmd in sys.argv for cmd in ['makemigrations', 'migrate', 'collectstatic', 'test', 'flush']):
-        return
-
-    # Solo auditar modelos de negocio explícitamente listados
-    if sender._meta.app_label not in AUDITED_APPS:
+    if not _is_audited(sender):
         return
     
     # Para User model, diferir auditoría hasta después del commit para evitar validaciones prematuras
@@ -53,14 +63,10 @@ def audit_log_on_save(sender, instance, created, **kwargs):
         }
     
     # Determinar el usuario
-    user = None
-    if hasattr(instance, 'created_by') and instance.created_by:
-        user = instance.created_by
-    elif hasattr(instance, 'user') and instance.user:
-        user = instance.user
+    user = _audit_user(instance)
     
     # Diferir auditoría hasta después del commit
-    transaction.on_commit(lambda: create_audit_log(
+    transaction.on_commit(lambda: queue_audit_log(
         user=user,
         action=action,
         description=f"{sender._meta.verbose_name} {action.lower()}d",
@@ -68,12 +74,38 @@ def audit_log_on_save(sender, instance, created, **kwargs):
         extra_data={'changes': changes}
     ))
 
+def audit_bulk_save(instances, created, changes=None):
+    """Audita filas escritas con ``bulk_create`` o ``update()``, que no emiten post_save.
+
+    Las entradas son las mismas que generaría ``audit_log_on_save`` por
+    instancia (``changes(instance)`` da los cambios de un UPDATE), pero se
+    encolan juntas tras el commit.
+    """
+    instances = list(instances)
+    if not instances or not _is_audited(type(instances[0])):
+        return
+
+    action = 'CREATE' if created else 'UPDATE'
+    description = f"{instances[0]._meta.verbose_name} {action.lower()}d"
+    items = [
+        {
+            'user': _audit_user(instance),
+            'action': action,
+            'description': description,
+            'content_object': instance,
+            'extra_data': {'changes': changes(instance) if changes else {}},
+        }
+        for instance in instances
+    ]
+    transaction.on_commit(lambda: queue_audit_logs(items))
+
+
 def _audit_user_creation(user_instance):
     """Auditar creación de usuario después del commit"""
     try:
         # Refrescar instancia para obtener datos actualizados
         user_instance.refresh_from_db()
-        create_audit_log(
+        queue_audit_log(
             user=None,  # Usuario sistema para creación de usuarios
             action='CREATE',
             description=f"Usuario creado: {user_instance.email}",
@@ -108,7 +140,7 @@ def audit_log_on_delete(sender, instance, **kwargs):
     # Diferir auditoría hasta después del commit
     deleted_object_label = _safe_instance_label(instance)
 
-    transaction.on_commit(lambda: create_audit_log(
+    transaction.on_commit(lambda: queue_audit_log(
         user=user,
         action='DELETE',
         description=f"{sender._meta.verbose_name} eliminado",
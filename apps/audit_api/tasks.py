@@ -0,0 +1,17 @@
+from celery import shared_task
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+@shared_task(bind=True, max_retries=3, default_retry_delay=30, retry_backoff=True, retry_jitter=True)
+def write_audit_log_batch(self, rows):
+    """Escribe un lote de AuditLog serializado por apps.audit_api.buffer (durabilidad 'async')."""
+    from .buffer import deserialize_audit_log, write_audit_logs
+
+    try:
+        write_audit_logs([deserialize_audit_log(row) for row in rows])
+    except Exception as e:
+        logger.error(f"Error writing audit log batch: {str(e)}")
+        raise self.retry(exc=e)
+    return len(rows)
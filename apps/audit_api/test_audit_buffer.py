@@ -0,0 +1,85 @@
+import pytest
+from django.db import connection
+from django.http import HttpResponse
+from django.test import RequestFactory
+from django.test.utils import CaptureQueriesContext
+
+from apps.audit_api import buffer
+from apps.audit_api.buffer import (
+    close_audit_buffer,
+    flush_audit_logs,
+    get_audit_buffer_metrics,
+    queue_audit_log,
+    start_audit_buffer,
+)
+from apps.audit_api.middleware import AuditLogMiddleware
+from apps.audit_api.models import AuditLog
+from apps.auth_api.factories import UserFactory
+
+
+@pytest.fixture(autouse=True)
+def _reset_metrics():
+    buffer.metrics.reset()
+
+
+@pytest.mark.django_db(transaction=True)
+def test_request_entries_are_written_in_one_insert_after_commit():
+    user = UserFactory()
+    token = start_audit_buffer()
+    for i in range(5):
+        queue_audit_log(user=user, action='UPDATE', description=f'cambio {i}', content_object=user)
+    assert not AuditLog.objects.filter(action='UPDATE', user=user).exists()
+
+    with CaptureQueriesContext(connection) as queries:
+        close_audit_buffer(token)
+
+    inserts = [q for q in queries if q['sql'].startswith('INSERT INTO "audit_api_auditlog"')]
+    assert len(inserts) == 1
+    assert AuditLog.objects.filter(action='UPDATE', user=user, object_id=user.id).count() == 5
+    assert get_audit_buffer_metrics()['written'] == 5
+
+
+@pytest.mark.django_db
+def test_without_buffer_entries_are_written_immediately():
+    queue_audit_log(user=None, action='SYSTEM_ERROR', description='sin buffer')
+
+    assert AuditLog.objects.filter(description='sin buffer').exists()
+
+
+@pytest.mark.django_db
+def test_buffer_flushes_early_when_full(settings):
+    settings.AUDIT_LOG_BUFFER_MAX_SIZE = 3
+    token = start_audit_buffer()
+    for i in range(4):
+        queue_audit_log(user=None, action='SYSTEM_ERROR', description=f'lleno {i}')
+
+    assert AuditLog.objects.filter(description__startswith='lleno').count() == 3
+    assert get_audit_buffer_metrics()['early_flushes'] == 1
+    buffer._buffer.reset(token)
+
+
+@pytest.mark.django_db
+def test_async_durability_hands_batch_to_celery(settings):
+    settings.AUDIT_LOG_DURABILITY = 'async'
+    user = UserFactory()
+
+    flush_audit_logs([buffer.build_audit_log(user=user, action='CREATE', description='async')])
+
+    assert AuditLog.objects.filter(description='async', user=user).exists()
+    assert get_audit_buffer_metrics()['async_batches'] == 1
+
+
+@pytest.mark.django_db(transaction=True)
+def test_middleware_logs_write_requests_through_buffer():
+    user = UserFactory()
+    middleware = AuditLogMiddleware(lambda request: None)
+    request = RequestFactory().post('/api/clients/', REMOTE_ADDR='10.0.0.1')
+    request.user = user
+
+    middleware.process_request(request)
+    assert not AuditLog.objects.filter(action='POST /api/clients/').exists()
+    middleware.process_response(request, HttpResponse(status=201))
+
+    log = AuditLog.objects.get(action='POST /api/clients/')
+    assert log.ip_address == '10.0.0.1'
+    assert not hasattr(request, '_audit_buffer_token')
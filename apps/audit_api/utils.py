@@ -149,11 +149,11 @@ def get_client_ip(request):
         ip = request.META.get('REMOTE_ADDR')
     return ip
 
-def create_audit_log(user, action, description, content_object=None, 
-                    ip_address=None, user_agent='', source='SYSTEM', 
+def build_audit_log(user, action, description, content_object=None,
+                    ip_address=None, user_agent='', source='SYSTEM',
                     extra_data=None, request=None):
     """
-    Función helper para crear logs de auditoría de forma unificada
+    Construye (sin guardar) un AuditLog con los mismos valores que create_audit_log
     """
     # Si se pasa request, extraer IP y user agent automáticamente
     if request:
@@ -189,9 +189,24 @@ def create_audit_log(user, action, description, content_object=None,
     
     if extra_data:
         kwargs['extra_data'] = extra_data
-    
+
+    return AuditLog(**kwargs)
+
+
+def create_audit_log(user, action, description, content_object=None, 
+                    ip_address=None, user_agent='', source='SYSTEM', 
+                    extra_data=None, request=None):
+    """
+    Función helper para crear logs de auditoría de forma unificada
+    """
     try:
-        return AuditLog.objects.create(**kwargs)
+        audit_log = build_audit_log(
+            user, action, description, content_object=content_object,
+            ip_address=ip_address, user_agent=user_agent, source=source,
+            extra_data=extra_data, request=request,
+        )
+        audit_log.save(force_insert=True)
+        return audit_log
     except Exception as e:
         # Durante migraciones o estados tempranos de la app la tabla puede no existir.
         # No queremos que una auditoría impida el procedimiento principal (migrate/tests).
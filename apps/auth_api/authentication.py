@@ -2,6 +2,8 @@ from rest_framework_simplejwt.authentication import JWTAuthentication
 from rest_framework_simplejwt.exceptions import InvalidToken, TokenError
 from django.conf import settings
 
+from .request_context import get_request_auth_context
+
 
 class CookieJWTAuthentication(JWTAuthentication):
     """
@@ -18,22 +20,22 @@ class CookieJWTAuthentication(JWTAuthentication):
         request.tenant = getattr(user, 'tenant', None)
     
     def authenticate(self, request):
-        # Primero intenta el método tradicional (Authorization header)
-        header_auth = super().authenticate(request)
-        if header_auth is not None:
-            user, validated_token = header_auth
-            self._attach_tenant(request, user)
-            return header_auth
-            
-        # Si no hay header, intenta cookies
-        raw_token = request.COOKIES.get('access_token')
-        if raw_token is None:
-            return None
-            
-        validated_token = self.get_validated_token(raw_token)
-        user = self.get_user(validated_token)
-        self._attach_tenant(request, user)
-        return (user, validated_token)
+        # El token se decodifica una sola vez por request (ver request_context)
+        ctx = get_request_auth_context(request)
+
+        # Primero el método tradicional (Authorization header): un header
+        # inválido es error aunque exista cookie
+        if ctx.header_error is not None:
+            raise ctx.header_error
+
+        # Si no hay header, la cookie
+        if ctx.cookie_error is not None:
+            raise ctx.cookie_error
+
+        auth_result = ctx.as_auth_tuple()
+        if auth_result is not None:
+            self._attach_tenant(request, ctx.user)
+        return auth_result
 
 
 class DualJWTAuthentication(JWTAuthentication):
@@ -51,25 +53,17 @@ class DualJWTAuthentication(JWTAuthentication):
         request.tenant = getattr(user, 'tenant', None)
     
     def authenticate(self, request):
-        # Método 1: Authorization header (actual)
-        try:
-            header_auth = super().authenticate(request)
-            if header_auth is not None:
-                user, _ = header_auth
-                self._attach_tenant(request, user)
-                return header_auth
-        except (InvalidToken, TokenError):
-            pass
-            
-        # Método 2: httpOnly cookie (nuevo)
-        try:
-            raw_token = request.COOKIES.get('access_token')
-            if raw_token is not None:
-                validated_token = self.get_validated_token(raw_token)
-                user = self.get_user(validated_token)
-                self._attach_tenant(request, user)
-                return (user, validated_token)
-        except (InvalidToken, TokenError):
-            pass
-            
-        return None
+        # Método 1: Authorization header, Método 2: httpOnly cookie.
+        # Ambos resueltos una sola vez en el contexto del request.
+        ctx = get_request_auth_context(request)
+
+        # Los errores de token se toleran (se prueba el otro método);
+        # el resto (header mal formado, usuario inactivo) se propaga.
+        for error in (ctx.header_error, ctx.cookie_error):
+            if error is not None and not isinstance(error, (InvalidToken, TokenError)):
+                raise error
+
+        auth_result = ctx.as_auth_tuple()
+        if auth_result is not None:
+            self._attach_tenant(request, ctx.user)
+        return auth_result
@@ -0,0 +1,182 @@
+"""Contexto de autenticacion por request.
+
+Un request API puede pasar por varios consumidores de JWT (MaintenanceModeMiddleware,
+TenantMiddleware, SubscriptionValidationMiddleware y los autenticadores DRF).
+Este modulo resuelve el token una sola vez (header Bearer primero, luego cookie
+``access_token``), carga el usuario con su tenant en una sola query y guarda el
+resultado en el HttpRequest para que todos lean lo mismo.
+"""
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken, TokenError
+from rest_framework_simplejwt.settings import api_settings
+
+
+AUTH_SOURCE_HEADER = 'header'
+AUTH_SOURCE_COOKIE = 'cookie'
+
+_CONTEXT_ATTR = '_auth_context'
+_ROLES_ATTR = '_effective_roles'
+
+
+class _ContextJWTAuthentication(JWTAuthentication):
+    """Decodificador interno: igual que simplejwt pero trae el tenant en el mismo SELECT."""
+
+    def get_user(self, validated_token):
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError as e:
+            raise InvalidToken('Token contained no recognizable user identification') from e
+
+        try:
+            user = self.user_model.objects.select_related('tenant').get(
+                **{api_settings.USER_ID_FIELD: user_id}
+            )
+        except self.user_model.DoesNotExist as e:
+            raise AuthenticationFailed('User not found', code='user_not_found') from e
+
+        if api_settings.CHECK_USER_IS_ACTIVE and not user.is_active:
+            raise AuthenticationFailed('User is inactive', code='user_inactive')
+
+        return user
+
+
+class RequestAuthContext:
+    """Resultado de autenticar un request una sola vez.
+
+    ``header_error`` y ``cookie_error`` conservan la excepcion original de cada
+    intento para que cada autenticador DRF pueda reproducir su semantica
+    (estricta o tolerante) sin volver a decodificar el token.
+    """
+
+    __slots__ = ('user', 'validated_token', 'source', 'header_error', 'cookie_error')
+
+    def __init__(self):
+        self.user = None
+        self.validated_token = None
+        self.source = None
+        self.header_error = None
+        self.cookie_error = None
+
+    @property
+    def is_authenticated(self) -> bool:
+        return self.user is not None
+
+    @property
+    def tenant_id(self):
+        if self.validated_token is None:
+            return None
+        return self.validated_token.get('tenant_id')
+
+    def as_auth_tuple(self):
+        if self.user is None:
+            return None
+        return self.user, self.validated_token
+
+
+def _is_token_error(exc) -> bool:
+    return isinstance(exc, (InvalidToken, TokenError))
+
+
+def _resolve(request) -> RequestAuthContext:
+    ctx = RequestAuthContext()
+    decoder = _ContextJWTAuthentication()
+
+    try:
+        header = decoder.get_header(request)
+        raw_token = decoder.get_raw_token(header) if header is not None else None
+        if raw_token is not None:
+            validated_token = decoder.get_validated_token(raw_token)
+            ctx.user = decoder.get_user(validated_token)
+            ctx.validated_token = validated_token
+            ctx.source = AUTH_SOURCE_HEADER
+            return ctx
+    except (AuthenticationFailed, TokenError) as exc:
+        ctx.header_error = exc
+        # Errores que no son de token (header mal formado, usuario inactivo)
+        # cortan la autenticacion igual que en simplejwt: no se prueba la cookie.
+        if not _is_token_error(exc):
+            return ctx
+
+    raw_token = request.COOKIES.get('access_token')
+    if raw_token is None:
+        return ctx
+
+    try:
+        validated_token = decoder.get_validated_token(raw_token)
+        ctx.user = decoder.get_user(validated_token)
+        ctx.validated_token = validated_token
+        ctx.source = AUTH_SOURCE_COOKIE
+    except (AuthenticationFailed, TokenError) as exc:
+        ctx.cookie_error = exc
+
+    return ctx
+
+
+def get_request_auth_context(request) -> RequestAuthContext:
+    """Devuelve el contexto de autenticacion del request, resolviendolo una sola vez.
+
+    Acepta tanto ``HttpRequest`` como ``rest_framework.request.Request``; en el
+    segundo caso el contexto se guarda en el HttpRequest subyacente para que
+    middlewares y autenticadores compartan la misma instancia.
+    """
+    http_request = getattr(request, '_request', request)
+    ctx = getattr(http_request, _CONTEXT_ATTR, None)
+    if ctx is None:
+        ctx = _resolve(http_request)
+        setattr(http_request, _CONTEXT_ATTR, ctx)
+    return ctx
+
+
+def authenticate_request_user(request):
+    """Asigna ``request.user`` desde el contexto JWT si aun no hay usuario autenticado.
+
+    Uso exclusivo de middlewares: los errores de token se ignoran porque la
+    respuesta 401 la decide DRF mas adelante.
+    """
+    user = getattr(request, 'user', None)
+    if user is not None and user.is_authenticated:
+        return user
+
+    ctx = get_request_auth_context(request)
+    if ctx.is_authenticated:
+        request.user = ctx.user
+    return getattr(request, 'user', None)
+
+
+def get_request_role(request, user=None, tenant=None) -> str:
+    """Rol efectivo del usuario del request, resuelto una sola vez por (usuario, tenant).
+
+    Middlewares, mixins y vistas comparten el resultado guardado en el
+    HttpRequest; entre requests lo cachea ``get_effective_role_name``.
+    """
+    user = user if user is not None else getattr(request, 'user', None)
+    if user is None or not getattr(user, 'is_authenticated', False):
+        return ''
+    if getattr(user, 'is_superuser', False):
+        return 'SuperAdmin'
+
+    http_request = getattr(request, '_request', request)
+    roles = getattr(http_request, _ROLES_ATTR, None)
+    if roles is None:
+        roles = {}
+        setattr(http_request, _ROLES_ATTR, roles)
+
+    tenant_id = tenant.pk if tenant is not None else user.tenant_id
+    key = (user.pk, tenant_id)
+    role = roles.get(key)
+    if role is None:
+        from .role_utils import get_effective_role_name
+
+        role = roles[key] = get_effective_role_name(user, tenant=tenant)
+    return role
+
+
+def get_request_role_api(request, user=None, tenant=None) -> str:
+    """Como ``get_request_role`` pero normalizado al formato de la API (``CLIENT_ADMIN``)."""
+    from .role_utils import normalize_role_for_api
+
+    user = user if user is not None else getattr(request, 'user', None)
+    return normalize_role_for_api(
+        get_request_role(request, user=user, tenant=tenant),
+        is_superuser=getattr(user, 'is_superuser', False),
+    )
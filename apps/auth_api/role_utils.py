@@ -1,4 +1,9 @@
 import re
+from functools import lru_cache
+
+from django.conf import settings
+
+from apps.utils.versioned_cache import LocalLRUCache, is_shared_cache
 
 
 ROLE_ALIASES = {
@@ -38,6 +43,15 @@ BUSINESS_ROLE_DISPLAY = {
 }
 
 
+# Nombres de rol asignados (UserRole) por (usuario, tenant, version RBAC). La
+# version sube con cualquier cambio de Role o de los UserRole del usuario
+# (roles_api.signals).
+EFFECTIVE_ROLE_LOCAL_TTL = getattr(settings, 'EFFECTIVE_ROLE_LOCAL_TTL', 30)
+_assigned_roles = LocalLRUCache(maxsize=4096, ttl=EFFECTIVE_ROLE_LOCAL_TTL)
+_ANY_TENANT = '*'
+
+
+@lru_cache(maxsize=256)
 def normalize_role_for_api(role: str | None, is_superuser: bool = False) -> str:
     """Normalize role labels to API format (UPPER_SNAKE_CASE)."""
     raw = (role or '').strip()
@@ -49,6 +63,7 @@ def normalize_role_for_api(role: str | None, is_superuser: bool = False) -> str:
     return ROLE_ALIASES.get(key, key)
 
 
+@lru_cache(maxsize=256)
 def normalize_business_role(role: str | None, is_superuser: bool = False) -> str:
     raw = (role or '').strip()
     if not raw:
@@ -84,17 +99,10 @@ def get_effective_role_name(user, tenant=None) -> str:
     if getattr(user, 'is_superuser', False):
         return 'SuperAdmin'
 
-    if tenant is None:
-        tenant = getattr(user, 'tenant', None)
+    tenant_id = getattr(tenant, 'pk', tenant) if tenant is not None else getattr(user, 'tenant_id', None)
 
     try:
-        from apps.roles_api.models import UserRole
-
-        role_qs = UserRole.objects.filter(user=user)
-        if tenant is not None:
-            role_qs = role_qs.filter(tenant=tenant)
-
-        role_name = role_qs.values_list('role__name', flat=True).first()
+        role_name = _get_assigned_role_name(user.pk, tenant_id)
         if role_name:
             return role_name
     except Exception:
@@ -103,6 +111,28 @@ def get_effective_role_name(user, tenant=None) -> str:
     return (getattr(user, 'role', None) or '').strip()
 
 
+def _get_assigned_role_name(user_id, tenant_id) -> str:
+    """Primer rol asignado via UserRole, cacheado por version RBAC ('' si no hay)."""
+    from apps.roles_api.models import UserRole
+    from apps.roles_api.permission_cache import RBAC_PERMISSION_FALLBACK_TTL, get_rbac_version
+
+    version = get_rbac_version(user_id)
+    cache_key = (user_id, tenant_id if tenant_id is not None else _ANY_TENANT, version)
+    if version is not None:
+        role_name = _assigned_roles.get(cache_key)
+        if role_name is not None:
+            return role_name
+
+    role_qs = UserRole.objects.filter(user_id=user_id)
+    if tenant_id is not None:
+        role_qs = role_qs.filter(tenant_id=tenant_id)
+    role_name = role_qs.values_list('role__name', flat=True).first() or ''
+
+    if version is not None:
+        _assigned_roles.set(cache_key, role_name, ttl=None if is_shared_cache() else RBAC_PERMISSION_FALLBACK_TTL)
+    return role_name
+
+
 def get_effective_role_api(user, tenant=None) -> str:
     return normalize_role_for_api(
         get_effective_role_name(user, tenant=tenant),
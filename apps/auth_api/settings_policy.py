@@ -1,10 +1,10 @@
 from django.conf import settings as django_settings
-from apps.settings_api.models import SystemSettings
+from apps.settings_api.settings_cache import get_cached_system_settings
 
 
 def _get_system_settings():
     try:
-        return SystemSettings.get_settings()
+        return get_cached_system_settings()
     except Exception:
         return None
 
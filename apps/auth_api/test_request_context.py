@@ -0,0 +1,83 @@
+import pytest
+from unittest.mock import patch
+from django.test import RequestFactory
+from rest_framework.request import Request
+from rest_framework_simplejwt.exceptions import InvalidToken
+from rest_framework_simplejwt.tokens import AccessToken
+
+from apps.auth_api.authentication import CookieJWTAuthentication, DualJWTAuthentication
+from apps.auth_api.factories import UserFactory
+from apps.auth_api.request_context import (
+    AUTH_SOURCE_COOKIE,
+    AUTH_SOURCE_HEADER,
+    _ContextJWTAuthentication,
+    get_request_auth_context,
+)
+
+
+def _access_token_for(user):
+    token = AccessToken.for_user(user)
+    token['tenant_id'] = user.tenant_id
+    return str(token)
+
+
+@pytest.mark.django_db
+def test_context_is_resolved_once_and_shared_with_drf_request():
+    user = UserFactory()
+    http_request = RequestFactory().get('/api/auth/verify/', HTTP_AUTHORIZATION=f'Bearer {_access_token_for(user)}')
+
+    with patch.object(
+        _ContextJWTAuthentication, 'get_validated_token',
+        wraps=_ContextJWTAuthentication().get_validated_token,
+    ) as decode:
+        ctx = get_request_auth_context(http_request)
+        drf_request = Request(http_request)
+        assert get_request_auth_context(drf_request) is ctx
+        assert DualJWTAuthentication().authenticate(drf_request)[0] == user
+        assert CookieJWTAuthentication().authenticate(drf_request)[0] == user
+
+    assert decode.call_count == 1
+    assert ctx.source == AUTH_SOURCE_HEADER
+    assert ctx.tenant_id == user.tenant_id
+
+
+@pytest.mark.django_db
+def test_full_request_decodes_token_once(api_client):
+    user = UserFactory()
+    api_client.credentials(HTTP_AUTHORIZATION=f'Bearer {_access_token_for(user)}')
+
+    with patch.object(
+        _ContextJWTAuthentication, 'get_validated_token',
+        wraps=_ContextJWTAuthentication().get_validated_token,
+    ) as decode:
+        response = api_client.get('/api/auth/verify/')
+
+    assert response.status_code == 200
+    assert response.json()['user']['id'] == user.id
+    assert decode.call_count == 1
+
+
+@pytest.mark.django_db
+def test_dual_falls_back_to_cookie_but_cookie_auth_is_strict_on_bad_header():
+    user = UserFactory()
+    http_request = RequestFactory().get('/api/auth/verify/', HTTP_AUTHORIZATION='Bearer not-a-token')
+    http_request.COOKIES['access_token'] = _access_token_for(user)
+
+    ctx = get_request_auth_context(http_request)
+    assert isinstance(ctx.header_error, InvalidToken)
+    assert ctx.source == AUTH_SOURCE_COOKIE
+
+    assert DualJWTAuthentication().authenticate(Request(http_request))[0] == user
+    with pytest.raises(InvalidToken):
+        CookieJWTAuthentication().authenticate(Request(http_request))
+
+
+@pytest.mark.django_db
+def test_anonymous_request_has_empty_context():
+    http_request = RequestFactory().get('/api/auth/verify/')
+
+    ctx = get_request_auth_context(http_request)
+
+    assert not ctx.is_authenticated
+    assert ctx.tenant_id is None
+    assert DualJWTAuthentication().authenticate(Request(http_request)) is None
@@ -0,0 +1,51 @@
+import pytest
+from django.db import connection
+from django.test import RequestFactory
+from django.test.utils import CaptureQueriesContext
+
+from apps.auth_api import role_utils
+from apps.auth_api.factories import UserFactory
+from apps.auth_api.request_context import get_request_role, get_request_role_api
+from apps.auth_api.role_utils import get_effective_role_name
+from apps.roles_api.models import Role, UserRole
+
+
+@pytest.fixture(autouse=True)
+def _clear_role_cache():
+    role_utils._assigned_roles.clear()
+    yield
+    role_utils._assigned_roles.clear()
+
+
+@pytest.fixture
+def manager():
+    user = UserFactory(role='Client-Staff')
+    role, _ = Role.objects.get_or_create(name='Manager')
+    UserRole.objects.create(user=user, role=role, tenant=user.tenant)
+    return user
+
+
+@pytest.mark.django_db
+def test_request_role_is_resolved_once_per_request(manager):
+    request = RequestFactory().get('/api/pos/sales/')
+    request.user = manager
+
+    with CaptureQueriesContext(connection) as queries:
+        assert get_request_role(request) == 'Manager'
+        assert get_request_role(request, tenant=manager.tenant) == 'Manager'
+        assert get_request_role_api(request, tenant=manager.tenant) == 'MANAGER'
+
+    assert len(queries) == 1
+
+
+@pytest.mark.django_db
+def test_effective_role_is_cached_between_requests_until_roles_change(manager):
+    assert get_effective_role_name(manager) == 'Manager'
+
+    with CaptureQueriesContext(connection) as queries:
+        assert get_effective_role_name(manager, tenant=manager.tenant) == 'Manager'
+    assert len(queries) == 0
+
+    UserRole.objects.filter(user=manager).delete()
+    # Sin UserRole se vuelve al campo legacy
+    assert get_effective_role_name(manager) == 'Client-Staff'
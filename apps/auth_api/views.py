@@ -32,6 +32,7 @@ from .serializers import (
     EmployeeUserSerializer, UserListSerializer, get_explicit_tenant_input,
     ResendVerificationSerializer
 )
+from .request_context import get_request_role_api
 from .role_utils import (
     get_effective_role_api,
     get_effective_role_name,
@@ -1352,7 +1353,7 @@ class VerifyAuthView(APIView):
             'user': {
                 'id': request.user.id,
                 'email': request.user.email,
-                'role': get_effective_role_api(request.user, tenant=getattr(request, 'tenant', None)),
+                'role': get_request_role_api(request, tenant=getattr(request, 'tenant', None)),
                 'branch_id': request.user.employee_profile.branch_id if hasattr(request.user, 'employee_profile') and request.user.employee_profile else None,
             }
         })
@@ -1,3 +1,4 @@
+from django.http import Http404
 from django.shortcuts import get_object_or_404
 from django.utils import timezone
 from django.db.models import Q, Prefetch
@@ -7,7 +8,7 @@ from rest_framework.permissions import AllowAny
 from rest_framework.response import Response
 from rest_framework.throttling import AnonRateThrottle
 from datetime import datetime, timedelta, date, time, timezone as dt_timezone
-from apps.tenants_api.models import Tenant
+from apps.tenants_api.tenant_cache import get_tenant_snapshot_by_subdomain
 from apps.services_api.models import Service
 from apps.employees_api.models import Employee, WorkSchedule
 from apps.clients_api.models import Client
@@ -27,13 +28,10 @@ class PublicBookingThrottle(AnonRateThrottle):
 
 
 def get_tenant_or_404(subdomain):
-    tenant = get_object_or_404(
-        Tenant,
-        subdomain=subdomain,
-        is_active=True,
-        deleted_at__isnull=True,
-    )
-    return tenant
+    snapshot = get_tenant_snapshot_by_subdomain(subdomain)
+    if snapshot is None or not snapshot.is_active or snapshot.deleted_at is not None:
+        raise Http404('No Tenant matches the given query.')
+    return snapshot.to_tenant()
 
 
 @api_view(['GET'])
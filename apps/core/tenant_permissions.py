@@ -8,7 +8,7 @@ import logging
 
 from rest_framework.permissions import BasePermission
 
-from apps.roles_api.models import UserRole
+from apps.roles_api.permission_cache import get_compiled_permissions
 
 logger = logging.getLogger(__name__)
 
@@ -27,23 +27,14 @@ def resolve_request_tenant(request):
 
 
 def _check_permission_in_db(user, tenant, app_label, codename):
-    """Verificar permisos explicitos via UserRole -> Role -> Permission."""
-    user_roles = UserRole.objects.filter(
-        user=user,
-        tenant=tenant
-    ).select_related('role').prefetch_related('role__permissions__content_type')
-
-    for user_role in user_roles:
-        if user_role.role.permissions.filter(
-            content_type__app_label=app_label,
-            codename=codename
-        ).exists():
-            return True
+    """Verificar permisos explicitos via UserRole -> Role -> Permission (set compilado y cacheado)."""
+    compiled = get_compiled_permissions(user, tenant)
+    if compiled.has_perm(app_label, codename):
+        return True
 
-    role_names = list(user_roles.values_list('role__name', flat=True))
     logger.warning(
         "Permiso denegado user=%s tenant=%s perm=%s.%s roles=%s",
-        user.id, tenant.id, app_label, codename, role_names,
+        user.id, tenant.id, app_label, codename, list(compiled.role_names),
     )
     return False
 
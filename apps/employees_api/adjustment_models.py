@@ -103,4 +103,9 @@ class CommissionAdjustment(models.Model):
         if not self.tenant_id:
             self.tenant = self.employee.tenant
         
+        creating = self._state.adding
         super().save(*args, **kwargs)
+        
+        if creating:
+            from .payroll_accumulators import record_commission_adjustment
+            record_commission_adjustment(self)
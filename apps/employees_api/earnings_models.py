@@ -52,6 +52,15 @@ class PayrollPeriod(models.Model):
     deductions_total = models.DecimalField(max_digits=10, decimal_places=2, default=Decimal('0.00'))
     net_amount = models.DecimalField(max_digits=10, decimal_places=2, default=Decimal('0.00'))
     
+    # Acumuladores incrementales: cada venta, reembolso y CommissionAdjustment
+    # aplica su delta con F() (ver payroll_accumulators.py); calculate_amounts()
+    # los reconstruye desde cero.
+    sales_commission_total = models.DecimalField(max_digits=10, decimal_places=2, default=Decimal('0.00'))
+    sales_count = models.IntegerField(default=0)
+    adjustments_total = models.DecimalField(max_digits=10, decimal_places=2, default=Decimal('0.00'))
+    accumulators_drift = models.BooleanField(default=False, help_text='El verificador detectó diferencias con el cálculo completo')
+    accumulators_verified_at = models.DateTimeField(null=True, blank=True)
+    
     # Snapshot inmutable del cálculo (se guarda al aprobar)
     calculation_snapshot = models.JSONField(null=True, blank=True, help_text='Snapshot del cálculo al momento de aprobación')
     
@@ -303,6 +312,12 @@ class PayrollPeriod(models.Model):
             self.commission_earnings = calculation['commission_earnings']
             self.gross_amount = calculation['gross_amount']
             
+            # Reiniciar acumuladores con el cálculo completo
+            self.sales_commission_total = calculation['sales_commission']
+            self.sales_count = calculation['sales_count']
+            self.adjustments_total = calculation['adjustments']
+            self.accumulators_drift = False
+            
             # Calcular deducciones y neto
             deductions = self.deductions.all()
             self.deductions_total = sum(d.amount for d in deductions)
@@ -0,0 +1,74 @@
+# Generated by Django 5.2.11 on 2026-10-17 19:03
+
+from decimal import Decimal
+from django.db import migrations, models
+
+
+def backfill_accumulators(apps, schema_editor):
+    """Inicializa los acumuladores de los períodos no finalizados con la misma
+    agregación que PayrollCalculationService.calculate_from_snapshots."""
+    import datetime
+    from django.db.models import Count, Sum
+    from django.utils.timezone import make_aware
+
+    PayrollPeriod = apps.get_model('employees_api', 'PayrollPeriod')
+    CommissionAdjustment = apps.get_model('employees_api', 'CommissionAdjustment')
+    Sale = apps.get_model('pos_api', 'Sale')
+
+    periods = PayrollPeriod.objects.filter(is_finalized=False).exclude(
+        status__in=['approved', 'paid']
+    ).select_related('employee')
+    for period in periods.iterator():
+        sales = Sale.objects.filter(
+            employee_id=period.employee_id,
+            date_time__gte=make_aware(datetime.datetime.combine(period.period_start, datetime.time.min)),
+            date_time__lte=make_aware(datetime.datetime.combine(period.period_end, datetime.time.max)),
+            status='confirmed',
+            commission_amount_snapshot__isnull=False,
+            user__tenant_id=period.employee.tenant_id,
+        ).aggregate(total=Sum('commission_amount_snapshot'), count=Count('id'))
+        adjustments = CommissionAdjustment.objects.filter(payroll_period_id=period.pk).aggregate(
+            total=Sum('amount')
+        )['total']
+        PayrollPeriod.objects.filter(pk=period.pk).update(
+            sales_commission_total=sales['total'] or Decimal('0.00'),
+            sales_count=sales['count'],
+            adjustments_total=adjustments or Decimal('0.00'),
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('employees_api', '0023_attendancerecord_is_justified_and_more'),
+        ('pos_api', '0032_rename_stripe_field_to_provider_transaction_id'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='payrollperiod',
+            name='accumulators_drift',
+            field=models.BooleanField(default=False, help_text='El verificador detectó diferencias con el cálculo completo'),
+        ),
+        migrations.AddField(
+            model_name='payrollperiod',
+            name='accumulators_verified_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='payrollperiod',
+            name='adjustments_total',
+            field=models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=10),
+        ),
+        migrations.AddField(
+            model_name='payrollperiod',
+            name='sales_commission_total',
+            field=models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=10),
+        ),
+        migrations.AddField(
+            model_name='payrollperiod',
+            name='sales_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.RunPython(backfill_accumulators, migrations.RunPython.noop),
+    ]
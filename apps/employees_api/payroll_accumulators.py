@@ -0,0 +1,174 @@
+"""Acumuladores incrementales de PayrollPeriod.
+
+Los deltas siguen la semántica de ``PayrollCalculationService.calculate_from_snapshots``;
+``verify_payroll_accumulators`` marca ``accumulators_drift`` si no coinciden.
+"""
+import logging
+from decimal import ROUND_HALF_UP, Decimal
+
+from django.db.models import F
+from django.utils import timezone
+
+from .earnings_models import PayrollPeriod
+
+logger = logging.getLogger(__name__)
+
+CENT = Decimal('0.01')
+
+# Tipos de pago cuyas ventas generan comisión (ver calculate_from_snapshots)
+COMMISSION_PAYMENT_TYPES = ('commission', 'mixed')
+
+# Estados con montos ya cerrados (además de is_finalized)
+CLOSED_STATUSES = ('approved', 'paid')
+
+
+def _money(value):
+    return Decimal(str(value)).quantize(CENT, rounding=ROUND_HALF_UP)
+
+
+def mutable_periods():
+    """Períodos cuyos montos aún pueden cambiar."""
+    return PayrollPeriod.objects.filter(is_finalized=False).exclude(status__in=CLOSED_STATUSES)
+
+
+def _apply_delta(periods, sales_commission=Decimal('0'), sales_count=0, adjustments=Decimal('0'),
+                 counts_sales_commission=True):
+    earnings = adjustments + (sales_commission if counts_sales_commission else Decimal('0'))
+    updates = {}
+    if sales_commission:
+        updates['sales_commission_total'] = F('sales_commission_total') + sales_commission
+    if sales_count:
+        updates['sales_count'] = F('sales_count') + sales_count
+    if adjustments:
+        updates['adjustments_total'] = F('adjustments_total') + adjustments
+    if earnings:
+        updates['commission_earnings'] = F('commission_earnings') + earnings
+        updates['gross_amount'] = F('gross_amount') + earnings
+        updates['net_amount'] = F('net_amount') + earnings
+    if not updates:
+        return 0
+    updates['updated_at'] = timezone.now()
+    return periods.update(**updates)
+
+
+def _sale_periods(employee_id, sale_date):
+    return mutable_periods().filter(
+        employee_id=employee_id,
+        period_start__lte=sale_date,
+        period_end__gte=sale_date,
+    )
+
+
+def _has_commission(sale):
+    return bool(sale.employee_id) and sale.commission_amount_snapshot is not None
+
+
+def _sale_delta(sale, sign):
+    if not _has_commission(sale):
+        return 0
+    return _apply_delta(
+        _sale_periods(sale.employee_id, timezone.localtime(sale.date_time).date()),
+        sales_commission=sign * _money(sale.commission_amount_snapshot),
+        sales_count=sign,
+        counts_sales_commission=sale.employee.payment_type in COMMISSION_PAYMENT_TYPES,
+    )
+
+
+def record_sale_commission(sale):
+    """Suma la comisión de una venta confirmada a su período."""
+    return _sale_delta(sale, 1)
+
+
+def reverse_sale_commission(sale):
+    """Resta la comisión de una venta que deja de estar confirmada (reembolso/anulación)."""
+    return _sale_delta(sale, -1)
+
+
+def record_sales_commission(sales):
+    """Versión por lotes de ``record_sale_commission``: un UPDATE por empleado y día."""
+    groups = {}
+    for sale in sales:
+        if not _has_commission(sale):
+            continue
+        key = (sale.employee_id, timezone.localtime(sale.date_time).date())
+        commission, count, employee = groups.get(key, (Decimal('0'), 0, sale.employee))
+        groups[key] = (commission + _money(sale.commission_amount_snapshot), count + 1, employee)
+
+    updated = 0
+    for (employee_id, sale_date), (commission, count, employee) in groups.items():
+        updated += _apply_delta(
+            _sale_periods(employee_id, sale_date),
+            sales_commission=commission,
+            sales_count=count,
+            counts_sales_commission=employee.payment_type in COMMISSION_PAYMENT_TYPES,
+        )
+    return updated
+
+
+def sales_in_closed_periods(sales):
+    """Ventas con comisión cuya fecha cubren períodos del empleado, todos cerrados.
+
+    ``record_sales_commission`` no las suma a ningún período. Una sola consulta.
+    """
+    dated = [
+        (sale, timezone.localtime(sale.date_time).date())
+        for sale in sales
+        if _has_commission(sale) and sale.commission_amount_snapshot > 0
+    ]
+    if not dated:
+        return []
+
+    days = [day for _, day in dated]
+    periods = {}
+    rows = PayrollPeriod.objects.filter(
+        employee_id__in={sale.employee_id for sale, _ in dated},
+        period_start__lte=max(days),
+        period_end__gte=min(days),
+    ).values_list('employee_id', 'period_start', 'period_end', 'is_finalized', 'status')
+    for employee_id, start, end, is_finalized, status in rows:
+        periods.setdefault(employee_id, []).append((start, end, not is_finalized and status not in CLOSED_STATUSES))
+
+    closed = []
+    for sale, day in dated:
+        covering = [mutable for start, end, mutable in periods.get(sale.employee_id, ()) if start <= day <= end]
+        if covering and not any(covering):
+            closed.append(sale)
+    return closed
+
+
+def record_commission_adjustment(adjustment):
+    """Suma un CommissionAdjustment recién creado a su período."""
+    return _apply_delta(
+        mutable_periods().filter(pk=adjustment.payroll_period_id),
+        adjustments=_money(adjustment.amount),
+    )
+
+
+def verify_period_accumulators(period):
+    """Compara los acumuladores con el cálculo completo y marca la deriva.
+
+    No corrige los montos: la corrección es ``calculate_amounts()`` desde
+    ``recalculate`` o al aprobar. Devuelve ``True`` si hay deriva.
+    """
+    from .payroll_services import PayrollCalculationService
+
+    calculation = PayrollCalculationService.calculate_from_snapshots(period)
+    expected = {
+        'sales_commission_total': _money(calculation['sales_commission']),
+        'sales_count': calculation['sales_count'],
+        'adjustments_total': _money(calculation['adjustments']),
+        'commission_earnings': _money(calculation['commission_earnings']),
+    }
+    drift = {
+        name: (getattr(period, name), value)
+        for name, value in expected.items()
+        if getattr(period, name) != value
+    }
+    if drift:
+        logger.warning("Payroll accumulator drift period_id=%s fields=%s", period.pk, drift)
+
+    PayrollPeriod.objects.filter(pk=period.pk).update(
+        accumulators_drift=bool(drift),
+        accumulators_verified_at=timezone.now(),
+    )
+    return bool(drift)
@@ -1,6 +1,6 @@
 import logging
 from decimal import Decimal
-from django.db.models import Sum
+from django.db.models import Count, Sum
 
 logger = logging.getLogger(__name__)
 
@@ -31,7 +31,7 @@ class PayrollCalculationService:
         end_dt = make_aware(datetime.datetime.combine(period.period_end, datetime.time.max))
         logger.debug("start_dt=%s, end_dt=%s", start_dt, end_dt)
         
-        sales_commission = Sale.objects.filter(
+        sales = Sale.objects.filter(
             employee=period.employee,
             date_time__gte=start_dt,
             date_time__lte=end_dt,
@@ -39,8 +39,10 @@ class PayrollCalculationService:
             commission_amount_snapshot__isnull=False,
             user__tenant=period.employee.tenant  # FIX 4: Filtro explícito por tenant
         ).aggregate(
-            total=Sum('commission_amount_snapshot')
-        )['total'] or Decimal('0.00')
+            total=Sum('commission_amount_snapshot'),
+            count=Count('id')
+        )
+        sales_commission = sales['total'] or Decimal('0.00')
         
         # 2. Sumar ajustes (positivos y negativos)
         adjustments_total = CommissionAdjustment.objects.filter(
@@ -74,6 +76,7 @@ class PayrollCalculationService:
             'base_salary': base_salary,
             'commission_earnings': total_commission,
             'sales_commission': sales_commission,
+            'sales_count': sales['count'],
             'adjustments': adjustments_total,
             'gross_amount': base_salary + total_commission,
         }
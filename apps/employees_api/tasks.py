@@ -115,4 +115,21 @@ def auto_checkout_end_of_day():
         record.save(update_fields=['check_out_at', 'notes', 'updated_at'])
         closed_count += 1
         
-    return f"Cerradas {closed_count} asistencias abiertas"
\ No newline at end of file
+    return f"Cerradas {closed_count} asistencias abiertas"
+
+
+@shared_task
+def verify_payroll_accumulators():
+    """
+    Verificador periódico: compara los acumuladores de los períodos abiertos con
+    el cálculo completo y marca accumulators_drift donde no coinciden.
+    """
+    from .payroll_accumulators import mutable_periods, verify_period_accumulators
+
+    checked = drifted = 0
+    for period in mutable_periods().select_related('employee', 'employee__tenant').iterator():
+        checked += 1
+        if verify_period_accumulators(period):
+            drifted += 1
+
+    return f"Verificados {checked} períodos, {drifted} con diferencias"
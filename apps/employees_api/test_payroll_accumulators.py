@@ -0,0 +1,156 @@
+from datetime import timedelta
+from decimal import Decimal
+from unittest import mock
+
+import pytest
+from django.contrib.auth import get_user_model
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from apps.employees_api.adjustment_models import CommissionAdjustment
+from apps.employees_api.earnings_models import PayrollPeriod
+from apps.employees_api.models import Employee
+from apps.employees_api.payroll_accumulators import (
+    record_sale_commission, reverse_sale_commission, verify_period_accumulators,
+)
+from apps.pos_api.models import CashRegister, Sale
+from apps.pos_api.testing import authenticate_client, grant_permissions, setup_plan
+from apps.tenants_api.models import Tenant
+
+User = get_user_model()
+
+
+@pytest.mark.django_db
+class TestPayrollAccumulators:
+    """Acumuladores incrementales de PayrollPeriod"""
+
+    @pytest.fixture
+    def setup_data(self):
+        owner = User.objects.create_superuser(email='owner-acc@test.com', password='pass', full_name='Owner')
+        tenant = Tenant.objects.create(name="Acc Tenant", subdomain='acc-tenant', owner=owner)
+        user = User.objects.create_user(email="cashier-acc@test.com", password="test123", tenant=tenant)
+        employee = Employee.objects.create(
+            user=user,
+            tenant=tenant,
+            payment_type='commission',
+            commission_rate=Decimal('10.00'),
+            fixed_salary=Decimal('0.00'),
+        )
+        today = timezone.localdate()
+        period = PayrollPeriod.objects.create(
+            employee=employee,
+            period_type='biweekly',
+            period_start=today - timedelta(days=1),
+            period_end=today + timedelta(days=13),
+            status='open',
+        )
+        return {'tenant': tenant, 'user': user, 'employee': employee, 'period': period}
+
+    def _sale(self, data, total='100.00'):
+        sale = Sale.objects.create(
+            employee=data['employee'],
+            tenant=data['tenant'],
+            user=data['user'],
+            period=data['period'],
+            total=Decimal(total),
+            paid=Decimal(total),
+            payment_method='cash',
+        )
+        record_sale_commission(sale)
+        return sale
+
+    def test_sales_update_running_totals(self, setup_data):
+        self._sale(setup_data, '100.00')
+        self._sale(setup_data, '55.55')
+
+        period = PayrollPeriod.objects.get(pk=setup_data['period'].pk)
+        assert period.sales_count == 2
+        assert period.sales_commission_total == Decimal('15.56')
+        assert period.commission_earnings == Decimal('15.56')
+        assert period.gross_amount == Decimal('15.56')
+        assert period.net_amount == Decimal('15.56')
+        assert verify_period_accumulators(period) is False
+
+    def test_refund_and_adjustment_match_full_recompute(self, setup_data):
+        sale = self._sale(setup_data)
+        self._sale(setup_data, '50.00')
+
+        sale.status = 'refunded'
+        sale.save(update_fields=['status'])
+        reverse_sale_commission(sale)
+        CommissionAdjustment.objects.create(
+            sale=sale,
+            payroll_period=setup_data['period'],
+            employee=setup_data['employee'],
+            amount=-sale.commission_amount_snapshot,
+            reason='refund',
+        )
+
+        period = PayrollPeriod.objects.get(pk=setup_data['period'].pk)
+        assert period.sales_count == 1
+        assert period.adjustments_total == Decimal('-10.00')
+        assert verify_period_accumulators(period) is False
+
+        running = (period.sales_commission_total, period.adjustments_total, period.commission_earnings)
+        period.calculate_amounts()
+        assert (period.sales_commission_total, period.adjustments_total, period.commission_earnings) == running
+
+    def test_fixed_salary_sales_do_not_earn_commission(self, setup_data):
+        employee = setup_data['employee']
+        employee.payment_type = 'fixed'
+        employee.save()
+
+        self._sale(setup_data)
+
+        period = PayrollPeriod.objects.get(pk=setup_data['period'].pk)
+        assert period.sales_commission_total == Decimal('10.00')
+        assert period.commission_earnings == Decimal('0.00')
+
+    def test_finalized_period_is_not_touched(self, setup_data):
+        PayrollPeriod.objects.filter(pk=setup_data['period'].pk).update(is_finalized=True)
+
+        self._sale(setup_data)
+
+        period = PayrollPeriod.objects.get(pk=setup_data['period'].pk)
+        assert period.sales_count == 0
+        assert period.commission_earnings == Decimal('0.00')
+
+    def test_verifier_flags_drift_and_recalculate_clears_it(self, setup_data):
+        self._sale(setup_data)
+        PayrollPeriod.objects.filter(pk=setup_data['period'].pk).update(sales_commission_total=Decimal('99.00'))
+
+        period = PayrollPeriod.objects.get(pk=setup_data['period'].pk)
+        assert verify_period_accumulators(period) is True
+
+        period.refresh_from_db()
+        assert period.accumulators_drift is True
+        assert period.accumulators_verified_at is not None
+
+        period.calculate_amounts()
+        period.save()
+        period.refresh_from_db()
+        assert period.accumulators_drift is False
+        assert period.sales_commission_total == Decimal('10.00')
+
+    def test_pos_sale_does_not_run_full_recompute(self, setup_data):
+        tenant, user = setup_data['tenant'], setup_data['user']
+        setup_plan(tenant)
+        grant_permissions(user, tenant, 'pos_api')
+        register = CashRegister.objects.create(tenant=tenant, user=user, initial_cash=1000)
+        client = APIClient()
+        authenticate_client(client, user)
+
+        data = {
+            'total': 200, 'discount': 0, 'cash_register': register.id,
+            'employee_id': setup_data['employee'].id,
+            'details': [{'content_type': 'service', 'object_id': 1, 'quantity': 1, 'price': 200, 'name': 'Corte'}],
+            'payments': [{'amount': 200, 'method': 'cash'}],
+        }
+        with mock.patch.object(PayrollPeriod, 'calculate_amounts') as calculate:
+            response = client.post('/api/pos/sales/', data, format='json')
+
+        assert response.status_code == 201, response.data
+        calculate.assert_not_called()
+        period = PayrollPeriod.objects.get(pk=setup_data['period'].pk)
+        assert period.sales_count == 1
+        assert period.commission_earnings == Decimal('20.00')
@@ -0,0 +1,192 @@
+"""Reserva de stock por conjuntos para ventas del POS.
+
+Los productos se bloquean ordenados por id para evitar deadlocks entre cajas;
+las alertas de stock y el AuditLog se emiten aqui tras el commit.
+"""
+import logging
+from dataclasses import dataclass, field
+from decimal import Decimal, InvalidOperation
+
+from django.db import transaction
+from django.db.models import Case, F, IntegerField, Q, When
+
+from apps.audit_api.signals import audit_bulk_save
+
+from .models import Product, StockMovement
+
+logger = logging.getLogger(__name__)
+
+
+class StockReservationError(Exception):
+    """Error de validacion de la reserva; el mensaje se muestra al usuario."""
+
+
+@dataclass
+class StockReservation:
+    # [(producto, cantidad)] en orden de id, con el stock ya descontado
+    items: list = field(default_factory=list)
+
+    def __bool__(self):
+        return bool(self.items)
+
+
+def _parse_quantity(value):
+    try:
+        quantity = Decimal(str(value))
+    except (InvalidOperation, TypeError, ValueError):
+        raise StockReservationError("Valores inválidos para cantidad o precio")
+    return quantity
+
+
+def aggregate_quantities(lines):
+    """Suma ``(product_id, cantidad)`` por producto; devuelve ``{id: Decimal}``."""
+    quantities = {}
+    for product_id, quantity in lines:
+        try:
+            product_id = int(product_id)
+        except (TypeError, ValueError):
+            raise StockReservationError("Producto no encontrado o ID inválido")
+        quantity = _parse_quantity(quantity)
+        if quantity <= 0:
+            raise StockReservationError("La cantidad debe ser mayor a 0")
+        quantities[product_id] = quantities.get(product_id, Decimal('0')) + quantity
+    return quantities
+
+
+def lock_products(tenant, product_ids):
+    """Bloquea los productos de ``tenant`` en orden de id con una sola consulta."""
+    return list(
+        Product.objects.select_for_update()
+        .filter(tenant=tenant, id__in=product_ids)
+        .order_by('id')
+    )
+
+
+def reserve_stock(tenant, lines):
+    """Bloquea, valida y descuenta el stock de ``lines`` (``[(product_id, cantidad)]``).
+
+    Debe llamarse dentro de ``transaction.atomic()``. Lanza
+    ``StockReservationError`` sin haber modificado nada si alguna linea no es
+    valida.
+    """
+    quantities = aggregate_quantities(lines)
+    if not quantities:
+        return StockReservation()
+
+    products = lock_products(tenant, list(quantities))
+    if len(products) != len(quantities):
+        raise StockReservationError("Producto no encontrado o ID inválido")
+
+    items = []
+    for product in products:
+        quantity = quantities[product.id]
+        if not product.is_active:
+            raise StockReservationError(f"El producto {product.name} no está activo")
+        if product.stock < quantity:
+            raise StockReservationError(
+                f"Stock insuficiente para {product.name}. Disponible: {product.stock}, Solicitado: {quantity}"
+            )
+        if quantity != quantity.to_integral_value():
+            # Product.stock es entero: antes se truncaba en silencio al guardar
+            raise StockReservationError(f"La cantidad de {product.name} debe ser un número entero")
+        items.append((product, int(quantity)))
+
+    apply_stock_decrements(items)
+    return StockReservation(items=items)
+
+
+def apply_stock_decrements(items):
+    """Descuenta ``[(producto, cantidad)]`` con un unico UPDATE condicional.
+
+    Los productos deben estar bloqueados y validados por el llamador; el stock
+    en memoria se actualiza para que coincida con la base de datos.
+    """
+    if not items:
+        return
+
+    condition = Q()
+    for product, quantity in items:
+        condition |= Q(pk=product.pk, stock__gte=quantity)
+    updated = Product.objects.filter(condition).update(
+        stock=Case(
+            *[When(pk=product.pk, then=F('stock') - quantity) for product, quantity in items],
+            default=F('stock'),
+            output_field=IntegerField(),
+        )
+    )
+    if updated != len(items):
+        # Con los locks tomados no deberia ocurrir; abortar en lugar de vender sin stock
+        raise StockReservationError("No se pudo reservar el stock, intente de nuevo")
+
+    for product, quantity in items:
+        product.stock -= quantity
+    audit_bulk_save(
+        [product for product, _ in items], created=False,
+        changes=lambda product: {'stock': str(product.stock)},
+    )
+
+
+def record_stock_movements(reservation, reason):
+    """Crea los StockMovement de ``reservation`` y programa las alertas de stock bajo."""
+    if not reservation:
+        return []
+
+    movements = StockMovement.objects.bulk_create([
+        StockMovement(product=product, quantity=-quantity, reason=reason)
+        for product, quantity in reservation.items
+    ])
+    audit_bulk_save(movements, created=True)
+
+    schedule_low_stock_alerts(product for product, _ in reservation.items)
+    return movements
+
+
+def schedule_low_stock_alerts(products):
+    """Programa tras el commit las alertas de los productos bajo el minimo."""
+    low_stock = [product for product in products if product.is_below_min_stock]
+    if low_stock:
+        transaction.on_commit(lambda: _send_low_stock_alerts(low_stock))
+
+
+def _send_low_stock_alerts(products):
+    from .signals import create_low_stock_alert
+
+    for product in products:
+        try:
+            create_low_stock_alert(product)
+        except Exception:
+            logger.exception("Error sending low stock alert product_id=%s", product.id)
+
+
+def check_stock_availability(tenant, lines):
+    """Valida ``lines`` contra el stock actual sin modificarlo.
+
+    Devuelve la lista de errores con el formato de ``validate_stock``. No toma
+    locks: la comprobacion es informativa y la reserva real la repite
+    ``reserve_stock`` al crear la venta.
+    """
+    quantities = aggregate_quantities(lines)
+    products = {
+        product.id: product
+        for product in Product.objects.filter(tenant=tenant, id__in=list(quantities)).only('id', 'name', 'stock')
+    }
+
+    errors = []
+    for product_id, quantity in quantities.items():
+        product = products.get(product_id)
+        if product is None:
+            errors.append({
+                'product_id': product_id,
+                'message': f'Producto {product_id} no encontrado',
+            })
+        elif product.stock < quantity:
+            if quantity == quantity.to_integral_value():
+                quantity = int(quantity)
+            errors.append({
+                'product_id': product_id,
+                'product_name': product.name,
+                'requested': quantity,
+                'available': product.stock,
+                'message': f'{product.name}: Stock insuficiente. Disponible: {product.stock}, Solicitado: {quantity}',
+            })
+    return errors
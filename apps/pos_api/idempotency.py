@@ -0,0 +1,214 @@
+"""Claves de idempotencia para endpoints del POS (cabecera ``Idempotency-Key``).
+
+Un duplicado recibe la respuesta guardada; la misma clave con otro cuerpo
+responde 422. Las respuestas 5xx, 429 y las excepciones liberan la clave.
+"""
+import functools
+import hashlib
+import json
+import logging
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.renderers import JSONRenderer
+from rest_framework.response import Response
+
+from apps.utils.versioned_cache import is_shared_cache
+
+from .models import IdempotencyRecord
+
+logger = logging.getLogger(__name__)
+
+IDEMPOTENCY_HEADER = 'Idempotency-Key'
+REPLAYED_HEADER = 'Idempotent-Replayed'
+IDEMPOTENCY_TTL = getattr(settings, 'IDEMPOTENCY_TTL', 24 * 3600)
+IDEMPOTENCY_LOCK_TTL = getattr(settings, 'IDEMPOTENCY_LOCK_TTL', 60)
+IDEMPOTENCY_WAIT = getattr(settings, 'IDEMPOTENCY_WAIT', 10)
+POLL_INTERVAL = 0.05
+MAX_KEY_LENGTH = 255
+
+IN_PROGRESS = 'in_progress'
+COMPLETED = 'completed'
+
+
+class CacheStore:
+    """Almacén en Redis: ``cache.add`` es el reclamo atómico."""
+
+    def claim(self, key, request_hash):
+        record = {'state': IN_PROGRESS, 'hash': request_hash}
+        if cache.add(key, record, IDEMPOTENCY_LOCK_TTL):
+            return True, None
+        return False, cache.get(key)
+
+    def complete(self, key, request_hash, status_code, body):
+        cache.set(key, {
+            'state': COMPLETED, 'hash': request_hash, 'status': status_code, 'body': body,
+        }, IDEMPOTENCY_TTL)
+
+    def release(self, key):
+        cache.delete(key)
+
+
+class DatabaseStore:
+    """Almacén en IdempotencyRecord: la restricción única de ``key`` es el reclamo."""
+
+    def claim(self, key, request_hash):
+        now = timezone.now()
+        try:
+            with transaction.atomic():
+                IdempotencyRecord.objects.create(
+                    key=key,
+                    request_hash=request_hash,
+                    expires_at=now + timedelta(seconds=IDEMPOTENCY_LOCK_TTL),
+                )
+            return True, None
+        except IntegrityError:
+            pass
+
+        record = IdempotencyRecord.objects.filter(key=key).first()
+        if record is None:
+            return False, None
+        if record.expires_at <= now:
+            # Reclamo huérfano o respuesta vencida: se borra y el llamador reintenta
+            IdempotencyRecord.objects.filter(pk=record.pk, expires_at__lte=now).delete()
+            return False, None
+        return False, {
+            'state': record.state,
+            'hash': record.request_hash,
+            'status': record.response_status,
+            'body': record.response_body,
+        }
+
+    def complete(self, key, request_hash, status_code, body):
+        IdempotencyRecord.objects.filter(key=key).update(
+            state=COMPLETED,
+            response_status=status_code,
+            response_body=body,
+            expires_at=timezone.now() + timedelta(seconds=IDEMPOTENCY_TTL),
+        )
+
+    def release(self, key):
+        IdempotencyRecord.objects.filter(key=key, state=IN_PROGRESS).delete()
+
+
+def _storage_key(scope, request, client_key):
+    tenant = getattr(request, 'tenant', None) or getattr(request.user, 'tenant', None)
+    digest = hashlib.sha256(client_key.encode()).hexdigest()
+    return f"idem:{scope}:{getattr(tenant, 'pk', '-')}:{request.user.pk}:{digest}"
+
+
+def _request_hash(request, kwargs):
+    data = request.data
+    if hasattr(data, 'lists'):
+        data = {key: values for key, values in data.lists()}
+    payload = json.dumps(
+        {'path': request.path, 'kwargs': kwargs, 'data': data},
+        sort_keys=True, default=str,
+    )
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def _serialize(data):
+    if data is None:
+        return None
+    return json.loads(JSONRenderer().render(data))
+
+
+def _is_final(status_code):
+    return status_code < 500 and status_code != status.HTTP_429_TOO_MANY_REQUESTS
+
+
+def _replay(record):
+    return Response(record['body'], status=record['status'], headers={REPLAYED_HEADER: 'true'})
+
+
+def _claim(store, key, request_hash):
+    """Reclama ``key`` o espera a que la petición en curso termine.
+
+    Devuelve ``(store, None)`` si la petición actual debe ejecutar la acción, o
+    ``(store, response)`` con la respuesta para el duplicado.
+    """
+    deadline = time.monotonic() + IDEMPOTENCY_WAIT
+    while True:
+        try:
+            claimed, record = store.claim(key, request_hash)
+        except Exception as e:
+            if isinstance(store, DatabaseStore):
+                raise
+            logger.warning("Idempotency cache unavailable, using database: %s", e)
+            store = DatabaseStore()
+            continue
+
+        if claimed:
+            return store, None
+        if record is None:
+            # La clave venció entre el reclamo y la lectura
+            continue
+        if record['hash'] != request_hash:
+            return store, Response(
+                {'error': 'La Idempotency-Key ya se usó con otra petición'},
+                status=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            )
+        if record['state'] == COMPLETED:
+            return store, _replay(record)
+        if time.monotonic() >= deadline:
+            return store, Response(
+                {'error': 'Hay una petición en curso con esta Idempotency-Key'},
+                status=status.HTTP_409_CONFLICT,
+                headers={'Retry-After': '1'},
+            )
+        time.sleep(POLL_INTERVAL)
+
+
+def idempotent(scope):
+    """Decorador para acciones de un ViewSet que aceptan ``Idempotency-Key``."""
+
+    def decorator(view_method):
+        @functools.wraps(view_method)
+        def wrapper(self, request, *args, **kwargs):
+            client_key = request.headers.get(IDEMPOTENCY_HEADER, '').strip()
+            if not client_key:
+                return view_method(self, request, *args, **kwargs)
+            if len(client_key) > MAX_KEY_LENGTH:
+                return Response(
+                    {'error': f'Idempotency-Key no puede superar {MAX_KEY_LENGTH} caracteres'},
+                    status=status.HTTP_400_BAD_REQUEST,
+                )
+
+            key = _storage_key(scope, request, client_key)
+            request_hash = _request_hash(request, kwargs)
+            store = CacheStore() if is_shared_cache() else DatabaseStore()
+            store, response = _claim(store, key, request_hash)
+            if response is not None:
+                return response
+
+            try:
+                response = view_method(self, request, *args, **kwargs)
+            except Exception:
+                store.release(key)
+                raise
+
+            try:
+                if _is_final(response.status_code):
+                    store.complete(key, request_hash, response.status_code, _serialize(response.data))
+                else:
+                    store.release(key)
+            except Exception as e:
+                # La acción ya corrió: no se convierte su respuesta en error
+                logger.error("Could not store idempotent response key=%s: %s", key, e)
+            return response
+
+        return wrapper
+
+    return decorator
+
+
+def purge_expired_records():
+    """Borra las filas de IdempotencyRecord vencidas (Redis vence solo)."""
+    deleted, _ = IdempotencyRecord.objects.filter(expires_at__lte=timezone.now()).delete()
+    return deleted
@@ -0,0 +1,39 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from apps.pos_api.sales_rollup import rebuild_sales_rollup
+from apps.pos_api.sales_stats import tenant_timezone
+from apps.tenants_api.models import Tenant
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the daily sales rollup from Sale rows (backfill history or fix drift)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=2, help='Rebuild the last N local days, today included (default 2)')
+        parser.add_argument('--all', action='store_true', help='Rebuild the whole history')
+        parser.add_argument('--tenant', type=int, help='Only this tenant id')
+
+    def handle(self, *args, **options):
+        tenants = Tenant.objects.order_by('id')
+        if options['tenant']:
+            tenants = tenants.filter(id=options['tenant'])
+
+        total_rows = 0
+        rebuilt = 0
+        for tenant in tenants.iterator():
+            if options['all']:
+                start_date = end_date = None
+            else:
+                # Días locales del tenant
+                end_date = timezone.localdate(timezone=tenant_timezone(tenant))
+                start_date = end_date - timedelta(days=max(options['days'], 1) - 1)
+            rows = rebuild_sales_rollup(tenant, start_date, end_date)
+            total_rows += rows
+            rebuilt += 1
+            if options['verbosity'] > 1:
+                self.stdout.write(f'Tenant #{tenant.id}: {rows} rows')
+
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt sales rollup for {rebuilt} tenants ({total_rows} rows)'))
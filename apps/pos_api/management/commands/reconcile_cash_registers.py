@@ -0,0 +1,48 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from apps.pos_api.models import CashRegister
+from apps.pos_api.register_totals import reconcile_registers
+
+
+class Command(BaseCommand):
+    help = 'Recompute cash register running totals and report (or fix) drift'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=2, help='Registers opened in the last N days (default 2)')
+        parser.add_argument('--all', action='store_true', help='Check every register regardless of age')
+        parser.add_argument('--tenant', type=int, help='Only registers of this tenant id')
+        parser.add_argument('--fix', action='store_true', help='Overwrite drifted totals with the recomputed values')
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        registers = CashRegister.objects.order_by('id')
+        if not options['all']:
+            registers = registers.filter(opened_at__gte=timezone.now() - timedelta(days=options['days']))
+        if options['tenant']:
+            registers = registers.filter(tenant_id=options['tenant'])
+
+        checked = 0
+        drifted = 0
+        batch_size = options['batch_size']
+        last_id = 0
+        while True:
+            # Paginación por id: cada lote cuesta dos consultas agrupadas
+            batch = list(registers.filter(id__gt=last_id)[:batch_size])
+            if not batch:
+                break
+            last_id = batch[-1].id
+            checked += len(batch)
+
+            drift = reconcile_registers(batch, fix=options['fix'])
+            drifted += len(drift)
+            for register_id, fields in drift.items():
+                details = ', '.join(f'{name}: {stored} -> {expected}' for name, (stored, expected) in fields.items())
+                self.stdout.write(self.style.WARNING(f'Register #{register_id}: {details}'))
+
+        action = 'fixed' if options['fix'] else 'found'
+        self.stdout.write(
+            self.style.SUCCESS(f'Checked {checked} cash registers, {action} drift in {drifted}')
+        )
@@ -0,0 +1,67 @@
+# Generated by Django 5.2.11 on 2026-10-17 19:07
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pos_api', '0032_rename_stripe_field_to_provider_transaction_id'),
+        ('tenants_api', '0011_remove_free_plan_type'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='NCFBlock',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('ncf_type', models.CharField(max_length=2)),
+                ('start_number', models.PositiveIntegerField()),
+                ('end_number', models.PositiveIntegerField()),
+                ('next_number', models.PositiveIntegerField()),
+                ('status', models.CharField(choices=[('active', 'Activo'), ('exhausted', 'Agotado'), ('released', 'Liberado')], default='active', max_length=10)),
+                ('expires_at', models.DateTimeField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('closed_at', models.DateTimeField(blank=True, null=True)),
+                ('cash_register', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='ncf_blocks', to='pos_api.cashregister')),
+                ('sequence', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='blocks', to='pos_api.ncfsequence')),
+                ('tenant', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='ncf_blocks', to='tenants_api.tenant')),
+            ],
+            options={
+                'verbose_name': 'Bloque NCF',
+                'verbose_name_plural': 'Bloques NCF',
+                'ordering': ['sequence', 'start_number'],
+            },
+        ),
+        migrations.CreateModel(
+            name='NCFGap',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('start_number', models.PositiveIntegerField()),
+                ('end_number', models.PositiveIntegerField()),
+                ('reason', models.CharField(choices=[('expired', 'Bloque vencido'), ('register_closed', 'Caja cerrada'), ('sequence_closed', 'Secuencia vencida o inactiva')], max_length=20)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('block', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='gaps', to='pos_api.ncfblock')),
+                ('sequence', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='gaps', to='pos_api.ncfsequence')),
+                ('tenant', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='ncf_gaps', to='tenants_api.tenant')),
+            ],
+            options={
+                'verbose_name': 'Hueco NCF',
+                'verbose_name_plural': 'Huecos NCF',
+                'ordering': ['sequence', 'start_number'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='ncfblock',
+            index=models.Index(fields=['cash_register', 'ncf_type', 'status'], name='pos_api_ncf_cash_re_8092f6_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='ncfblock',
+            index=models.Index(fields=['status', 'expires_at'], name='pos_api_ncf_status_362313_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='ncfgap',
+            index=models.Index(fields=['tenant', 'created_at'], name='pos_api_ncf_tenant__9720a0_idx'),
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.11 on 2026-10-17 19:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pos_api', '0033_ncf_blocks'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='IdempotencyRecord',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(max_length=128, unique=True)),
+                ('request_hash', models.CharField(max_length=64)),
+                ('state', models.CharField(choices=[('in_progress', 'En curso'), ('completed', 'Completada')], default='in_progress', max_length=12)),
+                ('response_status', models.PositiveSmallIntegerField(blank=True, null=True)),
+                ('response_body', models.JSONField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('expires_at', models.DateTimeField()),
+            ],
+            options={
+                'verbose_name': 'Clave de idempotencia',
+                'verbose_name_plural': 'Claves de idempotencia',
+                'indexes': [models.Index(fields=['expires_at'], name='pos_api_ide_expires_879060_idx')],
+            },
+        ),
+    ]
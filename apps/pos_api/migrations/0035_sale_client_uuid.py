@@ -0,0 +1,18 @@
+# Generated by Django 5.2.11 on 2026-10-17 19:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pos_api', '0034_idempotency_record'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='sale',
+            name='client_uuid',
+            field=models.UUIDField(blank=True, editable=False, help_text='UUID generado por la terminal para ventas offline', null=True, unique=True),
+        ),
+    ]
@@ -0,0 +1,88 @@
+# Generated by Django 5.2.11 on 2026-10-17 19:19
+
+from decimal import Decimal
+from django.db import migrations, models
+
+
+PAYMENT_TOTAL_FIELDS = {
+    'cash': 'cash_sales_total',
+    'card': 'card_sales_total',
+    'transfer': 'transfer_sales_total',
+}
+
+
+def backfill_running_totals(apps, schema_editor):
+    """Inicializa los acumuladores con la misma agregación que
+    apps.pos_api.register_totals.compute_register_totals."""
+    from django.db.models import Count, Sum
+
+    CashRegister = apps.get_model('pos_api', 'CashRegister')
+    Payment = apps.get_model('pos_api', 'Payment')
+    Sale = apps.get_model('pos_api', 'Sale')
+
+    totals = {}
+    payments = (
+        Payment.objects.filter(sale__cash_register__isnull=False, sale__status='confirmed')
+        .values('sale__cash_register_id', 'method')
+        .annotate(total=Sum('amount'))
+    )
+    for row in payments:
+        fields = totals.setdefault(row['sale__cash_register_id'], {})
+        name = PAYMENT_TOTAL_FIELDS.get(row['method'], 'other_sales_total')
+        fields[name] = fields.get(name, Decimal('0')) + (row['total'] or Decimal('0'))
+
+    sales = (
+        Sale.objects.filter(cash_register__isnull=False, status__in=['confirmed', 'refunded'])
+        .values('cash_register_id', 'status')
+        .annotate(count=Count('id'), total=Sum('total'))
+    )
+    for row in sales:
+        fields = totals.setdefault(row['cash_register_id'], {})
+        if row['status'] == 'confirmed':
+            fields['sales_count'] = row['count']
+        else:
+            fields['refunds_total'] = row['total'] or Decimal('0')
+
+    for register_id, fields in totals.items():
+        CashRegister.objects.filter(pk=register_id).update(**fields)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pos_api', '0035_sale_client_uuid'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='cashregister',
+            name='card_sales_total',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=14),
+        ),
+        migrations.AddField(
+            model_name='cashregister',
+            name='cash_sales_total',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=14),
+        ),
+        migrations.AddField(
+            model_name='cashregister',
+            name='other_sales_total',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=14),
+        ),
+        migrations.AddField(
+            model_name='cashregister',
+            name='refunds_total',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=14),
+        ),
+        migrations.AddField(
+            model_name='cashregister',
+            name='sales_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='cashregister',
+            name='transfer_sales_total',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=14),
+        ),
+        migrations.RunPython(backfill_running_totals, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 5.2.11 on 2026-10-17 19:25
+
+import django.core.serializers.json
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pos_api', '0036_cashregister_running_totals'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='receipt',
+            name='payload',
+            field=models.JSONField(blank=True, encoder=django.core.serializers.json.DjangoJSONEncoder, null=True),
+        ),
+        migrations.AddField(
+            model_name='receipt',
+            name='text_body',
+            field=models.TextField(blank=True, default=''),
+        ),
+    ]
@@ -0,0 +1,49 @@
+import logging
+
+from django.db import DatabaseError, migrations, transaction
+
+logger = logging.getLogger(__name__)
+
+# Índices trigram (pg_trgm) para los filtros de texto de search_sales:
+# cliente por nombre/teléfono y NCF. Son opcionales: solo en PostgreSQL y solo
+# si el rol de la base puede habilitar la extensión; si no, la búsqueda
+# funciona igual con un recorrido secuencial acotado por tenant y rango.
+TRIGRAM_INDEXES = [
+    ('pos_api_sale_ncf_trgm', 'pos_api_sale', 'ncf'),
+    ('clients_api_client_full_name_trgm', 'clients_api_client', 'full_name'),
+    ('clients_api_client_phone_trgm', 'clients_api_client', 'phone'),
+]
+
+
+def create_trigram_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    try:
+        with transaction.atomic(using=schema_editor.connection.alias):
+            schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    except DatabaseError as exc:
+        logger.warning("pg_trgm unavailable, skipping sale search trigram indexes: %s", exc)
+        return
+    for name, table, column in TRIGRAM_INDEXES:
+        schema_editor.execute(
+            f'CREATE INDEX IF NOT EXISTS {name} ON {table} USING gin ({column} gin_trgm_ops)'
+        )
+
+
+def drop_trigram_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for name, _, _ in TRIGRAM_INDEXES:
+        schema_editor.execute(f'DROP INDEX IF EXISTS {name}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('clients_api', '0004_alter_client_user'),
+        ('pos_api', '0037_receipt_payload'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_trigram_indexes, drop_trigram_indexes),
+    ]
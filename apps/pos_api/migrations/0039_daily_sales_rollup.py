@@ -0,0 +1,43 @@
+# Generated by Django 5.2.11 on 2026-10-17 19:30
+
+import django.db.models.deletion
+import django.db.models.functions.comparison
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('employees_api', '0024_payrollperiod_accumulators'),
+        ('pos_api', '0038_sale_search_trigram_indexes'),
+        ('settings_api', '0012_systemsettings_azul_auth1_systemsettings_azul_auth2_and_more'),
+        ('tenants_api', '0011_remove_free_plan_type'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailySalesRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('local_date', models.DateField(help_text='Día en la zona horaria del tenant')),
+                ('payment_method', models.CharField(max_length=50)),
+                ('sales_count', models.PositiveIntegerField(default=0)),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=16)),
+                ('discount_total', models.DecimalField(decimal_places=2, default=0, max_digits=16)),
+                ('refunds_count', models.PositiveIntegerField(default=0)),
+                ('refunds_total', models.DecimalField(decimal_places=2, default=0, max_digits=16)),
+                ('services_revenue', models.DecimalField(decimal_places=2, default=0, max_digits=16)),
+                ('products_revenue', models.DecimalField(decimal_places=2, default=0, max_digits=16)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('branch', models.ForeignKey(blank=True, db_constraint=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='settings_api.branch')),
+                ('employee', models.ForeignKey(blank=True, db_constraint=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='employees_api.employee')),
+                ('tenant', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_sales_rollups', to='tenants_api.tenant')),
+            ],
+            options={
+                'verbose_name': 'Resumen diario de ventas',
+                'verbose_name_plural': 'Resúmenes diarios de ventas',
+                'indexes': [models.Index(fields=['tenant', 'local_date'], name='pos_api_dai_tenant__7077a6_idx')],
+                'constraints': [models.UniqueConstraint(models.F('tenant'), django.db.models.functions.comparison.Coalesce('branch', 0), models.F('local_date'), django.db.models.functions.comparison.Coalesce('employee', 0), models.F('payment_method'), name='pos_daily_rollup_bucket_uniq')],
+            },
+        ),
+    ]
@@ -3,6 +3,8 @@ from django.utils import timezone
 from django.contrib.auth import get_user_model
 from django.contrib.contenttypes.models import ContentType
 from django.contrib.contenttypes.fields import GenericForeignKey
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models.functions import Coalesce
 from apps.clients_api.models import Client
 from apps.services_api.models import Service
 from apps.inventory_api.models import Product
@@ -77,6 +79,9 @@ class Sale(models.Model):
     rnc = models.CharField(max_length=20, blank=True, null=True, help_text='RNC o Cédula del cliente facturado')
     company_name = models.CharField(max_length=255, blank=True, null=True, help_text='Razón Social del cliente facturado')
 
+    # Venta registrada sin conexión (sincronizada por lote desde la terminal)
+    client_uuid = models.UUIDField(null=True, blank=True, unique=True, editable=False, help_text='UUID generado por la terminal para ventas offline')
+
     # Campos de auditoría
     created_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='sales_created')
     updated_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='sales_updated')
@@ -99,6 +104,32 @@ class Sale(models.Model):
             ('view_financial_reports', 'Can view financial reports'),
         ]
     
+    def populate_creation_snapshots(self):
+        """Completa los campos que se fijan al crear la venta.
+
+        Lo llama ``save()`` en la creación; ``bulk_create`` no pasa por
+        ``save()`` y quien lo use debe llamarlo antes.
+        """
+        # Nueva venta: establecer status=confirmed por defecto
+        if not self.status:
+            self.status = 'confirmed'
+
+        # Auto-poblar promotion_name si se asignó una promoción
+        if self.promotion_id and not self.promotion_name:
+            self.promotion_name = self.promotion.name
+
+        # Auto-poblar coupon_code si se asignó un cupón
+        if self.coupon_id and not self.coupon_code:
+            self.coupon_code = self.coupon.code
+
+        # NUEVO: Capturar snapshots de comisión al crear
+        if self.employee and self.employee.commission_rate:
+            self.commission_rate_snapshot = self.employee.commission_rate
+            # Calcular monto de comisión
+            from decimal import Decimal
+            commission_rate = Decimal(str(self.employee.commission_rate)) / Decimal('100')
+            self.commission_amount_snapshot = self.total * commission_rate
+
     def save(self, *args, **kwargs):
         from django.core.exceptions import ValidationError
         
@@ -109,26 +140,7 @@ class Sale(models.Model):
             elif not self.tenant_id and self.employee:
                 self.tenant = self.employee.tenant
             
-            # Nueva venta: establecer status=confirmed por defecto
-            if not self.status:
-                self.status = 'confirmed'
-
-            # Auto-poblar promotion_name si se asignó una promoción
-            if self.promotion_id and not self.promotion_name:
-                self.promotion_name = self.promotion.name
-
-            # Auto-poblar coupon_code si se asignó un cupón
-            if self.coupon_id and not self.coupon_code:
-                self.coupon_code = self.coupon.code
-            
-            # NUEVO: Capturar snapshots de comisión al crear
-            if self.employee and self.employee.commission_rate:
-                self.commission_rate_snapshot = self.employee.commission_rate
-                # Calcular monto de comisión
-                from decimal import Decimal
-                commission_rate = Decimal(str(self.employee.commission_rate)) / Decimal('100')
-                self.commission_amount_snapshot = self.total * commission_rate
-            
+            self.populate_creation_snapshots()
             return super().save(*args, **kwargs)
         
         # Si es partial update (update_fields), permitir cambios específicos
@@ -233,6 +245,41 @@ class SaleDetail(models.Model):
                     raise ValidationError({
                         'object_id': 'Service does not belong to the sale\'s tenant'
                     })
+
+    @classmethod
+    def validate_lines(cls, tenant_id, details, tenant_product_ids=None):
+        """Validación de ``clean()`` por conjuntos para las líneas de una venta nueva.
+
+        ``tenant_product_ids`` son los productos ya cargados del tenant (p. ej.
+        los bloqueados por la reserva de stock); si se pasan, los productos no
+        cuestan ninguna consulta. Los servicios se comprueban con una sola
+        consulta y solo se rechazan los de otro tenant.
+        """
+        from django.core.exceptions import ValidationError
+
+        product_ids, service_ids = set(), set()
+        for detail in details:
+            if not detail.content_type or not detail.object_id:
+                raise ValidationError('Both content type and object ID are required.')
+            if detail.content_type.model == 'product':
+                product_ids.add(detail.object_id)
+            elif detail.content_type.model == 'service' and detail.content_type.app_label == 'services_api':
+                service_ids.add(detail.object_id)
+
+        if product_ids:
+            if tenant_product_ids is None:
+                tenant_product_ids = set(
+                    Product.objects.filter(id__in=product_ids, tenant_id=tenant_id).values_list('id', flat=True)
+                )
+            if not product_ids <= set(tenant_product_ids):
+                raise ValidationError({
+                    'object_id': 'Product does not belong to the sale\'s tenant'
+                })
+        if service_ids:
+            if Service.objects.filter(id__in=service_ids).exclude(tenant_id=tenant_id).exists():
+                raise ValidationError({
+                    'object_id': 'Service does not belong to the sale\'s tenant'
+                })
     
     # Campos para almacenar datos al momento de la venta
     name = models.CharField(max_length=255)  # Nombre del producto/servicio
@@ -279,6 +326,20 @@ class CashRegister(models.Model):
     initial_cash = models.DecimalField(max_digits=14, decimal_places=2, default=0.00)
     final_cash = models.DecimalField(max_digits=14, decimal_places=2, default=0.00)
     is_open = models.BooleanField(default=True)
+
+    # Acumuladores de la sesión (apps.pos_api.register_totals): pagos de ventas
+    # confirmadas por método, ventas reembolsadas y número de ventas confirmadas
+    cash_sales_total = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    card_sales_total = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    transfer_sales_total = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    other_sales_total = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    refunds_total = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    sales_count = models.PositiveIntegerField(default=0)
+
+    RUNNING_TOTAL_FIELDS = (
+        'cash_sales_total', 'card_sales_total', 'transfer_sales_total',
+        'other_sales_total', 'refunds_total', 'sales_count',
+    )
     
     class Meta:
         ordering = ['-opened_at']
@@ -294,27 +355,19 @@ class CashRegister(models.Model):
             self.initial_cash = 0.00
         if self.final_cash is None:
             self.final_cash = 0.00
+        if not self._state.adding and not kwargs.get('update_fields'):
+            # Los acumuladores solo cambian con UPDATE ... F(); un save() completo
+            # con la instancia en memoria pisaría las ventas de otras peticiones
+            kwargs['update_fields'] = [
+                f.name for f in self._meta.concrete_fields
+                if not f.primary_key and f.name not in self.RUNNING_TOTAL_FIELDS
+            ]
         super().save(*args, **kwargs)
     
     @property
     def sales_amount(self):
-        """Calcular ventas en efectivo asociadas a esta sesión de caja"""
-        # Usar annotation si está disponible (evita query extra)
-        if hasattr(self, '_sales_amount_annotated'):
-            return float(self._sales_amount_annotated)
-        from django.db.models import Sum
-        from .models import Payment
-        if not self.opened_at:
-            return 0.00
-        
-        sales_total = Payment.objects.filter(
-            sale__cash_register=self,
-            sale__tenant=self.tenant,
-            method='cash',
-            sale__status='confirmed'
-        ).aggregate(total=Sum('amount'))['total'] or 0
-        
-        return float(sales_total)
+        """Ventas en efectivo confirmadas de esta sesión de caja"""
+        return float(self.cash_sales_total or 0)
 
     
     @property
@@ -404,6 +457,9 @@ class Receipt(models.Model):
     generated_at = models.DateTimeField(auto_now_add=True)
     printed_count = models.IntegerField(default=0)
     last_printed = models.DateTimeField(null=True, blank=True)
+    # Render inmutable generado al confirmar la venta (ver receipts.py)
+    payload = models.JSONField(null=True, blank=True, encoder=DjangoJSONEncoder)
+    text_body = models.TextField(blank=True, default='')
     
     class Meta:
         verbose_name = 'Receipt'
@@ -480,4 +536,150 @@ class NCFSequence(models.Model):
         if self.expiration_date < timezone.localdate():
             return None
         
-        return f"{self.prefix}{self.type}{self.current_sequence:08d}"
+        return self.format_ncf(self.current_sequence)
+
+    def format_ncf(self, number):
+        """NCF de 11 caracteres para ``number`` dentro de esta secuencia."""
+        return f"{self.prefix}{self.type}{number:08d}"
+
+
+class NCFBlock(models.Model):
+    """Bloque de números NCF reservado para una caja (ver ncf_allocator.py)."""
+
+    STATUS_CHOICES = [
+        ('active', 'Activo'),
+        ('exhausted', 'Agotado'),
+        ('released', 'Liberado'),
+    ]
+
+    sequence = models.ForeignKey(NCFSequence, on_delete=models.CASCADE, related_name='blocks')
+    tenant = models.ForeignKey('tenants_api.Tenant', on_delete=models.CASCADE, related_name='ncf_blocks')
+    cash_register = models.ForeignKey(CashRegister, on_delete=models.SET_NULL, null=True, blank=True, related_name='ncf_blocks')
+    ncf_type = models.CharField(max_length=2)
+    start_number = models.PositiveIntegerField()
+    end_number = models.PositiveIntegerField()
+    next_number = models.PositiveIntegerField()
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='active')
+    expires_at = models.DateTimeField()
+    created_at = models.DateTimeField(auto_now_add=True)
+    closed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        verbose_name = 'Bloque NCF'
+        verbose_name_plural = 'Bloques NCF'
+        ordering = ['sequence', 'start_number']
+        indexes = [
+            models.Index(fields=['cash_register', 'ncf_type', 'status']),
+            models.Index(fields=['status', 'expires_at']),
+        ]
+
+    def __str__(self):
+        return f"{self.sequence.prefix}{self.ncf_type} {self.start_number}-{self.end_number} ({self.status})"
+
+    @property
+    def remaining(self):
+        return max(0, self.end_number - self.next_number + 1)
+
+
+class NCFGap(models.Model):
+    """Rango de NCF reservado que no se emitió (para el reporte de anulados a DGII)."""
+
+    REASON_CHOICES = [
+        ('expired', 'Bloque vencido'),
+        ('register_closed', 'Caja cerrada'),
+        ('sequence_closed', 'Secuencia vencida o inactiva'),
+    ]
+
+    sequence = models.ForeignKey(NCFSequence, on_delete=models.CASCADE, related_name='gaps')
+    tenant = models.ForeignKey('tenants_api.Tenant', on_delete=models.CASCADE, related_name='ncf_gaps')
+    block = models.ForeignKey(NCFBlock, on_delete=models.SET_NULL, null=True, blank=True, related_name='gaps')
+    start_number = models.PositiveIntegerField()
+    end_number = models.PositiveIntegerField()
+    reason = models.CharField(max_length=20, choices=REASON_CHOICES)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        verbose_name = 'Hueco NCF'
+        verbose_name_plural = 'Huecos NCF'
+        ordering = ['sequence', 'start_number']
+        indexes = [
+            models.Index(fields=['tenant', 'created_at']),
+        ]
+
+    def __str__(self):
+        first, last = self.ncf_range
+        return f"{first} - {last} ({self.get_reason_display()})"
+
+    @property
+    def ncf_range(self):
+        return self.sequence.format_ncf(self.start_number), self.sequence.format_ncf(self.end_number)
+
+
+class IdempotencyRecord(models.Model):
+    """Respaldo en base de datos de las claves de idempotencia (ver apps.pos_api.idempotency)."""
+
+    STATE_CHOICES = [
+        ('in_progress', 'En curso'),
+        ('completed', 'Completada'),
+    ]
+
+    key = models.CharField(max_length=128, unique=True)
+    request_hash = models.CharField(max_length=64)
+    state = models.CharField(max_length=12, choices=STATE_CHOICES, default='in_progress')
+    response_status = models.PositiveSmallIntegerField(null=True, blank=True)
+    response_body = models.JSONField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    expires_at = models.DateTimeField()
+
+    class Meta:
+        verbose_name = 'Clave de idempotencia'
+        verbose_name_plural = 'Claves de idempotencia'
+        indexes = [
+            models.Index(fields=['expires_at']),
+        ]
+
+    def __str__(self):
+        return f"{self.key} ({self.state})"
+
+
+class DailySalesRollup(models.Model):
+    """Totales diarios de ventas por tenant, sucursal, empleado y método (ver apps.pos_api.sales_rollup)."""
+
+    tenant = models.ForeignKey('tenants_api.Tenant', on_delete=models.CASCADE, related_name='daily_sales_rollups')
+    # Sin FK real: el histórico sobrevive al borrado de la sucursal o del empleado
+    branch = models.ForeignKey(
+        'settings_api.Branch', on_delete=models.DO_NOTHING, db_constraint=False,
+        null=True, blank=True, related_name='+',
+    )
+    employee = models.ForeignKey(
+        'employees_api.Employee', on_delete=models.DO_NOTHING, db_constraint=False,
+        null=True, blank=True, related_name='+',
+    )
+    local_date = models.DateField(help_text='Día en la zona horaria del tenant')
+    payment_method = models.CharField(max_length=50)
+
+    sales_count = models.PositiveIntegerField(default=0)
+    revenue = models.DecimalField(max_digits=16, decimal_places=2, default=0)
+    discount_total = models.DecimalField(max_digits=16, decimal_places=2, default=0)
+    refunds_count = models.PositiveIntegerField(default=0)
+    refunds_total = models.DecimalField(max_digits=16, decimal_places=2, default=0)
+    services_revenue = models.DecimalField(max_digits=16, decimal_places=2, default=0)
+    products_revenue = models.DecimalField(max_digits=16, decimal_places=2, default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = 'Resumen diario de ventas'
+        verbose_name_plural = 'Resúmenes diarios de ventas'
+        constraints = [
+            # COALESCE: sin sucursal/empleado cuenta como una sola clave (NULL no choca en UNIQUE)
+            models.UniqueConstraint(
+                'tenant', Coalesce('branch', 0), 'local_date', Coalesce('employee', 0), 'payment_method',
+                name='pos_daily_rollup_bucket_uniq',
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['tenant', 'local_date']),
+        ]
+
+    def __str__(self):
+        return f"{self.tenant_id} {self.local_date} {self.payment_method}"
@@ -0,0 +1,201 @@
+"""Asignación de NCF por bloques reservados por caja.
+
+Los números sin usar de un bloque liberado vuelven a la secuencia si es el
+último bloque reservado; si no, se registran en NCFGap.
+"""
+import logging
+from datetime import datetime, time, timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .models import NCFBlock, NCFGap, NCFSequence
+
+logger = logging.getLogger(__name__)
+
+NCF_BLOCK_SIZE = getattr(settings, 'NCF_BLOCK_SIZE', 50)
+NCF_BLOCK_TTL = getattr(settings, 'NCF_BLOCK_TTL', 12 * 3600)
+
+
+class NCFUnavailable(Exception):
+    """No hay secuencia NCF utilizable; el mensaje se muestra al usuario."""
+
+
+def _usable_sequences(tenant, ncf_type):
+    return NCFSequence.objects.filter(
+        tenant=tenant,
+        type=ncf_type,
+        is_active=True,
+        current_sequence__lte=F('end_sequence'),
+        expiration_date__gte=timezone.localdate(),
+    ).order_by('created_at')
+
+
+def _open_blocks(register, ncf_type):
+    now = timezone.now()
+    return NCFBlock.objects.filter(
+        cash_register=register,
+        ncf_type=ncf_type,
+        status='active',
+        next_number__lte=F('end_number'),
+        expires_at__gt=now,
+        sequence__is_active=True,
+        sequence__expiration_date__gte=timezone.localdate(),
+    ).order_by('id')
+
+
+def _block_expiry(sequence, now):
+    # El bloque no debe sobrevivir a la secuencia
+    sequence_end = timezone.make_aware(datetime.combine(sequence.expiration_date, time.max))
+    return min(now + timedelta(seconds=NCF_BLOCK_TTL), sequence_end)
+
+
+def allocate_block(tenant, ncf_type, register, size=None):
+    """Reserva un bloque nuevo para ``register``.
+
+    Llamada fuera de una transacción, la reserva se confirma de inmediato y el
+    lock sobre NCFSequence dura solo esta función.
+    """
+    size = size or NCF_BLOCK_SIZE
+    with transaction.atomic():
+        sequence = _usable_sequences(tenant, ncf_type).select_for_update().first()
+        if sequence is None:
+            raise NCFUnavailable(
+                f"No hay secuencia NCF activa para el tipo {ncf_type}. "
+                "Verifique configuración, rango y fecha de expiración."
+            )
+
+        start = sequence.current_sequence
+        end = min(start + size - 1, sequence.end_sequence)
+        sequence.current_sequence = end + 1
+        sequence.save(update_fields=['current_sequence', 'updated_at'])
+
+        now = timezone.now()
+        return NCFBlock.objects.create(
+            sequence=sequence,
+            tenant=tenant,
+            cash_register=register,
+            ncf_type=ncf_type,
+            start_number=start,
+            end_number=end,
+            next_number=start,
+            expires_at=_block_expiry(sequence, now),
+        )
+
+
+def ensure_block(tenant, ncf_type, register):
+    """Garantiza que ``register`` tenga un bloque con números libres.
+
+    Se llama antes de abrir la transacción de la venta.
+    """
+    block = _open_blocks(register, ncf_type).first()
+    if block is not None:
+        return block
+    release_register_blocks(register, ncf_type=ncf_type, only_stale=True)
+    return allocate_block(tenant, ncf_type, register)
+
+
+def draw_ncf(tenant, ncf_type, register):
+    """Devuelve el siguiente NCF del bloque de ``register`` (dentro de la transacción de la venta)."""
+    block = (
+        _open_blocks(register, ncf_type)
+        .select_related('sequence')
+        .select_for_update(of=('self',))
+        .first()
+    )
+    if block is None:
+        # Otra venta de la misma caja agotó el bloque después de ensure_block:
+        # reservar aquí; el lock de la secuencia dura lo que quede de la venta.
+        block = allocate_block(tenant, ncf_type, register)
+
+    number = block.next_number
+    block.next_number = number + 1
+    update_fields = ['next_number']
+    if block.next_number > block.end_number:
+        block.status = 'exhausted'
+        block.closed_at = timezone.now()
+        update_fields += ['status', 'closed_at']
+    block.save(update_fields=update_fields)
+    return block.sequence.format_ncf(number)
+
+
+def release_block(block, reason):
+    """Cierra ``block``: devuelve o registra como hueco los números sin usar."""
+    with transaction.atomic():
+        block = NCFBlock.objects.select_for_update().get(pk=block.pk)
+        if block.status != 'active':
+            return None
+
+        gap = None
+        if block.next_number <= block.end_number:
+            sequence = NCFSequence.objects.select_for_update().get(pk=block.sequence_id)
+            if sequence.current_sequence == block.end_number + 1:
+                # Último bloque reservado: los números vuelven a la secuencia
+                sequence.current_sequence = block.next_number
+                sequence.save(update_fields=['current_sequence', 'updated_at'])
+            else:
+                gap = NCFGap.objects.create(
+                    sequence=sequence,
+                    tenant_id=block.tenant_id,
+                    block=block,
+                    start_number=block.next_number,
+                    end_number=block.end_number,
+                    reason=reason,
+                )
+                logger.info(
+                    "NCF gap recorded sequence_id=%s range=%s-%s reason=%s",
+                    sequence.pk, gap.start_number, gap.end_number, reason,
+                )
+
+        block.status = 'released'
+        block.closed_at = timezone.now()
+        block.save(update_fields=['status', 'closed_at'])
+        return gap
+
+
+def release_register_blocks(register, ncf_type=None, only_stale=False):
+    """Libera los bloques activos de ``register`` (p. ej. al cerrar la caja)."""
+    blocks = NCFBlock.objects.filter(cash_register=register, status='active')
+    if ncf_type:
+        blocks = blocks.filter(ncf_type=ncf_type)
+    if only_stale:
+        blocks = blocks.filter(_stale_condition(timezone.now()))
+
+    for block in blocks:
+        release_block(block, reason='register_closed' if not only_stale else _stale_reason(block))
+
+
+def _stale_condition(now):
+    return (
+        Q(expires_at__lte=now)
+        | Q(sequence__is_active=False)
+        | Q(sequence__expiration_date__lt=timezone.localdate())
+    )
+
+
+def _stale_reason(block):
+    sequence = block.sequence
+    if not sequence.is_active or sequence.expiration_date < timezone.localdate():
+        return 'sequence_closed'
+    return 'expired'
+
+
+def expire_ncf_blocks():
+    """Libera bloques vencidos, de cajas cerradas o de secuencias cerradas."""
+    now = timezone.now()
+    blocks = NCFBlock.objects.filter(status='active').filter(
+        _stale_condition(now) | Q(cash_register__isnull=True) | Q(cash_register__is_open=False)
+    ).select_related('sequence', 'cash_register')
+
+    released = 0
+    for block in blocks:
+        register = block.cash_register
+        if register is None or not register.is_open:
+            reason = 'register_closed'
+        else:
+            reason = _stale_reason(block)
+        release_block(block, reason)
+        released += 1
+    return released
@@ -0,0 +1,368 @@
+"""Sincronización por lotes de ventas registradas sin conexión.
+
+Cada venta trae un ``client_uuid``, así que reintentar el lote es seguro, y una
+venta inválida no afecta al resto del lote.
+"""
+import logging
+from dataclasses import dataclass, field
+from decimal import Decimal
+
+from django.conf import settings
+from django.contrib.contenttypes.models import ContentType
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from apps.audit_api.signals import audit_bulk_save
+from apps.clients_api.models import Client, LoyaltyTransaction
+from apps.employees_api.adjustment_models import CommissionAdjustment
+from apps.employees_api.models import Employee
+from apps.employees_api.payroll_accumulators import record_sales_commission, sales_in_closed_periods
+from apps.inventory_api.models import Product, StockMovement
+from apps.inventory_api.stock_reservation import (
+    apply_stock_decrements, lock_products, schedule_low_stock_alerts,
+)
+from apps.services_api.models import Service
+
+from .models import Coupon, Payment, Sale, SaleDetail
+from .receipts import schedule_receipt_render
+from .register_totals import record_register_sales
+from .sales_rollup import record_sales_rollup
+from .sales_stats import invalidate_sales_stats, tenant_timezone
+from .serializers import OfflineSaleSerializer
+
+logger = logging.getLogger(__name__)
+
+OFFLINE_SYNC_MAX_BATCH = getattr(settings, 'OFFLINE_SYNC_MAX_BATCH', 500)
+OFFLINE_SYNC_CHUNK_SIZE = getattr(settings, 'OFFLINE_SYNC_CHUNK_SIZE', 100)
+
+
+class OfflineSaleError(Exception):
+    """Venta del lote rechazada; el mensaje se devuelve en su resultado."""
+
+
+@dataclass
+class _BuiltSale:
+    index: int
+    sale: Sale
+    details: list
+    payments: list
+    # {product_id: cantidad} de esta venta
+    products: dict = field(default_factory=dict)
+
+
+class OfflineSaleSync:
+    """Procesa un lote de ventas offline de ``user`` en ``cash_register``.
+
+    ``resolve_period(employee)`` devuelve el período de nómina activo del
+    empleado (``SaleViewSet._get_or_create_active_period``) y
+    ``resolve_adjustment_period(employee, fecha)`` un período abierto para
+    ajustes de comisión (``SaleViewSet._get_or_create_adjustment_period``).
+    """
+
+    def __init__(self, tenant, user, cash_register, resolve_period, resolve_adjustment_period):
+        self.tenant = tenant
+        self.user = user
+        self.cash_register = cash_register
+        self.resolve_period = resolve_period
+        self.resolve_adjustment_period = resolve_adjustment_period
+        self.results = {}
+
+    def sync(self, payloads):
+        valid = self._validate(payloads)
+        self._prefetch([data for _, data in valid])
+
+        for start in range(0, len(valid), OFFLINE_SYNC_CHUNK_SIZE):
+            self._sync_chunk(valid[start:start + OFFLINE_SYNC_CHUNK_SIZE])
+        return [self.results[index] for index in range(len(payloads))]
+
+    # --- Validación y carga de referencias -------------------------------
+
+    def _validate(self, payloads):
+        valid = []
+        seen = set()
+        for index, payload in enumerate(payloads):
+            serializer = OfflineSaleSerializer(data=payload)
+            if not serializer.is_valid():
+                client_uuid = payload.get('client_uuid') if isinstance(payload, dict) else None
+                self.results[index] = _error(client_uuid, serializer.errors)
+                continue
+            data = serializer.validated_data
+            if data['client_uuid'] in seen:
+                self.results[index] = _error(data['client_uuid'], "client_uuid repetido en el lote")
+                continue
+            seen.add(data['client_uuid'])
+            valid.append((index, data))
+
+        valid.sort(key=lambda item: (item[1]['date_time'], item[0]))
+        return valid
+
+    def _prefetch(self, sales):
+        employee_ids = {data['employee_id'] for data in sales if data.get('employee_id')}
+        client_ids = {data['client'] for data in sales if data.get('client')}
+        service_ids = {
+            detail['object_id']
+            for data in sales for detail in data['details'] if detail['content_type'] == 'service'
+        }
+
+        self.employees = {
+            employee.id: employee
+            for employee in Employee.objects.filter(tenant=self.tenant, id__in=employee_ids).select_related('user')
+        }
+        self.clients = {client.id: client for client in Client.objects.filter(tenant=self.tenant, id__in=client_ids)}
+        self.service_ids = set(
+            Service.objects.filter(tenant=self.tenant, id__in=service_ids).values_list('id', flat=True)
+        )
+        self.periods = {employee.id: self.resolve_period(employee) for employee in self.employees.values()}
+        self.content_types = {
+            'product': ContentType.objects.get_for_model(Product),
+            'service': ContentType.objects.get_for_model(Service),
+        }
+
+    # --- Bloques ----------------------------------------------------------
+
+    def _sync_chunk(self, chunk):
+        try:
+            with transaction.atomic():
+                results = self._insert_chunk(chunk)
+        except IntegrityError:
+            # Otra sincronización del mismo lote insertó alguno de estos
+            # client_uuid entre la consulta y el INSERT; al repetir el bloque
+            # quedan como duplicados.
+            logger.info("Offline sync chunk collided, retrying tenant_id=%s", self.tenant.id)
+            with transaction.atomic():
+                results = self._insert_chunk(chunk)
+        self.results.update(results)
+
+    def _insert_chunk(self, chunk):
+        results = {}
+        existing = {
+            client_uuid: (sale_id, tenant_id)
+            for client_uuid, sale_id, tenant_id in Sale.objects.filter(
+                client_uuid__in=[data['client_uuid'] for _, data in chunk]
+            ).values_list('client_uuid', 'id', 'tenant_id')
+        }
+
+        pending = []
+        for index, data in chunk:
+            match = existing.get(data['client_uuid'])
+            if match is None:
+                pending.append((index, data))
+            elif match[1] == self.tenant.id:
+                results[index] = {'client_uuid': str(data['client_uuid']), 'status': 'duplicate', 'sale_id': match[0]}
+            else:
+                results[index] = _error(data['client_uuid'], "client_uuid ya utilizado")
+
+        products = {
+            product.id: product
+            for product in lock_products(self.tenant, {
+                detail['object_id']
+                for _, data in pending for detail in data['details'] if detail['content_type'] == 'product'
+            })
+        }
+        coupons = {
+            coupon.code: coupon
+            for coupon in Coupon.objects.select_for_update().filter(
+                tenant=self.tenant, code__in={data['coupon_code'] for _, data in pending if data['coupon_code']},
+            ).order_by('id')
+        }
+        available = {product_id: product.stock for product_id, product in products.items()}
+        coupon_uses = {code: coupon.current_uses for code, coupon in coupons.items()}
+
+        built = []
+        for index, data in pending:
+            try:
+                built.append(self._build_sale(index, data, products, available, coupons, coupon_uses))
+            except OfflineSaleError as e:
+                results[index] = _error(data['client_uuid'], str(e))
+
+        if built:
+            self._persist(built, products, available, coupons, coupon_uses)
+        for item in built:
+            results[item.index] = {
+                'client_uuid': str(item.sale.client_uuid), 'status': 'created', 'sale_id': item.sale.id,
+            }
+        return results
+
+    def _build_sale(self, index, data, products, available, coupons, coupon_uses):
+        """Valida ``data`` contra el estado del bloque y arma la venta sin guardarla.
+
+        ``available`` y ``coupon_uses`` solo se modifican si la venta es válida.
+        """
+        total = Decimal('0')
+        quantities = {}
+        for detail in data['details']:
+            total += detail['quantity'] * detail['price']
+            if detail['content_type'] == 'service':
+                if detail['object_id'] not in self.service_ids:
+                    raise OfflineSaleError(f"Servicio {detail['object_id']} no encontrado")
+                continue
+            quantities[detail['object_id']] = quantities.get(detail['object_id'], 0) + detail['quantity']
+
+        for product_id, quantity in quantities.items():
+            product = products.get(product_id)
+            if product is None:
+                raise OfflineSaleError("Producto no encontrado o ID inválido")
+            if not product.is_active:
+                raise OfflineSaleError(f"El producto {product.name} no está activo")
+            if available[product_id] < quantity:
+                raise OfflineSaleError(
+                    f"Stock insuficiente para {product.name}. Disponible: {available[product_id]}, Solicitado: {quantity}"
+                )
+
+        discount = data['discount']
+        if discount > total:
+            raise OfflineSaleError(f"El descuento ({discount}) no puede ser mayor al total ({total})")
+
+        coupon = None
+        if data['coupon_code']:
+            coupon = coupons.get(data['coupon_code'])
+            if coupon is None:
+                raise OfflineSaleError("Cupón no encontrado")
+            # La vigencia se evalúa a la hora en que se hizo la venta
+            if not coupon.is_active:
+                raise OfflineSaleError("El cupón no está activo")
+            if not coupon.start_date <= data['date_time'] <= coupon.end_date:
+                raise OfflineSaleError("El cupón no estaba vigente en la fecha de la venta")
+            if coupon.max_uses is not None and coupon_uses[coupon.code] >= coupon.max_uses:
+                raise OfflineSaleError("El cupón ha alcanzado su límite de usos")
+            if total < coupon.min_purchase_amount:
+                raise OfflineSaleError(
+                    f"Monto mínimo de compra requerido para el cupón: ${coupon.min_purchase_amount}"
+                )
+
+        employee = None
+        if data.get('employee_id'):
+            employee = self.employees.get(data['employee_id'])
+            if employee is None:
+                raise OfflineSaleError("Empleado no encontrado")
+        client = None
+        if data.get('client'):
+            client = self.clients.get(data['client'])
+            if client is None:
+                raise OfflineSaleError("Cliente no encontrado")
+
+        payments = data['payments']
+        payment_method = data.get('payment_method')
+        if not payment_method:
+            methods = {payment['method'] for payment in payments}
+            payment_method = methods.pop() if len(methods) == 1 else 'mixed'
+
+        sale = Sale(
+            tenant=self.tenant,
+            user=self.user,
+            cash_register=self.cash_register,
+            branch=self.cash_register.branch or (employee.branch if employee else None),
+            employee=employee,
+            period=self.periods.get(employee.id) if employee else None,
+            client=client,
+            client_uuid=data['client_uuid'],
+            date_time=data['date_time'],
+            total=total - discount,
+            discount=discount,
+            discount_reason=(data['discount_reason'] or '').strip(),
+            paid=sum((payment['amount'] for payment in payments), Decimal('0')),
+            payment_method=payment_method,
+            status='confirmed',
+            coupon=coupon,
+        )
+        sale.populate_creation_snapshots()
+        if client and sale.total > 0:
+            earn_rate = Decimal(str(getattr(settings, 'POS_LOYALTY_EARN_RATE', 100)))
+            sale.points_earned = int(sale.total // earn_rate)
+
+        for product_id, quantity in quantities.items():
+            available[product_id] -= quantity
+        if coupon:
+            coupon_uses[coupon.code] += 1
+        return _BuiltSale(index=index, sale=sale, details=data['details'], payments=payments, products=quantities)
+
+    def _persist(self, built, products, available, coupons, coupon_uses):
+        sales = Sale.objects.bulk_create([item.sale for item in built], batch_size=OFFLINE_SYNC_CHUNK_SIZE)
+
+        details, payments, movements = [], [], []
+        for item in built:
+            for detail in item.details:
+                details.append(SaleDetail(
+                    sale=item.sale,
+                    content_type=self.content_types[detail['content_type']],
+                    object_id=detail['object_id'],
+                    name=detail['name'],
+                    quantity=detail['quantity'],
+                    price=detail['price'],
+                ))
+            for payment in item.payments:
+                payments.append(Payment(sale=item.sale, **payment))
+            for product_id, quantity in item.products.items():
+                movements.append(StockMovement(
+                    product=products[product_id], quantity=-quantity, reason=f"Venta #{item.sale.id}",
+                ))
+        SaleDetail.objects.bulk_create(details, batch_size=OFFLINE_SYNC_CHUNK_SIZE)
+        Payment.objects.bulk_create(payments, batch_size=OFFLINE_SYNC_CHUNK_SIZE)
+        audit_bulk_save(sales, created=True)
+        audit_bulk_save(details, created=True)
+        audit_bulk_save(payments, created=True)
+
+        sold = [
+            (product, product.stock - available[product_id])
+            for product_id, product in products.items()
+            if product.stock != available[product_id]
+        ]
+        apply_stock_decrements(sold)
+        StockMovement.objects.bulk_create(movements, batch_size=OFFLINE_SYNC_CHUNK_SIZE)
+        audit_bulk_save(movements, created=True)
+        schedule_low_stock_alerts(product for product, _ in sold)
+
+        used_coupons = [coupon for code, coupon in coupons.items() if coupon.current_uses != coupon_uses[code]]
+        for coupon in used_coupons:
+            coupon.current_uses = coupon_uses[coupon.code]
+        if used_coupons:
+            Coupon.objects.bulk_update(used_coupons, ['current_uses'])
+
+        record_sales_commission(sales)
+        self._adjust_closed_period_commissions(sales)
+        record_register_sales(
+            self.cash_register.id, [(payment.method, payment.amount) for payment in payments], sales_count=len(sales),
+        )
+        record_sales_rollup(sales, tz=tenant_timezone(self.tenant))
+        invalidate_sales_stats(self.tenant.id)
+        schedule_receipt_render([sale.id for sale in sales], self.user.id)
+        self._record_loyalty(sales)
+
+    def _adjust_closed_period_commissions(self, sales):
+        """Lleva a un período abierto la comisión de ventas fechadas en períodos cerrados."""
+        today = timezone.now().date()
+        for sale in sales_in_closed_periods(sales):
+            CommissionAdjustment.objects.create(
+                sale=sale,
+                payroll_period=self.resolve_adjustment_period(sale.employee, today),
+                employee=sale.employee,
+                amount=sale.commission_amount_snapshot,
+                reason='correction',
+                description=f'Ajuste automático por venta #{sale.id} en período finalizado',
+                created_by=self.user,
+                tenant=sale.employee.tenant,
+            )
+
+    def _record_loyalty(self, sales):
+        earned = [sale for sale in sales if sale.points_earned]
+        points_by_client = {}
+        for sale in earned:
+            points_by_client[sale.client_id] = points_by_client.get(sale.client_id, 0) + sale.points_earned
+        for client_id, points in points_by_client.items():
+            Client.objects.filter(pk=client_id).update(loyalty_points=F('loyalty_points') + points)
+        LoyaltyTransaction.objects.bulk_create([
+            LoyaltyTransaction(
+                client_id=sale.client_id, sale=sale, points=sale.points_earned,
+                transaction_type='earned', description=f'Compra #{sale.id}',
+            )
+            for sale in earned
+        ])
+
+
+def _error(client_uuid, errors):
+    return {
+        'client_uuid': str(client_uuid) if client_uuid else None,
+        'status': 'error',
+        'errors': errors,
+    }
@@ -0,0 +1,111 @@
+import base64
+import binascii
+
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+class SaleKeysetPagination(BasePagination):
+    """Paginación por cursor sobre ``(date_time, id)`` descendente.
+
+    Cada página filtra a partir de la última venta de la anterior en vez de
+    saltar N filas con OFFSET, así que la página 500 cuesta lo mismo que la 1 y
+    usa el índice ``(tenant, -date_time)``. El ``id`` desempata ventas con el
+    mismo ``date_time``. No devuelve ``count``: contar todo el rango es justo
+    el recorrido que se quiere evitar.
+    """
+    page_size = 25
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    cursor_query_param = 'cursor'
+    invalid_cursor_message = 'Cursor inválido'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        self.page_size = self.get_page_size(request)
+        reverse, position = self.decode_cursor(request)
+
+        if position is not None:
+            date_time, pk = position
+            if reverse:
+                # date_time >= explícito para que el planner acote el rango en el índice
+                queryset = queryset.filter(date_time__gte=date_time).filter(
+                    Q(date_time__gt=date_time) | Q(id__gt=pk)
+                )
+            else:
+                queryset = queryset.filter(date_time__lte=date_time).filter(
+                    Q(date_time__lt=date_time) | Q(id__lt=pk)
+                )
+        ordering = ('date_time', 'id') if reverse else ('-date_time', '-id')
+        rows = list(queryset.order_by(*ordering)[:self.page_size + 1])
+
+        has_more = len(rows) > self.page_size
+        rows = rows[:self.page_size]
+        if reverse:
+            rows.reverse()
+
+        self.next_position = self.previous_position = None
+        if rows:
+            if has_more or reverse:
+                self.next_position = (False, rows[-1])
+            if position is not None and (has_more or not reverse):
+                self.previous_position = (True, rows[0])
+        return rows
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return min(max(size, 1), self.max_page_size)
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return False, None
+        try:
+            direction, raw_date_time, raw_pk = base64.urlsafe_b64decode(encoded.encode('ascii')).decode('ascii').split('|')
+            date_time = parse_datetime(raw_date_time)
+            pk = int(raw_pk)
+        except (TypeError, ValueError, UnicodeError, binascii.Error):
+            raise NotFound(self.invalid_cursor_message)
+        if direction not in ('n', 'p') or date_time is None:
+            raise NotFound(self.invalid_cursor_message)
+        return direction == 'p', (date_time, pk)
+
+    def encode_cursor(self, position):
+        if position is None:
+            return None
+        reverse, row = position
+        raw = f"{'p' if reverse else 'n'}|{row.date_time.isoformat()}|{row.pk}"
+        cursor = base64.urlsafe_b64encode(raw.encode('ascii')).decode('ascii')
+        return replace_query_param(self.base_url, self.cursor_query_param, cursor)
+
+    def get_next_link(self):
+        return self.encode_cursor(self.next_position)
+
+    def get_previous_link(self):
+        return self.encode_cursor(self.previous_position)
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'previous': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
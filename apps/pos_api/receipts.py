@@ -0,0 +1,208 @@
+"""Recibos pre-renderizados (``Receipt``).
+
+El recibo se renderiza una vez al confirmar la venta con los datos del negocio
+de ese momento; las ventas sin recibo se renderizan en la primera impresión.
+"""
+import logging
+
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+from apps.settings_api.barbershop_models import BarbershopSettings
+
+from .models import PosConfiguration, Receipt, Sale
+from .sales_stats import tenant_timezone
+
+logger = logging.getLogger(__name__)
+
+RECEIPT_LINE_WIDTH = 48  # Fuente A en papel de 80 mm
+
+PAYMENT_LABELS = {
+    'cash': 'Efectivo',
+    'card': 'Tarjeta',
+    'transfer': 'Transferencia',
+    'mixed': 'Mixto',
+    'other': 'Otro',
+}
+
+
+def _business_context(tenant, user):
+    """Datos del negocio (BarbershopSettings + PosConfiguration) y la configuración POS usada."""
+    settings = BarbershopSettings.objects.filter(tenant=tenant).first() if tenant else None
+
+    # Buscar config por tenant primero, luego por usuario
+    pos = PosConfiguration.objects.filter(tenant=tenant).first() if tenant else None
+    if not pos and user is not None:
+        pos = PosConfiguration.objects.filter(user=user).first()
+
+    name = ''
+    address = ''
+    phone = ''
+    email = ''
+
+    if settings:
+        name = settings.name or ''
+        contact = settings.contact or {}
+        address = contact.get('address', '') or ''
+        phone = contact.get('phone', '') or ''
+        email = contact.get('email', '') or ''
+
+    if pos:
+        name = pos.business_name or name
+        address = pos.address or address
+        phone = pos.phone or phone
+        email = pos.email or email
+
+    info = {
+        'name': name or 'Barberia',
+        'address': address or 'Direccion no configurada',
+        'phone': phone or 'Telefono no configurado',
+        'email': email or ''
+    }
+    return info, pos
+
+
+def get_business_info(tenant, user):
+    """Unificar datos de negocio para recibos usando BarbershopSettings + PosConfiguration."""
+    return _business_context(tenant, user)[0]
+
+
+def receipt_number(sale_id):
+    return f"R{sale_id:06d}"
+
+
+# --- Texto ESC/POS -------------------------------------------------------------
+
+def _center(text, width):
+    return text[:width].center(width).rstrip()
+
+
+def _columns(left, right, width):
+    right = str(right)
+    left = str(left)[:max(width - len(right) - 1, 0)]
+    return f"{left}{' ' * (width - len(left) - len(right))}{right}"
+
+
+def _money(symbol, value):
+    return f"{symbol}{float(value or 0):,.2f}"
+
+
+def render_receipt_text(sale_data, business_info, number, issued_at, currency_symbol='$', footer='', width=RECEIPT_LINE_WIDTH):
+    """Cuerpo de texto del recibo a partir del payload ya serializado."""
+    rule = '-' * width
+    lines = [_center(business_info['name'], width)]
+    for extra in (business_info['address'], business_info['phone'], business_info['email']):
+        if extra:
+            lines.append(_center(extra, width))
+    lines.append(rule)
+    lines.append(_columns(f"Recibo {number}", issued_at.strftime('%d/%m/%Y %H:%M'), width))
+    if sale_data.get('ncf'):
+        lines.append(f"NCF: {sale_data['ncf']}")
+    if sale_data.get('rnc'):
+        lines.append(f"RNC cliente: {sale_data['rnc']}")
+    if sale_data.get('company_name'):
+        lines.append(sale_data['company_name'][:width])
+    if sale_data.get('client_name'):
+        lines.append(f"Cliente: {sale_data['client_name']}"[:width])
+    if sale_data.get('employee_name'):
+        lines.append(f"Atendido por: {sale_data['employee_name']}"[:width])
+    lines.append(rule)
+
+    for detail in sale_data.get('details', []):
+        quantity = detail['quantity']
+        price = float(detail['price'])
+        lines.append(str(detail['name'])[:width])
+        lines.append(_columns(
+            f"  {quantity} x {_money(currency_symbol, price)}", _money(currency_symbol, quantity * price), width,
+        ))
+    lines.append(rule)
+
+    if float(sale_data.get('discount') or 0):
+        lines.append(_columns('Descuento', f"-{_money(currency_symbol, sale_data['discount'])}", width))
+    lines.append(_columns('TOTAL', _money(currency_symbol, sale_data['total']), width))
+    for payment in sale_data.get('payments', []):
+        label = PAYMENT_LABELS.get(payment['method'], payment['method'])
+        lines.append(_columns(label, _money(currency_symbol, payment['amount']), width))
+    lines.append(rule)
+
+    for footer_line in (footer or '').splitlines():
+        lines.append(_center(footer_line, width))
+    lines.append(_center('Gracias por su visita', width))
+    return '\n'.join(lines) + '\n'
+
+
+# --- Render ------------------------------------------------------------------
+
+def _sale_queryset():
+    return Sale.objects.select_related('client', 'employee__user', 'user', 'tenant').prefetch_related(
+        'details__content_type', 'payments',
+    )
+
+
+def build_receipt_payload(sale, user=None):
+    """``(payload, text_body)`` del recibo de ``sale``."""
+    from .serializers import SaleSerializer
+
+    business_info, pos = _business_context(sale.tenant, user or sale.user)
+    sale_data = SaleSerializer(sale).data
+    issued_at = timezone.localtime(sale.date_time, tenant_timezone(sale.tenant))
+    number = receipt_number(sale.id)
+    text_body = render_receipt_text(
+        sale_data, business_info, number, issued_at,
+        currency_symbol=pos.currency_symbol if pos else '$',
+        footer=pos.receipt_footer if pos else '',
+    )
+    return {'sale': sale_data, 'business_info': business_info}, text_body
+
+
+def render_receipt(sale, user=None):
+    """Guarda el recibo renderizado de ``sale`` si aún no existe y lo devuelve.
+
+    Nunca sobrescribe un payload ya guardado: el recibo es inmutable.
+    """
+    receipt = Receipt.objects.filter(sale_id=sale.id).first()
+    if receipt is not None and receipt.payload is not None:
+        return receipt
+
+    payload, text_body = build_receipt_payload(sale, user)
+    if receipt is None:
+        try:
+            with transaction.atomic():
+                return Receipt.objects.create(
+                    sale=sale, receipt_number=receipt_number(sale.id),
+                    payload=payload, text_body=text_body,
+                )
+        except IntegrityError:
+            # Otro proceso lo creó primero
+            receipt = Receipt.objects.get(sale_id=sale.id)
+            if receipt.payload is not None:
+                return receipt
+
+    Receipt.objects.filter(pk=receipt.pk, payload__isnull=True).update(payload=payload, text_body=text_body)
+    receipt.refresh_from_db()
+    return receipt
+
+
+def render_receipts_for_sales(sale_ids, user_id=None):
+    """Renderiza los recibos pendientes de ``sale_ids``; devuelve cuántos se crearon."""
+    from django.contrib.auth import get_user_model
+
+    user = get_user_model().objects.filter(pk=user_id).first() if user_id else None
+    pending = _sale_queryset().filter(id__in=sale_ids).exclude(receipt__payload__isnull=False)
+    rendered = 0
+    for sale in pending:
+        try:
+            render_receipt(sale, user)
+            rendered += 1
+        except Exception:
+            logger.exception("Receipt render failed sale_id=%s", sale.id)
+    return rendered
+
+
+def schedule_receipt_render(sale_ids, user_id=None):
+    """Encola el render de los recibos cuando la transacción actual confirme."""
+    from .tasks import render_receipts
+
+    sale_ids = list(sale_ids)
+    if sale_ids:
+        transaction.on_commit(lambda: render_receipts.delay(sale_ids, user_id))
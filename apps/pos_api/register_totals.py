@@ -0,0 +1,123 @@
+"""Acumuladores de CashRegister por método de pago.
+
+Ventas y reembolsos aplican su delta con ``UPDATE ... SET x = x + d``;
+``compute_register_totals`` hace el cálculo completo para rellenar y reconciliar.
+"""
+import logging
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Count, F, Sum
+
+from .models import CashRegister, Payment, Sale
+
+logger = logging.getLogger(__name__)
+
+PAYMENT_TOTAL_FIELDS = {
+    'cash': 'cash_sales_total',
+    'card': 'card_sales_total',
+    'transfer': 'transfer_sales_total',
+}
+# 'mixed' y 'other'
+OTHER_TOTAL_FIELD = 'other_sales_total'
+
+
+def _payment_field(method):
+    return PAYMENT_TOTAL_FIELDS.get(method, OTHER_TOTAL_FIELD)
+
+
+def _apply_delta(register_id, payments, sales_count=0, refunds=Decimal('0'), sign=1):
+    deltas = {}
+    for method, amount in payments:
+        name = _payment_field(method)
+        deltas[name] = deltas.get(name, Decimal('0')) + sign * Decimal(str(amount))
+
+    updates = {name: F(name) + delta for name, delta in deltas.items() if delta}
+    if sales_count:
+        updates['sales_count'] = F('sales_count') + sign * sales_count
+    if refunds:
+        updates['refunds_total'] = F('refunds_total') + refunds
+    if not register_id or not updates:
+        return 0
+    return CashRegister.objects.filter(pk=register_id).update(**updates)
+
+
+def record_register_sales(register_id, payments, sales_count=1):
+    """Suma ``payments`` (``[(método, monto)]``) de ventas confirmadas nuevas a la caja."""
+    return _apply_delta(register_id, payments, sales_count=sales_count)
+
+
+def record_register_refund(sale):
+    """Resta de su caja una venta confirmada que se reembolsa y suma su total a los reembolsos."""
+    if not sale.cash_register_id:
+        return 0
+    payments = sale.payments.values_list('method', 'amount')
+    return _apply_delta(sale.cash_register_id, payments, sales_count=1, refunds=sale.total, sign=-1)
+
+
+def compute_register_totals(register_ids):
+    """Cálculo completo de los acumuladores: ``{register_id: {campo: valor}}``.
+
+    Dos consultas agrupadas, sin importar cuántas cajas se pidan.
+    """
+    totals = {
+        register_id: {
+            **{name: Decimal('0') for name in CashRegister.RUNNING_TOTAL_FIELDS},
+            'sales_count': 0,
+        }
+        for register_id in register_ids
+    }
+    register_ids = list(totals)
+
+    payments = (
+        Payment.objects.filter(sale__cash_register_id__in=register_ids, sale__status='confirmed')
+        .values('sale__cash_register_id', 'method')
+        .annotate(total=Sum('amount'))
+    )
+    for row in payments:
+        totals[row['sale__cash_register_id']][_payment_field(row['method'])] += row['total'] or Decimal('0')
+
+    sales = (
+        Sale.objects.filter(cash_register_id__in=register_ids, status__in=['confirmed', 'refunded'])
+        .values('cash_register_id', 'status')
+        .annotate(count=Count('id'), total=Sum('total'))
+    )
+    for row in sales:
+        if row['status'] == 'confirmed':
+            totals[row['cash_register_id']]['sales_count'] = row['count']
+        else:
+            totals[row['cash_register_id']]['refunds_total'] = row['total'] or Decimal('0')
+    return totals
+
+
+def reconcile_registers(registers, fix=False):
+    """Compara los acumuladores de ``registers`` con el cálculo completo.
+
+    Devuelve ``{register_id: {campo: (guardado, esperado)}}`` con las cajas que
+    difieren; con ``fix=True`` además guarda los valores esperados.
+    """
+    registers = list(registers)
+    expected = compute_register_totals(register.pk for register in registers)
+
+    drift = {}
+    for register in registers:
+        differences = {
+            name: (getattr(register, name), value)
+            for name, value in expected[register.pk].items()
+            if getattr(register, name) != value
+        }
+        if not differences:
+            continue
+        drift[register.pk] = differences
+        logger.warning("Cash register total drift register_id=%s fields=%s", register.pk, differences)
+        if fix:
+            _fix_register(register.pk)
+    return drift
+
+
+def _fix_register(register_id):
+    # Con la fila bloqueada, una venta en curso o ya está en el cálculo o
+    # aplica su delta después de esta escritura; nunca se pierde
+    with transaction.atomic():
+        CashRegister.objects.select_for_update().filter(pk=register_id).first()
+        CashRegister.objects.filter(pk=register_id).update(**compute_register_totals([register_id])[register_id])
@@ -0,0 +1,243 @@
+"""Resumen diario de ventas (``DailySalesRollup``) mantenido con incrementos atómicos.
+
+Los lectores toman los días cerrados del resumen y agregan en vivo solo las
+ventas de hoy.
+"""
+from datetime import timedelta
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Count, DecimalField, F, Q, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .models import DailySalesRollup, Sale, SaleDetail
+from .sales_stats import local_range, tenant_timezone
+
+COUNT_FIELDS = ('sales_count', 'refunds_count')
+AMOUNT_FIELDS = ('revenue', 'discount_total', 'refunds_total', 'services_revenue', 'products_revenue')
+ROLLUP_FIELDS = COUNT_FIELDS + AMOUNT_FIELDS
+KEY_FIELDS = ('branch_id', 'employee_id', 'payment_method')
+
+
+def _empty():
+    return {**{name: 0 for name in COUNT_FIELDS}, **{name: Decimal('0') for name in AMOUNT_FIELDS}}
+
+
+def _line_split(sale_ids):
+    """``{sale_id: (productos, servicios)}`` en una consulta."""
+    line_total = F('quantity') * F('price')
+    is_product = Q(content_type__model='product')
+    rows = SaleDetail.objects.filter(sale_id__in=sale_ids).values('sale_id').annotate(
+        products=Sum(line_total, filter=is_product, output_field=DecimalField()),
+        services=Sum(line_total, filter=~is_product, output_field=DecimalField()),
+    )
+    return {row['sale_id']: (row['products'] or Decimal('0'), row['services'] or Decimal('0')) for row in rows}
+
+
+# --- Escritura ---------------------------------------------------------------
+
+def _bucket(sale, tz):
+    return {
+        'tenant_id': sale.tenant_id,
+        'branch_id': sale.branch_id,
+        'local_date': timezone.localtime(sale.date_time, tz).date(),
+        'employee_id': sale.employee_id,
+        'payment_method': sale.payment_method,
+    }
+
+
+def _apply(deltas):
+    """Suma ``{bucket: delta}`` al resumen.
+
+    Primero inserta en una consulta las filas que falten (``ignore_conflicts``
+    deja pasar las que ya existen o que otra transacción acaba de crear) y luego
+    aplica un ``UPDATE ... SET x = x + d`` por bucket, así que el costo no
+    depende de si el bucket es nuevo.
+    """
+    deltas = {bucket: delta for bucket, delta in deltas.items() if any(delta.values())}
+    if not deltas:
+        return
+    DailySalesRollup.objects.bulk_create(
+        [DailySalesRollup(**dict(bucket)) for bucket in deltas], ignore_conflicts=True,
+    )
+    now = timezone.now()
+    for bucket, delta in deltas.items():
+        DailySalesRollup.objects.filter(**dict(bucket)).update(
+            **{name: F(name) + value for name, value in delta.items() if value}, updated_at=now,
+        )
+
+
+def record_sales_rollup(sales, tz=None):
+    """Suma ventas recién creadas al resumen; una escritura por clave, no por venta."""
+    sales = [sale for sale in sales if sale.tenant_id]
+    if not sales:
+        return
+    split = _line_split([sale.id for sale in sales])
+    zones = {}
+    deltas = {}
+    for sale in sales:
+        if sale.tenant_id not in zones:
+            zones[sale.tenant_id] = tz or tenant_timezone(sale.tenant)
+        bucket = _bucket(sale, zones[sale.tenant_id])
+        delta = deltas.setdefault(tuple(bucket.items()), _empty())
+        products, services = split.get(sale.id, (Decimal('0'), Decimal('0')))
+        delta['sales_count'] += 1
+        delta['revenue'] += Decimal(str(sale.total))
+        delta['discount_total'] += Decimal(str(sale.discount or 0))
+        delta['products_revenue'] += products
+        delta['services_revenue'] += services
+    _apply(deltas)
+
+
+def record_refund_rollup(sale):
+    """Registra el reembolso de ``sale`` en el día (local) en que se vendió."""
+    if not sale.tenant_id:
+        return
+    bucket = tuple(_bucket(sale, tenant_timezone(sale.tenant)).items())
+    _apply({bucket: {'refunds_count': 1, 'refunds_total': sale.total}})
+
+
+# --- Agregación desde Sale ---------------------------------------------------
+
+def aggregate_sales(sales, tz, by=()):
+    """Agrega ``sales`` por día local y los campos ``by``: ``{(día, *by): totales}``.
+
+    Dos consultas: ventas y líneas (desglose servicios/productos).
+    """
+    refunded = Q(status='refunded')
+    rows = {}
+    sale_rows = sales.annotate(local_date=TruncDate('date_time', tzinfo=tz)).values('local_date', *by).annotate(
+        sales_count=Count('id'),
+        revenue=Sum('total'),
+        discount_total=Sum('discount'),
+        refunds_count=Count('id', filter=refunded),
+        refunds_total=Sum('total', filter=refunded),
+    )
+    for row in sale_rows:
+        totals = rows.setdefault((row['local_date'], *(row[name] for name in by)), _empty())
+        for name in ('sales_count', 'revenue', 'discount_total', 'refunds_count', 'refunds_total'):
+            totals[name] = row[name] or totals[name]
+
+    line_total = F('quantity') * F('price')
+    is_product = Q(content_type__model='product')
+    sale_by = [f'sale__{name}' for name in by]
+    line_rows = SaleDetail.objects.filter(sale__in=sales).annotate(
+        local_date=TruncDate('sale__date_time', tzinfo=tz)
+    ).values('local_date', *sale_by).annotate(
+        products=Sum(line_total, filter=is_product, output_field=DecimalField()),
+        services=Sum(line_total, filter=~is_product, output_field=DecimalField()),
+    )
+    for row in line_rows:
+        totals = rows.setdefault((row['local_date'], *(row[name] for name in sale_by)), _empty())
+        totals['products_revenue'] = row['products'] or Decimal('0')
+        totals['services_revenue'] = row['services'] or Decimal('0')
+    return rows
+
+
+def rebuild_sales_rollup(tenant, start_date=None, end_date=None):
+    """Recalcula el resumen de ``tenant`` (todo o ``[start_date, end_date]``) desde ``Sale``.
+
+    Devuelve cuántas filas quedaron. Pensado para días cerrados: una venta que
+    confirme sobre un día que se está reconstruyendo puede quedar fuera y se
+    corrige en la siguiente pasada.
+    """
+    tz = tenant_timezone(tenant)
+    sales = Sale.objects.filter(tenant=tenant)
+    existing = DailySalesRollup.objects.filter(tenant=tenant)
+    if start_date:
+        sales = sales.filter(date_time__gte=local_range(tz, start_date)[0])
+        existing = existing.filter(local_date__gte=start_date)
+    if end_date:
+        sales = sales.filter(date_time__lt=local_range(tz, end_date)[1])
+        existing = existing.filter(local_date__lte=end_date)
+
+    rows = aggregate_sales(sales, tz, KEY_FIELDS)
+    with transaction.atomic():
+        existing.delete()
+        DailySalesRollup.objects.bulk_create([
+            DailySalesRollup(
+                tenant=tenant, local_date=local_date, branch_id=branch_id,
+                employee_id=employee_id, payment_method=payment_method, **totals,
+            )
+            for (local_date, branch_id, employee_id, payment_method), totals in rows.items()
+        ], batch_size=1000)
+    return len(rows)
+
+
+# --- Lectura -----------------------------------------------------------------
+
+def _today_sales(tenant, tz, today, branch_id):
+    start, end = local_range(tz, today)
+    sales = Sale.objects.filter(tenant=tenant, date_time__gte=start, date_time__lt=end)
+    if branch_id:
+        sales = sales.filter(branch_id=branch_id)
+    return sales
+
+
+def _rollups(tenant, branch_id):
+    rollups = DailySalesRollup.objects.filter(tenant=tenant)
+    if branch_id:
+        rollups = rollups.filter(branch_id=branch_id)
+    return rollups
+
+
+def sales_by_day(tenant, start_date, end_date, branch_id=None, by=()):
+    """Totales por día local (y por ``by``) entre ``start_date`` y ``end_date`` inclusive.
+
+    ``start_date=None`` no acota por abajo. Devuelve una lista ordenada por día
+    de dicts con ``local_date``, los campos de ``by`` y los de ``ROLLUP_FIELDS``.
+    """
+    tz = tenant_timezone(tenant)
+    today = timezone.localdate(timezone=tz)
+    rows = {}
+
+    closed_end = min(end_date, today - timedelta(days=1))
+    if start_date is None or start_date <= closed_end:
+        rollups = _rollups(tenant, branch_id).filter(local_date__lte=closed_end)
+        if start_date:
+            rollups = rollups.filter(local_date__gte=start_date)
+        for row in rollups.values('local_date', *by).annotate(**{name: Sum(name) for name in ROLLUP_FIELDS}):
+            rows[(row['local_date'], *(row[name] for name in by))] = {name: row[name] for name in ROLLUP_FIELDS}
+
+    if (start_date is None or start_date <= today) and end_date >= today:
+        rows.update(aggregate_sales(_today_sales(tenant, tz, today, branch_id), tz, by))
+
+    return [
+        {'local_date': key[0], **dict(zip(by, key[1:])), **totals}
+        for key, totals in sorted(rows.items(), key=lambda item: item[0][0])
+    ]
+
+
+def sales_totals(tenant, periods, branch_id=None):
+    """Totales de varios períodos ``{nombre: (inicio | None, fin)}`` (fechas locales inclusive).
+
+    Una consulta al resumen con agregados condicionales por período y, si algún
+    período incluye hoy, una agregación en vivo de las ventas del día.
+    """
+    tz = tenant_timezone(tenant)
+    today = timezone.localdate(timezone=tz)
+    yesterday = today - timedelta(days=1)
+
+    aggregates = {}
+    for index, (start, end) in enumerate(periods.values()):
+        closed = Q(local_date__lte=min(end, yesterday))
+        if start:
+            closed &= Q(local_date__gte=start)
+        for name in ROLLUP_FIELDS:
+            aggregates[f'p{index}_{name}'] = Sum(name, filter=closed)
+    result = _rollups(tenant, branch_id).aggregate(**aggregates) if aggregates else {}
+
+    totals = {}
+    for index, period in enumerate(periods):
+        empty = _empty()
+        totals[period] = {name: result.get(f'p{index}_{name}') or empty[name] for name in ROLLUP_FIELDS}
+
+    live_periods = [name for name, (start, end) in periods.items() if (start is None or start <= today) and end >= today]
+    if live_periods:
+        live = aggregate_sales(_today_sales(tenant, tz, today, branch_id), tz).get((today,))
+        if live:
+            for period in live_periods:
+                for name in ROLLUP_FIELDS:
+                    totals[period][name] += live[name]
+    return totals
@@ -0,0 +1,242 @@
+"""Agregados de ventas para ``daily_summary`` y ``dashboard_stats`` del POS.
+
+Los filtros por día usaban ``date_time__date``, que envuelve la columna en un
+cast a fecha (en la zona del servidor) e impide usar el índice
+``(tenant, -date_time)``. Aquí los días se convierten en rangos semiabiertos
+``[inicio, fin)`` de datetimes en la zona horaria del tenant, y los KPIs se
+calculan en una sola consulta con agregados condicionales (``filter=Q(...)``).
+
+Los resultados se cachean por tenant, sucursal y rango con un contador de
+version por tenant (ver ``apps.utils.versioned_cache``). Cada venta creada,
+sincronizada o reembolsada sube la version al confirmar su transacción
+(``invalidate_sales_stats``), así que un dashboard nunca sirve una venta
+comprometida como ausente más allá de ese instante. Sin cache compartido la
+subida no llega a los demás workers y la copia expira a los
+POS_STATS_FALLBACK_TTL segundos.
+"""
+import logging
+import zoneinfo
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, DecimalField, F, Q, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from apps.utils.versioned_cache import bump_cache_version, get_cache_version, is_shared_cache
+
+from .models import Sale, SaleDetail
+
+logger = logging.getLogger(__name__)
+
+POS_STATS_CACHE_TTL = getattr(settings, 'POS_STATS_CACHE_TTL', 300)
+POS_STATS_FALLBACK_TTL = getattr(settings, 'POS_STATS_FALLBACK_TTL', 30)
+
+PAYMENT_METHODS = [choice for choice, _ in Sale._meta.get_field('payment_method').choices]
+
+MONTH_NAMES = {1: 'Ene', 2: 'Feb', 3: 'Mar', 4: 'Abr', 5: 'May', 6: 'Jun',
+               7: 'Jul', 8: 'Ago', 9: 'Sep', 10: 'Oct', 11: 'Nov', 12: 'Dic'}
+
+
+def tenant_timezone(tenant):
+    """Zona horaria IANA del tenant; la del servidor si no hay tenant o no es válida."""
+    name = getattr(tenant, 'time_zone', None)
+    if name:
+        try:
+            return zoneinfo.ZoneInfo(name)
+        except (zoneinfo.ZoneInfoNotFoundError, ValueError):
+            logger.warning("Invalid tenant time_zone=%s tenant_id=%s", name, getattr(tenant, 'id', None))
+    return timezone.get_current_timezone()
+
+
+def local_range(tz, start_date, end_date=None):
+    """Rango ``[start_date 00:00, (end_date + 1) 00:00)`` en ``tz`` como datetimes aware."""
+    end_date = end_date or start_date
+    start = timezone.make_aware(datetime.combine(start_date, time.min), tz)
+    end = timezone.make_aware(datetime.combine(end_date + timedelta(days=1), time.min), tz)
+    return start, end
+
+
+def _in_range(bounds):
+    start, end = bounds
+    return Q(date_time__gte=start, date_time__lt=end)
+
+
+# --- Cache -------------------------------------------------------------------
+
+def _version_key(tenant_id):
+    return f'pos_sales_stats:version:{tenant_id}'
+
+
+def cached_stats(tenant_id, name, key_parts, compute):
+    """Devuelve ``compute()`` cacheado bajo la version actual del tenant.
+
+    Sin tenant (superusuario en vista global) o con el cache caído se calcula
+    siempre contra la base de datos.
+    """
+    if not tenant_id:
+        return compute()
+    version = get_cache_version(_version_key(tenant_id))
+    if version is None:
+        return compute()
+
+    key = ':'.join(['pos_sales_stats', name, str(tenant_id), str(version), *map(str, key_parts)])
+    try:
+        data = cache.get(key)
+    except Exception:
+        data = None
+    if data is None:
+        data = compute()
+        ttl = POS_STATS_CACHE_TTL if is_shared_cache() else POS_STATS_FALLBACK_TTL
+        try:
+            cache.set(key, data, ttl)
+        except Exception:
+            pass
+    return data
+
+
+def invalidate_sales_stats(tenant_id):
+    """Invalida los agregados del tenant cuando la transacción actual confirme."""
+    if tenant_id:
+        transaction.on_commit(lambda: bump_cache_version(_version_key(tenant_id)))
+
+
+# --- Agregados ---------------------------------------------------------------
+
+def _money(value):
+    return value if value is not None else Decimal('0')
+
+
+def daily_summary_totals(sales):
+    """KPIs de ``sales`` en dos consultas: ventas (una pasada) y líneas por tipo."""
+    method_aggregates = {}
+    for method in PAYMENT_METHODS:
+        method_aggregates[f'{method}_count'] = Count('id', filter=Q(payment_method=method))
+        method_aggregates[f'{method}_paid'] = Sum('paid', filter=Q(payment_method=method))
+    totals = sales.aggregate(
+        sales_count=Count('id'), total_sum=Sum('total'), paid_sum=Sum('paid'), **method_aggregates,
+    )
+
+    line_total = F('quantity') * F('price')
+    by_type = SaleDetail.objects.filter(sale__in=sales).aggregate(
+        products=Sum(line_total, filter=Q(content_type__model='product'), output_field=DecimalField()),
+        services=Sum(line_total, filter=~Q(content_type__model='product'), output_field=DecimalField()),
+    )
+
+    return {
+        'sales_count': totals['sales_count'],
+        'total': _money(totals['total_sum']),
+        'paid': _money(totals['paid_sum']),
+        'by_method': [
+            {'payment_method': method, 'total': _money(totals[f'{method}_paid'])}
+            for method in PAYMENT_METHODS if totals[f'{method}_count']
+        ],
+        'by_type': {
+            'services': float(by_type['services'] or 0),
+            'products': float(by_type['products'] or 0),
+        },
+    }
+
+
+def _sales_by_day_and_method(base_filter, tz, start_date, end_date, tenant=None, branch_id=None):
+    """Filas ``{local_date, payment_method, revenue, sales_count}`` del rango.
+
+    Con tenant salen del resumen diario (hoy en vivo); sin tenant (vista global
+    de superusuario) de una consulta agrupada sobre ``Sale``.
+    """
+    if tenant is not None:
+        from .sales_rollup import sales_by_day
+
+        return sales_by_day(tenant, start_date, end_date, branch_id, by=('payment_method',))
+    return list(
+        Sale.objects.filter(base_filter, _in_range(local_range(tz, start_date, end_date)))
+        .annotate(local_date=TruncDate('date_time', tzinfo=tz))
+        .values('local_date', 'payment_method')
+        .annotate(revenue=Sum('total'), sales_count=Count('id'))
+        .order_by('local_date')
+    )
+
+
+def dashboard_totals(base_filter, tz, start_date, end_date, today, tenant=None, branch_id=None):
+    """Datos compartidos del dashboard para el tenant/sucursal de ``base_filter``.
+
+    KPIs del rango, desglose por método e ingresos diarios y mensuales salen de
+    una sola lectura por día y método que cubre el rango y los últimos 6 meses.
+    Las ventas de hoy por usuario se devuelven en ``user_today`` para que la
+    parte personal del dashboard no invalide el cache por usuario.
+    """
+    current_date = today.replace(day=1)
+    six_months_ago = current_date - timedelta(days=180)
+    rows = _sales_by_day_and_method(
+        base_filter, tz, min(start_date, six_months_ago), max(end_date, today), tenant, branch_id,
+    )
+
+    revenue_range = Decimal('0')
+    transactions_range = 0
+    by_method = {}
+    daily = {}
+    monthly_dict = {}
+    for row in rows:
+        day = row['local_date']
+        revenue = _money(row['revenue'])
+        if day >= six_months_ago:
+            month = day.strftime('%Y-%m')
+            monthly_dict[month] = monthly_dict.get(month, 0.0) + float(revenue)
+        if not start_date <= day <= end_date or not row['sales_count']:
+            continue
+        revenue_range += revenue
+        transactions_range += row['sales_count']
+        method = by_method.setdefault(row['payment_method'], {'total': Decimal('0'), 'count': 0})
+        method['total'] += revenue
+        method['count'] += row['sales_count']
+        daily[day] = daily.get(day, Decimal('0')) + revenue
+
+    payment_breakdown = sorted(
+        ({'payment_method': method, **totals} for method, totals in by_method.items()),
+        key=lambda row: row['total'], reverse=True,
+    )
+    daily_data = [{'day': day.strftime('%d/%m'), 'revenue': float(daily[day])} for day in sorted(daily)]
+
+    sales = Sale.objects.filter(base_filter)
+    today_q = _in_range(local_range(tz, today))
+    user_today = {
+        row['user_id']: {'count': row['count'], 'revenue': float(row['revenue'] or 0)}
+        for row in sales.filter(today_q).values('user_id').annotate(count=Count('id'), revenue=Sum('total'))
+    }
+
+    in_range = sales.filter(_in_range(local_range(tz, start_date, end_date)))
+    top_products = SaleDetail.objects.filter(
+        Q(sale__in=in_range), content_type__model='product'
+    ).values('name').annotate(sold=Sum('quantity')).order_by('-sold')[:5]
+    top_services = SaleDetail.objects.filter(
+        Q(sale__in=in_range), content_type__model='service'
+    ).values('name').annotate(
+        sold=Sum('quantity'), revenue=Sum('price')
+    ).order_by('-revenue')[:5]
+
+    # Ingresos mensuales (últimos 6 meses)
+    monthly_revenue = []
+    for _ in range(6):
+        month_total = monthly_dict.get(current_date.strftime('%Y-%m'), 0)
+        monthly_revenue.insert(0, {'month': MONTH_NAMES[current_date.month], 'revenue': month_total})
+        if current_date.month == 1:
+            current_date = current_date.replace(year=current_date.year - 1, month=12)
+        else:
+            current_date = current_date.replace(month=current_date.month - 1)
+
+    return {
+        'revenue_range': float(revenue_range),
+        'revenue_today': sum(user['revenue'] for user in user_today.values()),
+        'transactions_range': transactions_range,
+        'average_ticket': float(revenue_range / transactions_range) if transactions_range else 0.0,
+        'sales_today_count': sum(user['count'] for user in user_today.values()),
+        'payment_breakdown': payment_breakdown,
+        'top_products': list(top_products),
+        'top_services': list(top_services),
+        'daily_revenue': daily_data,
+        'monthly_revenue': monthly_revenue,
+        'user_today': user_today,
+    }
@@ -1,10 +1,16 @@
 
+from datetime import timedelta
+
+from django.contrib.contenttypes.models import ContentType
+from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
 from rest_framework import serializers
 
 from apps.appointments_api.models import Appointment
+from apps.audit_api.signals import audit_bulk_save
 from .models import Sale, SaleDetail, Payment, CashRegister, CashCount, Promotion, Receipt, PosConfiguration, NCFSequence, Coupon
 from apps.inventory_api.models import Product, StockMovement
+from apps.services_api.models import Service
 
 
 
@@ -188,21 +194,23 @@ class SaleSerializer(serializers.ModelSerializer):
         appointment = validated_data.pop('appointment', None)
         sale = Sale.objects.create(**validated_data)
 
-        # Crear detalles
+        # Content types desde el cache del manager: sin consultas tras la primera
+        content_types = ContentType.objects.get_for_models(Product, Service)
+        details = []
         for detail in details_data:
-            # Convertir content_type string a ContentType object
-            from django.contrib.contenttypes.models import ContentType
-            if detail['content_type'] == 'service':
-                content_type = ContentType.objects.get(app_label='services_api', model='service')
-            else:  # product
-                content_type = ContentType.objects.get(app_label='inventory_api', model='product')
-            
-            detail['content_type'] = content_type
-            SaleDetail.objects.create(sale=sale, **detail)
-            # Stock ya se descuenta en perform_create() con transacciones atómicas
-
-        for payment in payments_data:
-            Payment.objects.create(sale=sale, **payment)
+            model = Service if detail['content_type'] == 'service' else Product
+            details.append(SaleDetail(sale=sale, **dict(detail, content_type=content_types[model])))
+        if sale.tenant_id:
+            # Los productos ya los validó y bloqueó la reserva de stock de perform_create()
+            SaleDetail.validate_lines(
+                sale.tenant_id, details, tenant_product_ids=self.context.get('tenant_product_ids'),
+            )
+        # Stock ya se descuenta en perform_create() con transacciones atómicas
+        SaleDetail.objects.bulk_create(details)
+        payments = Payment.objects.bulk_create([Payment(sale=sale, **payment) for payment in payments_data])
+        # bulk_create no emite post_save: auditar las líneas y pagos en lote
+        audit_bulk_save(details, created=True)
+        audit_bulk_save(payments, created=True)
 
         # Si existe appointment, cambiar estado a 'completed'
         if appointment and isinstance(appointment, Appointment):
@@ -222,8 +230,11 @@ class CashRegisterSerializer(serializers.ModelSerializer):
     
     class Meta:
         model = CashRegister
-        fields = ['id', 'user', 'user_name', 'branch', 'opened_at', 'closed_at', 'initial_cash', 'final_cash', 'is_open', 'sales_amount']
-        read_only_fields = ['user', 'user_name', 'opened_at', 'closed_at', 'sales_amount']
+        fields = [
+            'id', 'user', 'user_name', 'branch', 'opened_at', 'closed_at', 'initial_cash', 'final_cash', 'is_open',
+            'sales_amount', *CashRegister.RUNNING_TOTAL_FIELDS,
+        ]
+        read_only_fields = ['user', 'user_name', 'opened_at', 'closed_at', 'sales_amount', *CashRegister.RUNNING_TOTAL_FIELDS]
 
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
@@ -340,3 +351,40 @@ class CouponValidationSerializer(serializers.Serializer):
 
     def validate_code(self, value):
         return value.strip().upper()
+
+
+PAYMENT_METHODS = [choice[0] for choice in Payment._meta.get_field('method').choices]
+
+
+class OfflineSaleDetailSerializer(serializers.Serializer):
+    content_type = serializers.ChoiceField(choices=['product', 'service'])
+    object_id = serializers.IntegerField(min_value=1)
+    quantity = serializers.IntegerField(min_value=1)
+    price = serializers.DecimalField(max_digits=14, decimal_places=2, min_value=0)
+    name = serializers.CharField(max_length=255, required=False, allow_blank=True, default='')
+
+
+class OfflinePaymentSerializer(serializers.Serializer):
+    method = serializers.ChoiceField(choices=PAYMENT_METHODS, default='cash')
+    amount = serializers.DecimalField(max_digits=14, decimal_places=2, min_value=0)
+    provider_transaction_id = serializers.CharField(max_length=255, required=False, allow_null=True, allow_blank=True)
+
+
+class OfflineSaleSerializer(serializers.Serializer):
+    """Venta registrada sin conexión en la terminal (ver apps.pos_api.offline_sync)."""
+    client_uuid = serializers.UUIDField()
+    date_time = serializers.DateTimeField()
+    details = OfflineSaleDetailSerializer(many=True, allow_empty=False)
+    payments = OfflinePaymentSerializer(many=True, allow_empty=False)
+    discount = serializers.DecimalField(max_digits=14, decimal_places=2, min_value=0, default=0)
+    discount_reason = serializers.CharField(required=False, allow_blank=True, default='')
+    payment_method = serializers.ChoiceField(choices=PAYMENT_METHODS, required=False)
+    employee_id = serializers.IntegerField(required=False, allow_null=True)
+    client = serializers.IntegerField(required=False, allow_null=True)
+    coupon_code = serializers.CharField(max_length=50, required=False, allow_blank=True, default='')
+
+    def validate_date_time(self, value):
+        # Tolerancia para relojes de terminal adelantados
+        if value > timezone.now() + timedelta(minutes=5):
+            raise serializers.ValidationError("La fecha de la venta no puede estar en el futuro")
+        return value
@@ -0,0 +1,31 @@
+from celery import shared_task
+
+
+@shared_task
+def expire_ncf_blocks():
+    """
+    Libera los bloques NCF vencidos, de cajas cerradas o de secuencias
+    vencidas; los números sin usar se devuelven o se registran como hueco.
+    """
+    from .ncf_allocator import expire_ncf_blocks as release_stale_blocks
+
+    released = release_stale_blocks()
+    return f"Liberados {released} bloques NCF"
+
+
+@shared_task
+def purge_idempotency_records():
+    """Borra las claves de idempotencia vencidas del respaldo en base de datos."""
+    from .idempotency import purge_expired_records
+
+    deleted = purge_expired_records()
+    return f"Eliminadas {deleted} claves de idempotencia"
+
+
+@shared_task
+def render_receipts(sale_ids, user_id=None):
+    """Pre-renderiza los recibos de ventas recién confirmadas."""
+    from .receipts import render_receipts_for_sales
+
+    rendered = render_receipts_for_sales(sale_ids, user_id)
+    return f"Renderizados {rendered} recibos"
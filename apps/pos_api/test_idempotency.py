@@ -0,0 +1,138 @@
+"""Cabecera Idempotency-Key en ventas, cobros y reembolsos (apps.pos_api.idempotency)."""
+from unittest import mock
+
+from django.core.cache import cache
+from rest_framework import status
+
+from apps.inventory_api.models import Product
+from apps.pos_api import idempotency
+from apps.pos_api.models import IdempotencyRecord, Sale
+from apps.pos_api.testing import TenantAPITestCase, create_test_user
+
+
+def _sale_data(total=100):
+    return {
+        'total': total, 'discount': 0,
+        'details': [{'content_type': 'service', 'object_id': 1, 'quantity': 1, 'price': total, 'name': 'Corte'}],
+        'payments': [{'amount': total, 'method': 'cash'}],
+    }
+
+
+class IdempotencyKeyTests(TenantAPITestCase):
+
+    def setUp(self):
+        cache.clear()
+        super().setUp()
+        self.open_register()
+
+    def _post_sale(self, key, data=None):
+        return self.client.post(
+            '/api/pos/sales/', data or _sale_data(), format='json', HTTP_IDEMPOTENCY_KEY=key,
+        )
+
+    def test_retry_replays_response_without_second_sale(self):
+        first = self._post_sale('retry-1')
+        second = self._post_sale('retry-1')
+
+        self.assertEqual(first.status_code, status.HTTP_201_CREATED, first.data)
+        self.assertEqual(second.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(second.data['id'], first.data['id'])
+        self.assertEqual(second['Idempotent-Replayed'], 'true')
+        self.assertEqual(Sale.objects.filter(tenant=self.tenant).count(), 1)
+
+    def test_without_header_each_request_executes(self):
+        self.client.post('/api/pos/sales/', _sale_data(), format='json')
+        self.client.post('/api/pos/sales/', _sale_data(), format='json')
+
+        self.assertEqual(Sale.objects.filter(tenant=self.tenant).count(), 2)
+
+    def test_same_key_with_different_body_is_rejected(self):
+        self._post_sale('reused')
+        response = self._post_sale('reused', _sale_data(total=250))
+
+        self.assertEqual(response.status_code, status.HTTP_422_UNPROCESSABLE_ENTITY)
+        self.assertEqual(Sale.objects.filter(tenant=self.tenant).count(), 1)
+
+    def test_keys_are_scoped_per_user(self):
+        other = create_test_user("cashier2-idem@test.com", tenant=self.tenant)
+        self.open_register(user=other)
+        other_client = self.client_for(other)
+
+        self._post_sale('shared-key')
+        response = other_client.post('/api/pos/sales/', _sale_data(), format='json', HTTP_IDEMPOTENCY_KEY='shared-key')
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED, response.data)
+        self.assertEqual(Sale.objects.filter(tenant=self.tenant).count(), 2)
+
+    def test_server_error_releases_key(self):
+        with mock.patch('apps.pos_api.views.SaleViewSet.perform_create', side_effect=RuntimeError("caída")):
+            with self.assertRaises(RuntimeError):
+                self._post_sale('after-error')
+
+        self.assertFalse(IdempotencyRecord.objects.exists())
+        response = self._post_sale('after-error')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED, response.data)
+
+    def test_refund_is_replayed(self):
+        product = Product.objects.create(name="Cera", sku="CERA", price=100, stock=5, tenant=self.tenant)
+        data = _sale_data()
+        data['details'] = [{'content_type': 'product', 'object_id': product.id, 'quantity': 1, 'price': 100, 'name': 'Cera'}]
+        sale_id = self._post_sale('sale-for-refund', data).data['id']
+        url = f'/api/pos/sales/{sale_id}/refund/'
+        data = {'reason': 'Cliente insatisfecho con el servicio'}
+
+        first = self.client.post(url, data, format='json', HTTP_IDEMPOTENCY_KEY='refund-1')
+        second = self.client.post(url, data, format='json', HTTP_IDEMPOTENCY_KEY='refund-1')
+
+        self.assertEqual(first.status_code, status.HTTP_200_OK, first.data)
+        self.assertEqual(second.status_code, status.HTTP_200_OK)
+        self.assertEqual(second['Idempotent-Replayed'], 'true')
+        self.assertEqual(second.data, first.data)
+        product.refresh_from_db()
+        self.assertEqual(product.stock, 5)
+
+    def test_duplicate_waits_for_in_flight_request(self):
+        store = idempotency.DatabaseStore()
+        claim_key = 'idem:test:wait'
+        request_hash = 'a' * 64
+        store.claim(claim_key, request_hash)
+
+        # La primera petición termina mientras el duplicado espera
+        def finish_first(_):
+            store.complete(claim_key, request_hash, 201, {'id': 7})
+
+        with mock.patch('apps.pos_api.idempotency.time.sleep', side_effect=finish_first) as sleep:
+            _, response = idempotency._claim(store, claim_key, request_hash)
+
+        sleep.assert_called_once()
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data, {'id': 7})
+
+    def test_in_flight_duplicate_times_out_with_conflict(self):
+        store = idempotency.DatabaseStore()
+        store.claim('idem:test:busy', 'b' * 64)
+
+        with mock.patch.object(idempotency, 'IDEMPOTENCY_WAIT', 0):
+            _, response = idempotency._claim(store, 'idem:test:busy', 'b' * 64)
+
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+        self.assertEqual(response['Retry-After'], '1')
+
+    def test_shared_cache_store_claims_atomically(self):
+        with mock.patch.object(idempotency, 'is_shared_cache', return_value=True):
+            first = self._post_sale('cache-1')
+            second = self._post_sale('cache-1')
+
+        self.assertEqual(second.data['id'], first.data['id'])
+        self.assertEqual(Sale.objects.filter(tenant=self.tenant).count(), 1)
+        # Con Redis no se escribe en la tabla de respaldo
+        self.assertFalse(IdempotencyRecord.objects.exists())
+
+    def test_cache_failure_falls_back_to_database(self):
+        with mock.patch.object(idempotency, 'is_shared_cache', return_value=True), \
+                mock.patch.object(idempotency.cache, 'add', side_effect=ConnectionError("redis caído")):
+            first = self._post_sale('fallback-1')
+            second = self._post_sale('fallback-1')
+
+        self.assertEqual(second.data['id'], first.data['id'])
+        self.assertEqual(IdempotencyRecord.objects.get().state, 'completed')
@@ -195,9 +195,11 @@ def test_sale_ncf_generation_consumidor_final(authenticated_user, client):
     assert response.status_code == status.HTTP_201_CREATED, f"Error: {response.data}"
     assert response.data["ncf"] == "B0200000001"
     
-    # Verify sequence incremented
+    # Verify the register reserved a block and drew its first number
     seq = NCFSequence.objects.get(tenant=user.tenant, type="02")
-    assert seq.current_sequence == 2
+    assert seq.current_sequence == 11
+    block = seq.blocks.get()
+    assert (block.start_number, block.end_number, block.next_number) == (1, 10, 2)
     
     # Create second sale and check next NCF
     response = api_client.post(reverse("sale-list"), data, format="json")
@@ -0,0 +1,194 @@
+"""Asignación de NCF por bloques (apps.pos_api.ncf_allocator)."""
+import threading
+from datetime import timedelta
+
+from django.db import connection, transaction
+from django.test import TransactionTestCase
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from apps.pos_api.models import CashRegister, NCFBlock, NCFGap, NCFSequence, Sale
+from apps.pos_api.ncf_allocator import (
+    NCFUnavailable, allocate_block, draw_ncf, ensure_block, expire_ncf_blocks, release_block,
+)
+from apps.pos_api.testing import (
+    TenantAPITestCase, authenticate_client, create_test_user, grant_permissions, setup_plan,
+)
+from apps.tenants_api.models import Tenant
+
+
+def _create_sequence(tenant, end=1000):
+    return NCFSequence.objects.create(
+        tenant=tenant, type='02', prefix='B', start_sequence=1, end_sequence=end,
+        current_sequence=1, expiration_date=timezone.localdate() + timedelta(days=30),
+    )
+
+
+def _sale_data():
+    return {
+        'total': 100, 'discount': 0, 'ncf_type': '02',
+        'details': [{'content_type': 'service', 'object_id': 1, 'quantity': 1, 'price': 100, 'name': 'Corte'}],
+        'payments': [{'amount': 100, 'method': 'cash'}],
+    }
+
+
+class NCFBlockAllocatorTests(TenantAPITestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.sequence = _create_sequence(self.tenant)
+        self.registers = []
+        for i in range(3):
+            user = create_test_user(f"cashier{i}-ncf@test.com", tenant=self.tenant)
+            self.registers.append(CashRegister.objects.create(tenant=self.tenant, user=user, initial_cash=0))
+
+    def test_registers_draw_from_their_own_blocks(self):
+        issued = []
+        for _ in range(4):
+            for register in self.registers:
+                ensure_block(self.tenant, '02', register)
+                with transaction.atomic():
+                    issued.append(draw_ncf(self.tenant, '02', register))
+
+        self.assertEqual(len(issued), len(set(issued)))
+        self.assertEqual(NCFBlock.objects.count(), 3)
+        self.sequence.refresh_from_db()
+        self.assertEqual(self.sequence.current_sequence, 151)
+        # Cada caja emite números consecutivos de su bloque
+        first_register = [issued[i] for i in range(0, 12, 3)]
+        self.assertEqual(first_register, ['B0200000001', 'B0200000002', 'B0200000003', 'B0200000004'])
+
+    def test_rolled_back_sale_returns_number_to_block(self):
+        register = self.registers[0]
+        ensure_block(self.tenant, '02', register)
+        try:
+            with transaction.atomic():
+                draw_ncf(self.tenant, '02', register)
+                raise RuntimeError("venta fallida")
+        except RuntimeError:
+            pass
+
+        with transaction.atomic():
+            self.assertEqual(draw_ncf(self.tenant, '02', register), 'B0200000001')
+
+    def test_exhausted_block_rolls_over_to_new_block(self):
+        register = self.registers[0]
+        allocate_block(self.tenant, '02', register, size=2)
+        issued = [draw_ncf(self.tenant, '02', register) for _ in range(3)]
+
+        self.assertEqual(issued, ['B0200000001', 'B0200000002', 'B0200000003'])
+        statuses = list(NCFBlock.objects.order_by('start_number').values_list('status', flat=True))
+        self.assertEqual(statuses, ['exhausted', 'active'])
+
+    def test_release_of_last_block_returns_numbers_without_gap(self):
+        block = allocate_block(self.tenant, '02', self.registers[0], size=10)
+        draw_ncf(self.tenant, '02', self.registers[0])
+
+        self.assertIsNone(release_block(block, 'register_closed'))
+        self.sequence.refresh_from_db()
+        self.assertEqual(self.sequence.current_sequence, 2)
+        self.assertFalse(NCFGap.objects.exists())
+
+    def test_release_of_inner_block_records_gap(self):
+        block = allocate_block(self.tenant, '02', self.registers[0], size=10)
+        allocate_block(self.tenant, '02', self.registers[1], size=10)
+        draw_ncf(self.tenant, '02', self.registers[0])
+
+        gap = release_block(block, 'register_closed')
+
+        self.assertEqual((gap.start_number, gap.end_number), (2, 10))
+        self.assertEqual(gap.ncf_range, ('B0200000002', 'B0200000010'))
+        self.sequence.refresh_from_db()
+        self.assertEqual(self.sequence.current_sequence, 21)
+
+    def test_expire_releases_stale_and_closed_register_blocks(self):
+        stale = allocate_block(self.tenant, '02', self.registers[0], size=10)
+        closed = allocate_block(self.tenant, '02', self.registers[1], size=10)
+        live = allocate_block(self.tenant, '02', self.registers[2], size=10)
+        NCFBlock.objects.filter(pk=stale.pk).update(expires_at=timezone.now() - timedelta(minutes=1))
+        CashRegister.objects.filter(pk=self.registers[1].pk).update(is_open=False)
+
+        self.assertEqual(expire_ncf_blocks(), 2)
+
+        reasons = dict(NCFGap.objects.values_list('block_id', 'reason'))
+        self.assertEqual(reasons, {stale.pk: 'expired', closed.pk: 'register_closed'})
+        live.refresh_from_db()
+        self.assertEqual(live.status, 'active')
+        # Un bloque vencido no se vuelve a usar: la caja recibe uno nuevo
+        new_block = ensure_block(self.tenant, '02', self.registers[0])
+        self.assertNotEqual(new_block.pk, stale.pk)
+
+    def test_block_never_outlives_sequence(self):
+        self.sequence.expiration_date = timezone.localdate()
+        self.sequence.save()
+
+        block = allocate_block(self.tenant, '02', self.registers[0])
+
+        self.assertLessEqual(timezone.localtime(block.expires_at).date(), timezone.localdate())
+
+    def test_no_usable_sequence(self):
+        NCFSequence.objects.update(is_active=False)
+        with self.assertRaisesMessage(NCFUnavailable, 'No hay secuencia NCF activa'):
+            ensure_block(self.tenant, '02', self.registers[0])
+
+    def test_closing_register_releases_its_block(self):
+        register = self.registers[0]
+        client = self.client_for(register.user)
+
+        response = client.post('/api/pos/sales/', _sale_data(), format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED, response.data)
+        self.assertEqual(response.data['ncf'], 'B0200000001')
+
+        response = client.post(f'/api/pos/cashregisters/{register.id}/close/', {'final_cash': 100}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK, response.data)
+        self.assertFalse(NCFBlock.objects.filter(status='active').exists())
+        self.sequence.refresh_from_db()
+        self.assertEqual(self.sequence.current_sequence, 2)
+
+
+class NCFBlockConcurrencyTests(TransactionTestCase):
+    """Ventas fiscales en paralelo desde varias cajas"""
+
+    def setUp(self):
+        self.owner = create_test_user("owner-ncf-conc@test.com", is_superuser=True)
+        self.tenant = Tenant.objects.create(name="NCF Conc", subdomain="ncf-conc", owner=self.owner)
+        setup_plan(self.tenant)
+        self.sequence = _create_sequence(self.tenant, end=5000)
+        self.cashiers = []
+        for i in range(4):
+            user = create_test_user(f"conc{i}-ncf@test.com", tenant=self.tenant)
+            grant_permissions(user, self.tenant, 'pos_api')
+            CashRegister.objects.create(tenant=self.tenant, user=user, initial_cash=0)
+            self.cashiers.append(user)
+
+    def test_parallel_sales_get_unique_ncfs(self):
+        if connection.vendor == 'sqlite':
+            self.skipTest("SQLite no soporta select_for_update concurrente real")
+
+        sales_per_cashier = 10
+        errors = []
+
+        def sell(user):
+            client = APIClient()
+            authenticate_client(client, user)
+            try:
+                for _ in range(sales_per_cashier):
+                    response = client.post('/api/pos/sales/', _sale_data(), format='json')
+                    if response.status_code != status.HTTP_201_CREATED:
+                        errors.append(response.data)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=sell, args=(user,)) for user in self.cashiers for _ in range(2)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(errors, [])
+        ncfs = list(Sale.objects.filter(tenant=self.tenant).values_list('ncf', flat=True))
+        self.assertEqual(len(ncfs), len(threads) * sales_per_cashier)
+        self.assertEqual(len(ncfs), len(set(ncfs)))
+        # La secuencia solo se tocó una vez por bloque, no por venta
+        self.assertLessEqual(NCFBlock.objects.count(), len(self.cashiers) * 2)
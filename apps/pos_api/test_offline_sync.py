@@ -0,0 +1,203 @@
+"""Sincronización por lotes de ventas offline (apps.pos_api.offline_sync)."""
+import uuid
+from datetime import timedelta
+from decimal import Decimal
+
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework import status
+
+from apps.audit_api.models import AuditLog
+from apps.clients_api.models import Client, LoyaltyTransaction
+from apps.employees_api.adjustment_models import CommissionAdjustment
+from apps.employees_api.earnings_models import PayrollPeriod
+from apps.employees_api.models import Employee
+from apps.inventory_api.models import Product, StockMovement
+from apps.pos_api.models import Coupon, Payment, Sale, SaleDetail
+from apps.pos_api.offline_sync import OfflineSaleSync
+from apps.pos_api.testing import TenantAPITestCase, create_test_user
+from apps.services_api.models import Service
+
+SYNC_URL = '/api/pos/sales/sync/'
+
+
+class OfflineSyncTests(TenantAPITestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.register = self.open_register()
+        self.products = [
+            Product.objects.create(name=f"Producto {i}", sku=f"SYNC-{i}", price=10, stock=10, tenant=self.tenant)
+            for i in range(3)
+        ]
+        self.service = Service.objects.create(name="Corte", price=100, tenant=self.tenant)
+
+    def _sale(self, products=(), service=False, minutes_ago=30, **extra):
+        details = [
+            {'content_type': 'product', 'object_id': product.id, 'quantity': quantity, 'price': 10, 'name': product.name}
+            for product, quantity in products
+        ]
+        if service:
+            details.append({'content_type': 'service', 'object_id': self.service.id, 'quantity': 1, 'price': 100})
+        total = sum(Decimal(str(d['quantity'] * d['price'])) for d in details)
+        sale = {
+            'client_uuid': str(uuid.uuid4()),
+            'date_time': (timezone.now() - timedelta(minutes=minutes_ago)).isoformat(),
+            'details': details,
+            'payments': [{'method': 'cash', 'amount': str(total)}],
+        }
+        sale.update(extra)
+        return sale
+
+    def _sync(self, sales):
+        return self.client.post(SYNC_URL, {'sales': sales}, format='json')
+
+    def test_batch_creates_sales_with_details_payments_and_movements(self):
+        sales = [
+            self._sale([(self.products[0], 2), (self.products[1], 1)]),
+            self._sale([(self.products[0], 3)], service=True),
+        ]
+        response = self._sync(sales)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK, response.data)
+        self.assertEqual(response.data['created'], 2)
+        self.assertEqual([r['client_uuid'] for r in response.data['results']], [s['client_uuid'] for s in sales])
+
+        created = Sale.objects.filter(tenant=self.tenant).order_by('date_time')
+        self.assertEqual(created.count(), 2)
+        self.assertEqual([s.total for s in created], [Decimal('30.00'), Decimal('130.00')])
+        self.assertTrue(all(s.cash_register_id == self.register.id and s.user_id == self.user.id for s in created))
+        self.assertEqual(SaleDetail.objects.filter(sale__in=created).count(), 4)
+        self.assertEqual(Payment.objects.filter(sale__in=created).count(), 2)
+
+        self.products[0].refresh_from_db()
+        self.assertEqual(self.products[0].stock, 5)
+        movements = StockMovement.objects.filter(product=self.products[0]).order_by('id')
+        self.assertEqual([m.quantity for m in movements], [-2, -3])
+
+    def test_query_count_does_not_grow_with_batch_size(self):
+        def sync_queries(count):
+            sales = [self._sale([(p, 1) for p in self.products], service=True) for _ in range(count)]
+            sync = OfflineSaleSync(
+                self.tenant, self.user, self.register, resolve_period=None, resolve_adjustment_period=None,
+            )
+            with CaptureQueriesContext(connection) as ctx:
+                results = sync.sync(sales)
+            self.assertEqual([r['status'] for r in results], ['created'] * count)
+            return len(ctx.captured_queries)
+
+        Product.objects.filter(tenant=self.tenant).update(stock=100)
+        self.assertEqual(sync_queries(2), sync_queries(20))
+
+    def test_retried_batch_reports_duplicates(self):
+        sales = [self._sale([(self.products[0], 1)]), self._sale(service=True)]
+        first = self._sync(sales)
+        second = self._sync(sales)
+
+        self.assertEqual(second.data['duplicate'], 2)
+        self.assertEqual(
+            [r['sale_id'] for r in second.data['results']],
+            [r['sale_id'] for r in first.data['results']],
+        )
+        self.assertEqual(Sale.objects.filter(tenant=self.tenant).count(), 2)
+        self.products[0].refresh_from_db()
+        self.assertEqual(self.products[0].stock, 9)
+
+    def test_invalid_sales_do_not_block_the_rest(self):
+        sales = [
+            self._sale([(self.products[0], 6)], minutes_ago=40),
+            # Esta venta ya no tiene stock tras la anterior
+            self._sale([(self.products[0], 6)], minutes_ago=30),
+            self._sale([(self.products[1], 1)], discount='50.00'),
+            {'client_uuid': 'no-es-uuid'},
+            self._sale([(self.products[2], 1)], minutes_ago=10),
+        ]
+        response = self._sync(sales)
+
+        statuses = [r['status'] for r in response.data['results']]
+        self.assertEqual(statuses, ['created', 'error', 'error', 'error', 'created'])
+        self.assertIn('Stock insuficiente', response.data['results'][1]['errors'])
+        self.assertIn('descuento', response.data['results'][2]['errors'])
+        self.products[0].refresh_from_db()
+        self.assertEqual(self.products[0].stock, 4)
+
+    def test_coupon_uses_are_enforced_across_the_batch(self):
+        now = timezone.now()
+        coupon = Coupon.objects.create(
+            tenant=self.tenant, code='UNA', value=10, max_uses=1,
+            start_date=now - timedelta(days=1), end_date=now + timedelta(days=1),
+        )
+        sales = [self._sale(service=True, coupon_code='UNA') for _ in range(2)]
+        response = self._sync(sales)
+
+        self.assertEqual([r['status'] for r in response.data['results']], ['created', 'error'])
+        coupon.refresh_from_db()
+        self.assertEqual(coupon.current_uses, 1)
+        self.assertEqual(Sale.objects.get(pk=response.data['results'][0]['sale_id']).coupon_code, 'UNA')
+
+    def test_commission_and_loyalty_are_accumulated(self):
+        employee = Employee.objects.create(
+            user=create_test_user("stylist-sync@test.com", tenant=self.tenant),
+            tenant=self.tenant, payment_type='commission', commission_rate=Decimal('10.00'),
+        )
+        customer = Client.objects.create(full_name="Cliente Sync", tenant=self.tenant)
+        sales = [self._sale(service=True, employee_id=employee.id, client=customer.id) for _ in range(3)]
+
+        response = self._sync(sales)
+
+        self.assertEqual(response.data['created'], 3, response.data)
+        period = PayrollPeriod.objects.get(employee=employee)
+        self.assertEqual(period.sales_count, 3)
+        self.assertEqual(period.commission_earnings, Decimal('30.00'))
+        customer.refresh_from_db()
+        self.assertEqual(customer.loyalty_points, 3)
+        self.assertEqual(LoyaltyTransaction.objects.filter(client=customer).count(), 3)
+
+    def test_commission_of_sale_in_closed_period_goes_to_an_adjustment(self):
+        employee = Employee.objects.create(
+            user=create_test_user("stylist-closed@test.com", tenant=self.tenant),
+            tenant=self.tenant, payment_type='commission', commission_rate=Decimal('10.00'),
+        )
+        sale_day = timezone.localtime(timezone.now() - timedelta(days=40)).date()
+        closed = PayrollPeriod.objects.create(
+            employee=employee, period_type='biweekly', status='approved', is_finalized=True,
+            period_start=sale_day - timedelta(days=2), period_end=sale_day + timedelta(days=2),
+        )
+        sales = [self._sale(service=True, employee_id=employee.id, minutes_ago=40 * 24 * 60)]
+
+        response = self._sync(sales)
+
+        self.assertEqual(response.data['created'], 1, response.data)
+        closed.refresh_from_db()
+        self.assertEqual(closed.sales_count, 0)
+        adjustment = CommissionAdjustment.objects.get(sale_id=response.data['results'][0]['sale_id'])
+        self.assertEqual(adjustment.amount, Decimal('10.00'))
+        self.assertNotEqual(adjustment.payroll_period_id, closed.id)
+        adjustment.payroll_period.refresh_from_db()
+        self.assertEqual(adjustment.payroll_period.adjustments_total, Decimal('10.00'))
+
+    def test_bulk_inserts_are_audited(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self._sync([self._sale([(self.products[0], 1)], service=True)])
+
+        sale = Sale.objects.get(pk=response.data['results'][0]['sale_id'])
+        expected = {
+            'sale': [sale.id],
+            'saledetail': list(SaleDetail.objects.filter(sale=sale).values_list('id', flat=True)),
+            'payment': list(Payment.objects.filter(sale=sale).values_list('id', flat=True)),
+            'stockmovement': list(StockMovement.objects.filter(product=self.products[0]).values_list('id', flat=True)),
+        }
+        for model, ids in expected.items():
+            audited = AuditLog.objects.filter(content_type__model=model, action='CREATE', object_id__in=ids)
+            self.assertEqual(audited.count(), len(ids), model)
+
+    def test_requires_open_register_and_bounded_batch(self):
+        response = self.client.post(SYNC_URL, {'sales': []}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        self.register.is_open = False
+        self.register.save()
+        response = self._sync([self._sale(service=True)])
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('Debe abrir una caja', str(response.data))
@@ -0,0 +1,101 @@
+"""Recibos pre-renderizados (apps.pos_api.receipts)."""
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework import status
+
+from apps.inventory_api.models import Product
+from apps.pos_api.models import PosConfiguration, Receipt, Sale
+from apps.pos_api.receipts import RECEIPT_LINE_WIDTH
+from apps.pos_api.testing import TenantAPITestCase, create_test_user
+from apps.tenants_api.models import Tenant
+
+
+class PreRenderedReceiptTests(TenantAPITestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.open_register()
+        self.pos = PosConfiguration.objects.create(
+            tenant=self.tenant, user=self.user, business_name="Barberia Central",
+            currency_symbol='RD$', receipt_footer="Vuelva pronto",
+        )
+        self.product = Product.objects.create(name="Cera mate", sku="REC-1", price=250, stock=10, tenant=self.tenant)
+
+    def _sell(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post('/api/pos/sales/', {
+                'total': 500, 'discount': 0,
+                'details': [{'content_type': 'product', 'object_id': self.product.id, 'quantity': 2, 'price': 250, 'name': 'Cera mate'}],
+                'payments': [{'method': 'cash', 'amount': 500}],
+            }, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED, response.data)
+        return response.data['id']
+
+    def test_receipt_is_rendered_when_sale_commits(self):
+        sale_id = self._sell()
+
+        receipt = Receipt.objects.get(sale_id=sale_id)
+        self.assertEqual(receipt.receipt_number, f"R{sale_id:06d}")
+        self.assertEqual(receipt.payload['sale']['id'], sale_id)
+        self.assertEqual(receipt.payload['business_info']['name'], "Barberia Central")
+        self.assertIn("Cera mate", receipt.text_body)
+        self.assertIn("RD$500.00", receipt.text_body)
+        self.assertIn("Vuelva pronto", receipt.text_body)
+        self.assertTrue(all(len(line) <= RECEIPT_LINE_WIDTH for line in receipt.text_body.splitlines()))
+        self.assertEqual(receipt.printed_count, 0)
+
+    def test_reprint_reads_payload_without_serializing_sale(self):
+        sale_id = self._sell()
+        first = self.client.get(f'/api/pos/sales/{sale_id}/print_receipt/')
+
+        with CaptureQueriesContext(connection) as ctx:
+            second = self.client.get(f'/api/pos/sales/{sale_id}/print_receipt/')
+
+        self.assertEqual(second.status_code, status.HTTP_200_OK)
+        self.assertEqual(second.data['sale'], first.data['sale'])
+        self.assertEqual(second.data['receipt']['printed_count'], 2)
+        self.assertIn("TOTAL", second.data['text'])
+        touched = [q['sql'] for q in ctx.captured_queries
+                   if any(table in q['sql'] for table in ('pos_api_saledetail', 'pos_api_payment', 'pos_api_posconfiguration'))]
+        self.assertEqual(touched, [])
+        self.assertEqual(Receipt.objects.get(sale_id=sale_id).printed_count, 2)
+
+    def test_reprint_after_refund_shows_current_status(self):
+        sale_id = self._sell()
+        self.assertEqual(self.client.get(f'/api/pos/sales/{sale_id}/print_receipt/').data['sale']['status'], 'confirmed')
+
+        refund = self.client.post(
+            f'/api/pos/sales/{sale_id}/refund/', {'reason': 'Producto defectuoso'}, format='json',
+            HTTP_IDEMPOTENCY_KEY='refund-receipt-1',
+        )
+        self.assertEqual(refund.status_code, status.HTTP_200_OK, refund.data)
+
+        reprint = self.client.get(f'/api/pos/sales/{sale_id}/print_receipt/')
+        self.assertEqual(reprint.data['sale']['status'], 'refunded')
+        self.assertTrue(reprint.data['sale']['closed'])
+
+    def test_legacy_sale_renders_on_first_print_and_stays_immutable(self):
+        sale = Sale.objects.create(
+            tenant=self.tenant, user=self.user, date_time=timezone.now(), total=80, paid=80, payment_method='card',
+        )
+
+        first = self.client.get(f'/api/pos/sales/{sale.id}/print_receipt/')
+        self.assertEqual(first.status_code, status.HTTP_200_OK)
+        self.assertEqual(first.data['business_info']['name'], "Barberia Central")
+
+        self.pos.business_name = "Nombre Nuevo"
+        self.pos.save()
+        second = self.client.get(f'/api/pos/sales/{sale.id}/print_receipt/')
+        self.assertEqual(second.data['business_info']['name'], "Barberia Central")
+        self.assertEqual(second.data['receipt']['printed_count'], 2)
+
+    def test_print_receipt_of_other_tenant_is_not_found(self):
+        other_owner = create_test_user("owner-receipt2@test.com", is_superuser=True)
+        other_tenant = Tenant.objects.create(name="Otro", subdomain="otro-receipt", owner=other_owner)
+        sale = Sale.objects.create(tenant=other_tenant, user=other_owner, total=10, paid=10)
+
+        response = self.client.get(f'/api/pos/sales/{sale.id}/print_receipt/')
+
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        self.assertFalse(Receipt.objects.filter(sale=sale).exists())
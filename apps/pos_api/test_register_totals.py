@@ -0,0 +1,105 @@
+"""Acumuladores de CashRegister (apps.pos_api.register_totals)."""
+from decimal import Decimal
+from io import StringIO
+
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework import status
+
+from apps.inventory_api.models import Product
+from apps.pos_api.models import CashRegister
+from apps.pos_api.register_totals import compute_register_totals
+from apps.pos_api.testing import TenantAPITestCase
+
+
+class CashRegisterTotalsTests(TenantAPITestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.register = self.open_register(500)
+        self.product = Product.objects.create(name="Cera", sku="TOT-1", price=100, stock=20, tenant=self.tenant)
+
+    def _sell(self, payments):
+        total = sum(amount for _, amount in payments)
+        data = {
+            'total': total, 'discount': 0,
+            'details': [{'content_type': 'product', 'object_id': self.product.id, 'quantity': 1, 'price': total, 'name': 'Cera'}],
+            'payments': [{'method': method, 'amount': amount} for method, amount in payments],
+        }
+        response = self.client.post('/api/pos/sales/', data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED, response.data)
+        return response.data['id']
+
+    def test_sales_update_totals_per_method(self):
+        self._sell([('cash', 60), ('card', 40)])
+        self._sell([('transfer', 100)])
+        self._sell([('other', 10)])
+
+        self.register.refresh_from_db()
+        self.assertEqual(self.register.cash_sales_total, Decimal('60.00'))
+        self.assertEqual(self.register.card_sales_total, Decimal('40.00'))
+        self.assertEqual(self.register.transfer_sales_total, Decimal('100.00'))
+        self.assertEqual(self.register.other_sales_total, Decimal('10.00'))
+        self.assertEqual(self.register.sales_count, 3)
+        self.assertEqual(self.register.sales_amount, 60.0)
+
+        expected = compute_register_totals([self.register.pk])[self.register.pk]
+        self.assertEqual({name: getattr(self.register, name) for name in expected}, expected)
+
+    def test_refund_moves_sale_out_of_method_totals(self):
+        sale_id = self._sell([('cash', 100)])
+        self._sell([('cash', 50)])
+
+        response = self.client.post(
+            f'/api/pos/sales/{sale_id}/refund/', {'reason': 'Producto defectuoso devuelto'}, format='json',
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK, response.data)
+
+        self.register.refresh_from_db()
+        self.assertEqual(self.register.cash_sales_total, Decimal('50.00'))
+        self.assertEqual(self.register.refunds_total, Decimal('100.00'))
+        self.assertEqual(self.register.sales_count, 1)
+
+    def test_full_save_does_not_overwrite_totals(self):
+        stale = CashRegister.objects.get(pk=self.register.pk)
+        self._sell([('cash', 100)])
+
+        stale.final_cash = Decimal('600')
+        stale.save()
+
+        self.register.refresh_from_db()
+        self.assertEqual(self.register.final_cash, Decimal('600.00'))
+        self.assertEqual(self.register.cash_sales_total, Decimal('100.00'))
+
+    def test_register_reads_do_not_aggregate_payments(self):
+        self._sell([('cash', 100)])
+
+        with CaptureQueriesContext(connection) as ctx:
+            listing = self.client.get('/api/pos/cashregisters/')
+            counted = self.client.post(
+                f'/api/pos/cashregisters/{self.register.id}/cash_count/',
+                {'counts': [{'denomination': 100, 'count': 6}]}, format='json',
+            )
+
+        self.assertEqual(listing.status_code, status.HTTP_200_OK)
+        self.assertEqual(counted.data['expected_cash'], Decimal('600.00'))
+        self.assertEqual(counted.data['difference'], Decimal('0.00'))
+        self.assertFalse([q for q in ctx.captured_queries if 'pos_api_payment' in q['sql']])
+
+    def test_reconcile_command_reports_and_fixes_drift(self):
+        self._sell([('cash', 100)])
+        CashRegister.objects.filter(pk=self.register.pk).update(cash_sales_total=Decimal('999'), sales_count=7)
+
+        out = StringIO()
+        call_command('reconcile_cash_registers', stdout=out)
+        self.assertIn(f'Register #{self.register.pk}', out.getvalue())
+        self.register.refresh_from_db()
+        self.assertEqual(self.register.cash_sales_total, Decimal('999.00'))
+
+        out = StringIO()
+        call_command('reconcile_cash_registers', '--fix', stdout=out)
+        self.assertIn('fixed drift in 1', out.getvalue())
+        self.register.refresh_from_db()
+        self.assertEqual(self.register.cash_sales_total, Decimal('100.00'))
+        self.assertEqual(self.register.sales_count, 1)
@@ -0,0 +1,96 @@
+"""search_sales con rangos locales y paginación por cursor."""
+import zoneinfo
+from datetime import datetime, time, timedelta
+
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework import status
+
+from apps.clients_api.models import Client
+from apps.pos_api.models import Sale
+from apps.pos_api.testing import TenantAPITestCase
+
+TZ = zoneinfo.ZoneInfo('America/Santo_Domingo')
+URL = '/api/pos/sales/search_sales/'
+
+
+class SaleSearchTests(TenantAPITestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.today = timezone.localdate(timezone=TZ)
+        self.noon = timezone.make_aware(datetime.combine(self.today, time(12)), TZ)
+
+    def _sale(self, date_time, **kwargs):
+        return Sale.objects.create(tenant=self.tenant, user=self.user, date_time=date_time, total=10, paid=10, **kwargs)
+
+    def _walk(self, url):
+        ids = []
+        pages = 0
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK, response.data)
+            ids.extend(row['id'] for row in response.data['results'])
+            url = response.data['next']
+            pages += 1
+        return ids, pages
+
+    def test_cursor_walks_every_sale_once_in_order(self):
+        sales = [self._sale(self.noon - timedelta(minutes=i)) for i in range(5)]
+        # Dos ventas con el mismo date_time: el id desempata
+        sales += [self._sale(self.noon - timedelta(minutes=2)) for _ in range(2)]
+        expected = [sale.id for sale in sorted(sales, key=lambda s: (s.date_time, s.id), reverse=True)]
+
+        ids, pages = self._walk(f'{URL}?page_size=3')
+
+        self.assertEqual(ids, expected)
+        self.assertEqual(pages, 3)
+
+    def test_previous_link_returns_the_earlier_page(self):
+        for i in range(6):
+            self._sale(self.noon - timedelta(minutes=i))
+        first = self.client.get(f'{URL}?page_size=2')
+        second = self.client.get(first.data['next'])
+
+        back = self.client.get(second.data['previous'])
+
+        self.assertIsNone(first.data['previous'])
+        self.assertEqual([row['id'] for row in back.data['results']], [row['id'] for row in first.data['results']])
+        self.assertIsNone(back.data['previous'])
+        self.assertIsNotNone(back.data['next'])
+
+    def test_deep_pages_do_not_offset(self):
+        for i in range(9):
+            self._sale(self.noon - timedelta(minutes=i))
+
+        first = self.client.get(f'{URL}?page_size=3')
+        with CaptureQueriesContext(connection) as second_ctx:
+            second = self.client.get(first.data['next'])
+        with CaptureQueriesContext(connection) as third_ctx:
+            self.client.get(second.data['next'])
+
+        def sale_queries(ctx):
+            return [q['sql'] for q in ctx.captured_queries if 'FROM "pos_api_sale"' in q['sql']]
+
+        self.assertEqual(len(sale_queries(second_ctx)), len(sale_queries(third_ctx)))
+        for sql in sale_queries(third_ctx):
+            self.assertNotIn('OFFSET', sql.upper())
+
+    def test_filters_use_tenant_local_days_and_text(self):
+        client = Client.objects.create(full_name="María Pérez", phone="809-555-1234", tenant=self.tenant)
+        today_sale = self._sale(timezone.make_aware(datetime.combine(self.today, time(0, 30)), TZ), client=client)
+        self._sale(timezone.make_aware(datetime.combine(self.today - timedelta(days=1), time(23, 30)), TZ))
+
+        by_day = self.client.get(f'{URL}?date_from={self.today}&date_to={self.today}')
+        by_client = self.client.get(f'{URL}?client=555-12')
+        by_receipt = self.client.get(f'{URL}?receipt=R{today_sale.id:06d}')
+
+        self.assertEqual([row['id'] for row in by_day.data['results']], [today_sale.id])
+        self.assertEqual([row['id'] for row in by_client.data['results']], [today_sale.id])
+        self.assertEqual([row['id'] for row in by_receipt.data['results']], [today_sale.id])
+
+    def test_invalid_cursor_is_not_found(self):
+        response = self.client.get(f'{URL}?cursor=not-a-cursor')
+
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
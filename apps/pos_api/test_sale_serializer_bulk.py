@@ -0,0 +1,80 @@
+"""Coste constante de SaleSerializer.create con ventas de muchas líneas."""
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework import status
+
+from apps.audit_api.models import AuditLog
+from apps.inventory_api.models import Product
+from apps.pos_api.models import Payment, Sale, SaleDetail
+from apps.pos_api.testing import TenantAPITestCase, create_test_user
+from apps.services_api.models import Service
+from apps.tenants_api.models import Tenant
+
+
+class SaleSerializerBulkCreateTests(TenantAPITestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.open_register()
+        self.products = [
+            Product.objects.create(name=f"Producto {i}", sku=f"BULK-{i}", price=10, stock=50, tenant=self.tenant)
+            for i in range(10)
+        ]
+        self.service = Service.objects.create(name="Corte", price=100, tenant=self.tenant)
+
+    def _sale_data(self, lines):
+        details = [
+            {'content_type': 'product', 'object_id': product.id, 'quantity': 1, 'price': 10, 'name': product.name}
+            for product in self.products[:lines]
+        ]
+        details.append({'content_type': 'service', 'object_id': self.service.id, 'quantity': 1, 'price': 100, 'name': 'Corte'})
+        total = 10 * lines + 100
+        return {
+            'total': total, 'discount': 0, 'details': details,
+            'payments': [{'amount': total - 50, 'method': 'cash'}, {'amount': 50, 'method': 'card'}],
+        }
+
+    def _inserts(self, lines):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.post('/api/pos/sales/', self._sale_data(lines), format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED, response.data)
+        return [q['sql'] for q in ctx.captured_queries if q['sql'].startswith('INSERT')]
+
+    def test_insert_count_is_independent_of_line_count(self):
+        one_line = self._inserts(1)
+        ten_lines = self._inserts(10)
+
+        self.assertEqual(len(one_line), len(ten_lines))
+        for table in ('pos_api_saledetail', 'pos_api_payment'):
+            self.assertEqual(sum(f'"{table}"' in sql.split('(')[0] for sql in ten_lines), 1)
+
+        sale = Sale.objects.filter(tenant=self.tenant).latest('id')
+        self.assertEqual(SaleDetail.objects.filter(sale=sale).count(), 11)
+        self.assertEqual(Payment.objects.filter(sale=sale).count(), 2)
+
+    def test_details_and_payments_are_audited_as_created(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post('/api/pos/sales/', self._sale_data(3), format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED, response.data)
+
+        sale = Sale.objects.get(pk=response.data['id'])
+        for model, ids in (
+            ('saledetail', SaleDetail.objects.filter(sale=sale).values_list('id', flat=True)),
+            ('payment', Payment.objects.filter(sale=sale).values_list('id', flat=True)),
+        ):
+            audited = AuditLog.objects.filter(content_type__model=model, action='CREATE', object_id__in=list(ids))
+            self.assertEqual(audited.count(), len(ids))
+
+    def test_service_from_other_tenant_is_rejected(self):
+        other_owner = create_test_user("owner-bulk2@test.com", is_superuser=True)
+        other_tenant = Tenant.objects.create(name="Otro", subdomain="otro-bulk", owner=other_owner)
+        foreign = Service.objects.create(name="Ajeno", price=100, tenant=other_tenant)
+        data = self._sale_data(1)
+        data['details'][-1]['object_id'] = foreign.id
+
+        response = self.client.post('/api/pos/sales/', data, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(Sale.objects.filter(tenant=self.tenant).exists())
+        self.products[0].refresh_from_db()
+        self.assertEqual(self.products[0].stock, 50)
@@ -0,0 +1,127 @@
+"""Agregados de daily_summary y dashboard_stats (apps.pos_api.sales_stats)."""
+import zoneinfo
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+
+from django.core.cache import cache
+from django.db import connection
+from django.db.models import Q
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework import status
+
+from apps.inventory_api.models import Product
+from apps.pos_api.models import CashRegister, Sale
+from apps.pos_api.sales_stats import daily_summary_totals, dashboard_totals, local_range
+from apps.pos_api.testing import TenantAPITestCase, create_test_user
+
+TZ = zoneinfo.ZoneInfo('America/Santo_Domingo')
+
+
+class SalesStatsTests(TenantAPITestCase):
+
+    def setUp(self):
+        cache.clear()
+        super().setUp()
+        self.today = timezone.localdate(timezone=TZ)
+
+    def _local(self, day, hour, minute=0):
+        return timezone.make_aware(datetime.combine(day, time(hour, minute)), TZ)
+
+    def _sale(self, date_time, total, method='cash', user=None):
+        return Sale.objects.create(
+            tenant=self.tenant, user=user or self.user, date_time=date_time,
+            total=total, paid=total, payment_method=method,
+        )
+
+    def test_daily_summary_uses_tenant_local_day(self):
+        self._sale(self._local(self.today, 0, 30), 100, 'cash')
+        self._sale(self._local(self.today, 23, 30), 50, 'card')
+        # 23:30 de ayer en Santo Domingo ya es "hoy" en UTC: no debe contar
+        self._sale(self._local(self.today - timedelta(days=1), 23, 30), 999, 'cash')
+
+        response = self.client.get('/api/pos/summary/daily/')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['sales_count'], 2)
+        self.assertEqual(response.data['total'], Decimal('150.00'))
+        self.assertEqual(
+            sorted((row['payment_method'], row['total']) for row in response.data['by_method']),
+            [('card', Decimal('50.00')), ('cash', Decimal('100.00'))],
+        )
+
+    def _dashboard(self):
+        with CaptureQueriesContext(connection) as ctx:
+            data = dashboard_totals(Q(tenant=self.tenant), TZ, self.today - timedelta(days=2), self.today, self.today)
+        return data, ctx.captured_queries
+
+    def test_aggregates_are_single_pass_and_index_friendly(self):
+        for day in range(3):
+            self._sale(self._local(self.today - timedelta(days=day), 12), 10 * (day + 1), 'cash')
+            self._sale(self._local(self.today - timedelta(days=day), 13), 5, 'transfer')
+
+        start, end = local_range(TZ, self.today)
+        sales = Sale.objects.filter(tenant=self.tenant, date_time__gte=start, date_time__lt=end)
+        with CaptureQueriesContext(connection) as ctx:
+            summary = daily_summary_totals(sales)
+        data, dashboard_queries = self._dashboard()
+
+        self.assertEqual(len(ctx.captured_queries), 2)
+        self.assertEqual(summary['sales_count'], 2)
+        self.assertEqual(data['transactions_range'], 6)
+        self.assertEqual(data['revenue_range'], 75.0)
+        self.assertEqual(data['revenue_today'], 15.0)
+        self.assertEqual(data['sales_today_count'], 2)
+        self.assertEqual([row['payment_method'] for row in data['payment_breakdown']], ['cash', 'transfer'])
+        self.assertEqual(len(data['daily_revenue']), 3)
+        self.assertEqual(data['user_today'][self.user.id], {'count': 2, 'revenue': 15.0})
+
+        for query in ctx.captured_queries + dashboard_queries:
+            where = query['sql'].split(' WHERE ', 1)[-1].split(' GROUP BY ')[0]
+            self.assertNotIn('django_datetime_cast_date', where)
+
+        # Más ventas y más métodos de pago no agregan consultas
+        for minute in range(10):
+            self._sale(self._local(self.today, 14, minute), 1, 'card')
+        _, more_queries = self._dashboard()
+        self.assertEqual(len(more_queries), len(dashboard_queries))
+
+    def test_dashboard_is_cached_until_a_sale_commits(self):
+        CashRegister.objects.create(tenant=self.tenant, user=self.user, initial_cash=0)
+        product = Product.objects.create(name="Cera", sku="STATS-1", price=100, stock=10, tenant=self.tenant)
+        self._sale(timezone.now(), 40)
+
+        first = self.client.get('/api/pos/dashboard/stats/')
+        self.assertEqual(first.data['revenue_today'], 40.0)
+        self.assertEqual(first.data['user_sales_today_count'], 1)
+
+        with CaptureQueriesContext(connection) as ctx:
+            cached = self.client.get('/api/pos/dashboard/stats/')
+        self.assertEqual(cached.data, first.data)
+        self.assertFalse([q for q in ctx.captured_queries if 'pos_api_sale' in q['sql']])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post('/api/pos/sales/', {
+                'total': 100, 'discount': 0,
+                'details': [{'content_type': 'product', 'object_id': product.id, 'quantity': 1, 'price': 100, 'name': 'Cera'}],
+                'payments': [{'method': 'card', 'amount': 100}],
+            }, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED, response.data)
+
+        fresh = self.client.get('/api/pos/dashboard/stats/')
+        self.assertEqual(fresh.data['revenue_today'], 140.0)
+        self.assertEqual(fresh.data['user_sales_today_count'], 2)
+
+    def test_user_figures_come_from_shared_cache_entry(self):
+        other = create_test_user("other-stats@test.com", tenant=self.tenant)
+        self._sale(timezone.now(), 30)
+        self._sale(timezone.now(), 70, user=other)
+
+        mine = self.client.get('/api/pos/dashboard/stats/')
+        other_client = self.client_for(other)
+        theirs = other_client.get('/api/pos/dashboard/stats/')
+
+        self.assertEqual(mine.data['revenue_today'], 100.0)
+        self.assertEqual(mine.data['user_sales_today_revenue'], 30.0)
+        self.assertEqual(theirs.data['user_sales_today_revenue'], 70.0)
+        self.assertNotIn('user_today', theirs.data)
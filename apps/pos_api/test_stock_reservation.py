@@ -0,0 +1,116 @@
+"""Reserva de stock en bloque al crear ventas (SaleViewSet.perform_create)."""
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework import status
+
+from apps.audit_api.models import AuditLog
+from apps.inventory_api.models import Product, StockMovement
+from apps.inventory_api.stock_reservation import StockReservationError, reserve_stock
+from apps.pos_api.testing import TenantAPITestCase, create_test_user
+from apps.tenants_api.models import Tenant
+
+
+class StockReservationTests(TenantAPITestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.products = [
+            Product.objects.create(name=f"Producto {i}", sku=f"SKU-{i}", price=10, stock=20, min_stock=1, tenant=self.tenant)
+            for i in range(10)
+        ]
+        self.cash_register = self.open_register(1000)
+
+    def _sale_data(self, details):
+        total = sum(d['quantity'] * d['price'] for d in details)
+        return {
+            'total': total, 'discount': 0, 'status': 'confirmed',
+            'cash_register': self.cash_register.id,
+            'details': details,
+            'payments': [{'amount': total, 'method': 'cash'}],
+        }
+
+    def _line(self, product, quantity):
+        return {'content_type': 'product', 'object_id': product.id, 'quantity': quantity,
+                'price': 10, 'name': product.name}
+
+    def test_ten_line_sale_reserves_stock_and_records_movements(self):
+        details = [self._line(product, 2) for product in self.products]
+        response = self.client.post('/api/pos/sales/', self._sale_data(details), format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED, response.data)
+        stocks = Product.objects.filter(tenant=self.tenant).values_list('stock', flat=True)
+        self.assertEqual(set(stocks), {18})
+        movements = StockMovement.objects.filter(product__tenant=self.tenant)
+        self.assertEqual(movements.count(), 10)
+        self.assertTrue(all(m.quantity == -2 for m in movements))
+
+    def test_sale_audits_stock_updates_and_movements(self):
+        details = [self._line(product, 2) for product in self.products[:3]]
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post('/api/pos/sales/', self._sale_data(details), format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED, response.data)
+        updates = AuditLog.objects.filter(
+            content_type__model='product', action='UPDATE', object_id__in=[p.id for p in self.products[:3]],
+        )
+        self.assertEqual(updates.count(), 3)
+        self.assertEqual(updates.first().extra_data, {'changes': {'stock': '18'}})
+        movement_ids = StockMovement.objects.filter(product__tenant=self.tenant).values_list('id', flat=True)
+        self.assertEqual(
+            AuditLog.objects.filter(content_type__model='stockmovement', action='CREATE',
+                                    object_id__in=list(movement_ids)).count(),
+            3,
+        )
+
+    def test_reservation_uses_constant_number_of_queries(self):
+        lines = [(product.id, 1) for product in self.products]
+        with CaptureQueriesContext(connection) as ctx:
+            reservation = reserve_stock(self.tenant, lines)
+
+        # SELECT ... FOR UPDATE + UPDATE condicional, sin importar el número de líneas
+        self.assertEqual(len(ctx.captured_queries), 2)
+        self.assertEqual([p.id for p, _ in reservation.items], sorted(p.id for p in self.products))
+        self.assertTrue(all(p.stock == 19 for p, _ in reservation.items))
+
+    def test_repeated_lines_are_summed_against_stock(self):
+        product = self.products[0]
+        details = [self._line(product, 15), self._line(product, 10)]
+        response = self.client.post('/api/pos/sales/', self._sale_data(details), format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('Stock insuficiente', str(response.data))
+        product.refresh_from_db()
+        self.assertEqual(product.stock, 20)
+
+    def test_failed_line_leaves_all_stock_untouched(self):
+        self.products[5].is_active = False
+        self.products[5].save()
+        details = [self._line(product, 1) for product in self.products]
+        response = self.client.post('/api/pos/sales/', self._sale_data(details), format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('no está activo', str(response.data))
+        self.assertEqual(set(Product.objects.filter(tenant=self.tenant).values_list('stock', flat=True)), {20})
+        self.assertFalse(StockMovement.objects.filter(product__tenant=self.tenant).exists())
+
+    def test_product_from_other_tenant_is_not_found(self):
+        other_owner = create_test_user("owner-other-stock@test.com", is_superuser=True)
+        other_tenant = Tenant.objects.create(name="Otro", subdomain="otro-stock", owner=other_owner)
+        foreign = Product.objects.create(name="Ajeno", sku="X", price=10, stock=5, tenant=other_tenant)
+
+        with self.assertRaisesMessage(StockReservationError, 'Producto no encontrado'):
+            reserve_stock(self.tenant, [(foreign.id, 1)])
+
+    def test_validate_stock_reports_shortages_in_one_query(self):
+        items = [{'type': 'product', 'id': p.id, 'quantity': 1} for p in self.products]
+        items.append({'type': 'product', 'id': self.products[0].id, 'quantity': 25})
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.post('/api/pos/sales/validate_stock/', {'items': items}, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(len(response.data['errors']), 1)
+        error = response.data['errors'][0]
+        self.assertEqual(error['product_id'], self.products[0].id)
+        self.assertEqual(error['requested'], 26)
+        product_queries = [q for q in ctx.captured_queries if 'inventory_api_product' in q['sql']]
+        self.assertEqual(len(product_queries), 1)
@@ -0,0 +1,55 @@
+"""Base comun para los tests de API del POS: tenant con plan, cajero con permisos y cliente autenticado."""
+from django.contrib.auth.models import Permission
+from django.test import TestCase
+from rest_framework.test import APIClient
+
+from apps.pos_api.models import CashRegister
+from apps.pos_api.tests_security_critical import authenticate_client, create_test_user
+from apps.roles_api.models import Role, UserRole
+from apps.subscriptions_api.models import SubscriptionPlan
+from apps.tenants_api.models import Tenant
+
+
+def setup_plan(tenant, **features):
+    """Asigna al tenant el plan 'basic' con caja registradora y las ``features`` extra."""
+    plan, _ = SubscriptionPlan.objects.update_or_create(
+        name='basic',
+        defaults={
+            'price': 0, 'max_users': 10, 'max_employees': 10,
+            'features': {'cash_register': True, **features},
+        },
+    )
+    tenant.subscription_plan = plan
+    tenant.save(update_fields=['subscription_plan'])
+    return plan
+
+
+def grant_permissions(user, tenant, *app_labels):
+    """Da a ``user`` en ``tenant`` un rol con todos los permisos de ``app_labels``."""
+    role, _ = Role.objects.get_or_create(name='TestRole', defaults={'description': 'Test role'})
+    role.permissions.add(*Permission.objects.filter(content_type__app_label__in=app_labels))
+    UserRole.objects.get_or_create(user=user, role=role, tenant=tenant)
+
+
+class TenantAPITestCase(TestCase):
+    """Tenant con plan, ``self.user`` con los permisos de ``permission_apps`` y ``self.client`` autenticado."""
+
+    plan_features = {}
+    permission_apps = ('pos_api',)
+
+    def setUp(self):
+        self.owner = create_test_user("owner@test.com", is_superuser=True)
+        self.tenant = Tenant.objects.create(name="Test Tenant", subdomain="test-tenant", owner=self.owner)
+        self.user = create_test_user("cashier@test.com", tenant=self.tenant)
+        setup_plan(self.tenant, **self.plan_features)
+        self.client = self.client_for(self.user)
+
+    def client_for(self, user):
+        """Cliente autenticado como ``user`` con los permisos de ``permission_apps``."""
+        grant_permissions(user, self.tenant, *self.permission_apps)
+        client = APIClient()
+        authenticate_client(client, user)
+        return client
+
+    def open_register(self, initial_cash=0, user=None):
+        return CashRegister.objects.create(tenant=self.tenant, user=user or self.user, initial_cash=initial_cash)
@@ -5,18 +5,30 @@ logger = logging.getLogger(__name__)
 from rest_framework.decorators import action, api_view, permission_classes
 from rest_framework.response import Response
 from django.utils import timezone
+from django.http import Http404
 from apps.core.tenant_permissions import TenantPermissionByAction
 from apps.tenants_api.base_viewsets import TenantScopedViewSet
 from .models import Sale, CashRegister, CashCount, Promotion, Receipt, PosConfiguration, NCFSequence, Coupon
 from .serializers import SaleSerializer, CashRegisterSerializer, CashCountSerializer, PromotionSerializer, ReceiptSerializer, PosConfigurationSerializer, NCFSequenceSerializer, CouponSerializer, CouponValidationSerializer
-from django.db.models import Sum, Q, F
+from django.db.models import Q, F
 from decimal import Decimal, InvalidOperation, ROUND_DOWN
 from apps.core.permissions import IsSuperAdmin
-from apps.settings_api.barbershop_models import BarbershopSettings
 from django.conf import settings
 from apps.audit_api.models import AuditLog
 from django.core.exceptions import ValidationError as DjangoValidationError
 from apps.subscriptions_api.permissions import HasFeaturePermission
+from apps.employees_api.payroll_accumulators import record_sale_commission, reverse_sale_commission
+from .idempotency import idempotent
+from .offline_sync import OFFLINE_SYNC_MAX_BATCH, OfflineSaleSync
+from .pagination import SaleKeysetPagination
+from .receipts import render_receipt, schedule_receipt_render
+from .register_totals import record_register_refund, record_register_sales
+from .sales_rollup import record_refund_rollup, record_sales_rollup
+from .sales_stats import cached_stats, daily_summary_totals, dashboard_totals, invalidate_sales_stats, local_range, tenant_timezone
+from .ncf_allocator import NCFUnavailable, draw_ncf, ensure_block, release_register_blocks
+from apps.inventory_api.stock_reservation import (
+    StockReservationError, check_stock_availability, record_stock_movements, reserve_stock,
+)
 
 class SaleViewSet(TenantScopedViewSet):
     queryset = Sale.objects.all()
@@ -42,51 +54,16 @@ class SaleViewSet(TenantScopedViewSet):
         'search_sales': 'pos_api.view_sale',
         'validate_stock': 'pos_api.add_sale',
         'charge_card': 'pos_api.add_sale',
+        'sync': 'pos_api.add_sale',
     }
 
-    def _get_business_info(self, request):
-        """
-        Unificar datos de negocio para recibos usando BarbershopSettings + PosConfiguration.
-        """
-        tenant = getattr(request, 'tenant', None) or getattr(request.user, 'tenant', None)
-        settings = BarbershopSettings.objects.filter(tenant=tenant).first() if tenant else None
-
-        # Buscar config por tenant primero, luego por usuario
-        pos = PosConfiguration.objects.filter(tenant=tenant).first()
-        if not pos:
-            pos = PosConfiguration.objects.filter(user=request.user).first()
-
-        name = ''
-        address = ''
-        phone = ''
-        email = ''
-
-        if settings:
-            name = settings.name or ''
-            contact = settings.contact or {}
-            address = contact.get('address', '') or ''
-            phone = contact.get('phone', '') or ''
-            email = contact.get('email', '') or ''
-
-        if pos:
-            name = pos.business_name or name
-            address = pos.address or address
-            phone = pos.phone or phone
-            email = pos.email or email
-
-        return {
-            'name': name or 'Barberia',
-            'address': address or 'Direccion no configurada',
-            'phone': phone or 'Telefono no configurado',
-            'email': email or ''
-        }
-    
     def _create_employee_earning(self, sale, employee_user):
         """Crea ganancia automática para el empleado - DEPRECATED"""
         # Esta función ya no es necesaria porque las comisiones se calculan
         # automáticamente desde los snapshots de Sale en PayrollPeriod
         pass
 
+    @idempotent('sale_create')
     def create(self, request, *args, **kwargs):
         logger.info("Creating sale request")
         logger.debug("Sale create payload received")
@@ -105,8 +82,8 @@ class SaleViewSet(TenantScopedViewSet):
             branch_id = self.request.query_params.get('branch_id') or self.request.query_params.get('branch')
 
         user = self.request.user
-        from apps.auth_api.role_utils import get_effective_role_api
-        user_role = get_effective_role_api(user, tenant=getattr(self.request, 'tenant', None))
+        from apps.auth_api.request_context import get_request_role_api
+        user_role = get_request_role_api(self.request, tenant=getattr(self.request, 'tenant', None))
         is_admin = user_role in ('CLIENT_ADMIN', 'SUPER_ADMIN') or user.is_superuser
         if not is_admin and hasattr(user, 'employee_profile') and user.employee_profile:
             if user.employee_profile.branch_id:
@@ -285,6 +262,16 @@ class SaleViewSet(TenantScopedViewSet):
         # Validar caja abierta y obtener la sesión
         open_register = self._validate_cash_register()
         
+        # Reservar bloque NCF para la caja en su propia transacción corta,
+        # antes de abrir la transacción de la venta
+        ncf_type = self.request.data.get('ncf_type')
+        ncf_tenant = getattr(self.request, 'tenant', None) or getattr(self.request.user, 'tenant', None)
+        if ncf_type and ncf_tenant:
+            try:
+                ensure_block(ncf_tenant, ncf_type, open_register)
+            except NCFUnavailable as e:
+                raise serializers.ValidationError(str(e))
+        
         # Usar transacción atómica para evitar race conditions
         from django.db import transaction
         
@@ -293,8 +280,8 @@ class SaleViewSet(TenantScopedViewSet):
             details = self.request.data.get('details', [])
             total = Decimal('0')
             
-            # Lista para almacenar productos bloqueados
-            locked_products = []
+            # Líneas de producto; el stock se reserva en bloque tras validar todas
+            product_lines = []
             
             for detail in details:
                 try:
@@ -308,34 +295,19 @@ class SaleViewSet(TenantScopedViewSet):
                         
                     total += quantity * price
                     
-                    # Validar y BLOQUEAR stock si es producto
                     if detail.get('content_type') == 'product':
-                        from apps.inventory_api.models import Product
-                        try:
-                            object_id = int(detail.get('object_id'))
-                            # LOCK: Bloquear fila para actualización
-                            tenant = getattr(self.request, 'tenant', None) or getattr(self.request.user, 'tenant', None)
-                            product = Product.objects.select_for_update().get(id=object_id, tenant=tenant)
-                            
-                            if not product.is_active:
-                                raise serializers.ValidationError(f"El producto {product.name} no está activo")
-                            
-                            # Validar stock DESPUÉS del lock
-                            if product.stock < quantity:
-                                raise serializers.ValidationError(
-                                    f"Stock insuficiente para {product.name}. Disponible: {product.stock}, Solicitado: {quantity}"
-                                )
-                            
-                            # CRÍTICO: Actualizar stock DENTRO del lock
-                            product.stock -= quantity
-                            product.save()
-                            
-                            locked_products.append((product, quantity))
-                        except (Product.DoesNotExist, ValueError, TypeError):
-                            raise serializers.ValidationError("Producto no encontrado o ID inválido")
+                        product_lines.append((detail.get('object_id'), quantity))
                 except (InvalidOperation, TypeError):
                     raise serializers.ValidationError("Valores inválidos para cantidad o precio")
             
+            # LOCK: un solo SELECT ... FOR UPDATE ordenado por id y un UPDATE condicional
+            tenant = getattr(self.request, 'tenant', None) or getattr(self.request.user, 'tenant', None)
+            try:
+                stock_reservation = reserve_stock(tenant, product_lines)
+            except StockReservationError as e:
+                raise serializers.ValidationError(str(e))
+            serializer.context['tenant_product_ids'] = {product.id for product, _ in stock_reservation.items}
+            
             # Aplicar descuento con validación
             discount = Decimal(str(self.request.data.get('discount', 0)))
             
@@ -457,43 +429,21 @@ class SaleViewSet(TenantScopedViewSet):
             )
 
             # --- Generación de NCF (Comprobante Fiscal RD) ---
-            ncf_type = self.request.data.get('ncf_type')
             if ncf_type:
                 tenant = getattr(self.request, 'tenant', None) or getattr(self.request.user, 'tenant', None)
                 if tenant:
-                    from django.db import transaction
-                    # Bloqueo de concurrencia para evitar NCF duplicados
-                    with transaction.atomic():
-                        sequence = NCFSequence.objects.select_for_update().filter(
-                            tenant=tenant,
-                            type=ncf_type,
-                            is_active=True,
-                            current_sequence__lte=F('end_sequence'),
-                            expiration_date__gte=timezone.now().date()
-                        ).order_by('created_at').first()
-                        
-                        if not sequence:
-                            raise serializers.ValidationError(
-                                f"No hay secuencia NCF activa para el tipo {ncf_type}. "
-                                "Verifique configuración, rango y fecha de expiración."
-                            )
-                        
-                        ncf = sequence.get_next_ncf()
-                        if not ncf:
-                            raise serializers.ValidationError(
-                                f"Secuencia NCF agotada o vencida para tipo {ncf_type}."
-                            )
-                        
-                        # Asignar NCF y datos fiscales a la venta
-                        sale.ncf = ncf
-                        sale.ncf_type = ncf_type
-                        sale.rnc = self.request.data.get('rnc', '')
-                        sale.company_name = self.request.data.get('company_name', '')
-                        sale.save(update_fields=['ncf', 'ncf_type', 'rnc', 'company_name'])
-                        
-                        # Incrementar secuencia
-                        sequence.current_sequence += 1
-                        sequence.save(update_fields=['current_sequence'])
+                    # El número sale del bloque de esta caja; solo se bloquea esa fila
+                    try:
+                        ncf = draw_ncf(tenant, ncf_type, open_register)
+                    except NCFUnavailable as e:
+                        raise serializers.ValidationError(str(e))
+                    
+                    # Asignar NCF y datos fiscales a la venta
+                    sale.ncf = ncf
+                    sale.ncf_type = ncf_type
+                    sale.rnc = self.request.data.get('rnc', '')
+                    sale.company_name = self.request.data.get('company_name', '')
+                    sale.save(update_fields=['ncf', 'ncf_type', 'rnc', 'company_name'])
 
             # Loyalty: Redimir puntos (descuento por canje)
             from apps.clients_api.models import LoyaltyTransaction
@@ -555,8 +505,16 @@ class SaleViewSet(TenantScopedViewSet):
                         }
                     )
             
-            # Recalcular período después de guardar venta.
+            # Sumar la comisión a los acumuladores del período (sin recalcular todo).
             # Si el período está finalizado, mover comisión a un ajuste en período abierto.
+            record_sale_commission(sale)
+            record_register_sales(
+                open_register.id,
+                [(payment['method'], payment['amount']) for payment in serializer.validated_data['payments']],
+            )
+            record_sales_rollup([sale])
+            invalidate_sales_stats(sale.tenant_id)
+            schedule_receipt_render([sale.id], self.request.user.id)
             if active_period and getattr(active_period, 'is_finalized', False):
                 from apps.employees_api.adjustment_models import CommissionAdjustment
 
@@ -573,23 +531,9 @@ class SaleViewSet(TenantScopedViewSet):
                         created_by=self.request.user,
                         tenant=sale_employee.tenant
                     )
-
-                    target_period.calculate_amounts()
-                    target_period.save()
-            elif active_period:
-                active_period.calculate_amounts()
-                active_period.save()
             
             # CRÍTICO: Crear movimientos de stock (productos ya actualizados)
-            for product, quantity in locked_products:
-                from apps.inventory_api.models import StockMovement
-                
-                # Crear movimiento de stock
-                StockMovement.objects.create(
-                    product=product,
-                    quantity=-quantity,
-                    reason=f"Venta #{sale.id}"
-                )
+            record_stock_movements(stock_reservation, reason=f"Venta #{sale.id}")
             
             # Actualizar cita si existe
             appointment_id = self.request.data.get('appointment_id')
@@ -646,6 +590,37 @@ class SaleViewSet(TenantScopedViewSet):
         return qs
 
     @action(detail=False, methods=['post'])
+    def sync(self, request):
+        """Sincroniza por lotes las ventas registradas sin conexión en la terminal."""
+        sales = request.data.get('sales') if isinstance(request.data, dict) else None
+        if not isinstance(sales, list) or not sales:
+            return Response(
+                {'error': 'Se requiere la lista "sales" con al menos una venta'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if len(sales) > OFFLINE_SYNC_MAX_BATCH:
+            return Response(
+                {'error': f'Máximo {OFFLINE_SYNC_MAX_BATCH} ventas por lote'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        open_register = self._validate_cash_register()
+        results = OfflineSaleSync(
+            tenant=self._get_request_tenant(),
+            user=request.user,
+            cash_register=open_register,
+            resolve_period=self._get_or_create_active_period,
+            resolve_adjustment_period=self._get_or_create_adjustment_period,
+        ).sync(sales)
+
+        summary = {result_status: 0 for result_status in ('created', 'duplicate', 'error')}
+        for result in results:
+            summary[result['status']] += 1
+        logger.info("Offline sync tenant_id=%s summary=%s", open_register.tenant_id, summary)
+        return Response({'results': results, **summary})
+
+    @action(detail=False, methods=['post'])
+    @idempotent('charge_card')
     def charge_card(self, request):
         """Cobra con tarjeta usando el proveedor del país del tenant."""
         from apps.payments_api.factory import PaymentProviderFactory
@@ -791,6 +766,7 @@ class SaleViewSet(TenantScopedViewSet):
         return Response(CashRegisterSerializer(register).data)
 
     @action(detail=True, methods=['post'])
+    @idempotent('refund')
     def refund(self, request, pk=None):
         from django.db import transaction
         from apps.employees_api.adjustment_models import CommissionAdjustment
@@ -942,10 +918,6 @@ class SaleViewSet(TenantScopedViewSet):
                             tenant=sale.employee.tenant
                         )
                         
-                        # Recalcular período afectado (idempotente, no hace save interno)
-                        target_period.calculate_amounts()
-                        target_period.save()
-                        
                     except IntegrityError:
                         # Ya existe adjustment para este refund
                         return Response(
@@ -956,9 +928,16 @@ class SaleViewSet(TenantScopedViewSet):
             # Marcar como reembolsada respetando inmutabilidad financiera.
             # El modelo Sale permite transición de estado confirmed -> refunded.
             refunded_amount = sale.total
+            was_confirmed = sale.status == 'confirmed'
             sale.status = 'refunded'
             sale.closed = True
             sale.save(update_fields=['status', 'closed', 'updated_at'])
+            record_refund_rollup(sale)
+            if was_confirmed:
+                # La venta deja de contar en los acumuladores de su período y de su caja
+                reverse_sale_commission(sale)
+                record_register_refund(sale)
+            invalidate_sales_stats(sale.tenant_id)
 
             AuditLog.objects.create(
                 user=request.user,
@@ -979,60 +958,63 @@ class SaleViewSet(TenantScopedViewSet):
     
     @action(detail=True, methods=['get'])
     def print_receipt(self, request, pk=None):
-        """Generar e imprimir recibo"""
-        sale = self.get_object()
-        
-        # Crear o actualizar recibo
-        receipt, created = Receipt.objects.get_or_create(
-            sale=sale,
-            defaults={
-                'receipt_number': f"R{sale.id:06d}",
-                'template_used': 'default'
-            }
-        )
-        
-        # Actualizar contador de impresiones
+        """Devolver el recibo pre-renderizado y contar la impresión"""
+        try:
+            sale_id = int(pk)
+        except (TypeError, ValueError):
+            raise Http404
+        # El alcance del usuario lo aplica el queryset de ventas, sin cargar la venta.
+        # El estado se lee al momento: un reembolso posterior no re-renderiza el recibo.
+        receipt = Receipt.objects.filter(
+            sale_id=sale_id, sale__in=self.filter_queryset(self.get_queryset()).values('pk'), payload__isnull=False,
+        ).annotate(sale_status=F('sale__status'), sale_closed=F('sale__closed')).first()
+        if receipt is None:
+            # Venta anterior a los recibos pre-renderizados o render aún pendiente
+            sale = self.get_object()
+            receipt = render_receipt(sale, request.user)
+            receipt.sale_status, receipt.sale_closed = sale.status, sale.closed
+
+        now = timezone.now()
+        Receipt.objects.filter(pk=receipt.pk).update(printed_count=F('printed_count') + 1, last_printed=now)
         receipt.printed_count += 1
-        receipt.last_printed = timezone.now()
-        receipt.save()
-        
-        # Generar datos del recibo
-        receipt_data = {
+        receipt.last_printed = now
+
+        return Response({
             'receipt': ReceiptSerializer(receipt).data,
-            'sale': SaleSerializer(sale).data,
-            'business_info': self._get_business_info(request)
-        }
-        
-        return Response(receipt_data)
+            'sale': {**receipt.payload['sale'], 'status': receipt.sale_status, 'closed': receipt.sale_closed},
+            'business_info': receipt.payload['business_info'],
+            'text': receipt.text_body,
+        })
     
     @action(detail=False, methods=['get'])
     def search_sales(self, request):
-        """Búsqueda avanzada de ventas"""
+        """Búsqueda avanzada de ventas, paginada por cursor"""
+        from django.utils.dateparse import parse_date
+
         queryset = self.get_queryset()
         
         # Filtros
-        date_from = request.query_params.get('date_from')
-        date_to = request.query_params.get('date_to')
+        def date_param(name):
+            try:
+                return parse_date(request.query_params.get(name) or '')
+            except ValueError:
+                return None
+
+        date_from = date_param('date_from')
+        date_to = date_param('date_to')
         client_id = request.query_params.get('client_id')
         employee_id = request.query_params.get('employee_id')
         payment_method = request.query_params.get('payment_method')
+        client_query = (request.query_params.get('client') or '').strip()
+        receipt_query = (request.query_params.get('receipt') or '').strip()
+        ncf_query = (request.query_params.get('ncf') or '').strip()
         
+        # Días locales del tenant como rangos [inicio, fin) sobre date_time
+        tz = tenant_timezone(self._get_request_tenant())
         if date_from:
-            try:
-                from django.utils.dateparse import parse_date
-                parsed_date = parse_date(date_from)
-                if parsed_date:
-                    queryset = queryset.filter(date_time__date__gte=parsed_date)
-            except ValueError:
-                pass
+            queryset = queryset.filter(date_time__gte=local_range(tz, date_from)[0])
         if date_to:
-            try:
-                from django.utils.dateparse import parse_date
-                parsed_date = parse_date(date_to)
-                if parsed_date:
-                    queryset = queryset.filter(date_time__date__lte=parsed_date)
-            except ValueError:
-                pass
+            queryset = queryset.filter(date_time__lt=local_range(tz, date_to)[1])
         if client_id:
             try:
                 client_id = int(client_id)
@@ -1047,54 +1029,43 @@ class SaleViewSet(TenantScopedViewSet):
                 pass
         if payment_method:
             queryset = queryset.filter(payment_method=payment_method)
+        if client_query:
+            queryset = queryset.filter(
+                Q(client__full_name__icontains=client_query) | Q(client__phone__icontains=client_query)
+            )
+        if receipt_query:
+            # El número de recibo es R + id de la venta: búsqueda exacta por pk
+            digits = receipt_query.upper().removeprefix('R')
+            queryset = queryset.filter(pk=int(digits)) if digits.isdigit() else queryset.none()
+        if ncf_query:
+            queryset = queryset.filter(ncf__icontains=ncf_query)
         
-        from apps.utils.response_formatter import StandardResponse
-        page = self.paginate_queryset(queryset)
-        if page is not None:
-            serializer = self.get_serializer(page, many=True)
-            return self.get_paginated_response(serializer.data)
-        serializer = self.get_serializer(queryset, many=True)
-        return Response(StandardResponse.list_response(
-            results=serializer.data,
-            count=queryset.count()
-        ))
+        paginator = SaleKeysetPagination()
+        page = paginator.paginate_queryset(queryset, request, view=self)
+        serializer = self.get_serializer(page, many=True)
+        return paginator.get_paginated_response(serializer.data)
 
     @action(detail=False, methods=['post'])
     def validate_stock(self, request):
         """Validar stock en tiempo real antes de confirmar venta"""
-        from apps.inventory_api.models import Product
-        from django.db import transaction
-        
         items = request.data.get('items', [])
         errors = []
+        lines = []
         
-        with transaction.atomic():
-            for item in items:
-                if item.get('type') == 'product':
-                    try:
-                        product_id = int(item.get('id'))
-                        quantity = int(item.get('quantity', 1))
-                        
-                        # Bloquear producto para lectura
-                        product = Product.objects.select_for_update().get(id=product_id, tenant=self.request.tenant)
-                        
-                        if product.stock < quantity:
-                            errors.append({
-                                'product_id': product_id,
-                                'product_name': product.name,
-                                'requested': quantity,
-                                'available': product.stock,
-                                'message': f'{product.name}: Stock insuficiente. Disponible: {product.stock}, Solicitado: {quantity}'
-                            })
-                    except Product.DoesNotExist:
-                        errors.append({
-                            'product_id': product_id,
-                            'message': f'Producto {product_id} no encontrado'
-                        })
-                    except (ValueError, TypeError):
-                        errors.append({
-                            'message': 'ID de producto o cantidad inválidos'
-                        })
+        for item in items:
+            if item.get('type') == 'product':
+                try:
+                    lines.append((int(item.get('id')), int(item.get('quantity', 1))))
+                except (ValueError, TypeError):
+                    errors.append({
+                        'message': 'ID de producto o cantidad inválidos'
+                    })
+        
+        # Una sola consulta para todos los productos; el lock lo toma la venta
+        try:
+            errors.extend(check_stock_availability(self.request.tenant, lines))
+        except StockReservationError as e:
+            errors.append({'message': str(e)})
         
         if errors:
             return Response({
@@ -1153,23 +1124,7 @@ class CashRegisterViewSet(TenantScopedViewSet):
         if user_id:
             queryset = queryset.filter(user_id=user_id)
         
-        # Anotar sales_amount para evitar N+1 en serialización
-        from django.db.models import Sum, OuterRef, Subquery
-        from django.db.models.functions import Coalesce
-        from decimal import Decimal
-        from .models import Payment
-        payment_subquery = Payment.objects.filter(
-            sale__cash_register=OuterRef('pk'),
-            sale__tenant=OuterRef('tenant'),
-            method='cash',
-            sale__status='confirmed'
-        ).values('sale__cash_register').annotate(
-            total=Sum('amount')
-        ).values('total')
-        queryset = queryset.annotate(
-            _sales_amount_annotated=Coalesce(Subquery(payment_subquery), Decimal('0.00'))
-        )
-        
+        # sales_amount sale de los acumuladores de la caja: sin subconsulta por fila
         return queryset
             
         return queryset
@@ -1240,6 +1195,8 @@ class CashRegisterViewSet(TenantScopedViewSet):
         register.closed_at = timezone.now()
         register.final_cash = serializer.validated_data['final_cash']
         register.save()
+        # Los NCF reservados y no usados vuelven a la secuencia o quedan como hueco
+        release_register_blocks(register)
         return Response(CashRegisterSerializer(register).data)
     
     @action(detail=True, methods=['post'])
@@ -1262,7 +1219,7 @@ class CashRegisterViewSet(TenantScopedViewSet):
                 return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
         
         # Calcular diferencia
-        expected_cash = register.initial_cash + self._calculate_cash_sales(register)
+        expected_cash = register.initial_cash + register.cash_sales_total
         difference = total_counted - expected_cash
         
         return Response({
@@ -1271,14 +1228,7 @@ class CashRegisterViewSet(TenantScopedViewSet):
             'difference': difference,
             'counts': CashCountSerializer(register.cash_counts.all(), many=True).data
         })
-    
-    def _calculate_cash_sales(self, register):
-        """Calcular ventas en efectivo de ESTA sesión de caja"""
-        cash_sales = Sale.objects.filter(
-            cash_register=register,
-            payment_method='cash'
-        ).aggregate(total=Sum('paid'))['total'] or Decimal('0')
-        return cash_sales
+
 # Nuevos ViewSets
 class PromotionViewSet(TenantScopedViewSet):
     queryset = Promotion.objects.all()
@@ -1443,10 +1393,11 @@ class PosConfigurationViewSet(TenantScopedViewSet):
 @api_view(['GET'])
 @permission_classes([permissions.IsAuthenticated])
 def daily_summary(request):
-        today = timezone.localdate()
+        tenant = getattr(request, 'tenant', None)
+        tz = tenant_timezone(tenant)
+        today = timezone.localdate(timezone=tz)
         
         # Determinar filtro base según usuario
-        tenant = getattr(request, 'tenant', None)
         if request.user.is_superuser:
             if tenant:
                 base_filter = Q(tenant=tenant)
@@ -1488,50 +1439,17 @@ def daily_summary(request):
         if open_register:
             # Filtrar ventas de esta sesión de caja
             sales = Sale.objects.filter(cash_register=open_register)
+            key_parts = ['register', open_register.id]
         else:
-            # No hay caja abierta, mostrar ventas del día con filtro base
-            sales = Sale.objects.filter(base_filter, date_time__date=today)
+            # No hay caja abierta, mostrar ventas del día local del tenant con filtro base
+            start, end = local_range(tz, today)
+            sales = Sale.objects.filter(base_filter, date_time__gte=start, date_time__lt=end)
+            key_parts = ['day', today, branch_id or 'all']
 
-        total = sales.aggregate(total=Sum('total'))['total'] or 0
-        paid = sales.aggregate(paid=Sum('paid'))['paid'] or 0
-
-        by_method = sales.values('payment_method').annotate(total=Sum('paid'))
-        
-        # Usar agregación SQL para calcular by_type
-        from .models import SaleDetail
-        from django.db.models import F, Case, When, DecimalField
-        
-        sale_ids = sales.values_list('id', flat=True)
-        by_type_data = SaleDetail.objects.filter(sale_id__in=sale_ids).aggregate(
-            products=Sum(
-                Case(
-                    When(content_type__model='product', then=F('quantity') * F('price')),
-                    default=0,
-                    output_field=DecimalField()
-                )
-            ),
-            services=Sum(
-                Case(
-                    When(~Q(content_type__model='product'), then=F('quantity') * F('price')),
-                    default=0,
-                    output_field=DecimalField()
-                )
-            )
+        summary = cached_stats(
+            getattr(tenant, 'id', None), 'daily_summary', key_parts, lambda: daily_summary_totals(sales),
         )
-        
-        by_type = {
-            'services': float(by_type_data['services'] or 0),
-            'products': float(by_type_data['products'] or 0),
-        }
-
-        return Response({
-            'date': today,
-            'sales_count': sales.count(),
-            'total': total,
-            'paid': paid,
-            'by_method': list(by_method),
-            'by_type': by_type,
-        })
+        return Response({'date': today, **summary})
 
 
 
@@ -1539,12 +1457,11 @@ def daily_summary(request):
 @permission_classes([permissions.IsAuthenticated])
 def dashboard_stats(request):
     """Estadísticas para el dashboard del POS con filtros avanzados"""
-    from django.core.cache import cache
-    from .models import SaleDetail
-    from django.db.models import Count, Sum
-    from datetime import datetime, timedelta
+    from datetime import datetime
 
-    today = timezone.localdate()
+    tenant = getattr(request, 'tenant', None)
+    tz = tenant_timezone(tenant)
+    today = timezone.localdate(timezone=tz)
 
     start_date = request.GET.get('start_date')
     end_date = request.GET.get('end_date')
@@ -1566,13 +1483,6 @@ def dashboard_stats(request):
     else:
         end_date = today
 
-    tenant = getattr(request, 'tenant', None)
-    tenant_id = getattr(tenant, 'id', None) or getattr(request.user.tenant, 'id', 'none')
-    cache_key = f'dashboard_stats_{request.user.id}_{tenant_id}_{start_date}_{end_date}_{branch_id or "all"}'
-    cached_data = cache.get(cache_key)
-    if cached_data:
-        return Response(cached_data)
-
     base_filter = Q(pk__isnull=True)
     if request.user.is_superuser:
         if tenant:
@@ -1585,92 +1495,17 @@ def dashboard_stats(request):
     if branch_id:
         base_filter = base_filter & Q(branch_id=branch_id)
 
-    range_filter = base_filter & Q(date_time__date__gte=start_date) & Q(date_time__date__lte=end_date)
-    today_filter = base_filter & Q(date_time__date=today)
-
-    all_in_range = Sale.objects.filter(range_filter)
-    sales_today = Sale.objects.filter(today_filter)
-
-    # KPIs del rango
-    revenue_range = all_in_range.aggregate(total=Sum('total'))['total'] or 0
-    transactions_range = all_in_range.count()
-    avg_ticket = revenue_range / transactions_range if transactions_range > 0 else 0
-    revenue_today = sales_today.aggregate(total=Sum('total'))['total'] or 0
-
-    # Método de pago breakdown
-    payment_breakdown = all_in_range.values('payment_method').annotate(
-        total=Sum('total'), count=Count('id')
-    ).order_by('-total')
-
-    # Top productos
-    top_products = SaleDetail.objects.filter(
-        Q(sale__in=all_in_range), content_type__model='product'
-    ).values('name').annotate(sold=Sum('quantity')).order_by('-sold')[:5]
-
-    # Top servicios
-    top_services = SaleDetail.objects.filter(
-        Q(sale__in=all_in_range), content_type__model='service'
-    ).values('name').annotate(
-        sold=Sum('quantity'), revenue=Sum('price')
-    ).order_by('-revenue')[:5]
-
-    user_sales_today = Sale.objects.filter(today_filter & Q(user=request.user))
-    user_sales_count = user_sales_today.count()
-    user_sales_revenue = user_sales_today.aggregate(total=Sum('total'))['total'] or 0
-
-    # Ingresos diarios en el rango
-    daily_revenue = all_in_range.extra(
-        select={'day': "CAST(date_time AS DATE)"}
-    ).values('day').annotate(total=Sum('total')).order_by('day')
-
-    daily_data = []
-    for entry in daily_revenue:
-        day_str = entry['day'].strftime('%d/%m') if hasattr(entry['day'], 'strftime') else str(entry['day'])
-        daily_data.append({'day': day_str, 'revenue': float(entry['total'])})
-
-    # Ingresos mensuales (últimos 6 meses)
-    current_date = today.replace(day=1)
-    six_months_ago = current_date - timedelta(days=180)
-    monthly_data = Sale.objects.filter(
-        base_filter, date_time__date__gte=six_months_ago
-    ).extra(
-        select={'month': "CAST(DATE_TRUNC('month', date_time) AS DATE)"}
-    ).values('month').annotate(total=Sum('total')).order_by('month')
-
-    monthly_dict = {}
-    for item in monthly_data:
-        m = item['month']
-        if hasattr(m, 'strftime'):
-            monthly_dict[m.strftime('%Y-%m')] = float(item['total'])
-
-    month_names = {1: 'Ene', 2: 'Feb', 3: 'Mar', 4: 'Abr', 5: 'May', 6: 'Jun',
-                   7: 'Jul', 8: 'Ago', 9: 'Sep', 10: 'Oct', 11: 'Nov', 12: 'Dic'}
-    monthly_revenue = []
-    for _ in range(6):
-        month_total = monthly_dict.get(current_date.strftime('%Y-%m'), 0)
-        monthly_revenue.insert(0, {'month': month_names[current_date.month], 'revenue': month_total})
-        if current_date.month == 1:
-            current_date = current_date.replace(year=current_date.year - 1, month=12)
-        else:
-            current_date = current_date.replace(month=current_date.month - 1)
-
-    data = {
-        'revenue_range': float(revenue_range),
-        'revenue_today': float(revenue_today),
-        'transactions_range': transactions_range,
-        'average_ticket': float(avg_ticket),
-        'sales_today_count': sales_today.count(),
-        'user_sales_today_count': user_sales_count,
-        'user_sales_today_revenue': float(user_sales_revenue),
-        'payment_breakdown': list(payment_breakdown),
-        'top_products': list(top_products),
-        'top_services': list(top_services),
-        'daily_revenue': daily_data,
-        'monthly_revenue': monthly_revenue,
-        'filter_range': {'start': start_date.isoformat(), 'end': end_date.isoformat()},
-    }
-
-    cache.set(cache_key, data, 60)
+    tenant_id = getattr(tenant, 'id', None)
+    totals = cached_stats(
+        tenant_id, 'dashboard', [start_date, end_date, today, branch_id or 'all'],
+        lambda: dashboard_totals(base_filter, tz, start_date, end_date, today, tenant=tenant, branch_id=branch_id),
+    )
+
+    data = {key: value for key, value in totals.items() if key != 'user_today'}
+    user_today = totals['user_today'].get(request.user.id, {'count': 0, 'revenue': 0.0})
+    data['user_sales_today_count'] = user_today['count']
+    data['user_sales_today_revenue'] = user_today['revenue']
+    data['filter_range'] = {'start': start_date.isoformat(), 'end': end_date.isoformat()}
     return Response(data)
 
 @api_view(['GET'])
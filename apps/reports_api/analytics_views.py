@@ -3,21 +3,25 @@ from rest_framework.response import Response
 from apps.core.tenant_permissions import TenantPermissionByAction
 from apps.subscriptions_api.permissions import HasFeaturePermission
 from django.db.models import Count, Sum, Avg, Q, F
+from django.db.models.functions import ExtractMonth
 from django.utils import timezone
 from datetime import datetime, timedelta, date
 from apps.clients_api.models import Client
 from apps.employees_api.models import Employee
 from apps.pos_api.models import Sale
+from apps.pos_api.sales_rollup import sales_by_day, sales_totals
+from apps.pos_api.sales_stats import tenant_timezone
 from apps.appointments_api.models import Appointment
 from apps.services_api.models import Service
+from .employee_metrics import employee_metrics
 
 
 def get_report_branch_id(request):
     branch_id = request.query_params.get('branch_id') or request.query_params.get('branch')
     user = request.user
     if user and getattr(user, 'is_authenticated', False) and not user.is_superuser:
-        from apps.auth_api.role_utils import get_effective_role_api
-        user_role = get_effective_role_api(user, tenant=getattr(request, 'tenant', user.tenant))
+        from apps.auth_api.request_context import get_request_role_api
+        user_role = get_request_role_api(request, tenant=getattr(request, 'tenant', user.tenant))
         if user_role != 'CLIENT_ADMIN' and hasattr(user, 'employee_profile') and user.employee_profile:
             if user.employee_profile.branch_id:
                 branch_id = user.employee_profile.branch_id
@@ -147,27 +151,15 @@ def calculate_employee_performance(tenant, days, branch_id=None):
     if branch_id:
         employee_filter['branch_id'] = branch_id
         
-    employees = Employee.objects.filter(**employee_filter)
+    employees = list(Employee.objects.filter(**employee_filter).select_related('user'))
+    metrics = employee_metrics(tenant, employees, since=start_date, branch_id=branch_id)
     performance_data = []
     
     for emp in employees:
-        # Ventas del empleado
-        sales_filter = {'employee': emp, 'date_time__gte': start_date, 'tenant': tenant}
-        if branch_id:
-            sales_filter['branch_id'] = branch_id
-            
-        sales = Sale.objects.filter(**sales_filter)
-        
-        # Citas del empleado
-        appointments_filter = {'stylist': emp.user, 'date_time__gte': start_date, 'client__tenant': tenant}
-        if branch_id:
-            appointments_filter['branch_id'] = branch_id
-            
-        appointments = Appointment.objects.filter(**appointments_filter)
-        
-        total_sales = sales.aggregate(total=Sum('total'))['total'] or 0
-        total_appointments = appointments.count()
-        completed_appointments = appointments.filter(status='completed').count()
+        totals = metrics[emp.id]
+        total_sales = totals['sales_total']
+        total_appointments = totals['appointments']
+        completed_appointments = totals['completed_appointments']
         
         # Tasa de conversión
         conversion_rate = (completed_appointments / total_appointments * 100) if total_appointments > 0 else 0
@@ -218,25 +210,15 @@ def calculate_service_trends(tenant, days, branch_id=None):
 
 def calculate_predictions(tenant, days, branch_id=None):
     """Predicciones básicas basadas en tendencias"""
-    sales_filter = {
-        'tenant': tenant,
-        'date_time__gte': timezone.now() - timedelta(days=days*2)
-    }
-    if branch_id:
-        sales_filter['branch_id'] = branch_id
-        
-    # Datos históricos
-    historical_sales = Sale.objects.filter(**sales_filter).extra(
-        select={'day': 'date(date_time)'}
-    ).values('day').annotate(
-        daily_total=Sum('total')
-    ).order_by('day')
+    # Datos históricos por día local desde el resumen diario
+    today = timezone.localdate(timezone=tenant_timezone(tenant))
+    historical_sales = sales_by_day(tenant, today - timedelta(days=days*2), today, branch_id)
     
     if len(historical_sales) < 7:
         return {'message': 'Datos insuficientes para predicciones'}
     
     # Promedio de los últimos 7 días
-    recent_avg = sum(float(day['daily_total']) for day in historical_sales[-7:]) / 7
+    recent_avg = sum(float(day['revenue']) for day in historical_sales[-7:]) / 7
     
     # Predicción simple para próximos 7 días
     next_week_prediction = recent_avg * 7
@@ -278,16 +260,13 @@ def calculate_clv(tenant, branch_id=None):
 
 def calculate_arpu(tenant, branch_id=None):
     """Average Revenue Per User"""
-    sales_filter = {
-        'tenant': tenant,
-    }
     clients_filter = {'tenant': tenant, 'is_active': True}
     
     if branch_id:
-        sales_filter['branch_id'] = branch_id
         clients_filter['client_appointments__branch_id'] = branch_id
         
-    total_revenue = Sale.objects.filter(**sales_filter).aggregate(total=Sum('total'))['total'] or 0
+    today = timezone.localdate(timezone=tenant_timezone(tenant))
+    total_revenue = sales_totals(tenant, {'all': (None, today)}, branch_id)['all']['revenue']
     active_clients = Client.objects.filter(**clients_filter).distinct().count()
     
     arpu = float(total_revenue) / max(active_clients, 1)
@@ -314,18 +293,16 @@ def calculate_churn_rate(tenant, branch_id=None):
 
 def calculate_growth_rate(tenant, branch_id=None):
     """Tasa de crecimiento mensual"""
-    current_month = timezone.now().replace(day=1)
-    last_month = (current_month - timedelta(days=1)).replace(day=1)
+    today = timezone.localdate(timezone=tenant_timezone(tenant))
+    current_month = today.replace(day=1)
+    last_month_end = current_month - timedelta(days=1)
     
-    current_filter = {'tenant': tenant, 'date_time__gte': current_month}
-    last_filter = {'tenant': tenant, 'date_time__gte': last_month, 'date_time__lt': current_month}
-    
-    if branch_id:
-        current_filter['branch_id'] = branch_id
-        last_filter['branch_id'] = branch_id
-        
-    current_revenue = Sale.objects.filter(**current_filter).aggregate(total=Sum('total'))['total'] or 0
-    last_revenue = Sale.objects.filter(**last_filter).aggregate(total=Sum('total'))['total'] or 0
+    totals = sales_totals(tenant, {
+        'current': (current_month, today),
+        'last': (last_month_end.replace(day=1), last_month_end),
+    }, branch_id)
+    current_revenue = totals['current']['revenue']
+    last_revenue = totals['last']['revenue']
     
     if last_revenue > 0:
         growth_rate = ((float(current_revenue) - float(last_revenue)) / float(last_revenue)) * 100
@@ -387,29 +364,33 @@ def calculate_seasonal_patterns(tenant, branch_id=None):
 def calculate_internal_benchmarks(tenant, branch_id=None):
     """Benchmarks internos"""
     sales_filter = {'tenant': tenant}
-    employee_filter = {'tenant': tenant, 'sales__isnull': False}
+    employee_filter = {'tenant': tenant}
     
     if branch_id:
         sales_filter['branch_id'] = branch_id
         employee_filter['branch_id'] = branch_id
         
-    # Mejor mes del año
-    best_month = Sale.objects.filter(**sales_filter).extra(
-        select={'month': 'EXTRACT(month FROM date_time)'}
+    # Mejor mes del año (mes local del tenant)
+    best_month = Sale.objects.filter(**sales_filter).annotate(
+        month=ExtractMonth('date_time', tzinfo=tenant_timezone(tenant))
     ).values('month').annotate(
         total=Sum('total')
     ).order_by('-total').first()
     
-    # Mejor empleado
-    best_employee = Employee.objects.filter(**employee_filter).annotate(
-        total_sales=Sum('sales__total')
-    ).order_by('-total_sales').first()
+    # Mejor empleado: el de mayor venta según las métricas agrupadas
+    employees = list(Employee.objects.filter(**employee_filter).select_related('user'))
+    metrics = employee_metrics(tenant, employees, branch_id=branch_id)
+    best_employee = max(
+        (emp for emp in employees if metrics[emp.id]['sales_count']),
+        key=lambda emp: metrics[emp.id]['sales_total'],
+        default=None,
+    )
     
     return {
         'best_month': best_month['month'] if best_month else None,
         'best_month_revenue': float(best_month['total']) if best_month else 0,
         'best_employee': best_employee.user.full_name if best_employee else None,
-        'best_employee_sales': float(best_employee.total_sales) if best_employee else 0
+        'best_employee_sales': float(metrics[best_employee.id]['sales_total']) if best_employee else 0
     }
 
 
@@ -469,24 +450,14 @@ def predict_demand(tenant, branch_id=None):
 
 def predict_revenue(tenant, branch_id=None):
     """Predicción de ingresos"""
-    sales_filter = {
-        'tenant': tenant,
-        'date_time__gte': timezone.now() - timedelta(days=30)
-    }
-    if branch_id:
-        sales_filter['branch_id'] = branch_id
-        
-    daily_revenue = Sale.objects.filter(**sales_filter).extra(
-        select={'day': 'date(date_time)'}
-    ).values('day').annotate(
-        total=Sum('total')
-    ).order_by('day')
+    today = timezone.localdate(timezone=tenant_timezone(tenant))
+    daily_revenue = sales_by_day(tenant, today - timedelta(days=30), today, branch_id)
     
     if len(daily_revenue) < 7:
         return {'message': 'Datos insuficientes'}
     
     # Promedio de últimos 7 días
-    recent_avg = sum(float(day['total']) for day in daily_revenue[-7:]) / 7
+    recent_avg = sum(float(day['revenue']) for day in daily_revenue[-7:]) / 7
     
     return {
         'next_month_estimate': round(recent_avg * 30, 2),
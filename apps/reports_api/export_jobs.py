@@ -0,0 +1,165 @@
+"""Exportaciones de reportes en segundo plano (``ExportJob`` + tarea ``run_export_job``).
+
+Los pedidos idénticos reutilizan el trabajo activo o reciente; uno activo sin
+``heartbeat_at`` en EXPORT_JOB_STALE_TIMEOUT segundos se marca fallido.
+"""
+import hashlib
+import logging
+import os
+import tempfile
+from datetime import timedelta
+
+from django.conf import settings
+from django.core import signing
+from django.core.files import File
+from django.db import IntegrityError, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .exporters import write_export
+from .models import ExportJob
+
+logger = logging.getLogger(__name__)
+
+EXPORT_JOB_RETENTION_HOURS = getattr(settings, 'EXPORT_JOB_RETENTION_HOURS', 24)
+EXPORT_JOB_REUSE_TTL = getattr(settings, 'EXPORT_JOB_REUSE_TTL', 300)
+EXPORT_JOB_STALE_TIMEOUT = getattr(settings, 'EXPORT_JOB_STALE_TIMEOUT', 600)
+EXPORT_DOWNLOAD_TOKEN_TTL = getattr(settings, 'EXPORT_DOWNLOAD_TOKEN_TTL', 900)
+
+DOWNLOAD_TOKEN_SALT = 'reports_api.export_job.download'
+
+
+def params_hash(tenant_id, report_type, file_format, branch_id=None):
+    raw = f"{tenant_id}|{report_type}|{file_format}|{branch_id or ''}"
+    return hashlib.sha256(raw.encode()).hexdigest()
+
+
+def _fail_stale_jobs(job_hash, now):
+    """Marca fallidos los trabajos activos de ``job_hash`` sin señal de vida reciente."""
+    cutoff = now - timedelta(seconds=EXPORT_JOB_STALE_TIMEOUT)
+    return ExportJob.objects.filter(
+        Q(heartbeat_at__lt=cutoff) | Q(heartbeat_at__isnull=True, created_at__lt=cutoff),
+        params_hash=job_hash, status__in=ExportJob.ACTIVE_STATUSES,
+    ).update(status='failed', error='El trabajo dejó de avanzar (mensaje perdido o worker caído)', finished_at=now)
+
+
+def _reusable(job_hash):
+    now = timezone.now()
+    if _fail_stale_jobs(job_hash, now):
+        logger.warning("Stale export job marked failed params_hash=%s", job_hash)
+    return ExportJob.objects.filter(params_hash=job_hash).filter(
+        Q(status__in=ExportJob.ACTIVE_STATUSES)
+        | Q(status='completed', finished_at__gte=now - timedelta(seconds=EXPORT_JOB_REUSE_TTL), expires_at__gt=now)
+    ).order_by('-created_at').first()
+
+
+def request_export(tenant, user, report_type, file_format, branch_id=None):
+    """Devuelve ``(job, created)``; encola la generación solo si el trabajo es nuevo.
+
+    ``job`` es ``None`` si otro request idéntico sigue ganando la carrera de
+    creación tras un reintento.
+    """
+    job_hash = params_hash(tenant.id, report_type, file_format, branch_id)
+    for _ in range(2):
+        job = _reusable(job_hash)
+        if job is not None:
+            return job, False
+        try:
+            with transaction.atomic():
+                job = ExportJob.objects.create(
+                    tenant=tenant, requested_by=user, report_type=report_type,
+                    file_format=file_format, branch_id=branch_id or None, params_hash=job_hash,
+                    heartbeat_at=timezone.now(),
+                )
+            break
+        except IntegrityError:
+            # Otro request idéntico lo creó primero; si ya terminó o falló, reintentar
+            job = None
+    if job is None:
+        return None, False
+
+    from .tasks import run_export_job
+
+    job_id = job.id
+    transaction.on_commit(lambda: run_export_job.delay(job_id))
+    return job, True
+
+
+def run_job(job_id):
+    """Genera el archivo de ``job_id``; no hace nada si otro worker ya lo tomó."""
+    now = timezone.now()
+    claimed = ExportJob.objects.filter(pk=job_id, status='pending').update(
+        status='running', started_at=now, heartbeat_at=now,
+    )
+    if not claimed:
+        return None
+    job = ExportJob.objects.select_related('tenant').get(pk=job_id)
+
+    def progress(rows):
+        ExportJob.objects.filter(pk=job_id).update(rows_written=rows, heartbeat_at=timezone.now())
+
+    try:
+        with tempfile.TemporaryFile() as target:
+            write_export(
+                job.report_type, job.file_format, job.tenant, target,
+                branch_id=job.branch_id, progress=progress,
+            )
+            target.seek(0)
+            stamp = timezone.now().strftime('%Y%m%d_%H%M%S')
+            job.file.save(f'{job.report_type}_report_{stamp}.{job.file_format}', File(target), save=False)
+    except Exception as exc:
+        logger.exception("Export job failed job_id=%s", job_id)
+        ExportJob.objects.filter(pk=job_id).update(
+            status='failed', error=str(exc)[:1000], finished_at=timezone.now(),
+        )
+        return None
+
+    now = timezone.now()
+    ExportJob.objects.filter(pk=job_id).update(
+        status='completed', file=job.file.name, finished_at=now,
+        expires_at=now + timedelta(hours=EXPORT_JOB_RETENTION_HOURS),
+    )
+    return job.file.name
+
+
+def purge_expired_jobs():
+    """Borra archivos y registros vencidos; devuelve cuántos.
+
+    También borra los fallidos y los que quedaron en curso (worker caído) tras
+    EXPORT_JOB_RETENTION_HOURS, para que no bloqueen la deduplicación.
+    """
+    now = timezone.now()
+    stale = ExportJob.objects.filter(
+        Q(expires_at__lt=now)
+        | (~Q(status='completed') & Q(created_at__lt=now - timedelta(hours=EXPORT_JOB_RETENTION_HOURS)))
+    )
+    deleted = 0
+    for job in stale.iterator():
+        if job.file:
+            try:
+                job.file.delete(save=False)
+            except Exception:
+                logger.exception("Could not delete export file job_id=%s", job.id)
+                continue
+        job.delete()
+        deleted += 1
+    return deleted
+
+
+# --- Tokens de descarga --------------------------------------------------------
+
+def download_token(job):
+    return signing.TimestampSigner(salt=DOWNLOAD_TOKEN_SALT).sign(str(job.pk))
+
+
+def job_id_from_token(token):
+    """``job_id`` del token o ``None`` si es inválido o venció."""
+    try:
+        value = signing.TimestampSigner(salt=DOWNLOAD_TOKEN_SALT).unsign(token, max_age=EXPORT_DOWNLOAD_TOKEN_TTL)
+    except signing.BadSignature:
+        return None
+    return int(value) if value.isdigit() else None
+
+
+def download_filename(job):
+    return os.path.basename(job.file.name)
@@ -0,0 +1,312 @@
+"""Exportación de reportes a CSV/XLSX en streaming.
+
+Las filas se leen en bloques de EXPORT_CHUNK_SIZE paginados por clave, así que
+solo hay un bloque en memoria y no se depende de cursores del servidor.
+"""
+import csv
+import tempfile
+
+from django.db.models import Q, Sum
+from django.http import FileResponse, StreamingHttpResponse
+from django.utils import timezone
+
+from apps.pos_api.sales_stats import tenant_timezone
+
+EXPORT_CHUNK_SIZE = 2000
+
+XLSX_CONTENT_TYPE = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+
+FILE_FORMATS = ('xlsx', 'csv')
+
+EMPTY = '—'
+
+
+class ExportSpec:
+    """Encabezados, anchos de columna (XLSX) y generador de filas de un reporte."""
+
+    def __init__(self, headers, rows, widths=None):
+        self.headers = headers
+        self.rows = rows
+        self.widths = widths or {}
+
+
+def _datetime(value, tz, default=''):
+    return timezone.localtime(value, tz).strftime('%Y-%m-%d %H:%M') if value else default
+
+
+def _iterate(queryset, order, *fields):
+    """Tuplas ``fields`` de ``queryset`` en orden ``order`` con paginación por clave.
+
+    Cada bloque es una consulta ``WHERE (orden, id) > último LIMIT n``; ``id``
+    desempata filas con el mismo valor de orden.
+    """
+    name = order.lstrip('-')
+    lookup = 'lt' if order.startswith('-') else 'gt'
+    keys = ('id',) if name == 'id' else (name, 'id')
+    queryset = queryset.order_by(*(f'-{key}' if lookup == 'lt' else key for key in keys))
+    page = queryset
+    while True:
+        rows = list(page.values_list(*keys, *fields)[:EXPORT_CHUNK_SIZE])
+        for row in rows:
+            yield row[len(keys):]
+        if len(rows) < EXPORT_CHUNK_SIZE:
+            return
+        last = rows[-1]
+        if name == 'id':
+            page = queryset.filter(**{f'id__{lookup}': last[0]})
+        else:
+            page = queryset.filter(
+                Q(**{f'{name}__{lookup}': last[0]}) | Q(**{name: last[0], f'id__{lookup}': last[1]})
+            )
+
+
+def _sales_rows(tenant, branch_id, tz):
+    from apps.pos_api.models import Sale
+
+    sales = Sale.objects.filter(tenant=tenant)
+    if branch_id:
+        sales = sales.filter(branch_id=branch_id)
+    rows = _iterate(
+        sales, '-date_time',
+        'id', 'date_time', 'client__full_name', 'employee__user__full_name',
+        'total', 'payment_method', 'status', 'branch__name',
+    )
+    for pk, date_time, client, employee, total, method, status, branch in rows:
+        yield (
+            pk, _datetime(date_time, tz), client or EMPTY, employee or EMPTY,
+            float(total), method or EMPTY, status or EMPTY, branch or EMPTY,
+        )
+
+
+def _appointments_rows(tenant, branch_id, tz):
+    from apps.appointments_api.models import Appointment
+
+    appointments = Appointment.objects.filter(client__tenant=tenant)
+    if branch_id:
+        appointments = appointments.filter(branch_id=branch_id)
+    rows = _iterate(
+        appointments, '-date_time',
+        'id', 'date_time', 'client__full_name', 'service__name', 'stylist__full_name', 'status', 'branch__name',
+    )
+    for pk, date_time, client, service, stylist, status, branch in rows:
+        yield (
+            pk, _datetime(date_time, tz), client or EMPTY, service or EMPTY,
+            stylist or EMPTY, status or EMPTY, branch or EMPTY,
+        )
+
+
+def _employees_rows(tenant, branch_id, tz):
+    from apps.employees_api.models import Employee
+
+    employees = Employee.objects.filter(tenant=tenant)
+    if branch_id:
+        employees = employees.filter(branch_id=branch_id)
+    rows = _iterate(
+        employees, 'id',
+        'id', 'user__full_name', 'user__email', 'phone', 'user__business_role', 'specialty', 'is_active', 'branch__name',
+    )
+    for pk, name, email, phone, role, specialty, is_active, branch in rows:
+        yield (
+            pk, name or EMPTY, email or EMPTY, phone or EMPTY, role or EMPTY,
+            specialty or EMPTY, 'Activo' if is_active else 'Inactivo', branch or EMPTY,
+        )
+
+
+def _clients_rows(tenant, branch_id, tz):
+    from apps.clients_api.models import Client
+
+    genders = dict(Client.GENDER_CHOICES)
+    clients = Client.objects.filter(tenant=tenant)
+    if branch_id:
+        clients = clients.filter(branch_id=branch_id)
+    rows = _iterate(
+        clients, '-created_at',
+        'id', 'full_name', 'email', 'phone', 'gender', 'birthday', 'notes', 'is_active', 'branch__name',
+    )
+    for pk, name, email, phone, gender, birthday, notes, is_active, branch in rows:
+        yield (
+            pk, name, email or EMPTY, phone or EMPTY,
+            genders.get(gender, EMPTY) if gender else EMPTY,
+            birthday.strftime('%Y-%m-%d') if birthday else EMPTY,
+            notes or EMPTY, 'Activo' if is_active else 'Inactivo', branch or EMPTY,
+        )
+
+
+def _sold_items_rows(model_name):
+    def rows(tenant, branch_id, tz):
+        from apps.pos_api.models import SaleDetail
+
+        details = SaleDetail.objects.filter(sale__tenant=tenant, content_type__model=model_name)
+        if branch_id:
+            details = details.filter(sale__branch_id=branch_id)
+        totals = details.values('name').annotate(
+            total_sold=Sum('quantity'),
+            total_revenue=Sum('price')
+        ).order_by('-total_revenue')
+        # Una fila por nombre de producto/servicio: acotado por el catálogo
+        for name, sold, revenue in totals.values_list('name', 'total_sold', 'total_revenue'):
+            yield name, sold, float(revenue)
+    return rows
+
+
+def _cash_registers_rows(tenant, branch_id, tz):
+    from apps.pos_api.models import CashRegister
+
+    registers = CashRegister.objects.filter(tenant=tenant)
+    if branch_id:
+        registers = registers.filter(branch_id=branch_id)
+    rows = _iterate(
+        registers, '-opened_at',
+        'id', 'opened_at', 'closed_at', 'user__full_name', 'user__email',
+        'initial_cash', 'cash_sales_total', 'final_cash', 'is_open', 'branch__name',
+    )
+    for pk, opened_at, closed_at, name, email, initial, cash_sales, final, is_open, branch in rows:
+        sales_amount = float(cash_sales or 0)
+        initial_cash = float(initial or 0)
+        final_cash = float(final or 0)
+        expected = initial_cash + sales_amount
+        yield (
+            pk, _datetime(opened_at, tz), _datetime(closed_at, tz, EMPTY), name or email or EMPTY,
+            initial_cash, sales_amount, expected,
+            final_cash if not is_open else 0.0,
+            final_cash - expected if not is_open else 0.0,
+            'Abierta' if is_open else 'Cerrada', branch or EMPTY,
+        )
+
+
+EXPORTS = {
+    'sales': ExportSpec(
+        ['ID', 'Fecha', 'Cliente', 'Empleado', 'Total', 'Método de pago', 'Estado', 'Sucursal'],
+        _sales_rows, {'C': 25, 'D': 25},
+    ),
+    'appointments': ExportSpec(
+        ['ID', 'Fecha', 'Cliente', 'Servicio', 'Empleado', 'Estado', 'Sucursal'],
+        _appointments_rows, {'C': 25, 'D': 22, 'E': 25},
+    ),
+    'employees': ExportSpec(
+        ['ID', 'Nombre', 'Email', 'Teléfono', 'Rol', 'Especialidad', 'Estado', 'Sucursal'],
+        _employees_rows, {'B': 25, 'C': 30},
+    ),
+    'clients': ExportSpec(
+        ['ID', 'Nombre', 'Email', 'Teléfono', 'Género', 'Cumpleaños', 'Notas', 'Estado', 'Sucursal'],
+        _clients_rows, {'B': 25, 'C': 30, 'G': 30},
+    ),
+    'services': ExportSpec(
+        ['Servicio', 'Cantidad vendida', 'Ingresos totales'],
+        _sold_items_rows('service'), {'A': 30, 'C': 18},
+    ),
+    'products': ExportSpec(
+        ['Producto', 'Cantidad vendida', 'Ingresos totales'],
+        _sold_items_rows('product'), {'A': 30, 'C': 18},
+    ),
+    'cash_registers': ExportSpec(
+        ['ID', 'Apertura', 'Cierre', 'Usuario', 'Monto Inicial', 'Ventas Efectivo', 'Monto Esperado',
+         'Monto Declarado', 'Diferencia', 'Estado', 'Sucursal'],
+        _cash_registers_rows, {'B': 18, 'C': 18, 'D': 25},
+    ),
+}
+
+
+# --- Escritores --------------------------------------------------------------
+
+class _Echo:
+    """Buffer mínimo para ``csv.writer``: devuelve la línea en vez de guardarla."""
+
+    def write(self, value):
+        return value
+
+
+def _csv_lines(spec, rows):
+    writer = csv.writer(_Echo())
+    # BOM para que Excel abra el archivo como UTF-8
+    yield '\ufeff' + writer.writerow(spec.headers)
+    for row in rows:
+        yield writer.writerow(row)
+
+
+def _report_styles():
+    from openpyxl.styles import Alignment, Border, Font, NamedStyle, PatternFill, Side
+
+    thin = Side(style='thin')
+    border = Border(left=thin, right=thin, top=thin, bottom=thin)
+    header = NamedStyle(
+        name='report_header',
+        font=Font(bold=True, color='FFFFFF', size=11),
+        fill=PatternFill(start_color='4F46E5', end_color='4F46E5', fill_type='solid'),
+        alignment=Alignment(horizontal='center', vertical='center'),
+        border=border,
+    )
+    cell = NamedStyle(name='report_cell', border=border)
+    return header, cell
+
+
+def write_xlsx(spec, rows, target):
+    """Escribe el reporte en ``target`` (archivo binario) con un workbook write-only."""
+    from openpyxl import Workbook
+    from openpyxl.cell import WriteOnlyCell
+
+    wb = Workbook(write_only=True)
+    header_style, cell_style = _report_styles()
+    wb.add_named_style(header_style)
+    wb.add_named_style(cell_style)
+
+    ws = wb.create_sheet()
+    ws.freeze_panes = 'A2'
+    for column, width in spec.widths.items():
+        ws.column_dimensions[column].width = width
+
+    def styled(value, style):
+        cell = WriteOnlyCell(ws, value=value)
+        cell.style = style
+        return cell
+
+    ws.append([styled(header, 'report_header') for header in spec.headers])
+    for row in rows:
+        ws.append([styled(value, 'report_cell') for value in row])
+    wb.save(target)
+
+
+def _with_progress(rows, progress):
+    written = 0
+    for row in rows:
+        yield row
+        written += 1
+        if written % EXPORT_CHUNK_SIZE == 0:
+            progress(written)
+    progress(written)
+
+
+def write_export(report_type, file_format, tenant, target, branch_id=None, progress=None):
+    """Escribe el reporte en ``target`` (archivo binario) para los trabajos asíncronos.
+
+    ``progress(filas)`` se llama cada ``EXPORT_CHUNK_SIZE`` filas y al terminar.
+    """
+    spec = EXPORTS[report_type]
+    rows = spec.rows(tenant, branch_id, tenant_timezone(tenant))
+    if progress is not None:
+        rows = _with_progress(rows, progress)
+    if file_format == 'csv':
+        for line in _csv_lines(spec, rows):
+            target.write(line.encode('utf-8'))
+    else:
+        write_xlsx(spec, rows, target)
+
+
+def export_response(report_type, file_format, tenant, branch_id=None):
+    """Respuesta de descarga del reporte; ``None`` si ``report_type`` no existe."""
+    spec = EXPORTS.get(report_type)
+    if spec is None:
+        return None
+    rows = spec.rows(tenant, branch_id, tenant_timezone(tenant))
+    filename = f'{report_type}_report_{timezone.now().strftime("%Y%m%d_%H%M%S")}.{file_format}'
+
+    if file_format == 'csv':
+        response = StreamingHttpResponse(_csv_lines(spec, rows), content_type='text/csv; charset=utf-8')
+        response['Content-Disposition'] = f'attachment; filename="{filename}"'
+        return response
+
+    # El zip del XLSX se arma al final; se escribe a disco y se envía en bloques
+    target = tempfile.TemporaryFile()
+    write_xlsx(spec, rows, target)
+    target.seek(0)
+    return FileResponse(target, as_attachment=True, filename=filename, content_type=XLSX_CONTENT_TYPE)
@@ -0,0 +1,44 @@
+# Generated by Django 5.2.11 on 2026-10-17 19:41
+
+import apps.reports_api.models
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reports_api', '0001_initial'),
+        ('settings_api', '0012_systemsettings_azul_auth1_systemsettings_azul_auth2_and_more'),
+        ('tenants_api', '0011_remove_free_plan_type'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ExportJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('report_type', models.CharField(max_length=30)),
+                ('file_format', models.CharField(default='xlsx', max_length=4)),
+                ('params_hash', models.CharField(max_length=64)),
+                ('status', models.CharField(choices=[('pending', 'Pendiente'), ('running', 'En proceso'), ('completed', 'Completado'), ('failed', 'Fallido')], default='pending', max_length=10)),
+                ('rows_written', models.PositiveIntegerField(default=0)),
+                ('file', models.FileField(blank=True, storage=apps.reports_api.models.export_storage, upload_to='exports/%Y/%m/')),
+                ('error', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('started_at', models.DateTimeField(blank=True, null=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('expires_at', models.DateTimeField(blank=True, null=True)),
+                ('branch', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='export_jobs', to='settings_api.branch')),
+                ('requested_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='export_jobs', to=settings.AUTH_USER_MODEL)),
+                ('tenant', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='export_jobs', to='tenants_api.tenant')),
+            ],
+            options={
+                'ordering': ['-created_at'],
+                'indexes': [models.Index(fields=['params_hash', 'status'], name='reports_api_params__20e3bb_idx'), models.Index(fields=['expires_at'], name='reports_api_expires_c2c3c8_idx')],
+                'constraints': [models.UniqueConstraint(condition=models.Q(('status__in', ['pending', 'running'])), fields=('params_hash',), name='reports_export_job_active_uniq')],
+            },
+        ),
+    ]
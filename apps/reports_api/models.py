@@ -1,3 +1,4 @@
+from django.conf import settings
 from django.db import models
 
 class ReportPermission(models.Model):
@@ -13,3 +14,61 @@ class ReportPermission(models.Model):
             ('view_kpi_dashboard', 'Can view KPI dashboard'),
             ('view_advanced_analytics', 'Can view advanced analytics'),
         ]
+
+
+def export_storage():
+    """Storage de los archivos exportados (alias ``EXPORT_JOB_STORAGE`` de ``STORAGES``)."""
+    from django.core.files.storage import storages
+
+    return storages[getattr(settings, 'EXPORT_JOB_STORAGE', 'default')]
+
+
+class ExportJob(models.Model):
+    """Exportación de reporte generada en segundo plano (ver ``export_jobs``)."""
+    STATUS_CHOICES = [
+        ('pending', 'Pendiente'),
+        ('running', 'En proceso'),
+        ('completed', 'Completado'),
+        ('failed', 'Fallido'),
+    ]
+    ACTIVE_STATUSES = ('pending', 'running')
+
+    tenant = models.ForeignKey('tenants_api.Tenant', on_delete=models.CASCADE, related_name='export_jobs')
+    requested_by = models.ForeignKey(
+        settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True, related_name='export_jobs'
+    )
+    report_type = models.CharField(max_length=30)
+    file_format = models.CharField(max_length=4, default='xlsx')
+    branch = models.ForeignKey(
+        'settings_api.Branch', on_delete=models.SET_NULL, null=True, blank=True, related_name='export_jobs'
+    )
+    # Hash de tenant + parámetros: deduplica trabajos idénticos
+    params_hash = models.CharField(max_length=64)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending')
+    rows_written = models.PositiveIntegerField(default=0)
+    file = models.FileField(upload_to='exports/%Y/%m/', storage=export_storage, blank=True)
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    # Última señal de vida del worker (inicio y cada avance)
+    heartbeat_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    expires_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['params_hash', 'status']),
+            models.Index(fields=['expires_at']),
+        ]
+        constraints = [
+            # Un solo trabajo en curso por combinación de parámetros
+            models.UniqueConstraint(
+                fields=['params_hash'],
+                condition=models.Q(status__in=['pending', 'running']),
+                name='reports_export_job_active_uniq',
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.report_type}.{self.file_format} ({self.status})"
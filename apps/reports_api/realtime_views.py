@@ -3,20 +3,26 @@ from rest_framework.response import Response
 from apps.core.tenant_permissions import TenantPermissionByAction
 from apps.subscriptions_api.permissions import HasFeaturePermission
 from apps.subscriptions_api.access_control import has_feature
+from django.conf import settings
+from django.core.cache import cache
 from django.db.models import Count, Sum, F, Q
+from django.db.models.functions import TruncHour
 from django.utils import timezone
-from datetime import timedelta
+from datetime import timedelta, timezone as dt_timezone
 from apps.pos_api.models import Sale
 from apps.appointments_api.models import Appointment
 from apps.clients_api.models import Client
+from apps.pos_api.sales_stats import tenant_timezone
+
+LIVE_DASHBOARD_CACHE_TTL = getattr(settings, 'LIVE_DASHBOARD_CACHE_TTL', 15)
 
 
 def get_report_branch_id(request):
     branch_id = request.query_params.get('branch_id') or request.query_params.get('branch')
     user = request.user
     if user and getattr(user, 'is_authenticated', False) and not user.is_superuser:
-        from apps.auth_api.role_utils import get_effective_role_api
-        user_role = get_effective_role_api(user, tenant=getattr(request, 'tenant', user.tenant))
+        from apps.auth_api.request_context import get_request_role_api
+        user_role = get_request_role_api(request, tenant=getattr(request, 'tenant', user.tenant))
         if user_role != 'CLIENT_ADMIN' and hasattr(user, 'employee_profile') and user.employee_profile:
             if user.employee_profile.branch_id:
                 branch_id = user.employee_profile.branch_id
@@ -98,7 +104,12 @@ class RealtimeMetricsView(APIView):
 
 
 class LiveDashboardView(APIView):
-    """Datos para dashboard en vivo"""
+    """Datos para dashboard en vivo.
+
+    La pantalla la consulta todo el personal cada pocos segundos, así que el
+    resultado se comparte por tenant y sucursal durante
+    LIVE_DASHBOARD_CACHE_TTL segundos.
+    """
     permission_classes = [TenantPermissionByAction, HasFeaturePermission]
     required_feature = 'reports'
     permission_map = {
@@ -108,71 +119,93 @@ class LiveDashboardView(APIView):
     def get(self, request):
         tenant = getattr(request, 'tenant', request.user.tenant)
         branch_id = get_report_branch_id(request)
-        hourly_data = []
-        now = timezone.now()
-
-        for i in range(24):
-            hour_start = now.replace(minute=0, second=0, microsecond=0) - timedelta(hours=i)
-            hour_end = hour_start + timedelta(hours=1)
-
-            sale_filter = {
-                'tenant': tenant,
-                'date_time__gte': hour_start,
-                'date_time__lt': hour_end
-            }
-            if branch_id:
-                sale_filter['branch_id'] = branch_id
 
-            hour_sales = Sale.objects.filter(**sale_filter).aggregate(total=Sum('total'))['total'] or 0
-
-            hourly_data.insert(0, {
-                'hour': hour_start.strftime('%H:00'),
-                'sales': float(hour_sales)
-            })
+        # Todo el personal de la sucursal comparte la misma copia
+        cache_key = f'live_dashboard_{getattr(tenant, "id", "none")}_branch_{branch_id or "all"}'
+        data = cache.get(cache_key)
+        if data is None:
+            data = self.build(tenant, branch_id)
+            cache.set(cache_key, data, LIVE_DASHBOARD_CACHE_TTL)
+        return Response(data)
+
+    @staticmethod
+    def hourly_sales(tenant, branch_id, now, tz):
+        """Ventas de las últimas 24 horas (hora local del tenant) en una consulta."""
+        current_hour = timezone.localtime(now, tz).replace(minute=0, second=0, microsecond=0)
+        # Restar en UTC: la aritmética con zoneinfo es de reloj de pared
+        hours = [
+            timezone.localtime(current_hour.astimezone(dt_timezone.utc) - timedelta(hours=i), tz)
+            for i in range(23, -1, -1)
+        ]
+
+        sale_filter = {
+            'tenant': tenant,
+            'date_time__gte': hours[0],
+            'date_time__lt': hours[-1] + timedelta(hours=1),
+        }
+        if branch_id:
+            sale_filter['branch_id'] = branch_id
 
-        active_employees = []
+        totals = {
+            row['hour']: row['total']
+            for row in Sale.objects.filter(**sale_filter).annotate(
+                hour=TruncHour('date_time', tzinfo=tz)
+            ).values('hour').annotate(total=Sum('total')).order_by()
+        }
+        return [
+            {'hour': hour.strftime('%H:00'), 'sales': float(totals.get(hour) or 0)}
+            for hour in hours
+        ]
+
+    @staticmethod
+    def employee_status(tenant, branch_id, now):
+        """Estado de cada empleado activo con una sola consulta de citas para todos."""
         from apps.employees_api.models import Employee
 
         emp_filter = {'tenant': tenant, 'is_active': True}
         if branch_id:
             emp_filter['branch_id'] = branch_id
+        employees = list(Employee.objects.filter(**emp_filter).select_related('user'))
 
-        employees = Employee.objects.filter(**emp_filter)
-        for emp in employees:
-            apt_filter = {
-                'client__tenant': tenant,
-                'stylist': emp.user,
-                'date_time__gte': now - timedelta(minutes=30),
-                'date_time__lte': now + timedelta(hours=2),
-                'status': 'scheduled'
-            }
-            if branch_id:
-                apt_filter['branch_id'] = branch_id
+        apt_filter = {
+            'tenant': tenant,
+            'stylist_id__in': [emp.user_id for emp in employees],
+            'date_time__gte': now - timedelta(minutes=30),
+            'date_time__lte': now + timedelta(hours=2),
+            'status': 'scheduled'
+        }
+        if branch_id:
+            apt_filter['branch_id'] = branch_id
 
-            current_appointment = Appointment.objects.filter(**apt_filter).first()
+        # La primera cita de la ventana por estilista: la actual o la siguiente
+        current = {}
+        appointments = Appointment.objects.filter(**apt_filter).order_by('stylist_id', 'date_time').values(
+            'stylist_id', 'date_time', 'client__full_name'
+        )
+        for appointment in appointments:
+            current.setdefault(appointment['stylist_id'], appointment)
 
+        active_employees = []
+        for emp in employees:
+            appointment = current.get(emp.user_id)
             status = 'available'
-            next_client = None
-
-            if current_appointment:
-                if current_appointment.date_time <= now:
-                    status = 'busy'
-                else:
-                    status = 'scheduled'
-                next_client = current_appointment.client.full_name
-
+            if appointment:
+                status = 'busy' if appointment['date_time'] <= now else 'scheduled'
             active_employees.append({
                 'name': emp.user.full_name or emp.user.email,
                 'status': status,
-                'next_client': next_client,
-                'next_appointment': current_appointment.date_time.isoformat() if current_appointment else None
+                'next_client': appointment['client__full_name'] if appointment else None,
+                'next_appointment': appointment['date_time'].isoformat() if appointment else None
             })
+        return active_employees
 
-        return Response({
-            'hourly_sales': hourly_data,
-            'employee_status': active_employees,
+    def build(self, tenant, branch_id):
+        now = timezone.now()
+        return {
+            'hourly_sales': self.hourly_sales(tenant, branch_id, now, tenant_timezone(tenant)),
+            'employee_status': self.employee_status(tenant, branch_id, now),
             'last_updated': now.isoformat()
-        })
+        }
 
 
 class PerformanceAlertsView(APIView):
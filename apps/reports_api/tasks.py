@@ -0,0 +1,19 @@
+from celery import shared_task
+
+
+@shared_task
+def run_export_job(job_id):
+    """Genera el archivo de un ExportJob pendiente."""
+    from .export_jobs import run_job
+
+    name = run_job(job_id)
+    return f"Exportación {job_id}: {name or 'sin archivo'}"
+
+
+@shared_task
+def purge_export_jobs():
+    """Borra las exportaciones vencidas y sus archivos."""
+    from .export_jobs import purge_expired_jobs
+
+    deleted = purge_expired_jobs()
+    return f"Eliminadas {deleted} exportaciones"
@@ -0,0 +1,102 @@
+"""Métricas de empleados agrupadas (apps.reports_api.employee_metrics)."""
+from datetime import timedelta
+from decimal import Decimal
+
+from django.utils import timezone
+from rest_framework import status
+
+from apps.appointments_api.models import Appointment
+from apps.clients_api.models import Client
+from apps.employees_api.models import Employee
+from apps.pos_api.models import Sale
+from apps.pos_api.sales_stats import tenant_timezone
+from apps.pos_api.testing import TenantAPITestCase, create_test_user
+from apps.reports_api.analytics_views import calculate_employee_performance, calculate_internal_benchmarks
+from apps.reports_api.employee_metrics import employee_metrics
+
+
+class EmployeeMetricsTests(TenantAPITestCase):
+
+    plan_features = {'reports': True}
+    permission_apps = ('pos_api', 'reports_api')
+
+    def setUp(self):
+        super().setUp()
+        self.customer = Client.objects.create(full_name="Cliente Métricas", tenant=self.tenant)
+        self.now = timezone.now()
+        self.employees = []
+
+    def _employee(self, index, sales=(), appointments=()):
+        user = create_test_user(f"stylist{index}-metrics@test.com", tenant=self.tenant)
+        emp = Employee.objects.create(user=user, tenant=self.tenant)
+        for total in sales:
+            Sale.objects.create(tenant=self.tenant, user=user, employee=emp, date_time=self.now, total=total, paid=total)
+        for state in appointments:
+            Appointment.objects.create(
+                tenant=self.tenant, client=self.customer, stylist=user,
+                date_time=self.now - timedelta(hours=1), status=state,
+            )
+        self.employees.append(emp)
+        return emp
+
+    def _many(self, count):
+        for index in range(len(self.employees), len(self.employees) + count):
+            self._employee(index, sales=[10 * (index + 1)], appointments=['completed', 'scheduled'])
+
+    def test_metrics_are_joined_per_employee(self):
+        busy = self._employee(1, sales=[100, 50], appointments=['completed', 'completed', 'cancelled'])
+        idle = self._employee(2)
+        # Fuera de la ventana
+        Sale.objects.create(
+            tenant=self.tenant, user=busy.user, employee=busy,
+            date_time=self.now - timedelta(days=60), total=999, paid=999,
+        )
+
+        metrics = employee_metrics(self.tenant, self.employees, since=self.now - timedelta(days=30))
+
+        self.assertEqual(metrics[busy.id], {
+            'sales_total': Decimal('150.00'), 'sales_count': 2,
+            'appointments': 3, 'completed_appointments': 2,
+        })
+        self.assertEqual(metrics[idle.id]['sales_count'], 0)
+        self.assertEqual(metrics[idle.id]['appointments'], 0)
+
+    def test_employee_performance_query_budget_is_constant(self):
+        self._many(3)
+        with self.assertNumQueries(3):
+            small = calculate_employee_performance(self.tenant, 30)
+
+        self._many(12)
+        with self.assertNumQueries(3):
+            large = calculate_employee_performance(self.tenant, 30)
+
+        self.assertEqual(len(small), 3)
+        self.assertEqual(len(large), 15)
+        self.assertEqual(large[0]['completed_appointments'], 1)
+        self.assertEqual(large[0]['conversion_rate'], 50.0)
+
+    def test_internal_benchmarks_query_budget(self):
+        self._many(10)
+
+        with self.assertNumQueries(4):
+            benchmarks = calculate_internal_benchmarks(self.tenant)
+
+        self.assertEqual(benchmarks['best_employee'], self.employees[-1].user.full_name)
+        self.assertEqual(benchmarks['best_employee_sales'], 100.0)
+        self.assertEqual(benchmarks['best_month'], timezone.localtime(self.now, tenant_timezone(self.tenant)).month)
+
+    def test_employee_report_groups_by_employee(self):
+        first = self._employee(1, sales=[100])
+        second = self._employee(2, sales=[40])
+        # Mismo nombre: antes se fusionaban en una sola fila
+        second.user.full_name = first.user.full_name
+        second.user.save(update_fields=['full_name'])
+        inactive = self._employee(3)
+        Employee.objects.filter(pk=inactive.pk).update(is_active=False)
+
+        response = self.client.get('/api/reports/employees/')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK, response.data)
+        self.assertEqual(response.data['total_employees'], 3)
+        self.assertEqual(response.data['active_employees'], 2)
+        self.assertEqual([row['sales'] for row in response.data['top_performers']], [100.0, 40.0])
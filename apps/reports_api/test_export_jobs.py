@@ -0,0 +1,171 @@
+"""Exportaciones en segundo plano (apps.reports_api.export_jobs)."""
+import csv
+import io
+from datetime import timedelta
+from unittest import mock
+
+from django.db import IntegrityError
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from apps.pos_api.models import Sale
+from apps.pos_api.testing import TenantAPITestCase, create_test_user
+from apps.reports_api import export_jobs
+from apps.reports_api.models import ExportJob
+from apps.settings_api.models import Branch
+from apps.tenants_api.models import Tenant
+
+URL = '/api/reports/export/jobs/'
+
+
+class ExportJobTests(TenantAPITestCase):
+
+    plan_features = {'export_reports': True}
+    permission_apps = ('pos_api', 'reports_api')
+
+    def setUp(self):
+        super().setUp()
+        Sale.objects.bulk_create([
+            Sale(tenant=self.tenant, user=self.user, date_time=timezone.now(), total=25, paid=25)
+            for _ in range(3)
+        ])
+
+    def _request(self, **data):
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client.post(URL, {'type': 'sales', 'file_format': 'csv', **data}, format='json')
+
+    def test_job_runs_and_file_downloads_with_token(self):
+        created = self._request()
+        self.assertEqual(created.status_code, status.HTTP_202_ACCEPTED, created.data)
+
+        job = self.client.get(f"{URL}{created.data['id']}/")
+        self.assertEqual(job.data['status'], 'completed')
+        self.assertEqual(job.data['rows_written'], 3)
+
+        download = APIClient().get(job.data['download_url'])
+        self.assertEqual(download.status_code, status.HTTP_200_OK)
+        rows = list(csv.reader(io.StringIO(b''.join(download.streaming_content).decode('utf-8-sig'))))
+        self.assertEqual(len(rows), 4)
+
+    def test_identical_requests_reuse_the_job(self):
+        first = self._request()
+        second = self._request()
+        other_format = self._request(file_format='xlsx')
+
+        self.assertEqual(second.status_code, status.HTTP_200_OK)
+        self.assertEqual(second.data['id'], first.data['id'])
+        self.assertNotEqual(other_format.data['id'], first.data['id'])
+        self.assertEqual(ExportJob.objects.filter(tenant=self.tenant).count(), 2)
+
+    def test_stale_running_job_no_longer_blocks_identical_requests(self):
+        stale = ExportJob.objects.create(
+            tenant=self.tenant, report_type='sales', file_format='csv', status='running',
+            params_hash=export_jobs.params_hash(self.tenant.id, 'sales', 'csv'),
+            started_at=timezone.now() - timedelta(hours=1),
+            heartbeat_at=timezone.now() - timedelta(seconds=export_jobs.EXPORT_JOB_STALE_TIMEOUT + 1),
+        )
+
+        response = self._request()
+
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED, response.data)
+        self.assertNotEqual(response.data['id'], stale.id)
+        stale.refresh_from_db()
+        self.assertEqual(stale.status, 'failed')
+        self.assertEqual(ExportJob.objects.get(pk=response.data['id']).status, 'completed')
+
+    def test_pending_job_whose_message_was_lost_is_replaced(self):
+        lost = ExportJob.objects.create(
+            tenant=self.tenant, report_type='sales', file_format='csv',
+            params_hash=export_jobs.params_hash(self.tenant.id, 'sales', 'csv'),
+        )
+        ExportJob.objects.filter(pk=lost.pk).update(created_at=timezone.now() - timedelta(hours=5))
+
+        response = self._request()
+
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED, response.data)
+        self.assertNotEqual(response.data['id'], lost.id)
+        lost.refresh_from_db()
+        self.assertEqual(lost.status, 'failed')
+
+    def test_running_job_with_recent_progress_is_reused(self):
+        running = ExportJob.objects.create(
+            tenant=self.tenant, report_type='sales', file_format='csv', status='running',
+            params_hash=export_jobs.params_hash(self.tenant.id, 'sales', 'csv'),
+            started_at=timezone.now() - timedelta(hours=1), heartbeat_at=timezone.now(),
+        )
+
+        response = self._request()
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['id'], running.id)
+
+    def test_invalid_or_foreign_branch_is_rejected(self):
+        other_owner = create_test_user("owner-jobs3@test.com", is_superuser=True)
+        other_tenant = Tenant.objects.create(name="Ajeno", subdomain="ajeno-jobs", owner=other_owner)
+        foreign = Branch.objects.create(tenant=other_tenant, name="Ajena")
+        own = Branch.objects.create(tenant=self.tenant, name="Centro")
+
+        for branch_id in ('abc', 999999, foreign.id):
+            response = self._request(branch_id=branch_id)
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST, branch_id)
+        self.assertFalse(ExportJob.objects.exists())
+        self.assertEqual(self._request(branch_id=own.id).status_code, status.HTTP_202_ACCEPTED)
+
+    def test_lost_creation_race_is_retried(self):
+        winner = ExportJob.objects.create(
+            tenant=self.tenant, report_type='sales', file_format='csv', status='failed',
+            params_hash=export_jobs.params_hash(self.tenant.id, 'sales', 'csv'),
+        )
+        create = ExportJob.objects.create
+        attempts = []
+
+        def flaky_create(**kwargs):
+            attempts.append(kwargs)
+            if len(attempts) == 1:
+                raise IntegrityError('reports_export_job_active_uniq')
+            return create(**kwargs)
+
+        with mock.patch.object(ExportJob.objects, 'create', side_effect=flaky_create):
+            response = self._request()
+
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED, response.data)
+        self.assertEqual(len(attempts), 2)
+        self.assertNotEqual(response.data['id'], winner.id)
+
+        with mock.patch.object(ExportJob.objects, 'create', side_effect=IntegrityError('uniq')):
+            response = self.client.post(URL, {'type': 'sales', 'file_format': 'xlsx'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+
+    def test_download_rejects_bad_or_expired_tokens(self):
+        job_id = self._request().data['id']
+        job = ExportJob.objects.get(pk=job_id)
+        token = export_jobs.download_token(job)
+        url = f'{URL}{job_id}/download/'
+
+        self.assertEqual(APIClient().get(f'{url}?token=bad').status_code, status.HTTP_403_FORBIDDEN)
+        with mock.patch.object(export_jobs, 'EXPORT_DOWNLOAD_TOKEN_TTL', -1):
+            self.assertEqual(APIClient().get(f'{url}?token={token}').status_code, status.HTTP_403_FORBIDDEN)
+        other = ExportJob.objects.create(tenant=self.tenant, report_type='sales', params_hash='x')
+        self.assertEqual(
+            APIClient().get(f'{URL}{other.id}/download/?token={token}').status_code, status.HTTP_403_FORBIDDEN
+        )
+
+    def test_status_of_other_tenant_is_not_found(self):
+        other_owner = create_test_user("owner-jobs2@test.com", is_superuser=True)
+        other_tenant = Tenant.objects.create(name="Otro", subdomain="otro-jobs", owner=other_owner)
+        job = ExportJob.objects.create(tenant=other_tenant, report_type='sales', params_hash='y')
+
+        response = self.client.get(f'{URL}{job.id}/')
+
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_purge_removes_expired_jobs_and_files(self):
+        job = ExportJob.objects.get(pk=self._request().data['id'])
+        storage = job.file.storage
+        name = job.file.name
+        ExportJob.objects.filter(pk=job.pk).update(expires_at=timezone.now() - timedelta(minutes=1))
+
+        self.assertEqual(export_jobs.purge_expired_jobs(), 1)
+        self.assertFalse(ExportJob.objects.filter(pk=job.pk).exists())
+        self.assertFalse(storage.exists(name))
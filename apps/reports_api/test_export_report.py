@@ -0,0 +1,90 @@
+"""export_report en streaming (apps.reports_api.exporters)."""
+import csv
+import datetime
+import io
+from unittest import mock
+
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from openpyxl import load_workbook
+from rest_framework import status
+
+from apps.pos_api.models import CashRegister, Sale
+from apps.pos_api.testing import TenantAPITestCase
+from apps.reports_api import exporters
+
+URL = '/api/reports/export/'
+
+
+class ExportReportTests(TenantAPITestCase):
+
+    plan_features = {'export_reports': True}
+    permission_apps = ('pos_api', 'reports_api')
+
+    def setUp(self):
+        super().setUp()
+
+    def _sales(self, count):
+        now = timezone.now()
+        Sale.objects.bulk_create([
+            Sale(tenant=self.tenant, user=self.user, date_time=now, total=10, paid=10, payment_method='cash')
+            for _ in range(count)
+        ])
+
+    def test_csv_streams_every_row_past_the_old_cap(self):
+        self._sales(5003)
+
+        response = self.client.get(f'{URL}?type=sales&file_format=csv')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.streaming)
+        rows = list(csv.reader(io.StringIO(b''.join(response.streaming_content).decode('utf-8-sig'))))
+        self.assertEqual(rows[0][:2], ['ID', 'Fecha'])
+        self.assertEqual(len(rows), 5004)
+        self.assertEqual(rows[1][4], '10.0')
+
+    def test_rows_are_paged_by_key_without_server_side_cursors(self):
+        # Todas las ventas comparten date_time: el id desempata entre bloques
+        self._sales(5)
+
+        with mock.patch.object(exporters, 'EXPORT_CHUNK_SIZE', 2), CaptureQueriesContext(connection) as queries:
+            rows = list(exporters.EXPORTS['sales'].rows(self.tenant, None, datetime.timezone.utc))
+
+        ids = [row[0] for row in rows]
+        self.assertEqual(ids, sorted(Sale.objects.filter(tenant=self.tenant).values_list('id', flat=True), reverse=True))
+        self.assertEqual(len([q for q in queries if 'pos_api_sale' in q['sql']]), 3)
+
+    def test_xlsx_is_written_in_write_only_mode_with_named_styles(self):
+        self._sales(3)
+
+        response = self.client.get(f'{URL}?type=sales')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Type'], exporters.XLSX_CONTENT_TYPE)
+        wb = load_workbook(io.BytesIO(b''.join(response.streaming_content)))
+        ws = wb.active
+        self.assertEqual(ws.max_row, 4)
+        self.assertEqual(ws['A1'].value, 'ID')
+        self.assertEqual(ws['A1'].style, 'report_header')
+        self.assertEqual(ws['A2'].style, 'report_cell')
+        self.assertEqual(ws.freeze_panes, 'A2')
+
+    def test_cash_register_columns_line_up_with_headers(self):
+        register = CashRegister.objects.create(tenant=self.tenant, user=self.user, initial_cash=100)
+        CashRegister.objects.filter(pk=register.pk).update(cash_sales_total=50, final_cash=140, is_open=False)
+
+        response = self.client.get(f'{URL}?type=cash_registers&file_format=csv')
+
+        header, row = list(csv.reader(io.StringIO(b''.join(response.streaming_content).decode('utf-8-sig'))))
+        values = dict(zip(header, row))
+        self.assertEqual(len(row), len(header))
+        self.assertEqual(values['Monto Esperado'], '150.0')
+        self.assertEqual(values['Monto Declarado'], '140.0')
+        self.assertEqual(values['Diferencia'], '-10.0')
+        self.assertEqual(values['Estado'], 'Cerrada')
+
+    def test_invalid_type_or_format_is_rejected(self):
+        self.assertEqual(self.client.get(f'{URL}?type=nope').status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.client.get(f'{URL}?file_format=pdf').status_code, status.HTTP_400_BAD_REQUEST)
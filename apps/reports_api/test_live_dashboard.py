@@ -0,0 +1,83 @@
+"""LiveDashboardView: ventas por hora y estado de empleados en consultas fijas."""
+import zoneinfo
+from datetime import timedelta
+
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework import status
+
+from apps.appointments_api.models import Appointment
+from apps.clients_api.models import Client
+from apps.employees_api.models import Employee
+from apps.pos_api.models import Sale
+from apps.pos_api.testing import TenantAPITestCase, create_test_user
+from apps.reports_api.realtime_views import LiveDashboardView
+
+TZ = zoneinfo.ZoneInfo('America/Santo_Domingo')
+URL = '/api/reports/live-dashboard/'
+
+
+class LiveDashboardTests(TenantAPITestCase):
+
+    plan_features = {'reports': True}
+    permission_apps = ('pos_api', 'reports_api')
+
+    def setUp(self):
+        cache.clear()
+        super().setUp()
+        self.customer = Client.objects.create(full_name="Cliente Vivo", tenant=self.tenant)
+        self.now = timezone.now()
+
+    def _stylist(self, email):
+        user = create_test_user(email, tenant=self.tenant)
+        Employee.objects.create(user=user, tenant=self.tenant)
+        return user
+
+    def _appointment(self, stylist, minutes):
+        return Appointment.objects.create(
+            tenant=self.tenant, client=self.customer, stylist=stylist,
+            date_time=self.now + timedelta(minutes=minutes),
+        )
+
+    def test_hourly_sales_are_bucketed_in_tenant_hours(self):
+        Sale.objects.create(tenant=self.tenant, user=self.user, date_time=self.now, total=40, paid=40)
+        Sale.objects.create(tenant=self.tenant, user=self.user, date_time=self.now - timedelta(hours=2), total=15, paid=15)
+        Sale.objects.create(tenant=self.tenant, user=self.user, date_time=self.now - timedelta(hours=30), total=99, paid=99)
+
+        hourly = LiveDashboardView.hourly_sales(self.tenant, None, self.now, TZ)
+
+        self.assertEqual(len(hourly), 24)
+        self.assertEqual(hourly[-1], {'hour': timezone.localtime(self.now, TZ).strftime('%H:00'), 'sales': 40.0})
+        self.assertEqual(hourly[-3]['sales'], 15.0)
+        self.assertEqual(sum(row['sales'] for row in hourly), 55.0)
+
+    def test_employee_status_uses_one_appointment_query(self):
+        busy = self._stylist("busy-live@test.com")
+        scheduled = self._stylist("scheduled-live@test.com")
+        self._stylist("free-live@test.com")
+        self._appointment(busy, -10)
+        self._appointment(busy, 60)
+        self._appointment(scheduled, 45)
+
+        with CaptureQueriesContext(connection) as ctx:
+            rows = LiveDashboardView.employee_status(self.tenant, None, self.now)
+
+        by_name = {row['name']: row for row in rows}
+        self.assertEqual(by_name['Busy-Live']['status'], 'busy')
+        self.assertEqual(by_name['Scheduled-Live']['status'], 'scheduled')
+        self.assertEqual(by_name['Scheduled-Live']['next_client'], "Cliente Vivo")
+        self.assertEqual(by_name['Free-Live']['status'], 'available')
+        self.assertEqual(len(ctx.captured_queries), 2)
+
+    def test_polling_staff_share_the_cached_result(self):
+        first = self.client.get(URL)
+        self.assertEqual(first.status_code, status.HTTP_200_OK, first.data)
+
+        Sale.objects.create(tenant=self.tenant, user=self.user, date_time=self.now, total=40, paid=40)
+        with CaptureQueriesContext(connection) as ctx:
+            second = self.client.get(URL)
+
+        self.assertEqual(second.data, first.data)
+        self.assertFalse([q for q in ctx.captured_queries if 'pos_api_sale' in q['sql']])
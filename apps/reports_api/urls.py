@@ -27,6 +27,9 @@ urlpatterns = [
     
     # Export reports (Enterprise only)
     path('export/', views.export_report, name='export-report'),
+    path('export/jobs/', views.create_export_job, name='export-job-create'),
+    path('export/jobs/<int:pk>/', views.export_job_status, name='export-job-status'),
+    path('export/jobs/<int:pk>/download/', views.export_job_download, name='export-job-download'),
 
     # SuperAdmin reports
     path('admin/', views.AdminReportsView.as_view(), name='admin-reports'),
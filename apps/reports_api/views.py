@@ -1,4 +1,5 @@
-from rest_framework.decorators import api_view, permission_classes
+from rest_framework.decorators import api_view, authentication_classes, permission_classes
+from rest_framework.permissions import AllowAny
 from rest_framework.response import Response
 from rest_framework import views, status
 from apps.core.tenant_permissions import tenant_permission
@@ -16,14 +17,21 @@ from apps.settings_api.policy_utils import (
     calculate_platform_commission,
     calculate_platform_net_revenue,
 )
-from django.http import HttpResponse
+from apps.pos_api.sales_rollup import sales_by_day, sales_totals
+from apps.pos_api.sales_stats import tenant_timezone
+from django.http import FileResponse
+from django.urls import reverse
+from .exporters import EXPORTS, FILE_FORMATS, XLSX_CONTENT_TYPE, export_response
+from .export_jobs import download_filename, download_token, job_id_from_token, request_export
+from .models import ExportJob
+from apps.settings_api.models import Branch
 
 def get_report_branch_id(request):
     branch_id = request.query_params.get('branch_id') or request.query_params.get('branch')
     user = request.user
     if user and getattr(user, 'is_authenticated', False) and not user.is_superuser:
-        from apps.auth_api.role_utils import get_effective_role_api
-        user_role = get_effective_role_api(user, tenant=getattr(request, 'tenant', user.tenant))
+        from apps.auth_api.request_context import get_request_role_api
+        user_role = get_request_role_api(request, tenant=getattr(request, 'tenant', user.tenant))
         if user_role != 'CLIENT_ADMIN' and hasattr(user, 'employee_profile') and user.employee_profile:
             if user.employee_profile.branch_id:
                 branch_id = user.employee_profile.branch_id
@@ -47,18 +55,23 @@ def employee_report(request):
         sale_filter['branch_id'] = branch_id
         
     # Estadísticas básicas
-    total_employees = Employee.objects.filter(**employee_filter).count()
-    active_employees = Employee.objects.filter(**employee_filter, is_active=True).count()
+    counts = Employee.objects.filter(**employee_filter).aggregate(
+        total=Count('id'),
+        active=Count('id', filter=Q(is_active=True)),
+    )
+    total_employees = counts['total']
+    active_employees = counts['active']
     
     # Empleados por especialidad
     employees_by_specialty = Employee.objects.filter(
         **employee_filter, is_active=True
     ).values('specialty').annotate(count=Count('id'))
     
-    # Top performers REALES desde ventas
+    # Top performers REALES desde ventas (agrupado por empleado, no por nombre)
     top_performers = Sale.objects.filter(
         **sale_filter
     ).values(
+        'employee_id',
         'employee__user__full_name',
         'employee__specialty'
     ).annotate(
@@ -85,50 +98,33 @@ def employee_report(request):
 @requires_feature('reports')
 def sales_report(request):
     """Reporte básico de ventas"""
-    from apps.pos_api.models import Sale, SaleDetail
-    from django.utils import timezone
-    from datetime import datetime, timedelta
+    from apps.pos_api.models import SaleDetail
     
     tenant = getattr(request, 'tenant', request.user.tenant)
     branch_id = get_report_branch_id(request)
     
-    sale_filter = {'tenant': tenant}
     detail_filter = {'sale__tenant': tenant, 'content_type__model': 'service'}
     if branch_id:
-        sale_filter['branch_id'] = branch_id
         detail_filter['sale__branch_id'] = branch_id
 
-    now = timezone.now()
-    month_start = now.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
-    
-    # Ventas totales
-    total_sales = Sale.objects.filter(**sale_filter).aggregate(
-        total=Sum('total')
-    )['total'] or 0
-    
-    # Ventas del mes
-    monthly_sales = Sale.objects.filter(
-        **sale_filter,
-        date_time__gte=month_start
-    ).aggregate(total=Sum('total'))['total'] or 0
-    
-    # Ventas por día (últimos 7 días) — 1 query con TruncDate vs 7 queries individuales
-    from django.db.models.functions import TruncDate
-    week_ago = (now - timedelta(days=7)).replace(hour=0, minute=0, second=0, microsecond=0)
-    daily_qs = Sale.objects.filter(
-        **sale_filter,
-        date_time__gte=week_ago
-    ).annotate(
-        day=TruncDate('date_time')
-    ).values('day').annotate(
-        total=Sum('total')
-    ).order_by('day')
-    
-    daily_map = {d['day']: float(d['total']) for d in daily_qs}
-    sales_by_day = []
+    # Días cerrados desde el resumen diario; solo las ventas de hoy en vivo
+    today = timezone.localdate(timezone=tenant_timezone(tenant))
+    totals = sales_totals(tenant, {
+        'all': (None, today),
+        'month': (today.replace(day=1), today),
+    }, branch_id)
+    total_sales = totals['all']['revenue']
+    monthly_sales = totals['month']['revenue']
+    
+    # Ventas por día (últimos 7 días)
+    daily_map = {
+        row['local_date']: float(row['revenue'])
+        for row in sales_by_day(tenant, today - timedelta(days=6), today, branch_id)
+    }
+    sales_by_day_data = []
     for i in range(6, -1, -1):
-        day = (now - timedelta(days=i)).date()
-        sales_by_day.append({
+        day = today - timedelta(days=i)
+        sales_by_day_data.append({
             'date': day.strftime('%Y-%m-%d'),
             'sales': daily_map.get(day, 0)
         })
@@ -144,7 +140,7 @@ def sales_report(request):
     return Response({
         'total_sales': float(total_sales),
         'monthly_sales': float(monthly_sales),
-        'sales_by_day': sales_by_day,
+        'sales_by_day': sales_by_day_data,
         'top_services': list(top_services)
     })
 
@@ -156,7 +152,6 @@ def dashboard_stats(request):
     from django.core.cache import cache
     from apps.clients_api.models import Client
     from apps.employees_api.models import Employee
-    from apps.pos_api.models import Sale
     from apps.appointments_api.models import Appointment
     
     tenant = getattr(request, 'tenant', request.user.tenant)
@@ -170,21 +165,20 @@ def dashboard_stats(request):
         return Response(cached_data)
     
     month_start = timezone.now().replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+    today = timezone.localdate(timezone=tenant_timezone(tenant))
     
     employee_filter = {'tenant': tenant, 'is_active': True}
     appointment_filter = {'client__tenant': tenant, 'date_time__gte': month_start}
-    sale_filter = {'tenant': tenant, 'date_time__gte': month_start}
     
     if branch_id:
         employee_filter['branch_id'] = branch_id
         appointment_filter['branch_id'] = branch_id
-        sale_filter['branch_id'] = branch_id
         
     # Estadísticas básicas
     total_clients = Client.objects.filter(tenant=tenant, is_active=True).count()
     active_employees = Employee.objects.filter(**employee_filter).count()
     monthly_appointments = Appointment.objects.filter(**appointment_filter).count()
-    monthly_revenue = Sale.objects.filter(**sale_filter).aggregate(total=Sum('total'))['total'] or 0
+    monthly_revenue = sales_totals(tenant, {'month': (today.replace(day=1), today)}, branch_id)['month']['revenue']
 
     data = {
         'total_clients': total_clients,
@@ -235,29 +229,19 @@ def reports_by_type(request):
         return Response({'labels': labels, 'data': data})
         
     elif report_type == 'sales':
-        from apps.pos_api.models import Sale
-        from django.db.models import Sum
-        from datetime import datetime, timedelta
-        
-        # Últimos 6 meses de ventas
-        data = []
-        labels = []
+        # Últimos 6 meses de ventas (meses locales), una consulta al resumen diario
+        today = timezone.localdate(timezone=tenant_timezone(tenant))
+        periods = {}
+        month_start = today.replace(day=1)
         for i in range(6):
-            month_start = (timezone.now() - timedelta(days=30*i)).replace(day=1)
             month_end = (month_start + timedelta(days=32)).replace(day=1) - timedelta(days=1)
-            
-            filters = {
-                'tenant': tenant,
-                'date_time__gte': month_start,
-                'date_time__lte': month_end
-            }
-            if branch_id:
-                filters['branch_id'] = branch_id
-                
-            total = Sale.objects.filter(**filters).aggregate(total=Sum('total'))['total'] or 0
-            
-            data.insert(0, float(total))
-            labels.insert(0, month_start.strftime('%b'))
+            periods[month_start] = (month_start, month_end)
+            month_start = (month_start - timedelta(days=1)).replace(day=1)
+        totals = sales_totals(tenant, periods, branch_id)
+        
+        months = sorted(periods)
+        labels = [month.strftime('%b') for month in months]
+        data = [float(totals[month]['revenue']) for month in months]
         
         return Response({'labels': labels, 'data': data})
     
@@ -482,9 +466,7 @@ def kpi_dashboard(request):
     from django.core.cache import cache
     from apps.clients_api.models import Client
     from apps.employees_api.models import Employee
-    from apps.pos_api.models import Sale
     from apps.appointments_api.models import Appointment
-    from django.db.models import Sum, Count, Avg
     
     tenant = getattr(request, 'tenant', request.user.tenant)
     branch_id = get_report_branch_id(request)
@@ -496,31 +478,29 @@ def kpi_dashboard(request):
     if cached_data:
         return Response(cached_data)
     
-    today = timezone.now().date()
+    today = timezone.localdate(timezone=tenant_timezone(tenant))
     month_start = today.replace(day=1)
     week_start = today - timedelta(days=today.weekday())
     
-    sale_monthly_filter = {'tenant': tenant, 'date_time__date__gte': month_start}
     appointment_monthly_filter = {'client__tenant': tenant, 'date_time__date__gte': month_start}
-    
-    sale_weekly_filter = {'tenant': tenant, 'date_time__date__gte': week_start}
     appointment_weekly_filter = {'client__tenant': tenant, 'date_time__date__gte': week_start}
     
     employee_filter = {'tenant': tenant, 'is_active': True}
     
     if branch_id:
-        sale_monthly_filter['branch_id'] = branch_id
         appointment_monthly_filter['branch_id'] = branch_id
-        sale_weekly_filter['branch_id'] = branch_id
         appointment_weekly_filter['branch_id'] = branch_id
         employee_filter['branch_id'] = branch_id
     
+    # Ventas del mes y de la semana desde el resumen diario (hoy en vivo)
+    sales = sales_totals(tenant, {'month': (month_start, today), 'week': (week_start, today)}, branch_id)
+    
     # KPIs del mes
-    monthly_revenue = Sale.objects.filter(**sale_monthly_filter).aggregate(total=Sum('total'))['total'] or 0
+    monthly_revenue = sales['month']['revenue']
     monthly_appointments = Appointment.objects.filter(**appointment_monthly_filter).count()
     
     # KPIs de la semana
-    weekly_revenue = Sale.objects.filter(**sale_weekly_filter).aggregate(total=Sum('total'))['total'] or 0
+    weekly_revenue = sales['week']['revenue']
     weekly_appointments = Appointment.objects.filter(**appointment_weekly_filter).count()
     
     # KPIs generales (Clients are global, Employees scoped)
@@ -528,7 +508,7 @@ def kpi_dashboard(request):
     active_employees = Employee.objects.filter(**employee_filter).count()
     
     # Ticket promedio
-    avg_ticket = Sale.objects.filter(**sale_monthly_filter).aggregate(avg=Avg('total'))['avg'] or 0
+    avg_ticket = monthly_revenue / sales['month']['sales_count'] if sales['month']['sales_count'] else 0
     
     data = {
         'monthly': {
@@ -640,218 +620,94 @@ def client_analytics(request):
 @permission_classes([tenant_permission('reports_api.view_sales_reports')])
 @requires_feature('export_reports')
 def export_report(request):
-    """Exportar reportes a Excel - Solo Enterprise"""
-    from openpyxl import Workbook
-    from openpyxl.styles import Font, PatternFill, Alignment, Border, Side
-
+    """Exportar reportes a Excel o CSV - Solo Enterprise"""
     report_type = request.GET.get('type', 'sales')
+    file_format = request.GET.get('file_format', 'xlsx')
     tenant = getattr(request, 'tenant', request.user.tenant)
     branch_id = get_report_branch_id(request)
 
-    wb = Workbook()
-    ws = wb.active
-
-    header_font = Font(bold=True, color='FFFFFF', size=11)
-    header_fill = PatternFill(start_color='4F46E5', end_color='4F46E5', fill_type='solid')
-    header_alignment = Alignment(horizontal='center', vertical='center')
-    thin_border = Border(
-        left=Side(style='thin'),
-        right=Side(style='thin'),
-        top=Side(style='thin'),
-        bottom=Side(style='thin')
-    )
+    if file_format not in FILE_FORMATS:
+        return Response({'error': f'Formato inválido: {file_format}'}, status=400)
 
-    def style_header(ws, headers):
-        for col, header in enumerate(headers, 1):
-            cell = ws.cell(row=1, column=col, value=header)
-            cell.font = header_font
-            cell.fill = header_fill
-            cell.alignment = header_alignment
-            cell.border = thin_border
-        ws.freeze_panes = 'A2'
+    response = export_response(report_type, file_format, tenant, branch_id)
+    if response is None:
+        return Response({'error': f'Tipo de reporte inválido: {report_type}'}, status=400)
+    return response
 
-    filters = {}
-    if branch_id:
-        filters['branch_id'] = branch_id
 
-    if report_type == 'sales':
-        from apps.pos_api.models import Sale
-        headers = ['ID', 'Fecha', 'Cliente', 'Empleado', 'Total', 'Método de pago', 'Estado', 'Sucursal']
-        style_header(ws, headers)
-
-        base_filter = {'tenant': tenant}
-        base_filter.update(filters)
-        sales = Sale.objects.filter(**base_filter).select_related(
-            'client', 'employee__user', 'branch'
-        ).order_by('-date_time')[:5000]
-
-        for row_idx, sale in enumerate(sales, 2):
-            ws.cell(row=row_idx, column=1, value=sale.id).border = thin_border
-            ws.cell(row=row_idx, column=2, value=sale.date_time.strftime('%Y-%m-%d %H:%M') if sale.date_time else '').border = thin_border
-            ws.cell(row=row_idx, column=3, value=sale.client.full_name if sale.client else '—').border = thin_border
-            ws.cell(row=row_idx, column=4, value=sale.employee.user.full_name if sale.employee and sale.employee.user else '—').border = thin_border
-            ws.cell(row=row_idx, column=5, value=float(sale.total)).border = thin_border
-            ws.cell(row=row_idx, column=6, value=sale.payment_method or '—').border = thin_border
-            ws.cell(row=row_idx, column=7, value=sale.status or '—').border = thin_border
-            ws.cell(row=row_idx, column=8, value=sale.branch.name if sale.branch else '—').border = thin_border
-        ws.column_dimensions['C'].width = 25
-        ws.column_dimensions['D'].width = 25
-
-    elif report_type == 'appointments':
-        from apps.appointments_api.models import Appointment
-        headers = ['ID', 'Fecha', 'Cliente', 'Servicio', 'Empleado', 'Estado', 'Sucursal']
-        style_header(ws, headers)
-
-        base_filter = {'client__tenant': tenant}
-        base_filter.update(filters)
-        appointments = Appointment.objects.filter(**base_filter).select_related(
-            'client', 'service', 'stylist', 'branch'
-        ).order_by('-date_time')[:5000]
-
-        for row_idx, apt in enumerate(appointments, 2):
-            ws.cell(row=row_idx, column=1, value=apt.id).border = thin_border
-            ws.cell(row=row_idx, column=2, value=apt.date_time.strftime('%Y-%m-%d %H:%M') if apt.date_time else '').border = thin_border
-            ws.cell(row=row_idx, column=3, value=apt.client.full_name if apt.client else '—').border = thin_border
-            ws.cell(row=row_idx, column=4, value=apt.service.name if apt.service else '—').border = thin_border
-            ws.cell(row=row_idx, column=5, value=apt.stylist.full_name if apt.stylist else '—').border = thin_border
-            ws.cell(row=row_idx, column=6, value=apt.status or '—').border = thin_border
-            ws.cell(row=row_idx, column=7, value=apt.branch.name if apt.branch else '—').border = thin_border
-        ws.column_dimensions['C'].width = 25
-        ws.column_dimensions['D'].width = 22
-        ws.column_dimensions['E'].width = 25
-
-    elif report_type == 'employees':
-        from apps.employees_api.models import Employee
-        headers = ['ID', 'Nombre', 'Email', 'Teléfono', 'Rol', 'Especialidad', 'Estado', 'Sucursal']
-        style_header(ws, headers)
-
-        base_filter = {'tenant': tenant}
-        base_filter.update(filters)
-        employees = Employee.objects.filter(**base_filter).select_related('user', 'branch')
-
-        for row_idx, emp in enumerate(employees, 2):
-            ws.cell(row=row_idx, column=1, value=emp.id).border = thin_border
-            ws.cell(row=row_idx, column=2, value=emp.user.full_name if emp.user else '—').border = thin_border
-            ws.cell(row=row_idx, column=3, value=emp.user.email if emp.user else '—').border = thin_border
-            ws.cell(row=row_idx, column=4, value=emp.phone or '—').border = thin_border
-            ws.cell(row=row_idx, column=5, value=emp.user.business_role if emp.user else '—').border = thin_border
-            ws.cell(row=row_idx, column=6, value=emp.specialty or '—').border = thin_border
-            ws.cell(row=row_idx, column=7, value='Activo' if emp.is_active else 'Inactivo').border = thin_border
-            ws.cell(row=row_idx, column=8, value=emp.branch.name if emp.branch else '—').border = thin_border
-        ws.column_dimensions['B'].width = 25
-        ws.column_dimensions['C'].width = 30
-
-    elif report_type == 'clients':
-        from apps.clients_api.models import Client
-        headers = ['ID', 'Nombre', 'Email', 'Teléfono', 'Género', 'Cumpleaños', 'Notas', 'Estado', 'Sucursal']
-        style_header(ws, headers)
-
-        base_filter = {'tenant': tenant}
-        if branch_id:
-            base_filter['branch_id'] = branch_id
-        clients = Client.objects.filter(**base_filter).select_related('branch').order_by('-created_at')[:5000]
-
-        for row_idx, client in enumerate(clients, 2):
-            ws.cell(row=row_idx, column=1, value=client.id).border = thin_border
-            ws.cell(row=row_idx, column=2, value=client.full_name).border = thin_border
-            ws.cell(row=row_idx, column=3, value=client.email or '—').border = thin_border
-            ws.cell(row=row_idx, column=4, value=client.phone or '—').border = thin_border
-            ws.cell(row=row_idx, column=5, value=dict(client.GENDER_CHOICES).get(client.gender, '—') if client.gender else '—').border = thin_border
-            ws.cell(row=row_idx, column=6, value=client.birthday.strftime('%Y-%m-%d') if client.birthday else '—').border = thin_border
-            ws.cell(row=row_idx, column=7, value=client.notes or '—').border = thin_border
-            ws.cell(row=row_idx, column=8, value='Activo' if client.is_active else 'Inactivo').border = thin_border
-            ws.cell(row=row_idx, column=9, value=client.branch.name if client.branch else '—').border = thin_border
-        ws.column_dimensions['B'].width = 25
-        ws.column_dimensions['C'].width = 30
-        ws.column_dimensions['G'].width = 30
-
-    elif report_type == 'services':
-        from apps.pos_api.models import SaleDetail
-        headers = ['Servicio', 'Cantidad vendida', 'Ingresos totales']
-        style_header(ws, headers)
-
-        detail_filters = {
-            'sale__tenant': tenant,
-            'content_type__model': 'service'
-        }
-        if branch_id:
-            detail_filters['sale__branch_id'] = branch_id
-
-        services = SaleDetail.objects.filter(**detail_filters).values('name').annotate(
-            total_sold=Sum('quantity'),
-            total_revenue=Sum('price')
-        ).order_by('-total_revenue')[:5000]
-
-        for row_idx, svc in enumerate(services, 2):
-            ws.cell(row=row_idx, column=1, value=svc['name']).border = thin_border
-            ws.cell(row=row_idx, column=2, value=svc['total_sold']).border = thin_border
-            ws.cell(row=row_idx, column=3, value=float(svc['total_revenue'])).border = thin_border
-        ws.column_dimensions['A'].width = 30
-        ws.column_dimensions['C'].width = 18
-
-    elif report_type == 'products':
-        from apps.pos_api.models import SaleDetail
-        headers = ['Producto', 'Cantidad vendida', 'Ingresos totales']
-        style_header(ws, headers)
-
-        detail_filters = {
-            'sale__tenant': tenant,
-            'content_type__model': 'product'
-        }
-        if branch_id:
-            detail_filters['sale__branch_id'] = branch_id
-
-        products = SaleDetail.objects.filter(**detail_filters).values('name').annotate(
-            total_sold=Sum('quantity'),
-            total_revenue=Sum('price')
-        ).order_by('-total_revenue')[:5000]
-
-        for row_idx, prod in enumerate(products, 2):
-            ws.cell(row=row_idx, column=1, value=prod['name']).border = thin_border
-            ws.cell(row=row_idx, column=2, value=prod['total_sold']).border = thin_border
-            ws.cell(row=row_idx, column=3, value=float(prod['total_revenue'])).border = thin_border
-        ws.column_dimensions['A'].width = 30
-        ws.column_dimensions['C'].width = 18
-
-    elif report_type == 'cash_registers':
-        from apps.pos_api.models import CashRegister
-        headers = ['ID', 'Apertura', 'Cierre', 'Usuario', 'Monto Inicial', 'Ventas Efectivo', 'Monto Esperado', 'Monto Declarado', 'Diferencia', 'Estado', 'Sucursal']
-        style_header(ws, headers)
-
-        base_filter = {'tenant': tenant}
-        base_filter.update(filters)
-        registers = CashRegister.objects.filter(**base_filter).select_related(
-            'user', 'branch'
-        ).order_by('-opened_at')[:5000]
-
-        for row_idx, reg in enumerate(registers, 2):
-            sales_amount = float(reg.sales_amount)
-            initial_cash = float(reg.initial_cash)
-            final_cash = float(reg.final_cash)
-            expected = initial_cash + sales_amount
-            difference = final_cash - expected if not reg.is_open else 0.0
-
-            ws.cell(row=row_idx, column=1, value=reg.id).border = thin_border
-            ws.cell(row=row_idx, column=2, value=reg.opened_at.strftime('%Y-%m-%d %H:%M') if reg.opened_at else '').border = thin_border
-            ws.cell(row=row_idx, column=3, value=reg.closed_at.strftime('%Y-%m-%d %H:%M') if reg.closed_at else '—').border = thin_border
-            ws.cell(row=row_idx, column=4, value=getattr(reg.user, 'full_name', getattr(reg.user, 'email', '—'))).border = thin_border
-            ws.cell(row=row_idx, column=5, value=initial_cash).border = thin_border
-            ws.cell(row=row_idx, column=6, value=sales_amount).border = thin_border
-            ws.cell(row=row_idx, column=7, value=final_cash if not reg.is_open else 0.0).border = thin_border
-            ws.cell(row=row_idx, column=8, value=difference if not reg.is_open else 0.0).border = thin_border
-            ws.cell(row=row_idx, column=9, value='Abierta' if reg.is_open else 'Cerrada').border = thin_border
-            ws.cell(row=row_idx, column=10, value=reg.branch.name if reg.branch else '—').border = thin_border
-        
-        ws.column_dimensions['B'].width = 18
-        ws.column_dimensions['C'].width = 18
-        ws.column_dimensions['D'].width = 25
+def _export_job_data(request, job):
+    data = {
+        'id': job.id,
+        'report_type': job.report_type,
+        'file_format': job.file_format,
+        'status': job.status,
+        'rows_written': job.rows_written,
+        'error': job.error or None,
+        'created_at': job.created_at,
+        'finished_at': job.finished_at,
+        'expires_at': job.expires_at,
+        'download_url': None,
+    }
+    if job.status == 'completed' and job.file:
+        url = request.build_absolute_uri(reverse('export-job-download', args=[job.id]))
+        data['download_url'] = f'{url}?token={download_token(job)}'
+    return data
 
-    else:
+
+@api_view(['POST'])
+@permission_classes([tenant_permission('reports_api.view_sales_reports')])
+@requires_feature('export_reports')
+def create_export_job(request):
+    """Encolar una exportación; pedidos idénticos reutilizan el mismo trabajo"""
+    report_type = request.data.get('type', 'sales')
+    file_format = request.data.get('file_format', 'xlsx')
+    tenant = getattr(request, 'tenant', request.user.tenant)
+    branch_id = get_report_branch_id(request) or request.data.get('branch_id')
+
+    if file_format not in FILE_FORMATS:
+        return Response({'error': f'Formato inválido: {file_format}'}, status=400)
+    if report_type not in EXPORTS:
         return Response({'error': f'Tipo de reporte inválido: {report_type}'}, status=400)
+    if branch_id:
+        if not str(branch_id).isdigit() or not Branch.objects.filter(pk=branch_id, tenant=tenant).exists():
+            return Response({'error': 'Sucursal inválida'}, status=400)
+        branch_id = int(branch_id)
+
+    job, created = request_export(tenant, request.user, report_type, file_format, branch_id)
+    if job is None:
+        return Response(
+            {'error': 'Otra exportación idéntica se está creando, intente de nuevo'},
+            status=status.HTTP_409_CONFLICT
+        )
+    return Response(
+        _export_job_data(request, job),
+        status=status.HTTP_202_ACCEPTED if created else status.HTTP_200_OK
+    )
 
-    response = HttpResponse(
-        content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+
+@api_view(['GET'])
+@permission_classes([tenant_permission('reports_api.view_sales_reports')])
+@requires_feature('export_reports')
+def export_job_status(request, pk):
+    """Estado y avance de una exportación"""
+    tenant = getattr(request, 'tenant', request.user.tenant)
+    job = ExportJob.objects.filter(pk=pk, tenant=tenant).first()
+    if job is None:
+        return Response({'error': 'Exportación no encontrada'}, status=status.HTTP_404_NOT_FOUND)
+    return Response(_export_job_data(request, job))
+
+
+@api_view(['GET'])
+@authentication_classes([])
+@permission_classes([AllowAny])
+def export_job_download(request, pk):
+    """Descargar una exportación con el token firmado de ``download_url``"""
+    if job_id_from_token(request.GET.get('token', '')) != pk:
+        return Response({'error': 'Enlace inválido o vencido'}, status=status.HTTP_403_FORBIDDEN)
+    job = ExportJob.objects.filter(pk=pk, status='completed', expires_at__gt=timezone.now()).first()
+    if job is None or not job.file:
+        return Response({'error': 'Exportación no disponible'}, status=status.HTTP_404_NOT_FOUND)
+    content_type = 'text/csv; charset=utf-8' if job.file_format == 'csv' else XLSX_CONTENT_TYPE
+    return FileResponse(
+        job.file.open('rb'), as_attachment=True, filename=download_filename(job), content_type=content_type
     )
-    response['Content-Disposition'] = f'attachment; filename="{report_type}_report_{timezone.now().strftime("%Y%m%d_%H%M%S")}.xlsx"'
-    wb.save(response)
-    return response
@@ -2,7 +2,7 @@ import logging
 
 from django.contrib.auth.backends import BaseBackend
 from django.contrib.auth import get_user_model
-from .models import UserRole
+from .permission_cache import ANY_TENANT, get_compiled_permissions
 
 logger = logging.getLogger(__name__)
 User = get_user_model()
@@ -42,23 +42,13 @@ class RoleBasedPermissionBackend(BaseBackend):
         
         # Obtener tenant del usuario (no del request, backend no tiene acceso)
         # El filtrado por tenant se hace en la permission class de DRF
-        user_roles = UserRole.objects.filter(
-            user=user_obj
-        ).select_related('role').prefetch_related('role__permissions__content_type')
-        
-        for user_role in user_roles:
-            role = user_role.role
-            # Verificar permiso con app_label + codename
-            if role.permissions.filter(
-                content_type__app_label=app_label,
-                codename=codename
-            ).exists():
-                return True
+        compiled = get_compiled_permissions(user_obj, ANY_TENANT)
+        if compiled.has_perm(app_label, codename):
+            return True
 
-        role_names = list(user_roles.values_list('role__name', flat=True))
         logger.warning(
             "Backend: permiso denegado user=%s perm=%s.%s roles=%s",
-            user_obj.id, app_label, codename, role_names,
+            user_obj.id, app_label, codename, list(compiled.role_names),
         )
         return False
     
@@ -73,14 +63,7 @@ class RoleBasedPermissionBackend(BaseBackend):
             return True
             
         # Verificar si tiene algún permiso en el módulo a través de roles
-        user_roles = UserRole.objects.filter(user=user_obj).select_related('role')
-        
-        for user_role in user_roles:
-            role = user_role.role
-            if role.permissions.filter(content_type__app_label=app_label).exists():
-                return True
-                
-        return False
+        return get_compiled_permissions(user_obj, ANY_TENANT).has_module(app_label)
     
     def get_user_permissions(self, user_obj, obj=None):
         """
@@ -89,20 +72,7 @@ class RoleBasedPermissionBackend(BaseBackend):
         if not user_obj.is_active:
             return set()
         
-        user_roles = UserRole.objects.filter(
-            user=user_obj
-        ).select_related('role').prefetch_related('role__permissions__content_type')
-        
-        permissions = set()
-        for user_role in user_roles:
-            role = user_role.role
-            role_perms = role.permissions.select_related('content_type').values_list(
-                'content_type__app_label', 'codename'
-            )
-            for app_label, codename in role_perms:
-                permissions.add(f'{app_label}.{codename}')
-                
-        return permissions
+        return set(get_compiled_permissions(user_obj, ANY_TENANT).perms)
     
     def get_group_permissions(self, user_obj, obj=None):
         """
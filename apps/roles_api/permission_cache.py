@@ -0,0 +1,167 @@
+"""Permisos RBAC compilados por (usuario, tenant).
+
+Las comprobaciones de permisos (DRF permission classes, RoleBasedPermissionBackend
+y PermissionChecker) leen un ``CompiledPermissions`` con ``frozenset`` de
+``app_label.codename`` en lugar de consultar cada rol por separado. El conjunto
+se construye con una sola consulta y se cachea en el LRU del proceso y en el
+cache compartido.
+
+Invalidacion (ver signals.py): un cambio en Role o Role.permissions sube la
+version global de RBAC, porque los roles no tienen tenant y los comparten todos;
+un cambio en UserRole solo sube la version del usuario afectado. Las claves
+incluyen ambas versiones, asi que ningun worker vuelve a servir un conjunto
+anterior. Sin cache compartido (LocMem) la subida no llega a los demas workers
+y las entradas viven RBAC_PERMISSION_FALLBACK_TTL segundos.
+"""
+from __future__ import annotations
+
+import logging
+from dataclasses import dataclass
+
+from django.conf import settings
+from django.core.cache import cache
+
+from apps.utils.versioned_cache import LocalLRUCache, bump_cache_version, get_cache_version, is_shared_cache
+
+from .models import UserRole
+
+logger = logging.getLogger(__name__)
+
+RBAC_VERSION_KEY = 'rbac:version'
+RBAC_PERMISSION_CACHE_TTL = getattr(settings, 'RBAC_PERMISSION_CACHE_TTL', 300)
+RBAC_PERMISSION_LOCAL_TTL = getattr(settings, 'RBAC_PERMISSION_LOCAL_TTL', 30)
+RBAC_PERMISSION_FALLBACK_TTL = getattr(settings, 'RBAC_PERMISSION_FALLBACK_TTL', 10)
+RBAC_PERMISSION_LOCAL_MAXSIZE = getattr(settings, 'RBAC_PERMISSION_LOCAL_MAXSIZE', 4096)
+
+# Clave de tenant para las consultas sin filtro de tenant (backend de Django)
+ANY_TENANT = '*'
+
+_local_permissions = LocalLRUCache(maxsize=RBAC_PERMISSION_LOCAL_MAXSIZE, ttl=RBAC_PERMISSION_LOCAL_TTL)
+
+
+@dataclass(frozen=True)
+class CompiledPermissions:
+    """Permisos efectivos de un usuario en un tenant."""
+
+    role_names: tuple = ()
+    # 'app_label.codename'
+    perms: frozenset = frozenset()
+    # Solo codename, para PermissionChecker
+    codenames: frozenset = frozenset()
+    # Permisos declarados en Role.limits['permissions']
+    limit_permissions: frozenset = frozenset()
+
+    def has_perm(self, app_label, codename):
+        return f'{app_label}.{codename}' in self.perms
+
+    def has_codename(self, codename):
+        return codename in self.codenames or codename in self.limit_permissions
+
+    def has_module(self, app_label):
+        prefix = f'{app_label}.'
+        return any(perm.startswith(prefix) for perm in self.perms)
+
+
+def _user_version_key(user_id):
+    return f'{RBAC_VERSION_KEY}:user:{user_id}'
+
+
+def get_rbac_version(user_id=None):
+    """Version de RBAC (global y, con ``user_id``, la del usuario).
+
+    ``None`` si el cache compartido no responde.
+    """
+    version = get_cache_version(RBAC_VERSION_KEY)
+    if version is None or user_id is None:
+        return version
+    user_version = get_cache_version(_user_version_key(user_id))
+    if user_version is None:
+        return None
+    return f'{version}.{user_version}'
+
+
+def bump_rbac_version():
+    """Invalida los permisos de todos los usuarios (cambio en un Role)."""
+    _local_permissions.clear()
+    return bump_cache_version(RBAC_VERSION_KEY)
+
+
+def bump_user_rbac_version(user_id):
+    """Invalida los permisos de ``user_id`` en todos sus tenants (cambio en UserRole)."""
+    return bump_cache_version(_user_version_key(user_id))
+
+
+def _tenant_key(tenant):
+    if tenant is ANY_TENANT:
+        return ANY_TENANT
+    return getattr(tenant, 'pk', tenant)
+
+
+def _compile_permissions(user_id, tenant_key):
+    user_roles = UserRole.objects.filter(user_id=user_id)
+    if tenant_key is not ANY_TENANT:
+        user_roles = user_roles.filter(tenant_id=tenant_key)
+
+    role_names = []
+    limit_permissions = set()
+    role_ids = []
+    for role_id, role_name, limits in user_roles.values_list('role_id', 'role__name', 'role__limits'):
+        role_ids.append(role_id)
+        role_names.append(role_name)
+        if isinstance(limits, dict):
+            limit_permissions.update(limits.get('permissions') or [])
+
+    perms = set()
+    codenames = set()
+    if role_ids:
+        from django.contrib.auth.models import Permission
+
+        rows = Permission.objects.filter(roles__in=role_ids).values_list(
+            'content_type__app_label', 'codename'
+        ).distinct()
+        for app_label, codename in rows:
+            perms.add(f'{app_label}.{codename}')
+            codenames.add(codename)
+
+    return CompiledPermissions(
+        role_names=tuple(role_names),
+        perms=frozenset(perms),
+        codenames=frozenset(codenames),
+        limit_permissions=frozenset(limit_permissions),
+    )
+
+
+def get_compiled_permissions(user, tenant=ANY_TENANT):
+    """Permisos compilados de ``user`` en ``tenant``.
+
+    ``tenant=None`` considera solo asignaciones globales (tenant NULL);
+    ``ANY_TENANT`` considera las asignaciones de todos los tenants.
+    """
+    user_id = getattr(user, 'pk', user)
+    tenant_key = _tenant_key(tenant)
+
+    version = get_rbac_version(user_id)
+    if version is None:
+        return _compile_permissions(user_id, tenant_key)
+
+    local_key = (user_id, tenant_key, version)
+    compiled = _local_permissions.get(local_key)
+    if compiled is not None:
+        return compiled
+
+    shared_key = f'rbac:perms:{user_id}:{tenant_key}:{version}'
+    try:
+        compiled = cache.get(shared_key)
+    except Exception:
+        compiled = None
+
+    shared = is_shared_cache()
+    if compiled is None:
+        compiled = _compile_permissions(user_id, tenant_key)
+        try:
+            cache.set(shared_key, compiled, RBAC_PERMISSION_CACHE_TTL if shared else RBAC_PERMISSION_FALLBACK_TTL)
+        except Exception:
+            pass
+
+    _local_permissions.set(local_key, compiled, ttl=None if shared else RBAC_PERMISSION_FALLBACK_TTL)
+    return compiled
@@ -1,26 +1,13 @@
-from django.contrib.auth.models import Permission
 from .models import UserRole
+from .permission_cache import ANY_TENANT, get_compiled_permissions
 
 class PermissionChecker:
     
     @staticmethod
     def user_has_permission(user, permission_codename, tenant=None):
         """Verifica si el usuario tiene un permiso específico"""
-        user_roles = UserRole.objects.filter(user=user).select_related('role').prefetch_related('role__permissions')
-        
-        if tenant:
-            user_roles = user_roles.filter(tenant=tenant)
-        
-        for user_role in user_roles:
-            role = user_role.role
-            
-            if role.permissions.filter(codename=permission_codename).exists():
-                return True
-                
-            if permission_codename in role.limits.get('permissions', []):
-                return True
-                
-        return False
+        compiled = get_compiled_permissions(user, tenant or ANY_TENANT)
+        return compiled.has_codename(permission_codename)
     
     @staticmethod
     def user_can_access_module(user, module_name, tenant=None):
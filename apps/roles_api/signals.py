@@ -1,13 +1,15 @@
 import logging
 
-from django.db.models.signals import post_migrate, post_save
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_migrate, post_save
 from django.dispatch import receiver
 
 from apps.roles_api.default_permissions import (
     ensure_role_default_permissions,
     sync_all_default_role_permissions,
 )
-from apps.roles_api.models import Role
+from apps.roles_api.models import Role, UserRole
+from apps.roles_api.permission_cache import bump_rbac_version, bump_user_rbac_version
 
 
 logger = logging.getLogger(__name__)
@@ -37,3 +39,28 @@ def sync_system_role_permissions_after_migrate(sender, **kwargs):
 
     if synced:
         logger.info("Default role permissions synced after migrations: %s", synced)
+
+
+@receiver(post_save, sender=Role, dispatch_uid='roles_api_invalidate_rbac_on_role_save')
+@receiver(post_delete, sender=Role, dispatch_uid='roles_api_invalidate_rbac_on_role_delete')
+@receiver(m2m_changed, sender=Role.permissions.through, dispatch_uid='roles_api_invalidate_rbac_on_role_permissions')
+def invalidate_compiled_permissions(sender, **kwargs):
+    """Invalida los permisos compilados de todos los usuarios (ver permission_cache).
+
+    Los roles no pertenecen a un tenant, asi que un cambio afecta a todos.
+    Se invalida de inmediato y otra vez al commit, igual que los snapshots de tenant.
+    """
+    action = kwargs.get('action')
+    if action is not None and not action.startswith('post_'):
+        return
+    bump_rbac_version()
+    transaction.on_commit(bump_rbac_version)
+
+
+@receiver(post_save, sender=UserRole, dispatch_uid='roles_api_invalidate_rbac_on_user_role_save')
+@receiver(post_delete, sender=UserRole, dispatch_uid='roles_api_invalidate_rbac_on_user_role_delete')
+def invalidate_user_compiled_permissions(sender, instance, **kwargs):
+    """Invalida solo los permisos compilados del usuario de la asignacion."""
+    user_id = instance.user_id
+    bump_user_rbac_version(user_id)
+    transaction.on_commit(lambda: bump_user_rbac_version(user_id))
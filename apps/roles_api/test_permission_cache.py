@@ -0,0 +1,95 @@
+from unittest import mock
+
+import pytest
+from django.contrib.auth.models import Permission
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from apps.auth_api.factories import UserFactory
+from apps.core.tenant_permissions import _check_permission_in_db
+from apps.roles_api import permission_cache
+from apps.roles_api.backends import RoleBasedPermissionBackend
+from apps.roles_api.models import Role, UserRole
+from apps.roles_api.permission_checker import PermissionChecker
+
+
+@pytest.fixture(autouse=True)
+def _clear_local_permissions():
+    permission_cache._local_permissions.clear()
+    yield
+    permission_cache._local_permissions.clear()
+
+
+@pytest.fixture
+def cashier():
+    user = UserFactory()
+    role, _ = Role.objects.get_or_create(name='PermCacheRole')
+    role.permissions.set([Permission.objects.get(content_type__app_label='pos_api', codename='view_sale')])
+    UserRole.objects.create(user=user, role=role, tenant=user.tenant)
+    return user, role
+
+
+@pytest.mark.django_db
+def test_permission_checks_hit_database_once(cashier):
+    user, _ = cashier
+    assert _check_permission_in_db(user, user.tenant, 'pos_api', 'view_sale')
+
+    with CaptureQueriesContext(connection) as queries:
+        assert _check_permission_in_db(user, user.tenant, 'pos_api', 'view_sale')
+        assert not _check_permission_in_db(user, user.tenant, 'pos_api', 'delete_sale')
+
+    assert len(queries) == 0
+
+
+@pytest.mark.django_db
+def test_backend_and_checker_share_compiled_permissions(cashier):
+    user, role = cashier
+    role.limits = {'permissions': ['export_reports']}
+    role.save()
+    backend = RoleBasedPermissionBackend()
+
+    assert backend.has_perm(user, 'pos_api.view_sale')
+    assert backend.has_module_perms(user, 'pos_api')
+    assert not backend.has_perm(user, 'pos_api.delete_sale')
+    assert 'pos_api.view_sale' in backend.get_user_permissions(user)
+    assert PermissionChecker.user_has_permission(user, 'view_sale', tenant=user.tenant)
+    assert PermissionChecker.user_has_permission(user, 'export_reports')
+    assert not PermissionChecker.user_has_permission(user, 'view_sale', tenant=UserFactory().tenant)
+
+
+@pytest.mark.django_db
+def test_role_and_assignment_changes_invalidate_compiled_permissions(cashier):
+    user, role = cashier
+    assert not _check_permission_in_db(user, user.tenant, 'pos_api', 'add_sale')
+
+    role.permissions.add(Permission.objects.get(content_type__app_label='pos_api', codename='add_sale'))
+    assert _check_permission_in_db(user, user.tenant, 'pos_api', 'add_sale')
+
+    UserRole.objects.filter(user=user).delete()
+    assert not _check_permission_in_db(user, user.tenant, 'pos_api', 'add_sale')
+
+
+@pytest.mark.django_db
+def test_assignment_change_keeps_other_users_cached(cashier):
+    user, role = cashier
+    other = UserFactory()
+    UserRole.objects.create(user=other, role=role, tenant=other.tenant)
+    assert _check_permission_in_db(other, other.tenant, 'pos_api', 'view_sale')
+
+    UserRole.objects.filter(user=user).delete()
+
+    with CaptureQueriesContext(connection) as queries:
+        assert _check_permission_in_db(other, other.tenant, 'pos_api', 'view_sale')
+    assert len(queries) == 0
+    assert not _check_permission_in_db(user, user.tenant, 'pos_api', 'view_sale')
+
+
+@pytest.mark.django_db
+def test_unshared_cache_bounds_staleness_of_other_workers(cashier):
+    user, _ = cashier
+
+    with mock.patch.object(permission_cache, 'RBAC_PERMISSION_FALLBACK_TTL', 0):
+        assert _check_permission_in_db(user, user.tenant, 'pos_api', 'view_sale')
+        # Otro worker quita la asignacion: su subida de version no llega a este LocMem
+        UserRole.objects.filter(user=user).update(tenant=None)
+        assert not _check_permission_in_db(user, user.tenant, 'pos_api', 'view_sale')
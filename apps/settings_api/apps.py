@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class SettingsApiConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'apps.settings_api'
+
+    def ready(self):
+        import apps.settings_api.signals  # noqa: F401
@@ -1,5 +1,5 @@
 from django.conf import settings as django_settings
-from .models import SystemSettings
+from .settings_cache import get_cached_system_settings
 import os
 import logging
 
@@ -22,8 +22,8 @@ class IntegrationService:
 
     @staticmethod
     def get_system_settings():
-        """Obtener configuraciones del sistema"""
-        return SystemSettings.get_settings()
+        """Obtener configuraciones del sistema (copia cacheada en el proceso)"""
+        return get_cached_system_settings()
 
     @staticmethod
     def is_stripe_enabled():
@@ -1,6 +1,8 @@
 from django.http import JsonResponse
 from django.utils.deprecation import MiddlewareMixin
-from .models import SystemSettings
+from apps.auth_api.request_context import authenticate_request_user
+from apps.utils.route_policy import RouteFlag, get_route_policy
+from .settings_cache import get_cached_system_settings
 
 
 class MaintenanceModeMiddleware(MiddlewareMixin):
@@ -8,31 +10,14 @@ class MaintenanceModeMiddleware(MiddlewareMixin):
 
     def process_request(self, request):
         # Permitir acceso a admin, health checks y landing
-        if (request.path == '/admin' or request.path.startswith('/admin/') or 
-            request.path.startswith('/api/healthz/') or
-            request.path.startswith('/api/system-settings/') or
-            request.path.startswith('/api/settings/public-branding/') or
-            request.path.startswith('/landing') or
-            request.path.startswith('/pages/landing') or
-            request.path.startswith('/api/auth/register') or
-            request.path.startswith('/api/auth/login') or
-            request.path.startswith('/api/auth/cookie-login') or
-            request.path.startswith('/api/auth/cookie-refresh') or
-            request.path.startswith('/api/auth/verify')):
+        if RouteFlag.MAINTENANCE_EXEMPT in get_route_policy(request):
             return None
 
         try:
-            settings = SystemSettings.get_settings()
+            settings = get_cached_system_settings()
             if settings.maintenance_mode:
-                # Autenticar desde JWT cookies para detectar superadmins
-                if not (hasattr(request, 'user') and request.user.is_authenticated):
-                    try:
-                        from apps.auth_api.authentication import CookieJWTAuthentication
-                        auth_result = CookieJWTAuthentication().authenticate(request)
-                        if auth_result:
-                            request.user, _ = auth_result
-                    except Exception:
-                        pass
+                # Autenticar desde JWT (header o cookie) para detectar superadmins
+                authenticate_request_user(request)
 
                 # Permitir acceso solo a superusuarios
                 if not (getattr(request, 'user', None) and request.user.is_authenticated and request.user.is_superuser):
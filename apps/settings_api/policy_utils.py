@@ -6,9 +6,9 @@ DEFAULT_PLATFORM_COMMISSION_RATE = Decimal("5.00")
 
 def _get_system_settings():
     try:
-        from apps.settings_api.models import SystemSettings
+        from apps.settings_api.settings_cache import get_cached_system_settings
 
-        return SystemSettings.get_settings()
+        return get_cached_system_settings()
     except Exception:
         return None
 
@@ -0,0 +1,48 @@
+"""Cache por proceso del singleton SystemSettings.
+
+MaintenanceModeMiddleware lo consulta en cada request e IntegrationService en
+cada SMS/WhatsApp/email. La fila (ya con los secretos descifrados) se guarda
+solo en memoria del worker, nunca en Redis; en Redis vive únicamente un
+contador de version que se sube al guardar/borrar la fila (ver signals.py), así
+que todos los workers recargan en el siguiente acceso.
+
+Sin cache compartido (LocMem o Redis caído) la subida de version no llega a los
+demás procesos y la copia local expira a los SYSTEM_SETTINGS_FALLBACK_TTL
+segundos.
+"""
+import copy
+
+from django.conf import settings
+
+from apps.utils.versioned_cache import LocalLRUCache, bump_cache_version, get_cache_version, is_shared_cache
+
+from .models import SystemSettings
+
+SYSTEM_SETTINGS_VERSION_KEY = 'system_settings:version'
+SYSTEM_SETTINGS_LOCAL_TTL = getattr(settings, 'SYSTEM_SETTINGS_LOCAL_TTL', 300)
+SYSTEM_SETTINGS_FALLBACK_TTL = getattr(settings, 'SYSTEM_SETTINGS_FALLBACK_TTL', 10)
+
+_local_settings = LocalLRUCache(maxsize=4, ttl=SYSTEM_SETTINGS_LOCAL_TTL)
+
+
+def get_cached_system_settings():
+    """Copia de SystemSettings servida desde memoria del proceso.
+
+    Cada llamada devuelve una instancia propia: el llamador puede leerla sin
+    riesgo de ver cambios de otro hilo. Para modificar la configuración se
+    debe seguir usando ``SystemSettings.get_settings()``.
+    """
+    version = get_cache_version(SYSTEM_SETTINGS_VERSION_KEY)
+    local_key = ('system_settings', version)
+    instance = _local_settings.get(local_key)
+    if instance is None:
+        instance = SystemSettings.get_settings()
+        ttl = None if version is not None and is_shared_cache() else SYSTEM_SETTINGS_FALLBACK_TTL
+        _local_settings.set(local_key, instance, ttl=ttl)
+    return copy.deepcopy(instance)
+
+
+def invalidate_system_settings_cache():
+    """Descarta la copia local y sube la version para el resto de workers."""
+    _local_settings.clear()
+    bump_cache_version(SYSTEM_SETTINGS_VERSION_KEY)
@@ -0,0 +1,14 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .models import SystemSettings
+from .settings_cache import invalidate_system_settings_cache
+
+
+@receiver(post_save, sender=SystemSettings, dispatch_uid='settings_api_invalidate_system_settings_on_save')
+@receiver(post_delete, sender=SystemSettings, dispatch_uid='settings_api_invalidate_system_settings_on_delete')
+def invalidate_system_settings_on_change(sender, instance, **kwargs):
+    """Invalida la copia cacheada de SystemSettings de inmediato y otra vez al commit."""
+    invalidate_system_settings_cache()
+    transaction.on_commit(invalidate_system_settings_cache)
@@ -0,0 +1,86 @@
+import pytest
+from django.db import connection
+from django.test import RequestFactory
+from django.test.utils import CaptureQueriesContext
+
+from apps.settings_api import settings_cache
+from apps.settings_api.integration_service import IntegrationService
+from apps.settings_api.middleware import MaintenanceModeMiddleware
+from apps.settings_api.models import SystemSettings
+from apps.settings_api.settings_cache import get_cached_system_settings
+
+
+@pytest.fixture(autouse=True)
+def _clear_local_settings():
+    settings_cache._local_settings.clear()
+    yield
+    settings_cache._local_settings.clear()
+
+
+@pytest.mark.django_db
+def test_cached_settings_skip_database_after_first_read():
+    SystemSettings.get_settings()
+    get_cached_system_settings()
+
+    with CaptureQueriesContext(connection) as queries:
+        first = get_cached_system_settings()
+        second = IntegrationService.get_system_settings()
+
+    assert len(queries) == 0
+    assert first.pk == second.pk == 1
+    # Cada llamador recibe su propia copia
+    first.platform_name = 'Mutada'
+    assert get_cached_system_settings().platform_name != 'Mutada'
+
+
+@pytest.mark.django_db
+def test_saving_settings_invalidates_cached_copy():
+    settings_obj = SystemSettings.get_settings()
+    assert get_cached_system_settings().maintenance_mode is False
+
+    settings_obj.maintenance_mode = True
+    settings_obj.save()
+
+    assert get_cached_system_settings().maintenance_mode is True
+
+
+@pytest.mark.django_db
+def test_version_bump_from_another_worker_forces_reload():
+    SystemSettings.get_settings()
+    get_cached_system_settings()
+
+    SystemSettings.objects.filter(pk=1).update(platform_name='Otro worker')
+    assert get_cached_system_settings().platform_name != 'Otro worker'
+
+    # Otro proceso sube la version en el cache compartido
+    from apps.utils.versioned_cache import bump_cache_version
+    bump_cache_version(settings_cache.SYSTEM_SETTINGS_VERSION_KEY)
+
+    assert get_cached_system_settings().platform_name == 'Otro worker'
+
+
+@pytest.mark.django_db
+def test_maintenance_middleware_reads_cached_settings():
+    settings_obj = SystemSettings.get_settings()
+    settings_obj.maintenance_mode = True
+    settings_obj.save()
+    middleware = MaintenanceModeMiddleware(lambda request: None)
+    get_cached_system_settings()
+
+    with CaptureQueriesContext(connection) as queries:
+        response = middleware.process_request(RequestFactory().get('/api/tenants/current/'))
+
+    assert response.status_code == 503
+    assert len(queries) == 0
+
+
+@pytest.mark.parametrize('backend, shared', [
+    ('django.core.cache.backends.locmem.LocMemCache', False),
+    ('django_redis.cache.RedisCache', True),
+    ('django.core.cache.backends.memcached.PyMemcacheCache', True),
+])
+def test_is_shared_cache_detects_backend(settings, backend, shared):
+    from apps.utils.versioned_cache import is_shared_cache
+
+    settings.CACHES = {'default': {'BACKEND': backend}}
+    assert is_shared_cache() is shared
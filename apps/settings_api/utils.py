@@ -1,28 +1,16 @@
-from .models import SystemSettings
-from django.core.cache import cache
 from django.utils import timezone
 from apps.subscriptions_api.plan_consistency import build_plan_settings_snapshot, is_unlimited_limit
+from .settings_cache import get_cached_system_settings, invalidate_system_settings_cache
 
 
 def get_system_config():
-    """Obtener configuraciones del sistema con cache (fallback a DB si Redis no disponible)"""
-    try:
-        config = cache.get('system_settings')
-        if config:
-            return config
-    except Exception:
-        pass
-    config = SystemSettings.get_settings()
-    try:
-        cache.set('system_settings', config, 300)  # 5 minutos
-    except Exception:
-        pass
-    return config
+    """Obtener configuraciones del sistema desde el cache del proceso (ver settings_cache)"""
+    return get_cached_system_settings()
 
 
 def clear_system_config_cache():
     """Limpiar cache de configuraciones"""
-    cache.delete('system_settings')
+    invalidate_system_settings_cache()
 
 
 def validate_tenant_limit():
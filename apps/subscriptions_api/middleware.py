@@ -3,77 +3,35 @@ from django.utils.deprecation import MiddlewareMixin
 from django.utils import timezone
 from datetime import datetime
 from apps.subscriptions_api.models import UserSubscription
-from django.core.cache import cache
+from django.conf import settings
 import logging
-from apps.tenants_api.subscription_lifecycle import sync_subscription_state
-from apps.auth_api.role_utils import get_effective_role_name
+from apps.tenants_api.tenant_cache import sync_subscription_if_due
+from apps.auth_api.request_context import get_request_role
+from apps.utils.rate_limiter import GCRARateLimiter
+from apps.utils.route_policy import RouteFlag, get_route_policy
 
 logger = logging.getLogger(__name__)
 
-BILLING_WEBHOOK_PATHS = [
-    '/api/billing/webhooks/stripe/',
-    '/api/payments/stripe/webhook/',
-]
-
-BILLING_ACCESS_PATHS = [
-    '/api/payments/payments/create_subscription_payment/',
-    '/api/subscriptions/renew/',
-]
-
-PAYWALL_SAFE_PREFIXES = [
-    '/api/subscriptions/me/entitlements/',
-    '/api/subscriptions/renew/',
-    '/api/tenants/current/',
-    '/api/tenants/locale/',
-    '/api/tenants/subscription-status/',
-]
-
-PAYWALL_SAFE_READONLY_PREFIXES = [
-    '/api/notifications/',
-]
-
 class SubscriptionValidationMiddleware(MiddlewareMixin):
     """
     Middleware para validar estado de suscripción y expiración de planes
     """
     
     def process_request(self, request):
-        if any(request.path.startswith(prefix) for prefix in PAYWALL_SAFE_PREFIXES):
+        route = get_route_policy(request)
+        if route.is_paywall_safe or RouteFlag.WEBHOOK in route:
             return None
 
-        if request.method in ('GET', 'HEAD', 'OPTIONS'):
-            for prefix in PAYWALL_SAFE_READONLY_PREFIXES:
-                if request.path.startswith(prefix):
-                    return None
-
-        for exempt_path in BILLING_WEBHOOK_PATHS:
-            if request.path.startswith(exempt_path):
-                return None
-
         # Excluir rutas que no requieren validación
-        exempt_paths = [
-            '/api/auth/',
-            '/api/schema/',
-            '/api/docs/',
-            '/api/healthz/',
-            '/admin/',
-            '/api/subscriptions/plans/',  # Permitir ver planes
-            '/api/subscriptions/register/',  # Permitir registro
-            '/api/subscriptions/register-with-plan/',  # Permitir registro con plan
-            '/api/settings/contact/',
-            '/api/booking/',  # Auto-agendamiento público
-        ]
-        
-        for exempt_path in exempt_paths:
-            if request.path.startswith(exempt_path):
-                return None
+        if RouteFlag.SUBSCRIPTION_CHECK_EXEMPT in route:
+            return None
         
         # Solo aplicar a usuarios autenticados
         if not hasattr(request, 'user') or not request.user.is_authenticated:
             return None
             
         # SuperAdmin siempre tiene acceso
-        if get_effective_role_name(request.user, tenant=getattr(request, 'tenant', None)) == 'SuperAdmin':
+        if get_request_role(request) == 'SuperAdmin':
             return None
             
         # Validar tenant y plan
@@ -86,11 +44,8 @@ class SubscriptionValidationMiddleware(MiddlewareMixin):
             
         tenant = getattr(request, 'tenant', request.user.tenant)
 
-        # Cache sync: solo sincronizar cada 5 minutos para evitar query + save en cada request
-        _sync_cache_key = f'sub_sync:{tenant.id}'
-        if cache.get(_sync_cache_key) is None:
-            sync_subscription_state(tenant, save=True)
-            cache.set(_sync_cache_key, True, 300)  # 5 min TTL
+        # Solo sincroniza (y escribe) si el snapshot indica un vencimiento cruzado
+        sync_subscription_if_due(request, tenant)
         
         if tenant.subscription_status in {'archived', 'cancelled'}:
             return JsonResponse({
@@ -189,7 +144,8 @@ class APIRateLimitMiddleware(MiddlewareMixin):
     Diseño:
     - Límites separados para lectura y escritura.
     - Exclusión de endpoints de polling/estado frecuentes.
-    - Contadores por hora, por usuario y por scope.
+    - GCRA por usuario y por scope (apps.utils.rate_limiter): un script
+      atómico en Redis por request; las lecturas se cobran en lotes.
     """
     
     # Límites por plan (requests por hora)
@@ -200,42 +156,24 @@ class APIRateLimitMiddleware(MiddlewareMixin):
         'enterprise': None,  # Ilimitado
     }
 
-    # Endpoints públicos (sin throttling de este middleware)
-    EXEMPT_PREFIXES = [
-        '/api/auth/',
-        '/api/healthz/',
-        '/api/schema/',
-        '/api/docs/',
-    ]
+    # Unidades que se reservan por viaje a Redis en cada scope
+    BATCH_SIZES = {
+        'read': getattr(settings, 'API_RATE_LIMIT_READ_BATCH', 10),
+        'write': 1,
+    }
+
+    limiter = GCRARateLimiter(period=3600)
 
-    # Endpoints de alta frecuencia de lectura que no deben penalizar UX.
-    EXEMPT_READ_PREFIXES = [
-        '/api/notifications/',
-        '/api/subscriptions/me/entitlements/',
-        '/api/subscriptions/renew/',
-        '/api/settings/barbershop/',
-        '/api/tenants/locale/',
-        '/api/tenants/current/',
-        '/api/auth/verify/',
-    ]
-    
     def process_request(self, request):
-        # Solo aplicar a rutas /api/
-        if not request.path.startswith('/api/'):
+        # Solo aplicar a rutas /api/; excluir públicas, pagos y lecturas de
+        # alta frecuencia (ver apps.utils.route_policy)
+        route = get_route_policy(request)
+        if RouteFlag.API not in route or route.is_rate_limit_exempt:
             return None
         
-        # Excluir rutas públicas
-        for exempt_path in self.EXEMPT_PREFIXES:
-            if request.path.startswith(exempt_path):
-                return None
-        
         # Solo aplicar a usuarios autenticados
         if not hasattr(request, 'user') or not request.user.is_authenticated:
             return None
-
-        for exempt_path in BILLING_ACCESS_PATHS:
-            if request.path.startswith(exempt_path):
-                return None
         
         # SuperAdmin sin límite
         if request.user.is_superuser:
@@ -257,64 +195,54 @@ class APIRateLimitMiddleware(MiddlewareMixin):
         if plan_limits is None:
             return None
 
-        is_read = request.method in ('GET', 'HEAD', 'OPTIONS')
-        if is_read:
-            for prefix in self.EXEMPT_READ_PREFIXES:
-                if request.path.startswith(prefix):
-                    return None
-
-        scope = 'read' if is_read else 'write'
+        scope = 'read' if route.is_read else 'write'
         rate_limit = plan_limits.get(scope)
         if rate_limit is None:
             return None
 
-        # Clave de cache por usuario/scope y por hora para evitar crecimiento infinito
-        current_hour_bucket = timezone.now().strftime('%Y%m%d%H')
-        cache_key = f'api_rate_limit:{request.user.id}:{scope}:{current_hour_bucket}'
+        cache_key = f'api_rate_limit:{request.user.id}:{scope}'
 
-        # Obtener contador actual (fail-open controlado si Redis/cache falla)
+        # Fail-open controlado si Redis/cache falla
         try:
-            current_count = cache.get(cache_key, 0)
+            result = self.limiter.hit(cache_key, rate_limit, batch=min(self.BATCH_SIZES[scope], rate_limit))
         except Exception as exc:
-            logger.error("RateLimit cache get failed: %s", str(exc))
+            logger.error("RateLimit check failed: %s", str(exc))
             return None
 
         # Verificar límite
-        if current_count >= rate_limit:
+        if not result.allowed:
             logger.warning(
-                "RATE_LIMIT_EXCEEDED user=%s path=%s plan=%s scope=%s count=%d limit=%d",
-                request.user.id, request.path, plan_name, scope, current_count, rate_limit,
+                "RATE_LIMIT_EXCEEDED user=%s path=%s plan=%s scope=%s limit=%d retry_after=%d",
+                request.user.id, request.path, plan_name, scope, rate_limit, result.retry_after,
             )
-            return JsonResponse({
+            response = JsonResponse({
                 'error': 'Rate limit exceeded',
                 'code': 'RATE_LIMIT_EXCEEDED',
                 'limit': rate_limit,
                 'period': '1 hour',
                 'plan': plan_name,
                 'scope': scope,
+                'retry_after': result.retry_after,
                 'action_required': 'upgrade_plan' if plan_name != 'enterprise' else 'wait'
             }, status=429)
-        
-        # Incrementar contador (expira en 1 hora)
-        try:
-            cache.set(cache_key, current_count + 1, 3600)
-        except Exception as exc:
-            logger.error("RateLimit cache set failed: %s", str(exc))
-            return None
+            response['Retry-After'] = str(result.retry_after)
+            request.rate_limit_result = result
+            request.rate_limit_scope = scope
+            return response
         
         # Agregar headers de rate limit
-        request.rate_limit_remaining = rate_limit - current_count - 1
-        request.rate_limit_limit = rate_limit
+        request.rate_limit_result = result
         request.rate_limit_scope = scope
         
         return None
     
     def process_response(self, request, response):
         # Agregar headers de rate limit a la respuesta
-        if hasattr(request, 'rate_limit_remaining'):
-            response['X-RateLimit-Limit'] = str(request.rate_limit_limit)
-            response['X-RateLimit-Remaining'] = str(request.rate_limit_remaining)
-            response['X-RateLimit-Reset'] = str(3600)  # 1 hora en segundos
+        result = getattr(request, 'rate_limit_result', None)
+        if result is not None:
+            response['X-RateLimit-Limit'] = str(result.limit)
+            response['X-RateLimit-Remaining'] = str(result.remaining)
+            response['X-RateLimit-Reset'] = str(result.reset_after)
             response['X-RateLimit-Scope'] = str(getattr(request, 'rate_limit_scope', 'read'))
         
         return response
@@ -2,6 +2,7 @@ from celery import shared_task
 from datetime import timedelta
 from django.utils import timezone
 from django.conf import settings
+from django.core.cache import cache
 from apps.tenants_api.models import Tenant
 from apps.tenants_api.subscription_lifecycle import sync_subscription_state
 from apps.subscriptions_api.models import UserSubscription, Subscription
@@ -14,6 +15,36 @@ stripe.api_key = getattr(settings, 'STRIPE_SECRET_KEY', None)
 
 logger = logging.getLogger(__name__)
 
+# Ventana de la reserva atómica de avisos (mayor que el hito más lejano: 7 días)
+WARNING_CLAIM_TTL = 8 * 86400
+
+
+def _claim_warning(kind, tenant, deadline, days_remaining):
+    """Reserva atómica del aviso ``kind`` de un tenant para un hito concreto.
+
+    ``cache.add`` solo tiene éxito para un worker, así que dos ejecuciones
+    solapadas del escaneo (beat + cron) no envían el mismo aviso dos veces.
+    La clave incluye la fecha límite: si el trial o el acceso se renuevan, los
+    hitos del nuevo período se vuelven a avisar. Devuelve la clave reservada,
+    ``''`` si el cache no responde (queda el flag persistido en el tenant) o
+    ``None`` si otro worker ya la tiene.
+    """
+    key = f'subscription_warning:{kind}:{tenant.id}:{deadline.isoformat()}:{days_remaining}d'
+    try:
+        return key if cache.add(key, 1, WARNING_CLAIM_TTL) else None
+    except Exception as exc:
+        logger.warning("Warning claim failed key=%s: %s", key, exc)
+        return ''
+
+
+def _release_warning(key):
+    if not key:
+        return
+    try:
+        cache.delete(key)
+    except Exception:
+        pass
+
 def _email_branding_for_tenant(tenant):
     business_name = tenant.name or 'Auron Suite'
     logo_url = ''
@@ -150,6 +181,9 @@ def send_trial_expiration_warnings(self):
     Task para enviar avisos de expiración próxima
     Ejecutar diariamente a las 10:00 AM
     Envía avisos a 3 y 1 día antes del fin del trial.
+
+    Es el único origen de los avisos de trial (el request no los dispara);
+    cada aviso se reserva con ``_claim_warning`` antes de enviarse.
     """
     try:
         today = timezone.now().date()
@@ -159,19 +193,31 @@ def send_trial_expiration_warnings(self):
         ]
         
         warned_count = 0
-        for warning_date in warning_dates:
-            tenants_to_warn = Tenant.objects.filter(
-                subscription_status='trial',
-                trial_end_date=warning_date,
-                is_active=True
-            )
-            
-            for tenant in tenants_to_warn:
-                days_remaining = (tenant.trial_end_date - today).days
+        tenants_to_warn = Tenant.objects.filter(
+            subscription_status='trial',
+            trial_end_date__in=warning_dates,
+            is_active=True,
+            deleted_at__isnull=True,
+        ).select_related('owner')
+
+        for tenant in tenants_to_warn:
+            days_remaining = (tenant.trial_end_date - today).days
+            if (tenant.trial_notifications_sent or {}).get(f'trial_warning_{days_remaining}d'):
+                continue
+
+            claim = _claim_warning('trial', tenant, tenant.trial_end_date, days_remaining)
+            if claim is None:
+                continue
+
+            try:
                 send_trial_warning_email(tenant, days_remaining)
-                warned_count += 1
-                
-                logger.info(f"Sent trial warning to {tenant.name} ({days_remaining} days remaining)")
+            except Exception as exc:
+                _release_warning(claim)
+                logger.error("Trial warning failed tenant=%s: %s", tenant.subdomain, exc)
+                continue
+            warned_count += 1
+            
+            logger.info(f"Sent trial warning to {tenant.name} ({days_remaining} days remaining)")
         
         return f"Sent {warned_count} trial expiration warnings"
     except Exception as e:
@@ -218,8 +264,17 @@ def send_subscription_expiry_warnings(self):
                 )
                 continue
 
-            # Enviar email
-            _send_subscription_expiry_email(tenant, days_remaining)
+            claim = _claim_warning('expiry', tenant, access_date, days_remaining)
+            if claim is None:
+                continue
+
+            # Enviar email; si falla se libera la reserva para el próximo intento
+            try:
+                _send_subscription_expiry_email(tenant, days_remaining)
+            except Exception as exc:
+                _release_warning(claim)
+                logger.error("Subscription expiry warning failed tenant=%s: %s", tenant.subdomain, exc)
+                continue
 
             # Marcar como enviado
             warnings_sent[notification_key] = True
@@ -0,0 +1,91 @@
+import pytest
+from django.http import HttpResponse
+from django.test import RequestFactory
+
+from apps.auth_api.factories import UserFactory
+from apps.subscriptions_api.middleware import APIRateLimitMiddleware
+from apps.subscriptions_api.models import SubscriptionPlan
+from apps.utils.rate_limiter import GCRARateLimiter
+
+
+@pytest.fixture
+def limiter():
+    limiter = GCRARateLimiter(period=3600)
+    original = APIRateLimitMiddleware.limiter
+    APIRateLimitMiddleware.limiter = limiter
+    yield limiter
+    APIRateLimitMiddleware.limiter = original
+
+
+def test_gcra_allows_burst_up_to_limit_and_reports_retry_after():
+    limiter = GCRARateLimiter(period=3600)
+
+    results = [limiter.hit('user:write', 4) for _ in range(5)]
+
+    assert [r.allowed for r in results] == [True, True, True, True, False]
+    assert [r.remaining for r in results[:4]] == [3, 2, 1, 0]
+    assert results[0].reset_after == 900
+    assert results[3].reset_after == 3600
+    # Un nuevo cupo se libera cada 3600 / 4 segundos
+    assert results[4].retry_after == 900
+
+
+def test_read_batches_never_exceed_limit():
+    limiter = GCRARateLimiter(period=3600)
+
+    results = [limiter.hit('user:read', 25, batch=10) for _ in range(27)]
+
+    assert sum(r.allowed for r in results) == 25
+    assert [r.remaining for r in results[:3]] == [24, 23, 22]
+
+
+def test_sparse_reads_are_charged_one_unit_each():
+    # Cada lote vence antes del siguiente request (cliente esporadico): las
+    # unidades no usadas vuelven al cupo en la misma llamada que pide las nuevas
+    limiter = GCRARateLimiter(period=3600, lease_ttl=0)
+
+    results = [limiter.hit('user:read', 100, batch=10) for _ in range(5)]
+
+    assert all(r.allowed for r in results)
+    assert [r.remaining for r in results] == [99, 98, 97, 96, 95]
+
+
+def test_batches_are_granted_only_far_from_the_limit(monkeypatch):
+    # Lejos del limite un lote cubre varios requests con una sola llamada al backend;
+    # cerca del limite cada request pide una unidad, sin dejar unidades varadas
+    limiter = GCRARateLimiter(period=3600)
+    calls = []
+    acquire = limiter._acquire
+    monkeypatch.setattr(limiter, '_acquire', lambda *args: calls.append(args) or acquire(*args))
+
+    for _ in range(10):
+        limiter.hit('wide', limit=1000, batch=10)
+    assert len(calls) == 1
+
+    calls.clear()
+    results = [limiter.hit('narrow', limit=50, batch=10) for _ in range(51)]
+    assert len(calls) == 51
+    assert [r.allowed for r in results].count(True) == 50
+
+
+@pytest.mark.django_db
+def test_middleware_sets_headers_and_blocks_with_retry_after(limiter, monkeypatch):
+    plan = SubscriptionPlan.objects.create(name='basic', price=0, max_users=10)
+    user = UserFactory()
+    user.tenant.subscription_plan = plan
+    user.tenant.save()
+    monkeypatch.setitem(APIRateLimitMiddleware.RATE_LIMITS, 'basic', {'read': 10000, 'write': 2})
+    middleware = APIRateLimitMiddleware(lambda request: None)
+
+    responses = []
+    for _ in range(3):
+        request = RequestFactory().post('/api/pos/sales/')
+        request.user = user
+        blocked = middleware.process_request(request)
+        responses.append(middleware.process_response(request, blocked or HttpResponse()))
+
+    assert [r.status_code for r in responses] == [200, 200, 429]
+    assert responses[0]['X-RateLimit-Remaining'] == '1'
+    assert responses[0]['X-RateLimit-Reset'] == '1800'
+    assert responses[2]['Retry-After'] == '1800'
+    assert responses[2]['X-RateLimit-Scope'] == 'write'
@@ -0,0 +1,80 @@
+import pytest
+from datetime import timedelta
+from unittest.mock import patch
+
+from django.core.cache import cache
+from django.utils import timezone
+
+from apps.auth_api.factories import UserFactory
+from apps.subscriptions_api import tasks
+from apps.tenants_api.middleware import TenantMiddleware
+
+
+@pytest.fixture(autouse=True)
+def _clear_cache():
+    cache.clear()
+    yield
+    cache.clear()
+
+
+@pytest.fixture
+def trial_owner():
+    user = UserFactory()
+    tenant = user.tenant
+    tenant.owner = user
+    tenant.subscription_status = 'trial'
+    tenant.trial_end_date = timezone.now().date() + timedelta(days=3)
+    tenant.is_active = True
+    tenant.trial_notifications_sent = {}
+    tenant.save()
+    return user
+
+
+@pytest.mark.django_db
+def test_scan_sends_each_trial_milestone_once(trial_owner):
+    with patch('apps.auth_api.tasks.send_email_async.delay') as send:
+        tasks.send_trial_expiration_warnings()
+        tasks.send_trial_expiration_warnings()
+
+    assert send.call_count == 1
+    trial_owner.tenant.refresh_from_db()
+    assert trial_owner.tenant.trial_notifications_sent == {'trial_warning_3d': True}
+
+
+@pytest.mark.django_db
+def test_claim_guards_concurrent_scans_before_flag_is_persisted(trial_owner):
+    tenant = trial_owner.tenant
+    assert tasks._claim_warning('trial', tenant, tenant.trial_end_date, 3)
+
+    with patch('apps.auth_api.tasks.send_email_async.delay') as send:
+        tasks.send_trial_expiration_warnings()
+
+    send.assert_not_called()
+
+
+@pytest.mark.django_db
+def test_request_path_never_dispatches_trial_warnings(trial_owner, api_client):
+    api_client.force_authenticate(trial_owner)
+
+    with patch('apps.subscriptions_api.tasks.send_trial_warning_email.delay') as delay, \
+            patch('apps.auth_api.tasks.send_email_async.delay') as send:
+        api_client.get('/api/tenants/current/')
+
+    delay.assert_not_called()
+    send.assert_not_called()
+    assert not hasattr(TenantMiddleware, 'check_trial_notifications')
+
+
+@pytest.mark.django_db
+def test_failed_expiry_warning_releases_claim_for_retry(trial_owner):
+    tenant = trial_owner.tenant
+    tenant.subscription_status = 'active'
+    tenant.access_until = timezone.now() + timedelta(days=3)
+    tenant.save()
+
+    with patch('apps.subscriptions_api.tasks._send_subscription_expiry_email', side_effect=RuntimeError('smtp')):
+        tasks.send_subscription_expiry_warnings()
+    with patch('apps.subscriptions_api.tasks._send_subscription_expiry_email') as send:
+        tasks.send_subscription_expiry_warnings()
+
+    send.assert_called_once_with(tenant, 3)
@@ -3,3 +3,6 @@ from django.apps import AppConfig
 class TenantsApiConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'apps.tenants_api'
+
+    def ready(self):
+        import apps.tenants_api.signals  # noqa: F401
@@ -4,6 +4,8 @@ Base ViewSet para filtrado automático por tenant
 from rest_framework import viewsets
 from rest_framework.exceptions import PermissionDenied
 
+from apps.auth_api.request_context import get_request_role_api
+
 
 class TenantQuerySetMixin:
     """Mixin con lógica de filtrado por tenant compartida entre ViewSets."""
@@ -26,11 +28,7 @@ class TenantQuerySetMixin:
         # Restricción estricta de sucursal para empleados no administradores
         user = self.request.user
         if user and getattr(user, 'is_authenticated', False) and not user.is_superuser:
-            user_role = getattr(self.request, '_role_cache', None)
-            if user_role is None:
-                from apps.auth_api.role_utils import get_effective_role_api
-                user_role = get_effective_role_api(user, tenant=self.request.tenant)
-                setattr(self.request, '_role_cache', user_role)
+            user_role = get_request_role_api(self.request, tenant=self.request.tenant)
             if user_role != 'CLIENT_ADMIN' and hasattr(user, 'employee_profile') and user.employee_profile:
                 if user.employee_profile.branch_id:
                     branch_id = user.employee_profile.branch_id
@@ -89,11 +87,7 @@ class TenantScopedViewSet(TenantQuerySetMixin, viewsets.ModelViewSet):
 
         # Restricción/Autoset de sucursal para empleados no administradores
         if user and getattr(user, 'is_authenticated', False):
-            user_role = getattr(self.request, '_role_cache', None)
-            if user_role is None:
-                from apps.auth_api.role_utils import get_effective_role_api
-                user_role = get_effective_role_api(user, tenant=self.request.tenant)
-                setattr(self.request, '_role_cache', user_role)
+            user_role = get_request_role_api(self.request, tenant=self.request.tenant)
             if user_role != 'CLIENT_ADMIN' and hasattr(user, 'employee_profile') and user.employee_profile:
                 if user.employee_profile.branch_id:
                     if hasattr(serializer, 'Meta') and hasattr(serializer.Meta, 'model'):
@@ -114,10 +108,9 @@ class TenantScopedViewSet(TenantQuerySetMixin, viewsets.ModelViewSet):
 
         # Restricción de sucursal para empleados no administradores en actualizaciones
         if user and getattr(user, 'is_authenticated', False) and not user.is_superuser:
-            from apps.auth_api.role_utils import get_effective_role_api
             tenant = getattr(self.request, 'tenant', None) or getattr(user, 'tenant', None)
             if tenant:
-                user_role = get_effective_role_api(user, tenant=tenant)
+                user_role = get_request_role_api(self.request, tenant=tenant)
                 if user_role != 'CLIENT_ADMIN' and hasattr(user, 'employee_profile') and user.employee_profile:
                     if user.employee_profile.branch_id:
                         if hasattr(serializer, 'Meta') and hasattr(serializer.Meta, 'model'):
@@ -1,46 +1,37 @@
 from django.http import JsonResponse, HttpResponseForbidden
 from django.utils.deprecation import MiddlewareMixin
 from django.utils import timezone
-from .models import Tenant
-from .subscription_lifecycle import sync_subscription_state
-from rest_framework_simplejwt.authentication import JWTAuthentication
-from rest_framework_simplejwt.exceptions import InvalidToken, TokenError
+from .tenant_cache import get_tenant_snapshot, sync_subscription_if_due
 from django.conf import settings
 import logging
 
 from django.contrib.gis.geoip2 import GeoIP2
 from apps.auth_api.utils import get_client_ip
-from apps.auth_api.role_utils import get_effective_role_name
+from apps.utils.route_policy import RouteFlag, get_route_policy
+from apps.auth_api.request_context import (
+    AUTH_SOURCE_HEADER,
+    authenticate_request_user,
+    get_request_auth_context,
+    get_request_role,
+)
 
 logger = logging.getLogger(__name__)
 
 
-PAYWALL_SAFE_PREFIXES = [
-    '/api/subscriptions/me/entitlements/',
-    '/api/subscriptions/renew/',
-    '/api/tenants/current/',
-    '/api/tenants/locale/',
-    '/api/tenants/subscription-status/',
-]
-
-PAYWALL_SAFE_READONLY_PREFIXES = [
-    '/api/notifications/',
-]
-
 class TenantMiddleware(MiddlewareMixin):
     """
     Middleware para manejar multitenancy basado en JWT claims o usuario autenticado
     """
 
     @staticmethod
-    def _is_superadmin(user) -> bool:
+    def _is_superadmin(request, user) -> bool:
         if not getattr(user, 'is_authenticated', False):
             return False
         # is_superuser es la fuente de verdad para el dueño del SaaS.
         # No depender de roles que pueden no existir en una DB nueva.
         if getattr(user, 'is_superuser', False):
             return True
-        return get_effective_role_name(user) == 'SuperAdmin'
+        return get_request_role(request, user) == 'SuperAdmin'
 
     @staticmethod
     def _inactive_tenant_response(tenant=None):
@@ -80,129 +71,80 @@ class TenantMiddleware(MiddlewareMixin):
 
     @staticmethod
     def _is_paywall_safe_request(request) -> bool:
-        if any(request.path.startswith(prefix) for prefix in PAYWALL_SAFE_PREFIXES):
-            return True
-
-        if request.method in ('GET', 'HEAD', 'OPTIONS'):
-            return any(request.path.startswith(prefix) for prefix in PAYWALL_SAFE_READONLY_PREFIXES)
-
-        return False
+        return get_route_policy(request).is_paywall_safe
     
     def process_request(self, request):
-        # Excluir admin de Django
-        if request.path.startswith('/admin/'):
-            return None
-        
-        # Solo aplicar a rutas API
-        if not request.path.startswith('/api/'):
+        route = get_route_policy(request)
+
+        # Solo aplicar a rutas API (excluye admin de Django)
+        if RouteFlag.API not in route:
             return None
         
         # Rutas exentas (solo públicas)
-        exempt_paths = [
-            '/api/auth/login/',
-            '/api/auth/cookie-login/',
-            '/api/auth/cookie-logout/',
-            '/api/auth/cookie-refresh/',
-            '/api/auth/mfa/login-verify/',
-            '/api/auth/register/',
-            '/api/auth/password-reset/',
-            '/api/healthz/',
-            '/api/subscriptions/plans/',  # Solo lectura
-            '/api/subscriptions/register/',
-            '/api/subscriptions/register-with-plan/',
-            '/api/settings/contact/',  # Formulario público
-            '/api/booking/',  # Auto-agendamiento público
-        ]
-        if settings.DEBUG:
-            exempt_paths.extend(['/api/schema/', '/api/docs/'])
-        for exempt_path in exempt_paths:
-            if request.path.startswith(exempt_path):
-                return None
+        if route.is_public:
+            return None
         
-        # ✅ AUTENTICAR USUARIO DESDE COOKIES PRIMERO
-        if not (hasattr(request, 'user') and request.user.is_authenticated):
-            from apps.auth_api.authentication import CookieJWTAuthentication
-            try:
-                auth_result = CookieJWTAuthentication().authenticate(request)
-                if auth_result:
-                    request.user, _ = auth_result
-            except Exception:
-                pass
+        # ✅ AUTENTICAR USUARIO DESDE JWT PRIMERO (decodificado una sola vez por request)
+        try:
+            authenticate_request_user(request)
+        except Exception:
+            pass
         
         # Rutas admin requieren superuser
-        admin_paths = [
-            '/api/settings/admin/',
-            '/api/system-settings/',
-        ]
-        for admin_path in admin_paths:
-            if request.path.startswith(admin_path):
-                if not (hasattr(request, 'user') and request.user.is_authenticated and request.user.is_superuser):
-                    return JsonResponse({
-                        'error': 'Forbidden',
-                        'code': 'SUPERUSER_REQUIRED'
-                    }, status=403)
+        if RouteFlag.ADMIN_ONLY in route:
+            if not (hasattr(request, 'user') and request.user.is_authenticated and request.user.is_superuser):
+                return JsonResponse({
+                    'error': 'Forbidden',
+                    'code': 'SUPERUSER_REQUIRED'
+                }, status=403)
 
         # El dueno del SaaS no debe depender de tenant ni de claims stale en tokens.
-        if self._is_superadmin(getattr(request, 'user', None)):
+        if self._is_superadmin(request, getattr(request, 'user', None)):
             request.tenant = None
             return None
         
-        # Intentar obtener tenant desde JWT claims
-        try:
-            auth_header = request.META.get('HTTP_AUTHORIZATION', '')
-            if auth_header.startswith('Bearer '):
-                token_str = auth_header.split(' ')[1]
-                jwt_auth = JWTAuthentication()
-                validated_token = jwt_auth.get_validated_token(token_str)
-                tenant_id = validated_token.get('tenant_id')
-                if tenant_id:
-                    try:
-                        is_paywall_safe = self._is_paywall_safe_request(request)
-                        tenant_filter = {
-                            'id': tenant_id,
-                            'deleted_at__isnull': True,
-                        }
-                        if not is_paywall_safe:
-                            tenant_filter['is_active'] = True
-                        
-                        tenant = Tenant.objects.get(**tenant_filter)
-                        request.tenant = tenant
-                        
-                        # ✅ VALIDACIÓN DEFENSIVA: JWT tenant debe coincidir con user.tenant
-                        if hasattr(request, 'user') and request.user.is_authenticated:
-                            if not request.user.is_superuser and request.user.tenant_id != tenant_id:
-                                return JsonResponse({
-                                    'error': 'TENANT_MISMATCH',
-                                    'code': 'TENANT_MISMATCH',
-                                    'message': 'Token no corresponde al tenant del usuario',
-                                    'expected_tenant': request.user.tenant_id,
-                                    'token_tenant': tenant_id
-                                }, status=403)
-                    except Tenant.DoesNotExist:
-                        return self._inactive_tenant_response()
-        except (InvalidToken, TokenError, Tenant.DoesNotExist):
-            # Si falla JWT, intentar desde usuario autenticado
-            pass
+        # Intentar obtener tenant desde JWT claims (solo header Bearer válido;
+        # si falla JWT, se resuelve desde el usuario autenticado)
+        auth_context = get_request_auth_context(request)
+        if auth_context.source == AUTH_SOURCE_HEADER:
+            tenant_id = auth_context.tenant_id
+            if tenant_id:
+                is_paywall_safe = self._is_paywall_safe_request(request)
+                snapshot = get_tenant_snapshot(tenant_id)
+                if (snapshot is None
+                        or snapshot.deleted_at is not None
+                        or (not is_paywall_safe and not snapshot.is_active)):
+                    return self._inactive_tenant_response()
+
+                request.tenant = snapshot.to_tenant()
+                request.tenant_snapshot = snapshot
+                
+                # ✅ VALIDACIÓN DEFENSIVA: JWT tenant debe coincidir con user.tenant
+                if hasattr(request, 'user') and request.user.is_authenticated:
+                    if not request.user.is_superuser and request.user.tenant_id != tenant_id:
+                        return JsonResponse({
+                            'error': 'TENANT_MISMATCH',
+                            'code': 'TENANT_MISMATCH',
+                            'message': 'Token no corresponde al tenant del usuario',
+                            'expected_tenant': request.user.tenant_id,
+                            'token_tenant': tenant_id
+                        }, status=403)
         
         # Si no tenant desde JWT, fallback a usuario autenticado
         if not hasattr(request, 'tenant') or not request.tenant:
             if hasattr(request, 'user') and request.user.is_authenticated:
-                # Recargar usuario con tenant para evitar lazy loading
-                from django.contrib.auth import get_user_model
-                User = get_user_model()
-                try:
-                    user = User.objects.select_related('tenant').get(pk=request.user.pk)
-                    request.user = user
-                except User.DoesNotExist:
-                    logger.warning('Authenticated user not found while resolving tenant')
-                    pass
+                # Tenant desde el snapshot cacheado, sin recargar el usuario
+                snapshot = get_tenant_snapshot(getattr(request.user, 'tenant_id', None))
+                user_tenant = snapshot.to_tenant() if snapshot is not None else None
+                if user_tenant is not None:
+                    request.user.tenant = user_tenant
+                    request.tenant_snapshot = snapshot
                 
                 # Permitir acceso a super admins
-                if self._is_superadmin(request.user):
+                if self._is_superadmin(request, request.user):
                     request.tenant = None
-                elif hasattr(request.user, 'tenant') and request.user.tenant:
+                elif user_tenant is not None:
                     # Validar que el tenant del usuario esté activo
-                    user_tenant = request.user.tenant
                     
                     if user_tenant.deleted_at is not None or not user_tenant.is_active:
                         if user_tenant.deleted_at is None and self._is_paywall_safe_request(request):
@@ -226,21 +168,10 @@ class TenantMiddleware(MiddlewareMixin):
         # Verificar y manejar trial expirado
         if request.tenant:
             if self._is_paywall_safe_request(request):
-                self.check_trial_notifications(request.tenant)
                 return None
 
             # Verificar rutas que no requieren validación de suscripción
-            subscription_exempt_paths = [
-                '/api/subscriptions/renew/',
-                '/api/tenants/subscription-status/',
-                '/api/subscriptions/plans/',
-            ]
-            
-            is_subscription_exempt = any(
-                request.path.startswith(path) for path in subscription_exempt_paths
-            )
-            
-            if not is_subscription_exempt:
+            if RouteFlag.SUBSCRIPTION_EXEMPT not in route:
                 # 🔴 GRACE PERIOD: evaluar ANTES de sync_subscription_state
                 # para que los 3 días de gracia del trial sean reales
                 now = timezone.now()
@@ -252,10 +183,9 @@ class TenantMiddleware(MiddlewareMixin):
                     if days_expired <= 3:
                         request.grace_period = True
                         request.subscription_limited = True
-                        self.check_trial_notifications(tenant)
                         return None
 
-                sync_subscription_state(request.tenant, save=True)
+                sync_subscription_if_due(request, request.tenant, now=now)
                 access_level = request.tenant.get_access_level()
                 
                 if access_level == 'hidden':
@@ -283,9 +213,6 @@ class TenantMiddleware(MiddlewareMixin):
                 elif access_level == 'limited':
                     request.grace_period = True
                     request.subscription_limited = True
-            
-            # Enviar notificaciones de trial
-            self.check_trial_notifications(request.tenant)
         
         # Geolock opcional
         if getattr(settings, 'GEO_LOCK_ENABLED', False) and request.tenant and request.tenant.country:
@@ -306,36 +233,3 @@ class TenantMiddleware(MiddlewareMixin):
                 pass
         
         return None
-    
-    def check_trial_notifications(self, tenant):
-        """Verificar y enviar notificaciones de trial"""
-        if tenant.subscription_status != 'trial':
-            return
-            
-        # Notificación 3 días antes
-        if tenant.should_send_trial_notification(3):
-            self.send_trial_notification(tenant, 3)
-        
-        # Notificación 1 día antes
-        elif tenant.should_send_trial_notification(1):
-            self.send_trial_notification(tenant, 1)
-    
-    def send_trial_notification(self, tenant, days_left):
-        """Enviar notificacion real de trial via Celery."""
-        try:
-            from apps.subscriptions_api.tasks import send_trial_warning_email
-            send_trial_warning_email.delay(
-                tenant_id=tenant.id,
-                days_remaining=days_left,
-            )
-            logger.info(
-                "Trial warning email queued tenant=%s days_left=%d",
-                tenant.subdomain,
-                days_left,
-            )
-        except Exception as exc:
-            logger.error(
-                "Failed to queue trial warning email tenant=%s: %s",
-                tenant.subdomain,
-                exc,
-            )
@@ -0,0 +1,19 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .models import Tenant
+from .tenant_cache import invalidate_tenant_snapshot
+
+
+@receiver(post_save, sender=Tenant, dispatch_uid='tenants_api_invalidate_snapshot_on_save')
+@receiver(post_delete, sender=Tenant, dispatch_uid='tenants_api_invalidate_snapshot_on_delete')
+def invalidate_tenant_snapshot_on_change(sender, instance, **kwargs):
+    """Invalida el snapshot cacheado del tenant en cada cambio de la fila.
+
+    Se invalida de inmediato y otra vez al commit: una lectura concurrente
+    entre ambos momentos podria cachear la fila previa bajo la version nueva.
+    """
+    tenant_id, subdomain = instance.pk, instance.subdomain
+    invalidate_tenant_snapshot(tenant_id, subdomain)
+    transaction.on_commit(lambda: invalidate_tenant_snapshot(tenant_id, subdomain))
@@ -1,7 +1,7 @@
 from __future__ import annotations
 
 from dataclasses import dataclass
-from datetime import timedelta
+from datetime import datetime, time, timedelta, timezone as dt_timezone
 
 from django.utils import timezone
 
@@ -202,6 +202,82 @@ def get_access_level(tenant, now=None) -> str:
     return "blocked"
 
 
+def _parse_marker(raw):
+    return timezone.datetime.fromisoformat(raw) if raw else None
+
+
+def get_next_transition_at(tenant, now=None):
+    """Instante a partir del cual ``sync_subscription_state`` cambiaria el tenant.
+
+    Espejo sin efectos de las reglas de ``sync_subscription_state``:
+    - ``None``: no hay transicion pendiente por paso del tiempo.
+    - ``now``: el estado persistido es inconsistente y debe sincronizarse ya.
+    - cualquier otra fecha: fin del trial, fin de la gracia de past_due,
+      vencimiento de ``access_until`` o archivado de suspendidos/cancelados.
+    """
+    now = now or timezone.now()
+    status = getattr(tenant, "subscription_status", None)
+    is_active = getattr(tenant, "is_active", False)
+    billing_info = getattr(tenant, "billing_info", None) or {}
+
+    if getattr(tenant, "deleted_at", None) is not None:
+        if status != "archived" or is_active or billing_info.get("archived_at") is None:
+            return now
+        return None
+
+    if status in ACTIVE_STATUSES.union(LIMITED_STATUSES) and not is_active:
+        return now
+    if status in BLOCKED_STATUSES and is_active:
+        return now
+
+    access_until = getattr(tenant, "access_until", None)
+
+    if status == "trial":
+        trial_end_date = getattr(tenant, "trial_end_date", None)
+        if trial_end_date is None:
+            return now
+        # sync compara contra now.date() (UTC): expira al iniciar el dia siguiente
+        return datetime.combine(trial_end_date + timedelta(days=1), time.min, tzinfo=dt_timezone.utc)
+
+    if status == "active":
+        if access_until is None:
+            return now
+        return access_until
+
+    if status == "past_due":
+        if access_until and access_until > now:
+            return now
+        past_due_since = _parse_marker(billing_info.get("past_due_since")) or access_until
+        if past_due_since is None:
+            return now
+        return past_due_since + timedelta(days=PAST_DUE_GRACE_DAYS, microseconds=1)
+
+    if status == "suspended":
+        suspended_at = _parse_marker(billing_info.get("suspended_at"))
+        if suspended_at is None:
+            return now
+        return suspended_at + timedelta(days=SUSPENDED_ARCHIVE_DAYS)
+
+    if status == "archived":
+        if billing_info.get("archived_at") is None:
+            return now
+        return None
+
+    if status == "cancelled":
+        cancelled_at = _parse_marker(billing_info.get("cancelled_at")) or getattr(tenant, "updated_at", None)
+        if cancelled_at is None:
+            return now
+        return cancelled_at + timedelta(days=SUSPENDED_ARCHIVE_DAYS)
+
+    return None
+
+
+def is_transition_due(next_transition_at, now=None) -> bool:
+    if next_transition_at is None:
+        return False
+    return next_transition_at <= (now or timezone.now())
+
+
 def sync_subscription_state(tenant, now=None, *, save: bool = True) -> SubscriptionSyncResult:
     now = now or timezone.now()
     changed_fields: list[str] = []
@@ -0,0 +1,208 @@
+"""Snapshots cacheados de Tenant (LRU por proceso delante del cache compartido).
+
+Las claves incluyen la version del tenant, que se sube en cada guardado/borrado;
+sin cache compartido una copia vieja dura como mucho TENANT_SNAPSHOT_FALLBACK_TTL.
+"""
+from __future__ import annotations
+
+import copy
+import logging
+from dataclasses import dataclass
+from datetime import datetime
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS
+from django.utils import timezone
+
+from apps.utils.versioned_cache import LocalLRUCache, bump_cache_version, get_cache_version, is_shared_cache
+
+from .models import Tenant
+from .subscription_lifecycle import get_next_transition_at, is_transition_due, sync_subscription_state
+
+logger = logging.getLogger(__name__)
+
+TENANT_SNAPSHOT_TTL = getattr(settings, 'TENANT_SNAPSHOT_CACHE_TTL', 300)
+TENANT_SNAPSHOT_LOCAL_TTL = getattr(settings, 'TENANT_SNAPSHOT_LOCAL_TTL', 30)
+TENANT_SNAPSHOT_FALLBACK_TTL = getattr(settings, 'TENANT_SNAPSHOT_FALLBACK_TTL', 10)
+TENANT_SNAPSHOT_LOCAL_MAXSIZE = getattr(settings, 'TENANT_SNAPSHOT_LOCAL_MAXSIZE', 2048)
+
+_local_snapshots = LocalLRUCache(maxsize=TENANT_SNAPSHOT_LOCAL_MAXSIZE, ttl=TENANT_SNAPSHOT_LOCAL_TTL)
+
+
+def _version_key(tenant_id):
+    return f'tenant_snapshot:version:{tenant_id}'
+
+
+def _snapshot_key(tenant_id, version):
+    return f'tenant_snapshot:{tenant_id}:{version}'
+
+
+def _subdomain_key(subdomain):
+    return f'tenant_snapshot:subdomain:{subdomain}'
+
+
+@dataclass(frozen=True)
+class TenantSnapshot:
+    """Copia inmutable de una fila Tenant en una version concreta."""
+
+    id: int
+    subdomain: str
+    version: int
+    field_names: tuple
+    values: tuple
+    next_transition_at: datetime | None = None
+
+    @classmethod
+    def from_tenant(cls, tenant, version):
+        field_names = tuple(f.attname for f in Tenant._meta.concrete_fields)
+        values = tuple(copy.deepcopy(getattr(tenant, name)) for name in field_names)
+        return cls(id=tenant.pk, subdomain=tenant.subdomain, version=version,
+                   field_names=field_names, values=values,
+                   next_transition_at=get_next_transition_at(tenant))
+
+    def get(self, name, default=None):
+        try:
+            return self.values[self.field_names.index(name)]
+        except ValueError:
+            return default
+
+    @property
+    def is_active(self):
+        return self.get('is_active')
+
+    @property
+    def deleted_at(self):
+        return self.get('deleted_at')
+
+    def to_tenant(self):
+        """Instancia Tenant nueva (mutable) construida sin tocar la base de datos."""
+        return Tenant.from_db(DEFAULT_DB_ALIAS, list(self.field_names), copy.deepcopy(list(self.values)))
+
+
+def _load_snapshot(tenant_id, version):
+    tenant = Tenant.objects.filter(pk=tenant_id).first()
+    if tenant is None:
+        return None
+    return TenantSnapshot.from_tenant(tenant, version)
+
+
+def get_tenant_snapshot(tenant_id):
+    """Snapshot del tenant ``tenant_id`` o ``None`` si no existe."""
+    if not tenant_id:
+        return None
+
+    version = get_cache_version(_version_key(tenant_id))
+    if version is None:
+        # Cache compartido caido: ir directo a la fuente de verdad
+        return _load_snapshot(tenant_id, None)
+
+    local_key = (tenant_id, version)
+    snapshot = _local_snapshots.get(local_key)
+    if snapshot is not None:
+        return snapshot
+
+    try:
+        snapshot = cache.get(_snapshot_key(tenant_id, version))
+    except Exception:
+        snapshot = None
+
+    shared = is_shared_cache()
+    if snapshot is None:
+        snapshot = _load_snapshot(tenant_id, version)
+        if snapshot is None:
+            return None
+        try:
+            cache.set(
+                _snapshot_key(tenant_id, version), snapshot,
+                TENANT_SNAPSHOT_TTL if shared else TENANT_SNAPSHOT_FALLBACK_TTL,
+            )
+        except Exception:
+            pass
+
+    _local_snapshots.set(local_key, snapshot, ttl=None if shared else TENANT_SNAPSHOT_FALLBACK_TTL)
+    return snapshot
+
+
+def get_tenant_snapshot_by_subdomain(subdomain):
+    """Snapshot del tenant con ``subdomain`` o ``None`` si no existe."""
+    if not subdomain:
+        return None
+
+    local_key = ('subdomain', subdomain)
+    tenant_id = _local_snapshots.get(local_key)
+    if tenant_id is None:
+        try:
+            tenant_id = cache.get(_subdomain_key(subdomain))
+        except Exception:
+            tenant_id = None
+
+    if tenant_id is not None:
+        snapshot = get_tenant_snapshot(tenant_id)
+        # El mapeo subdominio -> id se auto-valida: si el subdominio cambió se recarga
+        if snapshot is not None and snapshot.subdomain == subdomain:
+            _local_snapshots.set(local_key, tenant_id)
+            return snapshot
+
+    tenant_id = Tenant.objects.filter(subdomain=subdomain).values_list('id', flat=True).first()
+    if tenant_id is None:
+        return None
+
+    try:
+        cache.set(_subdomain_key(subdomain), tenant_id, TENANT_SNAPSHOT_TTL)
+    except Exception:
+        pass
+    _local_snapshots.set(local_key, tenant_id)
+    return get_tenant_snapshot(tenant_id)
+
+
+def get_cached_tenant(tenant_id):
+    snapshot = get_tenant_snapshot(tenant_id)
+    return snapshot.to_tenant() if snapshot is not None else None
+
+
+def get_cached_tenant_by_subdomain(subdomain):
+    snapshot = get_tenant_snapshot_by_subdomain(subdomain)
+    return snapshot.to_tenant() if snapshot is not None else None
+
+
+def sync_subscription_if_due(request, tenant, now=None):
+    """Sincroniza el ciclo de vida del tenant solo si se cruzó su próximo vencimiento.
+
+    El snapshot guarda ``next_transition_at``; en el caso normal el request
+    solo compara una fecha. La escritura ocurre únicamente cuando la fecha ya
+    pasó, y como mucho una vez por request aunque varios middlewares lo pidan.
+    """
+    if getattr(request, '_subscription_synced', False):
+        return False
+
+    now = now or timezone.now()
+    snapshot = getattr(request, 'tenant_snapshot', None)
+    if snapshot is None or snapshot.id != tenant.pk:
+        snapshot = get_tenant_snapshot(tenant.pk)
+    if snapshot is not None and not is_transition_due(snapshot.next_transition_at, now):
+        return False
+
+    result = sync_subscription_state(tenant, now=now, save=True)
+    request._subscription_synced = True
+    if not result.changed:
+        # El vencimiento ya estaba aplicado (p. ej. por otro worker): refrescar el snapshot
+        logger.debug('Subscription transition due without changes tenant=%s', tenant.pk)
+        invalidate_tenant_snapshot(tenant.pk)
+    return result.changed
+
+
+def invalidate_tenant_snapshot(tenant_id, subdomain=None):
+    """Invalida el snapshot de ``tenant_id`` en todos los workers."""
+    bump_cache_version(_version_key(tenant_id))
+    if subdomain:
+        _local_snapshots.delete(('subdomain', subdomain))
+        try:
+            cache.delete(_subdomain_key(subdomain))
+        except Exception:
+            pass
+
+
+def invalidate_tenant_snapshots(tenant_ids):
+    for tenant_id in tenant_ids:
+        invalidate_tenant_snapshot(tenant_id)
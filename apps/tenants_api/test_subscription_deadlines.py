@@ -0,0 +1,95 @@
+import copy
+from datetime import timedelta
+
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework_simplejwt.tokens import AccessToken
+
+from apps.auth_api.factories import UserFactory
+from apps.tenants_api.models import Tenant
+from apps.tenants_api.subscription_lifecycle import (
+    get_next_transition_at,
+    is_transition_due,
+    sync_subscription_state,
+)
+
+NOW = timezone.now()
+
+
+def _tenant(**kwargs):
+    defaults = {'name': 'Deadline', 'subdomain': 'deadline', 'is_active': True, 'billing_info': {}}
+    defaults.update(kwargs)
+    return Tenant(**defaults)
+
+
+def _changes_at(tenant, when):
+    return sync_subscription_state(copy.deepcopy(tenant), now=when, save=False).changed
+
+
+@pytest.mark.parametrize('tenant', [
+    _tenant(subscription_status='trial', trial_end_date=NOW.date() + timedelta(days=3)),
+    _tenant(subscription_status='active', access_until=NOW + timedelta(days=10)),
+    _tenant(subscription_status='past_due', access_until=NOW - timedelta(days=2),
+            billing_info={'past_due_since': (NOW - timedelta(days=2)).isoformat()}),
+    _tenant(subscription_status='suspended', is_active=False,
+            billing_info={'suspended_at': (NOW - timedelta(days=30)).isoformat()}),
+    _tenant(subscription_status='cancelled', is_active=False,
+            billing_info={'cancelled_at': (NOW - timedelta(days=30)).isoformat()}),
+], ids=['trial', 'active', 'past_due', 'suspended', 'cancelled'])
+def test_deadline_matches_sync_rules(tenant):
+    deadline = get_next_transition_at(tenant, now=NOW)
+
+    assert deadline > NOW
+    assert not _changes_at(tenant, NOW)
+    assert not _changes_at(tenant, deadline - timedelta(seconds=1))
+    assert _changes_at(tenant, deadline)
+
+
+@pytest.mark.parametrize('tenant', [
+    _tenant(subscription_status='trial', trial_end_date=None),
+    _tenant(subscription_status='active', access_until=None),
+    _tenant(subscription_status='active', is_active=False, access_until=NOW + timedelta(days=5)),
+    _tenant(subscription_status='suspended', is_active=False),
+], ids=['trial-no-end', 'active-no-access-until', 'active-but-inactive', 'suspended-no-marker'])
+def test_inconsistent_state_is_due_immediately(tenant):
+    assert is_transition_due(get_next_transition_at(tenant, now=NOW), now=NOW)
+    assert _changes_at(tenant, NOW)
+
+
+def test_archived_tenant_has_no_pending_transition():
+    tenant = _tenant(subscription_status='archived', is_active=False,
+                     billing_info={'archived_at': NOW.isoformat()})
+
+    assert get_next_transition_at(tenant, now=NOW) is None
+    assert not _changes_at(tenant, NOW + timedelta(days=3650))
+
+
+@pytest.mark.django_db
+def test_request_does_not_write_tenant_until_deadline(api_client):
+    user = UserFactory()
+    tenant = user.tenant
+    tenant.subscription_status = 'active'
+    tenant.access_until = timezone.now() + timedelta(days=10)
+    tenant.save()
+    token = AccessToken.for_user(user)
+    token['tenant_id'] = tenant.id
+    api_client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+
+    api_client.get('/api/auth/verify/')
+    with CaptureQueriesContext(connection) as ctx:
+        api_client.get('/api/auth/verify/')
+    assert not [q for q in ctx.captured_queries if 'UPDATE "tenants_api_tenant"' in q['sql']]
+
+    tenant.access_until = timezone.now() - timedelta(days=1)
+    tenant.save()
+    with CaptureQueriesContext(connection) as ctx:
+        api_client.get('/api/auth/verify/')
+    assert [q for q in ctx.captured_queries if 'UPDATE "tenants_api_tenant"' in q['sql']]
+    tenant.refresh_from_db()
+    assert tenant.subscription_status == 'past_due'
+
+    with CaptureQueriesContext(connection) as ctx:
+        api_client.get('/api/auth/verify/')
+    assert not [q for q in ctx.captured_queries if 'UPDATE "tenants_api_tenant"' in q['sql']]
@@ -0,0 +1,94 @@
+from unittest import mock
+
+import pytest
+from django.core.cache import cache
+from django.http import Http404
+
+from apps.booking_api.views import get_tenant_or_404
+from apps.tenants_api import tenant_cache
+from apps.tenants_api.models import Tenant
+from apps.tenants_api.tenant_cache import (
+    get_cached_tenant,
+    get_tenant_snapshot,
+    get_tenant_snapshot_by_subdomain,
+    invalidate_tenant_snapshots,
+)
+
+
+@pytest.fixture
+def tenant(db):
+    return Tenant.objects.create(name="Snapshot Barber", subdomain="snapshot")
+
+
+@pytest.mark.django_db
+def test_snapshot_is_served_without_queries_once_warm(tenant, django_assert_num_queries):
+    first = get_tenant_snapshot(tenant.id)
+    get_tenant_snapshot_by_subdomain('snapshot')
+
+    with django_assert_num_queries(0):
+        again = get_tenant_snapshot(tenant.id)
+        by_subdomain = get_tenant_snapshot_by_subdomain('snapshot')
+
+    assert again is first
+    assert by_subdomain is first
+
+
+@pytest.mark.django_db
+def test_cached_tenant_is_a_detached_persisted_instance(tenant):
+    cached = get_cached_tenant(tenant.id)
+    cached.settings['mutated'] = True
+
+    assert cached.pk == tenant.pk
+    assert not cached._state.adding
+    assert 'mutated' not in get_cached_tenant(tenant.id).settings
+
+
+@pytest.mark.django_db
+def test_save_invalidates_snapshot(tenant):
+    assert get_tenant_snapshot(tenant.id).is_active
+
+    tenant.soft_delete()
+
+    snapshot = get_tenant_snapshot(tenant.id)
+    assert snapshot.deleted_at is not None
+    assert not snapshot.is_active
+    with pytest.raises(Http404):
+        get_tenant_or_404('snapshot')
+
+
+@pytest.mark.django_db
+def test_queryset_update_requires_explicit_invalidation(tenant):
+    get_tenant_snapshot(tenant.id)
+
+    Tenant.objects.filter(id=tenant.id).update(is_active=False)
+    invalidate_tenant_snapshots([tenant.id])
+
+    assert get_tenant_snapshot(tenant.id).is_active is False
+
+
+@pytest.mark.django_db
+def test_subdomain_change_is_not_served_from_stale_mapping(tenant):
+    get_tenant_snapshot_by_subdomain('snapshot')
+
+    tenant.subdomain = 'renamed'
+    tenant.save()
+
+    assert get_tenant_snapshot_by_subdomain('snapshot') is None
+    assert get_tenant_snapshot_by_subdomain('renamed').id == tenant.id
+
+
+@pytest.mark.django_db
+def test_unshared_cache_bounds_staleness_of_other_workers(tenant):
+    # Otro worker desactiva el tenant: su subida de version no llega a este LocMem
+    with mock.patch.object(tenant_cache, 'is_shared_cache', return_value=True):
+        get_tenant_snapshot(tenant.id)
+        Tenant.objects.filter(id=tenant.id).update(is_active=False)
+        assert get_tenant_snapshot(tenant.id).is_active is True
+
+    cache.clear()
+    tenant_cache._local_snapshots.clear()
+    with mock.patch.object(tenant_cache, 'TENANT_SNAPSHOT_FALLBACK_TTL', 0):
+        Tenant.objects.filter(id=tenant.id).update(is_active=True)
+        get_tenant_snapshot(tenant.id)
+        Tenant.objects.filter(id=tenant.id).update(is_active=False)
+        assert get_tenant_snapshot(tenant.id).is_active is False
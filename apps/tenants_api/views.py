@@ -2,6 +2,7 @@ from rest_framework import viewsets, permissions, decorators, response, status,
 from django.contrib.auth import get_user_model
 from apps.core.permissions import IsSuperAdmin
 from .models import Tenant
+from .tenant_cache import invalidate_tenant_snapshots
 from .serializers import TenantSerializer, TenantLocaleSerializer
 from django.contrib.contenttypes.models import ContentType
 from apps.audit_api.models import AuditLog
@@ -250,6 +251,7 @@ class TenantViewSet(viewsets.ModelViewSet):
         tenant_ids = request.data.get('tenant_ids', [])
         tenants = Tenant.objects.filter(id__in=tenant_ids, deleted_at__isnull=True)
         tenants.update(is_active=True)
+        invalidate_tenant_snapshots(tenant_ids)
         return response.Response({"activated": len(tenants)})
     
     @decorators.action(detail=False, methods=["post"])
@@ -258,6 +260,7 @@ class TenantViewSet(viewsets.ModelViewSet):
         tenant_ids = request.data.get('tenant_ids', [])
         tenants = Tenant.objects.filter(id__in=tenant_ids, deleted_at__isnull=True)
         tenants.update(is_active=False)
+        invalidate_tenant_snapshots(tenant_ids)
         return response.Response({"deactivated": len(tenants)})
     
     @decorators.action(detail=False, methods=["post"])
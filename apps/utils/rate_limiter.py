@@ -0,0 +1,213 @@
+"""Rate limiter GCRA (Generic Cell Rate Algorithm) para APIRateLimitMiddleware.
+
+Cada clave guarda un solo valor: el TAT (theoretical arrival time) en ms. Un
+limite de ``limit`` requests por ``period`` equivale a un intervalo de emision
+``period / limit`` con rafaga de hasta ``limit`` requests; no hay ventanas fijas
+que se reinicien en bloque ni TTL que se renueve con cada hit.
+
+Con Redis la comprobacion y el incremento son un unico script Lua atomico (un
+round trip como mucho por request). Sin Redis (LocMem en desarrollo/tests) el
+mismo algoritmo corre en memoria del proceso, por lo que el limite es por worker.
+
+Para scopes de lectura se puede pedir un lote (``batch``): el script concede
+hasta ``batch`` unidades de una vez y el proceso las consume localmente durante
+``lease_ttl`` segundos sin volver a Redis, así que el lote nunca permite superar
+el limite. Los lotes viven en la memoria de cada worker: las unidades no usadas
+de un lote vencido se devuelven en el mismo script del siguiente request de esa
+clave que llegue a ese worker; hasta entonces siguen cobradas (como mucho
+``batch - 1`` por worker, recuperadas en ``(batch - 1) * interval``). Por eso
+solo se concede un lote lejos del limite (LEASE_HEADROOM).
+"""
+import logging
+import math
+import threading
+import time
+from dataclasses import dataclass
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+
+GCRA_SCRIPT = """
+local now = tonumber(ARGV[1])
+local interval = tonumber(ARGV[2])
+local period = tonumber(ARGV[3])
+local requested = tonumber(ARGV[4])
+local released = tonumber(ARGV[5])
+local headroom = tonumber(ARGV[6])
+local tat = tonumber(redis.call('GET', KEYS[1]))
+if tat then
+    tat = tat - released
+end
+if not tat or tat < now then
+    tat = now
+end
+local available = math.floor((now + period - tat) / interval)
+if available < 1 then
+    if released > 0 then
+        redis.call('SET', KEYS[1], string.format('%.3f', tat), 'PX', math.ceil(tat - now))
+    end
+    return {0, 0, math.ceil(tat - period + interval - now), math.ceil(tat - now)}
+end
+if available < requested * headroom then
+    requested = 1
+end
+local granted = math.min(requested, available)
+local new_tat = tat + granted * interval
+redis.call('SET', KEYS[1], string.format('%.3f', new_tat), 'PX', math.ceil(new_tat - now))
+return {granted, available - granted, 0, math.ceil(new_tat - now)}
+"""
+
+# Un lote solo se concede si quedan al menos ``batch * LEASE_HEADROOM`` unidades;
+# cerca del limite cada request se cobra de a una, asi que las unidades varadas
+# en lotes de otros workers no provocan 429 antes de tiempo.
+LEASE_HEADROOM = 10
+
+
+@dataclass(frozen=True)
+class RateLimitResult:
+    allowed: bool
+    limit: int
+    remaining: int
+    # Segundos hasta poder reintentar (0 si se permitio)
+    retry_after: int
+    # Segundos hasta recuperar el cupo completo
+    reset_after: int
+
+
+def _now_ms():
+    return time.time() * 1000
+
+
+class _Lease:
+    __slots__ = ('tokens', 'remaining', 'reset_at', 'expires_at')
+
+    def __init__(self, tokens, remaining, reset_at, expires_at):
+        self.tokens = tokens
+        self.remaining = remaining
+        self.reset_at = reset_at
+        self.expires_at = expires_at
+
+
+class GCRARateLimiter:
+    """Limiter GCRA con backend Redis atomico y fallback en memoria del proceso."""
+
+    LOCAL_MAX_KEYS = 10000
+
+    def __init__(self, period=3600, lease_ttl=5.0):
+        self.period_ms = period * 1000
+        self.lease_ttl = lease_ttl
+        self._lock = threading.Lock()
+        self._local_tats = {}
+        self._leases = {}
+        self._script = None
+
+    # Backends -----------------------------------------------------------------
+
+    def _redis_script(self):
+        if self._script is None:
+            backend = settings.CACHES.get('default', {}).get('BACKEND', '')
+            if 'redis' not in backend.lower():
+                return None
+            from django_redis import get_redis_connection
+
+            self._script = get_redis_connection('default').register_script(GCRA_SCRIPT)
+        return self._script
+
+    def _acquire_redis(self, script, key, limit, requested, released, now):
+        granted, available, retry_ms, reset_ms = script(
+            keys=[key],
+            args=[int(now), self.period_ms / limit, self.period_ms, requested, released, LEASE_HEADROOM],
+        )
+        return int(granted), int(available), int(retry_ms), int(reset_ms)
+
+    def _acquire_local(self, key, limit, requested, released, now):
+        interval = self.period_ms / limit
+        with self._lock:
+            tat = max(self._local_tats.get(key, now) - released, now)
+            available = math.floor((now + self.period_ms - tat) / interval)
+            if available < 1:
+                if released:
+                    self._local_tats[key] = tat
+                return 0, 0, math.ceil(tat - self.period_ms + interval - now), math.ceil(tat - now)
+            if available < requested * LEASE_HEADROOM:
+                requested = 1
+            granted = min(requested, available)
+            new_tat = tat + granted * interval
+            if len(self._local_tats) >= self.LOCAL_MAX_KEYS:
+                # Las claves con TAT vencido equivalen a cupo completo
+                self._local_tats = {k: v for k, v in self._local_tats.items() if v > now}
+            self._local_tats[key] = new_tat
+            return granted, available - granted, 0, math.ceil(new_tat - now)
+
+    def _acquire(self, key, limit, requested, now, unused=0):
+        """Pide ``requested`` unidades tras devolver ``unused`` de un lote vencido."""
+        released = unused * self.period_ms / limit
+        script = self._redis_script()
+        if script is None:
+            return self._acquire_local(key, limit, requested, released, now)
+        return self._acquire_redis(script, key, limit, requested, released, now)
+
+    # API ----------------------------------------------------------------------
+
+    def _consume_lease(self, key, limit, now):
+        """``(resultado, 0)`` si el lote vigente cubre el request.
+
+        Si no, ``(None, unidades)`` con las unidades sin usar de un lote vencido,
+        que se devuelven en la misma llamada a ``_acquire``.
+        """
+        with self._lock:
+            lease = self._leases.get((key, limit))
+            if lease is None:
+                return None, 0
+            if lease.expires_at <= time.monotonic():
+                del self._leases[(key, limit)]
+                return None, lease.tokens
+            if lease.tokens < 1:
+                return None, 0
+            lease.tokens -= 1
+            return RateLimitResult(
+                allowed=True,
+                limit=limit,
+                remaining=lease.remaining + lease.tokens,
+                retry_after=0,
+                reset_after=max(0, math.ceil((lease.reset_at - now) / 1000)),
+            ), 0
+
+    def hit(self, key, limit, batch=1):
+        """Registra un request contra ``key``; lanza la excepcion del backend si falla."""
+        now = _now_ms()
+        unused = 0
+        if batch > 1:
+            result, unused = self._consume_lease(key, limit, now)
+            if result is not None:
+                return result
+
+        granted, available, retry_ms, reset_ms = self._acquire(key, limit, max(1, batch), now, unused)
+        if granted > 1:
+            with self._lock:
+                if len(self._leases) >= self.LOCAL_MAX_KEYS:
+                    # Las unidades de los lotes vencidos descartados aqui no se devuelven
+                    now_monotonic = time.monotonic()
+                    self._leases = {k: v for k, v in self._leases.items() if v.expires_at > now_monotonic}
+                self._leases[(key, limit)] = _Lease(
+                    tokens=granted - 1,
+                    remaining=available,
+                    reset_at=now + reset_ms,
+                    expires_at=time.monotonic() + self.lease_ttl,
+                )
+
+        return RateLimitResult(
+            allowed=granted >= 1,
+            limit=limit,
+            remaining=available + max(0, granted - 1),
+            retry_after=math.ceil(retry_ms / 1000),
+            reset_after=math.ceil(reset_ms / 1000),
+        )
+
+    def reset(self):
+        """Vacía el estado local (tests)."""
+        with self._lock:
+            self._local_tats.clear()
+            self._leases.clear()
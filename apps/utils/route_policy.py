@@ -0,0 +1,245 @@
+"""Tabla única de políticas por ruta para los middlewares de la API.
+
+TenantMiddleware, SubscriptionValidationMiddleware, APIRateLimitMiddleware y
+MaintenanceModeMiddleware comparten aquí sus listas de prefijos. La tabla se
+compila una vez al importar el módulo en un trie por caracteres y cada request
+se clasifica una sola vez (``get_route_flags``); los middlewares solo leen
+flags.
+"""
+import enum
+
+from django.conf import settings
+
+
+class RouteFlag(enum.IntFlag):
+    NONE = 0
+    API = enum.auto()
+    ADMIN_SITE = enum.auto()
+    # Rutas públicas: TenantMiddleware no resuelve tenant
+    PUBLIC = enum.auto()
+    # Públicas solo con DEBUG (schema/docs); se evalúa en cada request
+    PUBLIC_IN_DEBUG = enum.auto()
+    # Solo superusuarios
+    ADMIN_ONLY = enum.auto()
+    # Accesibles aunque el tenant esté bloqueado por falta de pago
+    PAYWALL_SAFE = enum.auto()
+    PAYWALL_SAFE_READ = enum.auto()
+    # TenantMiddleware no evalúa el nivel de acceso de la suscripción
+    SUBSCRIPTION_EXEMPT = enum.auto()
+    # SubscriptionValidationMiddleware no aplica
+    SUBSCRIPTION_CHECK_EXEMPT = enum.auto()
+    WEBHOOK = enum.auto()
+    BILLING_ACCESS = enum.auto()
+    RATE_LIMIT_EXEMPT = enum.auto()
+    RATE_LIMIT_EXEMPT_READ = enum.auto()
+    MAINTENANCE_EXEMPT = enum.auto()
+
+
+READ_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+PUBLIC_PREFIXES = [
+    '/api/auth/login/',
+    '/api/auth/cookie-login/',
+    '/api/auth/cookie-logout/',
+    '/api/auth/cookie-refresh/',
+    '/api/auth/mfa/login-verify/',
+    '/api/auth/register/',
+    '/api/auth/password-reset/',
+    '/api/healthz/',
+    '/api/subscriptions/plans/',  # Solo lectura
+    '/api/subscriptions/register/',
+    '/api/subscriptions/register-with-plan/',
+    '/api/settings/contact/',  # Formulario público
+    '/api/booking/',  # Auto-agendamiento público
+]
+
+PUBLIC_DEBUG_PREFIXES = [
+    '/api/schema/',
+    '/api/docs/',
+]
+
+ADMIN_ONLY_PREFIXES = [
+    '/api/settings/admin/',
+    '/api/system-settings/',
+]
+
+PAYWALL_SAFE_PREFIXES = [
+    '/api/subscriptions/me/entitlements/',
+    '/api/subscriptions/renew/',
+    '/api/tenants/current/',
+    '/api/tenants/locale/',
+    '/api/tenants/subscription-status/',
+]
+
+PAYWALL_SAFE_READONLY_PREFIXES = [
+    '/api/notifications/',
+]
+
+SUBSCRIPTION_EXEMPT_PREFIXES = [
+    '/api/subscriptions/renew/',
+    '/api/tenants/subscription-status/',
+    '/api/subscriptions/plans/',
+]
+
+SUBSCRIPTION_CHECK_EXEMPT_PREFIXES = [
+    '/api/auth/',
+    '/api/schema/',
+    '/api/docs/',
+    '/api/healthz/',
+    '/admin/',
+    '/api/subscriptions/plans/',  # Permitir ver planes
+    '/api/subscriptions/register/',  # Permitir registro
+    '/api/subscriptions/register-with-plan/',  # Permitir registro con plan
+    '/api/settings/contact/',
+    '/api/booking/',  # Auto-agendamiento público
+]
+
+BILLING_WEBHOOK_PATHS = [
+    '/api/billing/webhooks/stripe/',
+    '/api/payments/stripe/webhook/',
+]
+
+BILLING_ACCESS_PATHS = [
+    '/api/payments/payments/create_subscription_payment/',
+    '/api/subscriptions/renew/',
+]
+
+# Endpoints públicos (sin throttling por plan)
+RATE_LIMIT_EXEMPT_PREFIXES = [
+    '/api/auth/',
+    '/api/healthz/',
+    '/api/schema/',
+    '/api/docs/',
+]
+
+# Endpoints de alta frecuencia de lectura que no deben penalizar UX.
+RATE_LIMIT_EXEMPT_READ_PREFIXES = [
+    '/api/notifications/',
+    '/api/subscriptions/me/entitlements/',
+    '/api/subscriptions/renew/',
+    '/api/settings/barbershop/',
+    '/api/tenants/locale/',
+    '/api/tenants/current/',
+    '/api/auth/verify/',
+]
+
+# Admin, health checks, landing y login siguen disponibles en mantenimiento
+MAINTENANCE_EXEMPT_EXACT = [
+    '/admin',
+]
+
+MAINTENANCE_EXEMPT_PREFIXES = [
+    '/admin/',
+    '/api/healthz/',
+    '/api/system-settings/',
+    '/api/settings/public-branding/',
+    '/landing',
+    '/pages/landing',
+    '/api/auth/register',
+    '/api/auth/login',
+    '/api/auth/cookie-login',
+    '/api/auth/cookie-refresh',
+    '/api/auth/verify',
+]
+
+ROUTE_POLICY_TABLE = [
+    (['/api/'], RouteFlag.API),
+    (['/admin/'], RouteFlag.ADMIN_SITE),
+    (PUBLIC_PREFIXES, RouteFlag.PUBLIC),
+    (PUBLIC_DEBUG_PREFIXES, RouteFlag.PUBLIC_IN_DEBUG),
+    (ADMIN_ONLY_PREFIXES, RouteFlag.ADMIN_ONLY),
+    (PAYWALL_SAFE_PREFIXES, RouteFlag.PAYWALL_SAFE),
+    (PAYWALL_SAFE_READONLY_PREFIXES, RouteFlag.PAYWALL_SAFE_READ),
+    (SUBSCRIPTION_EXEMPT_PREFIXES, RouteFlag.SUBSCRIPTION_EXEMPT),
+    (SUBSCRIPTION_CHECK_EXEMPT_PREFIXES, RouteFlag.SUBSCRIPTION_CHECK_EXEMPT),
+    (BILLING_WEBHOOK_PATHS, RouteFlag.WEBHOOK),
+    (BILLING_ACCESS_PATHS, RouteFlag.BILLING_ACCESS),
+    (RATE_LIMIT_EXEMPT_PREFIXES, RouteFlag.RATE_LIMIT_EXEMPT),
+    (RATE_LIMIT_EXEMPT_READ_PREFIXES, RouteFlag.RATE_LIMIT_EXEMPT_READ),
+    (MAINTENANCE_EXEMPT_PREFIXES, RouteFlag.MAINTENANCE_EXEMPT),
+]
+
+
+class RouteClassifier:
+    """Trie por caracteres: una pasada sobre el path acumula los flags de
+    todos los prefijos que lo cubren."""
+
+    _FLAGS = 0
+    _EXACT_FLAGS = 1
+
+    def __init__(self, table, exact_table=()):
+        self._root = {}
+        for prefixes, flag in table:
+            for prefix in prefixes:
+                self._add(prefix, flag, self._FLAGS)
+        for paths, flag in exact_table:
+            for path in paths:
+                self._add(path, flag, self._EXACT_FLAGS)
+
+    def _add(self, prefix, flag, slot):
+        node = self._root
+        for char in prefix:
+            node = node.setdefault(char, {})
+        marks = node.setdefault(None, [0, 0])
+        marks[slot] |= int(flag)
+
+    def classify(self, path):
+        flags = 0
+        node = self._root
+        for char in path:
+            node = node.get(char)
+            if node is None:
+                return RouteFlag(flags)
+            marks = node.get(None)
+            if marks is not None:
+                flags |= marks[self._FLAGS]
+        marks = node.get(None)
+        if marks is not None:
+            flags |= marks[self._EXACT_FLAGS]
+        return RouteFlag(flags)
+
+
+route_classifier = RouteClassifier(
+    ROUTE_POLICY_TABLE,
+    exact_table=[(MAINTENANCE_EXEMPT_EXACT, RouteFlag.MAINTENANCE_EXEMPT)],
+)
+
+
+class RoutePolicy:
+    """Flags de la ruta del request con los casos que dependen del método HTTP."""
+
+    __slots__ = ('flags', 'is_read')
+
+    def __init__(self, flags, method):
+        self.flags = flags
+        self.is_read = method in READ_METHODS
+
+    def __contains__(self, flag):
+        return bool(self.flags & flag)
+
+    @property
+    def is_public(self):
+        if RouteFlag.PUBLIC in self.flags:
+            return True
+        return RouteFlag.PUBLIC_IN_DEBUG in self.flags and settings.DEBUG
+
+    @property
+    def is_paywall_safe(self):
+        if RouteFlag.PAYWALL_SAFE in self.flags:
+            return True
+        return self.is_read and RouteFlag.PAYWALL_SAFE_READ in self.flags
+
+    @property
+    def is_rate_limit_exempt(self):
+        if RouteFlag.RATE_LIMIT_EXEMPT in self.flags or RouteFlag.BILLING_ACCESS in self.flags:
+            return True
+        return self.is_read and RouteFlag.RATE_LIMIT_EXEMPT_READ in self.flags
+
+
+def get_route_policy(request):
+    """Clasifica ``request.path`` una sola vez por request."""
+    policy = getattr(request, '_route_policy', None)
+    if policy is None:
+        policy = RoutePolicy(route_classifier.classify(request.path), request.method)
+        request._route_policy = policy
+    return policy
@@ -0,0 +1,61 @@
+import pytest
+from django.test import RequestFactory, override_settings
+
+from apps.utils.route_policy import (
+    MAINTENANCE_EXEMPT_PREFIXES,
+    ROUTE_POLICY_TABLE,
+    RouteFlag,
+    get_route_policy,
+    route_classifier,
+)
+
+
+SAMPLE_PATHS = [
+    '/', '/admin', '/admin/', '/admin/login/', '/landing', '/landing-page', '/pages/landing/x',
+    '/api/', '/api/auth/', '/api/auth/login/', '/api/auth/verify/', '/api/auth/verify-email/abc/',
+    '/api/healthz/', '/api/schema/', '/api/docs/', '/api/booking/demo/services/',
+    '/api/subscriptions/plans/', '/api/subscriptions/register/', '/api/subscriptions/register-with-plan/',
+    '/api/subscriptions/renew/', '/api/subscriptions/me/entitlements/', '/api/tenants/current/',
+    '/api/notifications/unread/', '/api/billing/webhooks/stripe/', '/api/payments/stripe/webhook/',
+    '/api/payments/payments/create_subscription_payment/', '/api/settings/admin/users/',
+    '/api/system-settings/', '/api/settings/barbershop/', '/api/pos/sales/', '/api/pos/sales/10/',
+]
+
+
+@pytest.mark.parametrize('path', SAMPLE_PATHS)
+def test_trie_matches_linear_prefix_scan(path):
+    expected = RouteFlag.NONE
+    for prefixes, flag in ROUTE_POLICY_TABLE:
+        if any(path.startswith(prefix) for prefix in prefixes):
+            expected |= flag
+    if path == '/admin':
+        expected |= RouteFlag.MAINTENANCE_EXEMPT
+
+    assert route_classifier.classify(path) == expected
+
+
+def test_maintenance_prefixes_are_character_prefixes():
+    assert '/landing' in MAINTENANCE_EXEMPT_PREFIXES
+    assert RouteFlag.MAINTENANCE_EXEMPT in route_classifier.classify('/landing-page')
+    assert RouteFlag.MAINTENANCE_EXEMPT not in route_classifier.classify('/administrator')
+
+
+def test_method_dependent_flags():
+    rf = RequestFactory()
+
+    read = get_route_policy(rf.get('/api/notifications/'))
+    write = get_route_policy(rf.post('/api/notifications/'))
+
+    assert read.is_paywall_safe and read.is_rate_limit_exempt
+    assert not write.is_paywall_safe and not write.is_rate_limit_exempt
+
+
+def test_debug_only_public_routes():
+    request = RequestFactory().get('/api/docs/')
+    policy = get_route_policy(request)
+
+    with override_settings(DEBUG=False):
+        assert not policy.is_public
+    with override_settings(DEBUG=True):
+        assert policy.is_public
+    assert get_route_policy(request) is policy
@@ -0,0 +1,108 @@
+"""Cache en dos niveles con invalidacion por version.
+
+- LocalLRUCache: cache en memoria del proceso (por worker de gunicorn), con TTL
+  corto como cota de staleness cuando el cache compartido no esta disponible.
+- get_cache_version / bump_cache_version: contador de version en el cache
+  compartido (Redis). Las entradas se guardan con la version en la clave, asi
+  que subir la version invalida todas las copias en todos los workers.
+
+Si el cache compartido falla se devuelve ``None`` como version y el llamador
+debe ir a la base de datos (fail-open hacia la fuente de verdad, nunca hacia
+datos viejos).
+"""
+import logging
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import cache
+
+logger = logging.getLogger(__name__)
+
+
+class LocalLRUCache:
+    """LRU thread-safe en memoria del proceso con expiracion por entrada."""
+
+    def __init__(self, maxsize=1024, ttl=30):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return default
+            expires_at, value = item
+            if expires_at <= time.monotonic():
+                del self._data[key]
+                return default
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl=None):
+        expires_at = time.monotonic() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._data[key] = (expires_at, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+def is_shared_cache():
+    """``True`` si el cache por defecto es compartido entre procesos (Redis/Memcached).
+
+    Con LocMem cada worker tiene su propio contador de version y una subida no
+    se ve en los demas; los llamadores deben acotar la staleness con un TTL corto.
+    """
+    backend = settings.CACHES.get('default', {}).get('BACKEND', '').lower()
+    # 'locmemcache' contiene 'memcache'
+    if 'locmem' in backend:
+        return False
+    return 'redis' in backend or 'memcache' in backend
+
+
+def _fresh_version():
+    # Basada en tiempo: si la clave de version se pierde (eviction/reinicio de
+    # Redis) la nueva version nunca coincide con entradas antiguas.
+    return int(time.time() * 1000)
+
+
+def get_cache_version(key):
+    """Version actual de ``key``; la inicializa si no existe. ``None`` si el cache falla."""
+    try:
+        version = cache.get(key)
+        if version is None:
+            cache.add(key, _fresh_version(), timeout=None)
+            version = cache.get(key)
+        return version
+    except Exception as exc:
+        logger.warning("Versioned cache get failed key=%s: %s", key, exc)
+        return None
+
+
+def bump_cache_version(key):
+    """Invalida todas las entradas asociadas a ``key`` subiendo su version."""
+    try:
+        try:
+            return cache.incr(key)
+        except ValueError:
+            version = _fresh_version()
+            cache.set(key, version, timeout=None)
+            return version
+    except Exception as exc:
+        logger.warning("Versioned cache bump failed key=%s: %s", key, exc)
+        return None
@@ -309,6 +309,7 @@ _db_schema = env('DB_SCHEMA', default='')
 _pgbouncer_enabled = env.bool('PGBOUNCER_ENABLED', default=False)
 
 # Con PgBouncer en modo transaction: CONN_MAX_AGE=0 para no dejar conexiones abiertas
+# y sin cursores del lado del servidor (.iterator() en exportaciones)
 _conn_max_age = 0 if _pgbouncer_enabled else env.int('CONN_MAX_AGE', default=600)
 
 _database_url = env('DATABASE_URL', default=None)
@@ -324,6 +325,7 @@ if _database_url:
         'connect_timeout': 10,
         'options': _db_schema_opts,
     })
+    _db_config['DISABLE_SERVER_SIDE_CURSORS'] = _pgbouncer_enabled
     DATABASES = {'default': _db_config}
 else:
     _db_schema_opts = f'-c search_path={_db_schema},public -c statement_timeout=30000' if _db_schema else '-c statement_timeout=30000'
@@ -336,6 +338,7 @@ else:
             'HOST': env('DB_HOST', default='db'),
             'PORT': env('DB_PORT', default='5432'),
             'CONN_MAX_AGE': _conn_max_age,
+            'DISABLE_SERVER_SIDE_CURSORS': _pgbouncer_enabled,
             'OPTIONS': {
                 'connect_timeout': 10,
                 'options': _db_schema_opts,
@@ -368,6 +371,58 @@ else:
     }
     SESSION_ENGINE = 'django.contrib.sessions.backends.db'
 
+# Snapshots de Tenant (apps.tenants_api.tenant_cache): TTL del cache compartido
+# y cota de staleness del LRU por proceso cuando Redis no está disponible.
+# Sin cache compartido (LocMem) ambas copias viven TENANT_SNAPSHOT_FALLBACK_TTL.
+TENANT_SNAPSHOT_CACHE_TTL = env.int('TENANT_SNAPSHOT_CACHE_TTL', default=300)
+TENANT_SNAPSHOT_LOCAL_TTL = env.int('TENANT_SNAPSHOT_LOCAL_TTL', default=30)
+TENANT_SNAPSHOT_FALLBACK_TTL = env.int('TENANT_SNAPSHOT_FALLBACK_TTL', default=10)
+
+# SystemSettings (apps.settings_api.settings_cache): copia por proceso invalidada
+# por version en Redis; sin Redis se recarga cada SYSTEM_SETTINGS_FALLBACK_TTL.
+SYSTEM_SETTINGS_LOCAL_TTL = env.int('SYSTEM_SETTINGS_LOCAL_TTL', default=300)
+SYSTEM_SETTINGS_FALLBACK_TTL = env.int('SYSTEM_SETTINGS_FALLBACK_TTL', default=10)
+
+# Auditoría (apps.audit_api.buffer): 'request' = bulk_create al final del
+# request, 'async' = lote a Celery, 'sync' = una inserción por entrada.
+AUDIT_LOG_DURABILITY = env('AUDIT_LOG_DURABILITY', default='request')
+AUDIT_LOG_BUFFER_MAX_SIZE = env.int('AUDIT_LOG_BUFFER_MAX_SIZE', default=200)
+
+# NCF por bloques (apps.pos_api.ncf_allocator): números reservados por caja y
+# vida máxima en segundos de un bloque antes de liberarlo.
+NCF_BLOCK_SIZE = env.int('NCF_BLOCK_SIZE', default=50)
+NCF_BLOCK_TTL = env.int('NCF_BLOCK_TTL', default=12 * 3600)
+
+# Idempotency-Key (apps.pos_api.idempotency): vida de la respuesta guardada,
+# vida de un reclamo en curso y espera máxima de un duplicado, en segundos.
+IDEMPOTENCY_TTL = env.int('IDEMPOTENCY_TTL', default=24 * 3600)
+IDEMPOTENCY_LOCK_TTL = env.int('IDEMPOTENCY_LOCK_TTL', default=60)
+IDEMPOTENCY_WAIT = env.int('IDEMPOTENCY_WAIT', default=10)
+
+# Sincronización offline (apps.pos_api.offline_sync): ventas por lote y
+# ventas por transacción.
+OFFLINE_SYNC_MAX_BATCH = env.int('OFFLINE_SYNC_MAX_BATCH', default=500)
+OFFLINE_SYNC_CHUNK_SIZE = env.int('OFFLINE_SYNC_CHUNK_SIZE', default=100)
+
+# Agregados de daily_summary/dashboard_stats del POS (apps.pos_api.sales_stats):
+# vida en cache con Redis y, sin cache compartido, cota de staleness en segundos.
+POS_STATS_CACHE_TTL = env.int('POS_STATS_CACHE_TTL', default=300)
+POS_STATS_FALLBACK_TTL = env.int('POS_STATS_FALLBACK_TTL', default=30)
+
+# Dashboard en vivo de reportes (LiveDashboardView): segundos que todo el
+# personal de un tenant/sucursal comparte la misma copia.
+LIVE_DASHBOARD_CACHE_TTL = env.int('LIVE_DASHBOARD_CACHE_TTL', default=15)
+
+# Exportaciones en segundo plano (apps.reports_api.export_jobs): alias de
+# STORAGES para los archivos, horas que se conservan, segundos en que un pedido
+# idéntico reutiliza el resultado, segundos sin avance tras los que un trabajo
+# en curso se da por caído y vigencia del enlace de descarga.
+EXPORT_JOB_STORAGE = env('EXPORT_JOB_STORAGE', default='default')
+EXPORT_JOB_RETENTION_HOURS = env.int('EXPORT_JOB_RETENTION_HOURS', default=24)
+EXPORT_JOB_REUSE_TTL = env.int('EXPORT_JOB_REUSE_TTL', default=300)
+EXPORT_JOB_STALE_TIMEOUT = env.int('EXPORT_JOB_STALE_TIMEOUT', default=600)
+EXPORT_DOWNLOAD_TOKEN_TTL = env.int('EXPORT_DOWNLOAD_TOKEN_TTL', default=900)
+
 # Celery — usa REDIS_URL como fuente única si no se definen explícitamente
 # ⚠️  RENDER FREE PLAN: CELERY_TASK_ALWAYS_EAGER=True en env vars de Render.
 # Las tareas corren síncronas dentro del web service (sin workers separados).
@@ -399,6 +454,15 @@ CELERY_BEAT_SCHEDULE = {
         'task': 'apps.subscriptions_api.tasks.check_expired_subscriptions',
         'schedule': crontab(minute=0),  # Cada hora
     },
+    # Avisos de fin de trial / expiración (únicos emisores; el request no los dispara)
+    'send-trial-expiration-warnings': {
+        'task': 'apps.subscriptions_api.tasks.send_trial_expiration_warnings',
+        'schedule': crontab(hour=10, minute=0),  # Diario a las 10:00 AM
+    },
+    'send-subscription-expiry-warnings': {
+        'task': 'apps.subscriptions_api.tasks.send_subscription_expiry_warnings',
+        'schedule': crontab(hour=10, minute=15),  # Diario a las 10:15 AM
+    },
     # Tareas de automatización de citas
     'mark-expired-appointments': {
         'task': 'apps.notifications_api.tasks.mark_expired_appointments',
@@ -420,6 +484,26 @@ CELERY_BEAT_SCHEDULE = {
         'task': 'apps.notifications_api.tasks.cleanup_old_notifications',
         'schedule': crontab(hour=3, minute=0, day_of_week=0),  # Domingos a las 3:00 AM
     },
+    # Bloques NCF vencidos o de cajas cerradas
+    'expire-ncf-blocks': {
+        'task': 'apps.pos_api.tasks.expire_ncf_blocks',
+        'schedule': crontab(minute='*/30'),  # Cada 30 minutos
+    },
+    # Claves de idempotencia vencidas (respaldo en base de datos)
+    'purge-idempotency-records': {
+        'task': 'apps.pos_api.tasks.purge_idempotency_records',
+        'schedule': crontab(hour=4, minute=15),  # Diario a las 4:15 AM
+    },
+    # Exportaciones de reportes vencidas y sus archivos
+    'purge-export-jobs': {
+        'task': 'apps.reports_api.tasks.purge_export_jobs',
+        'schedule': crontab(minute=45),  # Cada hora
+    },
+    # Verificación de acumuladores de nómina (solo marca diferencias)
+    'verify-payroll-accumulators': {
+        'task': 'apps.employees_api.tasks.verify_payroll_accumulators',
+        'schedule': crontab(hour=3, minute=30),  # Diario a las 3:30 AM
+    },
     # Reconciliación financiera diaria
     'daily-financial-reconciliation': {
         'task': 'apps.billing_api.tasks.daily_financial_reconciliation',